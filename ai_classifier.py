@@ -4,22 +4,128 @@ from tensorflow import keras
 from tensorflow.keras import layers
 import numpy as np
 import os
-from PIL import Image
+import threading
+from collections import namedtuple
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import cv2
+from cache_clasificaciones import CacheClasificaciones, hash_archivo
+from almacen_modelos import AlmacenModelos
+from aumentacion import agregar_aumentacion
+import perfiles
+import preprocesamiento
+import deteccion_ood
+from deteccion_ood import DESCONOCIDO
+from instrumentacion import medir
+from indice_embeddings import IndiceEmbeddings
+from miniaturas import VistaPrevia, GrillaMiniaturas
+
+
+# Máximo de vistas de TTA: completa, espejo, centro, 4 esquinas y centro espejado
+MAX_VISTAS_TTA = 8
+
+
+# Cambia cuando cambia la forma de interpretar la salida del modelo (p. ej. el rechazo de desconocidas):
+# los resultados en caché con otro formato dejan de usarse
+FORMATO_RESULTADOS = 2
+
+
+def version_resultados(version):
+    """Versión con que se guardan los resultados en la caché"""
+    return f"{version}/r{FORMATO_RESULTADOS}"
+
+
+# Modelo de la versión anterior al almacén versionado
+RUTA_MODELO_LEGADO = 'modelo_aeronaves.h5'
+RUTA_CLASES_LEGADO = 'clases_aeronaves.txt'
+
+
+def huella_archivo(ruta):
+    """Identificar una versión de archivo por tamaño y fecha de modificación"""
+    estado = os.stat(ruta)
+    return f"{estado.st_size:x}-{estado.st_mtime_ns:x}"
+
+
+# Hiperparámetros de entrenamiento; la búsqueda (busqueda_hiperparametros.py) varía estos mismos
+HIPERPARAMETROS_POR_DEFECTO = {
+    'tasa_aprendizaje': 1e-3,
+    'tamano_lote': 32,
+    'dropout': 0.5,
+    'tamano_imagen': 224,
+    'aumentacion': False,
+    'mezcla': None,            # None, 'mixup' o 'cutmix' (requiere aumentacion)
+    'epocas': 10,
+    'paciencia': 3,
+}
+
+
+def resolver_hiperparametros(hiperparametros=None, perfil=None):
+    """(perfil, hiperparámetros completos): valores por defecto, luego el perfil, luego los explícitos"""
+    perfil = perfil or perfiles.PERFIL_POR_DEFECTO
+    return perfil, dict(HIPERPARAMETROS_POR_DEFECTO, **perfiles.hiperparametros(perfil, hiperparametros))
+
+
+# Modelo, clases, versión, tamaño de entrada, perfil y calibración de desconocidas (None = sin rechazo)
+# se reemplazan juntos en una sola asignación
+ModeloActivo = namedtuple('ModeloActivo', ['model', 'class_names', 'version', 'tamano', 'perfil', 'ood'],
+                          defaults=(None,))
 
 
 class ClasificadorAeronaves:
-    def __init__(self):
-        self.model = None
-        self.class_names = ['Boeing-737', 'Airbus-A320', 'Cessna-172', 'Embraer-190', 'ATR-72']
+    def __init__(self, usar_cache=True, almacen=None):
+        self._activo = ModeloActivo(
+            None, ['Boeing-737', 'Airbus-A320', 'Cessna-172', 'Embraer-190', 'ATR-72'], None, (224, 224),
+            perfiles.PERFIL_POR_DEFECTO)
+        self.almacen = almacen or AlmacenModelos()
+        self.cache = CacheClasificaciones() if usar_cache else None
+        self._marca_cargada = None
+        self._hilo_recarga = None
+        self._detener_recarga = threading.Event()
         self.img_height = 224
         self.img_width = 224
+        # Test-time augmentation: número de vistas por imagen (1 = desactivado)
+        self.vistas_tta = 1
+        # Fracción de la imagen que conserva cada recorte de TTA
+        self.fraccion_recorte = 0.8
+        # Métricas de la mejor época del último entrenamiento
+        self.ultimas_metricas = None
+        # Centroides y umbrales de desconocidas del último entrenamiento (se guardan con el modelo)
+        self.calibracion_ood = None
+        # (modelo, extractor de embedding y probabilidades) del último modelo usado
+        self._extractor = (None, None)
+    
+    @property
+    def model(self):
+        return self._activo.model
+    
+    @model.setter
+    def model(self, model):
+        self._activo = self._activo._replace(model=model)
+    
+    @property
+    def class_names(self):
+        return self._activo.class_names
+    
+    @class_names.setter
+    def class_names(self, class_names):
+        self._activo = self._activo._replace(class_names=class_names)
+    
+    @property
+    def version_modelo(self):
+        return self._activo.version
+    
+    @property
+    def perfil(self):
+        return self._activo.perfil
+    
+    @property
+    def rechaza_desconocidas(self):
+        return self._activo.ood is not None
         
-    def crear_modelo(self):
-        """Crear modelo CNN simple para clasificación"""
-        self.model = keras.Sequential([
+    def crear_modelo(self, dropout=0.5, tasa_aprendizaje=1e-3, perdida='sparse_categorical_crossentropy',
+                     num_clases=None):
+        """Crear modelo CNN simple para clasificación (no reemplaza al modelo activo)"""
+        model = keras.Sequential([
+            keras.Input(shape=(self.img_height, self.img_width, 3)),
             layers.Rescaling(1./255),
             layers.Conv2D(32, 3, activation='relu'),
             layers.MaxPooling2D(),
@@ -28,150 +134,489 @@ class ClasificadorAeronaves:
             layers.Conv2D(128, 3, activation='relu'),
             layers.MaxPooling2D(),
             layers.Flatten(),
-            layers.Dense(128, activation='relu'),
-            layers.Dropout(0.5),
-            layers.Dense(len(self.class_names), activation='softmax')
+            # Penúltima capa: su salida es el embedding de la búsqueda de imágenes parecidas
+            layers.Dense(128, activation='relu', name='embedding'),
+            layers.Dropout(dropout),
+            # Salida en float32 aunque el resto use precisión mixta
+            layers.Dense(num_clases or len(self.class_names), activation='softmax', dtype='float32')
         ])
         
-        self.model.compile(
-            optimizer='adam',
-            loss='sparse_categorical_crossentropy',
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=tasa_aprendizaje),
+            loss=perdida,
             metrics=['accuracy']
         )
         
         print("✅ Modelo creado exitosamente")
-        return self.model
+        return model
     
-    def entrenar_modelo(self, ruta_datos):
-        """Entrenar el modelo con imágenes organizadas en carpetas"""
+    @medir('ia.entrenar_modelo')
+    def entrenar_modelo(self, ruta_datos, hiperparametros=None, callbacks=(), ruta_checkpoint=None,
+                        guardar=True, perfil=None):
+        """Entrenar el modelo con imágenes organizadas en carpetas.
+        
+        Se detiene cuando la precisión de validación deja de mejorar y se queda con la mejor época.
+        El perfil (perfiles.py) fija resolución y precisión; los hiperparámetros explícitos mandan.
+        """
         if not os.path.exists(ruta_datos):
             print(f"❌ Error: La ruta {ruta_datos} no existe")
             return False
+        
+        perfil, hp = resolver_hiperparametros(hiperparametros, perfil)
+        self.img_height = self.img_width = int(hp['tamano_imagen'])
             
         try:
-            # Crear datasets de entrenamiento y validación
-            train_ds = tf.keras.utils.image_dataset_from_directory(
-                ruta_datos,
-                validation_split=0.2,
-                subset="training",
-                seed=123,
-                image_size=(self.img_height, self.img_width),
-                batch_size=32
-            )
-            
-            val_ds = tf.keras.utils.image_dataset_from_directory(
-                ruta_datos,
-                validation_split=0.2,
-                subset="validation", 
-                seed=123,
-                image_size=(self.img_height, self.img_width),
-                batch_size=32
-            )
+            # Crear datasets de entrenamiento y validación (misma decodificación que la inferencia;
+            # cada imagen se decodifica una sola vez y queda en caché)
+            train_ds, val_ds, class_names = preprocesamiento.datasets_desde_carpetas(
+                ruta_datos, (self.img_height, self.img_width), hp['tamano_lote'],
+                fraccion_validacion=0.2, semilla=123)
             
             # Obtener nombres de clases del dataset
-            self.class_names = train_ds.class_names
-            print(f"📂 Clases encontradas: {self.class_names}")
-            
-            # Optimizar rendimiento
-            AUTOTUNE = tf.data.AUTOTUNE
-            train_ds = train_ds.cache().prefetch(buffer_size=AUTOTUNE)
-            val_ds = val_ds.cache().prefetch(buffer_size=AUTOTUNE)
-            
-            # Crear modelo si no existe
-            if self.model is None:
-                self.crear_modelo()
+            print(f"📂 Clases encontradas: {class_names}")
             
-            # Entrenar modelo
-            print("🚀 Iniciando entrenamiento...")
-            history = self.model.fit(
-                train_ds,
-                validation_data=val_ds,
-                epochs=10,  # Pocas épocas para prueba rápida
-                verbose=1
-            )
+            metricas = self.entrenar_con_datasets(train_ds, val_ds, hiperparametros, perfil, callbacks,
+                                                  ruta_checkpoint, clases=class_names)
             
-            # Guardar modelo
-            self.guardar_modelo()
-            print("✅ Entrenamiento completado y modelo guardado")
+            if guardar:
+                self.guardar_modelo(metricas=metricas, ruta_datos=ruta_datos,
+                                    extra={'hiperparametros': hp, **perfiles.metadatos(perfil)})
+                print("✅ Entrenamiento completado y modelo guardado")
             return True
             
         except Exception as e:
             print(f"❌ Error durante entrenamiento: {str(e)}")
             return False
     
-    def predecir_imagen(self, ruta_imagen):
-        """Predecir tipo de aeronave desde imagen"""
+    def entrenar_con_datasets(self, train_ds, val_ds, hiperparametros=None, perfil=None, callbacks=(),
+                              ruta_checkpoint=None, clases=None):
+        """Entrenar con datasets de lotes (imágenes 0-255, etiquetas enteras) ya armados.
+        
+        Usa clases (por defecto self.class_names) y devuelve las métricas de la mejor época. Se entrena
+        una copia: el modelo activo sigue sirviendo intacto y se reemplaza recién al terminar.
+        """
+        perfil, hp = resolver_hiperparametros(hiperparametros, perfil)
+        clases = list(clases or self.class_names)
+        self.img_height = self.img_width = int(hp['tamano_imagen'])
+        # Sin aumento ni one-hot: para calibrar el rechazo de desconocidas después de entrenar
+        train_original, val_original = train_ds, val_ds
+        
+        # MixUp/CutMix mezclan etiquetas: se entrena con one-hot y entropía cruzada categórica
+        mezcla = hp['mezcla'] if hp['aumentacion'] else None
+        perdida = 'categorical_crossentropy' if mezcla else 'sparse_categorical_crossentropy'
+        if mezcla:
+            num_clases = len(clases)
+            train_ds = train_ds.map(lambda x, y: (x, tf.one_hot(y, num_clases)))
+            val_ds = val_ds.map(lambda x, y: (x, tf.one_hot(y, num_clases)))
+        
+        # Optimizar rendimiento (el aumento va después de la caché: cambia en cada época)
+        AUTOTUNE = tf.data.AUTOTUNE
+        if hp['aumentacion']:
+            train_ds = agregar_aumentacion(train_ds, semilla=123, mezcla=mezcla)
+        train_ds = train_ds.prefetch(buffer_size=AUTOTUNE)
+        val_ds = val_ds.prefetch(buffer_size=AUTOTUNE)
+        
+        # Se parte del modelo activo si no cambian los hiperparámetros, el perfil, el tamaño de entrada
+        # ni las clases; si no, de un modelo nuevo
+        with perfiles.politica(perfiles.precision_efectiva(perfil)):
+            model = self.crear_modelo(dropout=hp['dropout'], tasa_aprendizaje=hp['tasa_aprendizaje'],
+                                      perdida=perdida, num_clases=len(clases))
+        if (self.model is not None and not hiperparametros and perfil == self._activo.perfil
+                and self._activo.tamano == (self.img_height, self.img_width)
+                and list(self.class_names) == clases):
+            model.set_weights(self.model.get_weights())
+        
+        detencion = [keras.callbacks.EarlyStopping(monitor='val_accuracy', mode='max',
+                                                   patience=hp['paciencia'],
+                                                   restore_best_weights=True)]
+        if ruta_checkpoint:
+            detencion.append(keras.callbacks.ModelCheckpoint(ruta_checkpoint, monitor='val_accuracy',
+                                                             mode='max', save_best_only=True))
+        
+        # Entrenar modelo
+        print("🚀 Iniciando entrenamiento...")
+        history = model.fit(
+            train_ds,
+            validation_data=val_ds,
+            epochs=hp['epocas'],
+            callbacks=detencion + list(callbacks),
+            verbose=1
+        )
+        
+        # Métricas de la mejor época (la que quedó en el modelo)
+        mejor = int(np.argmax(history.history['val_accuracy']))
+        metricas = {nombre: float(valores[mejor]) for nombre, valores in history.history.items()}
+        metricas['epocas'] = len(history.history['val_accuracy'])
+        self.ultimas_metricas = metricas
+        
+        self.calibracion_ood = self.calibrar_ood(train_original, val_original, model=model)
+        # Un solo reemplazo y sin versión hasta guardar_modelo: nada entra a la caché con la clave
+        # de la versión anterior
+        self._activo = ModeloActivo(model, clases, None, (self.img_height, self.img_width), perfil,
+                                    self._preparar_ood(model, self.calibracion_ood))
+        return metricas
+    
+    def calibrar_ood(self, train_ds, val_ds, puntaje=deteccion_ood.PUNTAJE_POR_DEFECTO,
+                     tasa_aceptacion=deteccion_ood.TASA_ACEPTACION, model=None):
+        """Centroides de embeddings por clase (entrenamiento) y umbrales que aceptan
+        tasa_aceptacion de la validación; sin imágenes desconocidas de ejemplo"""
+        model = model or self.model
+        extractor = self._extractor_de(model)
+        
+        def recorrer(ds):
+            embeddings, probabilidades, etiquetas = [], [], []
+            for x, y in ds:
+                embedding, probabilidad = extractor(x, training=False)
+                embeddings.append(tf.cast(embedding, tf.float32).numpy())
+                probabilidades.append(tf.cast(probabilidad, tf.float32).numpy())
+                etiquetas.append(np.asarray(y))
+            return np.concatenate(embeddings), np.concatenate(probabilidades), np.concatenate(etiquetas)
+        
+        embeddings_train, _, etiquetas_train = recorrer(train_ds)
+        embeddings_val, probabilidades_val, _ = recorrer(val_ds)
+        pesos, sesgo = model.layers[-1].get_weights()
+        calibracion = deteccion_ood.calibrar(embeddings_train, etiquetas_train, embeddings_val,
+                                             probabilidades_val, pesos, sesgo, puntaje, tasa_aceptacion)
+        print(f"🚧 Umbral de desconocidas ({puntaje}): {calibracion['umbrales'][puntaje]:.3f}")
+        return calibracion
+    
+    def _preparar_ood(self, model, calibracion):
+        """Calibración con los pesos de la capa de salida (para los logits del puntaje de energía)"""
+        if not calibracion:
+            return None
+        pesos, sesgo = model.layers[-1].get_weights()
+        return deteccion_ood.preparar(calibracion, pesos, sesgo)
+    
+    @medir('ia.predecir_imagen')
+    def predecir_imagen(self, ruta_imagen, vistas_tta=None):
+        """Predecir tipo de aeronave desde imagen (DESCONOCIDO si no se parece a ningún tipo entrenado)"""
         if self.model is None:
             if not self.cargar_modelo():
                 return None, 0
+        # Una sola lectura: un cambio de modelo en paralelo no mezcla versiones
+        activo = self._activo
+        
+        vistas = self._normalizar_vistas(vistas_tta)
+        
+        # Un acierto en caché evita decodificar la imagen y ejecutar la red
+        clave = self._clave_cache(ruta_imagen, activo.version)
+        if clave:
+            en_cache = self.cache.obtener(clave, version_resultados(activo.version), vistas)
+            if en_cache:
+                return tuple(en_cache)
         
         try:
             # Cargar y preprocesar imagen
-            img = tf.keras.utils.load_img(ruta_imagen, target_size=(self.img_height, self.img_width))
-            img_array = tf.keras.utils.img_to_array(img)
-            img_array = tf.expand_dims(img_array, 0)
-            
-            # Hacer predicción
-            predictions = self.model.predict(img_array, verbose=0)
-            score = tf.nn.softmax(predictions[0])
-            
-            # Obtener resultado
-            clase_predicha = self.class_names[np.argmax(score)]
-            confianza = 100 * np.max(score)
+            img_array, legibles = self._cargar_lote([ruta_imagen], vistas, activo.tamano)
+            if not legibles:
+                return None, 0
             
-            return clase_predicha, confianza
+            # Hacer predicción (una sola pasada para todas las vistas)
+            probabilidades, embeddings = self._inferir(activo, img_array, 1, vistas)
+            resultado = self._interpretar(probabilidades, embeddings, activo)[0]
+            if clave:
+                self.cache.guardar(clave, version_resultados(activo.version), vistas, *resultado, embeddings[0])
+            return resultado
             
         except Exception as e:
             print(f"❌ Error en predicción: {str(e)}")
             return None, 0
     
-    def guardar_modelo(self):
-        """Guardar modelo entrenado"""
+    @medir('ia.predecir_lote')
+    def predecir_lote(self, rutas_imagenes, vistas_tta=None):
+        """Predecir varias imágenes con una sola llamada a predict"""
+        resultados = [(None, 0)] * len(rutas_imagenes)
+        if self.model is None:
+            if not self.cargar_modelo():
+                return resultados
+        activo = self._activo
+        
+        vistas = self._normalizar_vistas(vistas_tta)
+        
+        pendientes = []
+        claves = {}
+        for i, ruta in enumerate(rutas_imagenes):
+            clave = self._clave_cache(ruta, activo.version)
+            if clave:
+                en_cache = self.cache.obtener(clave, version_resultados(activo.version), vistas)
+                if en_cache:
+                    resultados[i] = tuple(en_cache)
+                    continue
+                claves[i] = clave
+            pendientes.append(i)
+        
+        # Las imágenes ilegibles se descartan sin arruinar el resto del lote
+        lote, legibles = self._cargar_lote([rutas_imagenes[i] for i in pendientes], vistas, activo.tamano)
+        indices_validos = [pendientes[j] for j in legibles]
+        if not indices_validos:
+            return resultados
+        
+        try:
+            probabilidades, embeddings = self._inferir(activo, lote, len(indices_validos), vistas)
+        except Exception as e:
+            print(f"❌ Error en predicción por lote: {str(e)}")
+            return resultados
+        
+        for i, resultado, embedding in zip(indices_validos, self._interpretar(probabilidades, embeddings, activo),
+                                           embeddings):
+            resultados[i] = resultado
+            if i in claves:
+                self.cache.guardar(claves[i], version_resultados(activo.version), vistas, *resultado, embedding)
+        return resultados
+    
+    @medir('ia.predecir_con_embeddings')
+    def predecir_con_embeddings(self, rutas_imagenes, vistas_tta=None):
+        """(versión, [(clase, confianza %, embedding float32)]) en una sola pasada por la red.
+        
+        La caché guarda el embedding junto al resultado: una imagen ya vista no vuelve a la red.
+        Imágenes ilegibles devuelven (None, 0, None).
+        """
+        resultados = [(None, 0, None)] * len(rutas_imagenes)
+        if self.model is None:
+            if not self.cargar_modelo():
+                return None, resultados
+        activo = self._activo
+        vistas = self._normalizar_vistas(vistas_tta)
+        
+        pendientes = []
+        claves = {}
+        for i, ruta in enumerate(rutas_imagenes):
+            clave = self._clave_cache(ruta, activo.version)
+            if clave:
+                en_cache = self.cache.obtener(clave, version_resultados(activo.version), vistas, con_embedding=True)
+                if en_cache:
+                    tipo, confianza, embedding = en_cache
+                    resultados[i] = (tipo, confianza, np.frombuffer(embedding, dtype='float32').copy())
+                    continue
+                claves[i] = clave
+            pendientes.append(i)
+        if not pendientes:
+            return activo.version, resultados
+        
+        lote, legibles = self._cargar_lote([rutas_imagenes[i] for i in pendientes], vistas, activo.tamano)
+        indices_validos = [pendientes[j] for j in legibles]
+        if not indices_validos:
+            return activo.version, resultados
+        
+        try:
+            probabilidades, embeddings = self._inferir(activo, lote, len(indices_validos), vistas)
+        except Exception as e:
+            print(f"❌ Error en predicción por lote: {str(e)}")
+            return activo.version, resultados
+        
+        interpretados = self._interpretar(probabilidades, embeddings, activo)
+        for i, resultado, embedding in zip(indices_validos, interpretados, embeddings):
+            resultados[i] = (*resultado, embedding)
+            if i in claves:
+                self.cache.guardar(claves[i], version_resultados(activo.version), vistas, *resultado, embedding)
+        return activo.version, resultados
+    
+    def puntajes_ood(self, rutas_imagenes, tamano_lote=32):
+        """{puntaje: array} de cada imagen legible, para evaluar el rechazo de desconocidas"""
+        if self.model is None and not self.cargar_modelo():
+            return {}
+        activo = self._activo
+        pesos, sesgo = activo.model.layers[-1].get_weights()
+        centroides = activo.ood['centroides'] if activo.ood else None
+        partes = []
+        for inicio in range(0, len(rutas_imagenes), tamano_lote):
+            lote, legibles = self._cargar_lote(rutas_imagenes[inicio:inicio + tamano_lote], 1, activo.tamano)
+            if legibles:
+                probabilidades, embeddings = self._inferir(activo, lote, len(legibles), 1)
+                partes.append(deteccion_ood.calcular_puntajes(embeddings, probabilidades, pesos, sesgo,
+                                                              centroides))
+        if not partes:
+            return {}
+        return {nombre: np.concatenate([p[nombre] for p in partes]) for nombre in partes[0]}
+    
+    def _inferir(self, activo, lote, cantidad, vistas):
+        """(probabilidades, embeddings) promediados por imagen, en una sola pasada por la red"""
+        embeddings, probabilidades = self._extractor_de(activo.model).predict(lote, verbose=0)
+        probabilidades = probabilidades.reshape(cantidad, vistas, -1).mean(axis=1)
+        embeddings = embeddings.astype('float32').reshape(cantidad, vistas, -1).mean(axis=1)
+        return probabilidades, embeddings
+    
+    def _extractor_de(self, model):
+        """Modelo con dos salidas, embedding de la penúltima capa y probabilidades, sobre los mismos pesos"""
+        modelo_extractor, extractor = self._extractor
+        if modelo_extractor is not model:
+            try:
+                capa = model.get_layer('embedding')
+            except ValueError:
+                # Modelos guardados antes de nombrar la capa: la penúltima densa
+                capa = [c for c in model.layers if isinstance(c, layers.Dense)][-2]
+            extractor = keras.Model(model.inputs, [capa.output, model.output])
+            self._extractor = (model, extractor)
+        return extractor
+    
+    def _clave_cache(self, ruta_imagen, version):
+        """Hash de contenido de la imagen, o None si no hay caché"""
+        if self.cache is None or version is None:
+            return None
+        try:
+            return hash_archivo(ruta_imagen)
+        except OSError:
+            return None
+    
+    def _normalizar_vistas(self, vistas_tta):
+        """Acotar el número de vistas de TTA al rango soportado"""
+        vistas = self.vistas_tta if vistas_tta is None else vistas_tta
+        return max(1, min(int(vistas), MAX_VISTAS_TTA))
+    
+    def _interpretar(self, probabilidades, embeddings, activo):
+        """[(clase, confianza %)] de un lote; la salida del modelo ya es softmax.
+        
+        Con calibración, las imágenes bajo el umbral de su puntaje se informan como DESCONOCIDO.
+        """
+        ganadoras = np.argmax(probabilidades, axis=1)
+        confianzas = 100 * probabilidades.max(axis=1)
+        rechazadas = (deteccion_ood.desconocidas(embeddings, probabilidades, activo.ood)
+                      if activo.ood else np.zeros(len(ganadoras), dtype=bool))
+        return [(DESCONOCIDO if rechazada else activo.class_names[ganadora], float(confianza))
+                for ganadora, confianza, rechazada in zip(ganadoras, confianzas, rechazadas)]
+    
+    def _cargar_lote(self, rutas_imagenes, vistas, tamano):
+        """(lote de vistas listo para el modelo, índices de las rutas legibles); tamano = entrada del modelo"""
+        return preprocesamiento.cargar_lote(rutas_imagenes, tamano, vistas, self.fraccion_recorte)
+    
+    def guardar_modelo(self, metricas=None, ruta_datos=None, extra=None):
+        """Guardar modelo entrenado como nueva versión y promoverla"""
         if self.model:
-            self.model.save('modelo_aeronaves.h5')
-            # Guardar nombres de clases
-            with open('clases_aeronaves.txt', 'w') as f:
-                for clase in self.class_names:
-                    f.write(f"{clase}\n")
-    
-    def cargar_modelo(self):
-        """Cargar modelo previamente entrenado"""
+            if self.calibracion_ood:
+                extra = dict(extra or {}, ood=self.calibracion_ood)
+            version = self.almacen.registrar(self.model, self.class_names,
+                                             metricas=metricas, ruta_datos=ruta_datos, extra=extra)
+            self.almacen.promover(version)
+            self._activo = self._activo._replace(version=version)
+            self._marca_cargada = self.almacen.marca_actual()
+            print(f"💾 Modelo guardado como versión {version}")
+            
+            # Los resultados del modelo anterior dejan de ser válidos
+            if self.cache is not None:
+                self.cache.invalidar(version_resultados(version))
+    
+    @medir('ia.cargar_modelo')
+    def cargar_modelo(self, version=None):
+        """Cargar modelo previamente entrenado (por defecto la versión vigente)"""
         try:
-            if os.path.exists('modelo_aeronaves.h5'):
-                self.model = tf.keras.models.load_model('modelo_aeronaves.h5')
-                
-                # Cargar nombres de clases
-                if os.path.exists('clases_aeronaves.txt'):
-                    with open('clases_aeronaves.txt', 'r') as f:
-                        self.class_names = [line.strip() for line in f.readlines()]
-                
-                print("✅ Modelo cargado exitosamente")
-                return True
-            else:
+            nuevo = self._leer_modelo(version)
+            if nuevo is None:
                 print("❌ No se encontró modelo entrenado")
                 return False
+            self._activo = nuevo
+            print(f"✅ Modelo cargado exitosamente (versión {nuevo.version})")
+            return True
         except Exception as e:
             print(f"❌ Error cargando modelo: {str(e)}")
             return False
+    
+    def _leer_modelo(self, version=None):
+        """Leer modelo y clases de disco sin tocar el modelo activo"""
+        if version is None:
+            self._marca_cargada = self.almacen.marca_actual()
+            version = self.almacen.version_actual()
+        
+        if version is not None:
+            ruta_modelo, ruta_clases = self.almacen.rutas(version)
+            metadatos = self.almacen.metadatos(version)
+            perfil = perfiles.perfil_de(metadatos)
+            calibracion = metadatos.get('ood')
+        elif os.path.exists(RUTA_MODELO_LEGADO):
+            ruta_modelo, ruta_clases = RUTA_MODELO_LEGADO, RUTA_CLASES_LEGADO
+            version = huella_archivo(RUTA_MODELO_LEGADO)
+            perfil = perfiles.PERFIL_POR_DEFECTO
+            calibracion = None
+        else:
+            return None
+        
+        # Hilos del perfil con que se entrenó (si TensorFlow todavía no arrancó en este proceso);
+        # la precisión de cada capa viene guardada en el propio modelo
+        perfiles.configurar_hilos(perfil)
+        
+        model = tf.keras.models.load_model(ruta_modelo)
+        
+        # Cargar nombres de clases
+        class_names = self.class_names
+        if os.path.exists(ruta_clases):
+            with open(ruta_clases, 'r') as f:
+                class_names = [line.strip() for line in f.readlines()]
+        
+        # El tamaño de entrada sale del propio modelo: cada versión puede entrenarse a otra resolución
+        tamano = tuple(model.input_shape[1:3])
+        if None in tamano:
+            tamano = (self.img_height, self.img_width)
+        
+        # Versiones entrenadas antes de la calibración: sin rechazo de desconocidas
+        return ModeloActivo(model, class_names, version, tamano, perfil, self._preparar_ood(model, calibracion))
+    
+    def verificar_actualizacion(self):
+        """Cambiar al modelo vigente si otra instancia promovió una versión nueva"""
+        marca = self.almacen.marca_actual()
+        if marca is None or marca == self._marca_cargada:
+            return False
+        version = self.almacen.version_actual()
+        if version == self.version_modelo:
+            self._marca_cargada = marca
+            return False
+        
+        # Se carga aparte; las predicciones en curso siguen con el modelo anterior
+        nuevo = self._leer_modelo(version)
+        self._marca_cargada = marca
+        self._activo = nuevo
+        print(f"🔄 Modelo actualizado a la versión {version}")
+        return True
+    
+    def iniciar_recarga_automatica(self, intervalo=5.0):
+        """Vigilar el almacén en segundo plano y cambiar de modelo sin reiniciar"""
+        if self._hilo_recarga and self._hilo_recarga.is_alive():
+            return
+        self._detener_recarga.clear()
+        
+        def vigilar():
+            while not self._detener_recarga.wait(intervalo):
+                try:
+                    self.verificar_actualizacion()
+                except Exception as e:
+                    print(f"❌ Error actualizando modelo: {str(e)}")
+        
+        self._hilo_recarga = threading.Thread(target=vigilar, daemon=True)
+        self._hilo_recarga.start()
+    
+    def detener_recarga_automatica(self):
+        self._detener_recarga.set()
 
 class VentanaIAAeronaves(tk.Toplevel):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
         self.title("IA - Clasificador de Aeronaves")
-        self.geometry("700x650")
+        self.geometry("760x820")
         self.configure(bg='#ecf0f1')
         
         self.clasificador = ClasificadorAeronaves()
         self.ruta_imagen_seleccionada = None
+        # Índice de imágenes parecidas de la versión de modelo en uso (se arma al primer uso)
+        self.indice = None
+        self.imagen_id = None
+        # Un pedido de parecidas a la vez; solo se muestra el último
+        self.lock_similares = threading.Lock()
+        self.pedido_similares = 0
         
         self.crear_interfaz()
         
         # Intentar cargar modelo existente
         if self.clasificador.cargar_modelo():
-            self.label_estado.config(text="✅ Modelo cargado - Listo para clasificar", fg='green')
+            self.label_estado.config(text=f"✅ Modelo cargado (perfil {self.clasificador.perfil}) - Listo para clasificar",
+                                     fg='green')
         else:
             self.label_estado.config(text="⚠️ No hay modelo entrenado - Entrena primero", fg='orange')
+        
+        # Tomar modelos promovidos por otros procesos sin cerrar la ventana
+        self.clasificador.iniciar_recarga_automatica()
+    
+    def destroy(self):
+        self.clasificador.detener_recarga_automatica()
+        super().destroy()
     
     def crear_interfaz(self):
         # Título
@@ -204,21 +649,50 @@ class VentanaIAAeronaves(tk.Toplevel):
                                font=('Arial', 10), height=2)
         btn_entrenar.pack(pady=10)
         
+        # Perfil de rendimiento: menor resolución y bfloat16 para PCs lentas
+        frame_perfil = tk.Frame(frame_entrenamiento, bg='#ecf0f1')
+        frame_perfil.pack(pady=5)
+        tk.Label(frame_perfil, text="Perfil:", bg='#ecf0f1', font=('Arial', 10)).pack(side='left')
+        self.var_perfil = tk.StringVar(value=perfiles.PERFIL_POR_DEFECTO)
+        ttk.Combobox(frame_perfil, textvariable=self.var_perfil, values=list(perfiles.PERFILES),
+                    state='readonly', width=12).pack(side='left', padx=5)
+        
         # Frame para clasificación
         frame_clasificacion = tk.LabelFrame(self, text="🔍 Clasificación", 
                                           font=('Arial', 12, 'bold'), bg='#ecf0f1')
         frame_clasificacion.pack(fill='x', padx=10, pady=10)
         
-        btn_seleccionar = tk.Button(frame_clasificacion, text="🖼️ Seleccionar Imagen",
+        # Vista previa a la derecha: se genera en segundo plano, sin decodificar la foto completa
+        self.vista_previa = VistaPrevia(frame_clasificacion, tamano=(240, 180), relief='sunken', bd=1)
+        self.vista_previa.pack(side='right', padx=10, pady=10)
+        controles = tk.Frame(frame_clasificacion, bg='#ecf0f1')
+        controles.pack(side='left', fill='x', expand=True)
+        
+        frame_botones = tk.Frame(controles, bg='#ecf0f1')
+        frame_botones.pack(pady=10)
+        btn_seleccionar = tk.Button(frame_botones, text="🖼️ Seleccionar Imagen",
                                   command=self.seleccionar_imagen, bg='#2ecc71', fg='white',
                                   font=('Arial', 12), height=2)
-        btn_seleccionar.pack(pady=10)
+        btn_seleccionar.pack(side='left', padx=5)
+        btn_explorar = tk.Button(frame_botones, text="📂 Explorar Carpeta",
+                               command=self.explorar_carpeta, bg='#16a085', fg='white',
+                               font=('Arial', 12), height=2)
+        btn_explorar.pack(side='left', padx=5)
         
-        self.label_imagen = tk.Label(frame_clasificacion, text="No hay imagen seleccionada",
+        self.label_imagen = tk.Label(controles, text="No hay imagen seleccionada",
                                    bg='#ecf0f1', font=('Arial', 11))
         self.label_imagen.pack(pady=5)
         
-        btn_clasificar = tk.Button(frame_clasificacion, text="🎯 Clasificar Aeronave",
+        # Vistas de TTA: más vistas = más precisión en fotos parciales, más latencia
+        frame_tta = tk.Frame(controles, bg='#ecf0f1')
+        frame_tta.pack(pady=5)
+        tk.Label(frame_tta, text="Vistas TTA (1 = rápido):", bg='#ecf0f1',
+                font=('Arial', 10)).pack(side='left')
+        self.var_vistas_tta = tk.IntVar(value=self.clasificador.vistas_tta)
+        tk.Spinbox(frame_tta, from_=1, to=MAX_VISTAS_TTA, textvariable=self.var_vistas_tta,
+                  width=4, font=('Arial', 10)).pack(side='left', padx=5)
+        
+        btn_clasificar = tk.Button(controles, text="🎯 Clasificar Aeronave",
                                  command=self.clasificar_imagen, bg='#e74c3c', fg='white',
                                  font=('Arial', 12), height=2)
         btn_clasificar.pack(pady=10)
@@ -240,6 +714,19 @@ class VentanaIAAeronaves(tk.Toplevel):
                                           font=('Arial', 12), state='disabled')
         self.btn_usar_resultado.pack(pady=10)
         
+        # Fotos ya guardadas más parecidas: ayudan a decidir cuando la confianza es baja
+        frame_similares = tk.LabelFrame(self, text="🖼️ Imágenes Parecidas",
+                                       font=('Arial', 10, 'bold'), bg='#ecf0f1')
+        frame_similares.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        columnas = ('similitud', 'matricula', 'tipo', 'archivo')
+        self.tree_similares = ttk.Treeview(frame_similares, columns=columnas, show='headings', height=5)
+        for columna, titulo, ancho in zip(columnas, ('Similitud', 'Matrícula', 'Tipo', 'Archivo'),
+                                          (80, 100, 120, 320)):
+            self.tree_similares.heading(columna, text=titulo)
+            self.tree_similares.column(columna, width=ancho)
+        self.tree_similares.pack(fill='both', expand=True, padx=5, pady=5)
+        
         self.ultimo_resultado = None
     
     def entrenar_modelo(self):
@@ -254,8 +741,10 @@ class VentanaIAAeronaves(tk.Toplevel):
         # Entrenar en thread separado para no bloquear UI
         import threading
         
+        perfil = self.var_perfil.get()
+        
         def entrenar():
-            exito = self.clasificador.entrenar_modelo(carpeta)
+            exito = self.clasificador.entrenar_modelo(carpeta, perfil=perfil)
             if exito:
                 self.label_estado.config(text="✅ Modelo entrenado exitosamente", fg='green')
                 messagebox.showinfo("Éxito", "¡Modelo entrenado correctamente!\nYa puedes clasificar aeronaves.")
@@ -273,9 +762,19 @@ class VentanaIAAeronaves(tk.Toplevel):
         archivo = filedialog.askopenfilename(title="Seleccionar imagen de aeronave", filetypes=tipos)
         
         if archivo:
-            self.ruta_imagen_seleccionada = archivo
-            nombre_archivo = os.path.basename(archivo)
-            self.label_imagen.config(text=f"📷 Imagen: {nombre_archivo}")
+            self.elegir_imagen(archivo)
+    
+    def explorar_carpeta(self):
+        """Elegir la imagen a clasificar desde una grilla con las fotos de una carpeta"""
+        carpeta = filedialog.askdirectory(title="Seleccionar carpeta con fotos candidatas")
+        if carpeta:
+            VentanaExplorarImagenes(self, carpeta, self.elegir_imagen)
+    
+    def elegir_imagen(self, archivo):
+        self.ruta_imagen_seleccionada = archivo
+        nombre_archivo = os.path.basename(archivo)
+        self.label_imagen.config(text=f"📷 Imagen: {nombre_archivo}")
+        self.vista_previa.mostrar(archivo)
     
     def clasificar_imagen(self):
         """Clasificar imagen seleccionada"""
@@ -291,15 +790,30 @@ class VentanaIAAeronaves(tk.Toplevel):
         self.update()
         
         # Clasificar imagen
-        tipo_predicho, confianza = self.clasificador.predecir_imagen(self.ruta_imagen_seleccionada)
+        try:
+            vistas = self.var_vistas_tta.get()
+        except tk.TclError:
+            vistas = 1
+        version, [(tipo_predicho, confianza, embedding)] = self.clasificador.predecir_con_embeddings(
+            [self.ruta_imagen_seleccionada], vistas_tta=vistas)
         
-        if tipo_predicho:
+        if tipo_predicho == DESCONOCIDO:
+            # No se parece a ningún tipo entrenado: las fotos parecidas ayudan a identificarla
+            self.mostrar_similares(version, tipo_predicho, confianza, embedding)
+            self.label_resultado.config(text="❓ Tipo desconocido: no coincide con ningún tipo entrenado\n"
+                                             "Revisa las imágenes parecidas", fg='red')
+            self.ultimo_resultado = None
+            self.btn_usar_resultado.config(state='disabled')
+        elif tipo_predicho:
+            self.mostrar_similares(version, tipo_predicho, confianza, embedding)
+
             resultado_texto = f"🎯 Tipo detectado: {tipo_predicho}\n📊 Confianza: {confianza:.1f}%"
             color = 'green' if confianza > 70 else 'orange' if confianza > 50 else 'red'
             
             self.label_resultado.config(text=resultado_texto, fg=color)
             self.ultimo_resultado = tipo_predicho
-            self.btn_usar_resultado.config(state='normal')
+            # Se habilita cuando la foto queda guardada (mostrar_similares), para poder vincularla
+            self.btn_usar_resultado.config(state='disabled')
             
             # Mostrar información adicional
             info_adicional = self.obtener_info_aeronave(tipo_predicho)
@@ -309,39 +823,62 @@ class VentanaIAAeronaves(tk.Toplevel):
             self.label_resultado.config(text="❌ Error en clasificación", fg='red')
             self.btn_usar_resultado.config(state='disabled')
     
+    def mostrar_similares(self, version, tipo, confianza, embedding):
+        """Listar las fotos guardadas más parecidas y agregar esta al almacén de imágenes.
+        
+        Armar el índice lee todos los embeddings de la versión: se hace en un hilo y el
+        resultado vuelve al hilo de Tk con after().
+        """
+        self.tree_similares.delete(*self.tree_similares.get_children())
+        self.imagen_id = None
+        self.pedido_similares += 1
+        pedido = self.pedido_similares
+        db = self.parent.db
+        ruta = os.path.abspath(self.ruta_imagen_seleccionada)
+        
+        def tarea():
+            try:
+                with self.lock_similares:
+                    indice = self.indice
+                    if indice is None or indice.version != version:
+                        indice = IndiceEmbeddings(db, version)
+                    else:
+                        indice.actualizar()
+                    imagen_id = db.guardar_imagenes([(None, ruta, tipo, float(confianza), embedding.tobytes())],
+                                                    version)[0]
+                    similares = indice.similares(embedding, k=5, excluir=(imagen_id,))
+                    indice.actualizar()
+                    self.indice = indice
+            except Exception as e:
+                print(f"❌ Error buscando imágenes parecidas: {e}")
+                imagen_id, similares = None, []
+            try:
+                self.after(0, self._poner_similares, pedido, imagen_id, similares)
+            except (RuntimeError, tk.TclError):
+                pass  # La ventana se cerró mientras se buscaba
+        
+        threading.Thread(target=tarea, daemon=True).start()
+    
+    def _poner_similares(self, pedido, imagen_id, similares):
+        if pedido != self.pedido_similares or not self.winfo_exists():
+            return  # Llegó tarde: ya se clasificó otra foto
+        self.imagen_id = imagen_id
+        for fila, similitud in similares:
+            self.tree_similares.insert('', 'end', values=(f"{similitud:.2f}", fila[6] or '-', fila[2] or '',
+                                                          os.path.basename(fila[1])))
+        if self.ultimo_resultado:
+            self.btn_usar_resultado.config(state='normal')
+    
     def obtener_info_aeronave(self, tipo):
-        """Obtener información adicional según el tipo detectado"""
-        info_aeronaves = {
-            'Boeing-737': {
-                'fabricante': 'Boeing',
-                'categoria': 'Pesada',
-                'peso_aprox': 79000
-            },
-            'Airbus-A320': {
-                'fabricante': 'Airbus', 
-                'categoria': 'Pesada',
-                'peso_aprox': 73500
-            },
-            'Cessna-172': {
-                'fabricante': 'Cessna',
-                'categoria': 'Liviana', 
-                'peso_aprox': 1157
-            },
-            'Embraer-190': {
-                'fabricante': 'Embraer',
-                'categoria': 'Mediana',
-                'peso_aprox': 51800
-            },
-            'ATR-72': {
-                'fabricante': 'ATR',
-                'categoria': 'Mediana',
-                'peso_aprox': 22500
-            }
-        }
-        
-        if tipo in info_aeronaves:
-            info = info_aeronaves[tipo]
-            return f"Fabricante: {info['fabricante']}\nCategoría: {info['categoria']}\nPeso MTOW aproximado: {info['peso_aprox']:,} kg"
+        """Obtener información adicional del catálogo de tipos según el tipo detectado"""
+        info = self.parent.catalogo.buscar(tipo)
+        if info:
+            # Categoría e intervalo efectivos: los del catálogo o los heredados de las reglas
+            categoria = self.parent.reglas.categoria(info.peso_mtow, tipo)
+            intervalo = self.parent.reglas.intervalo(categoria, tipo)
+            return (f"Fabricante: {info.fabricante}\nCategoría: {categoria}\n"
+                    f"Peso MTOW aproximado: {info.peso_mtow:,.0f} kg"
+                    + (f"\nMantenimiento cada {intervalo:g} horas de vuelo" if intervalo is not None else ""))
         return None
     
     def usar_en_registro(self):
@@ -353,14 +890,32 @@ class VentanaIAAeronaves(tk.Toplevel):
         self.destroy()
         
         # Abrir ventana de registro con datos sugeridos
-        ventana_registro = VentanaRegistroAeronaveIA(self.parent, self.ultimo_resultado)
+        ventana_registro = VentanaRegistroAeronaveIA(self.parent, self.ultimo_resultado, self.imagen_id)
+
+class VentanaExplorarImagenes(tk.Toplevel):
+    """Grilla de miniaturas de una carpeta; un clic elige la foto a clasificar"""
+    def __init__(self, parent, carpeta, al_seleccionar):
+        super().__init__(parent)
+        self.title(f"Explorar - {os.path.basename(carpeta) or carpeta}")
+        self.geometry("720x640")
+        self.configure(bg='#ecf0f1')
+        
+        self.label_estado = tk.Label(self, text="", font=('Arial', 10), bg='#ecf0f1')
+        self.label_estado.pack(pady=5)
+        
+        self.grilla = GrillaMiniaturas(self, al_seleccionar=al_seleccionar)
+        self.grilla.pack(fill='both', expand=True, padx=10, pady=10)
+        cantidad = self.grilla.mostrar_carpeta(carpeta)
+        self.label_estado.config(text=f"📷 {cantidad} imágenes en {carpeta} - clic para elegir")
 
 class VentanaRegistroAeronaveIA(tk.Toplevel):
     """Ventana de registro con datos sugeridos por IA"""
-    def __init__(self, parent, tipo_detectado):
+    def __init__(self, parent, tipo_detectado, imagen_id=None):
         super().__init__(parent)
         self.parent = parent
         self.tipo_detectado = tipo_detectado
+        # Foto clasificada: queda vinculada a la aeronave al registrarla
+        self.imagen_id = imagen_id
         self.title("Registrar Aeronave - Con IA")
         self.geometry("600x450")
         self.configure(bg='#ecf0f1')
@@ -438,40 +993,12 @@ class VentanaRegistroAeronaveIA(tk.Toplevel):
                  bg='#e74c3c', fg='white', font=('Arial', 12), width=12).pack(side='right', padx=10)
     
     def prellenar_datos(self):
-        """Pre-llenar datos basados en el tipo detectado por IA"""
-        datos_sugeridos = {
-            'Boeing-737': {
-                'modelo': 'Boeing 737-800',
-                'fabricante': 'Boeing',
-                'peso_mtow': '79000'
-            },
-            'Airbus-A320': {
-                'modelo': 'Airbus A320',
-                'fabricante': 'Airbus', 
-                'peso_mtow': '73500'
-            },
-            'Cessna-172': {
-                'modelo': 'Cessna 172',
-                'fabricante': 'Cessna',
-                'peso_mtow': '1157'
-            },
-            'Embraer-190': {
-                'modelo': 'Embraer 190',
-                'fabricante': 'Embraer',
-                'peso_mtow': '51800'
-            },
-            'ATR-72': {
-                'modelo': 'ATR 72',
-                'fabricante': 'ATR',
-                'peso_mtow': '22500'
-            }
-        }
-        
-        if self.tipo_detectado in datos_sugeridos:
-            datos = datos_sugeridos[self.tipo_detectado]
-            self.var_modelo.set(datos['modelo'])
-            self.var_fabricante.set(datos['fabricante'])
-            self.var_peso_mtow.set(datos['peso_mtow'])
+        """Pre-llenar datos del catálogo de tipos según el tipo detectado por IA"""
+        datos = self.parent.catalogo.buscar(self.tipo_detectado)
+        if datos:
+            self.var_modelo.set(datos.modelo)
+            self.var_fabricante.set(datos.fabricante)
+            self.var_peso_mtow.set(f"{datos.peso_mtow:g}")
     
     def guardar_aeronave(self):
         """Guardar aeronave con datos asistidos por IA"""
@@ -497,18 +1024,27 @@ class VentanaRegistroAeronaveIA(tk.Toplevel):
             messagebox.showerror("Error", "Hangar no válido")
             return
         
+        aviso = self.parent.discrepancia_catalogo(peso_mtow, self.var_modelo.get())
+        if aviso and not messagebox.askyesno("Revisar peso MTOW", f"{aviso}\n\n¿Registrar de todos modos?"):
+            return
+        
         # Insertar en la base de datos
         success = self.parent.db.insertar_aeronave(
             matricula=self.var_matricula.get(),
             modelo=self.var_modelo.get(),
             fabricante=self.var_fabricante.get(),
             peso_mtow=peso_mtow,
-            categoria=self.parent.categorizar_aeronave(peso_mtow),
+            categoria=self.parent.categorizar_aeronave(peso_mtow, self.var_modelo.get()),
             horas_vuelo=horas_vuelo,
             hangar_id=hangar[0]
         )
         
         if success:
+            if self.imagen_id is not None:
+                aeronave_id = self.parent.db.obtener_ids_por_matricula([self.var_matricula.get()]).get(
+                    self.var_matricula.get())
+                if aeronave_id is not None:
+                    self.parent.db.vincular_imagen(self.imagen_id, aeronave_id)
             messagebox.showinfo("Éxito", "✅ Aeronave registrada con asistencia de IA")
             self.destroy()
         else:
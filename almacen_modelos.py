@@ -0,0 +1,162 @@
+# almacen_modelos.py - Almacén versionado de modelos del clasificador
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+
+ARCHIVO_MODELO = 'modelo.h5'
+ARCHIVO_CLASES = 'clases.txt'
+ARCHIVO_METADATOS = 'metadata.json'
+
+
+def hash_manifiesto(ruta_datos):
+    """Hash del listado del dataset (ruta relativa, tamaño, fecha) para saber con qué se entrenó"""
+    h = hashlib.sha256()
+    for raiz, carpetas, archivos in os.walk(ruta_datos):
+        carpetas.sort()
+        for nombre in sorted(archivos):
+            ruta = os.path.join(raiz, nombre)
+            estado = os.stat(ruta)
+            relativa = os.path.relpath(ruta, ruta_datos).replace(os.sep, '/')
+            h.update(f"{relativa}\0{estado.st_size}\0{estado.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _hash_directorio(ruta):
+    h = hashlib.sha256()
+    for nombre in sorted(os.listdir(ruta)):
+        h.update(nombre.encode() + b'\0')
+        with open(os.path.join(ruta, nombre), 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(bloque)
+    return h.hexdigest()
+
+
+def _escribir_atomico(ruta, contenido):
+    """Escribir un archivo completo y reemplazar el anterior con un solo rename"""
+    carpeta = os.path.dirname(ruta) or '.'
+    fd, temporal = tempfile.mkstemp(dir=carpeta, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+class AlmacenModelos:
+    """Versiones inmutables direccionadas por contenido + puntero ACTUAL reemplazado atómicamente"""
+    def __init__(self, raiz="modelos"):
+        self.raiz = raiz
+        self.carpeta_versiones = os.path.join(raiz, 'versiones')
+        self.ruta_actual = os.path.join(raiz, 'ACTUAL')
+        self.ruta_historial = os.path.join(raiz, 'historial.txt')
+        os.makedirs(self.carpeta_versiones, exist_ok=True)
+
+    def registrar(self, model, class_names, metricas=None, ruta_datos=None, extra=None):
+        """Guardar un modelo como nueva versión (sin promoverlo) y devolver su id"""
+        temporal = tempfile.mkdtemp(dir=self.raiz, prefix='.tmp-')
+        try:
+            model.save(os.path.join(temporal, ARCHIVO_MODELO))
+            with open(os.path.join(temporal, ARCHIVO_CLASES), 'w') as f:
+                for clase in class_names:
+                    f.write(f"{clase}\n")
+
+            version = _hash_directorio(temporal)[:16]
+            metadatos = {
+                'version': version,
+                'clases': list(class_names),
+                'metricas': metricas or {},
+                'fecha_entrenamiento': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'hash_manifiesto': hash_manifiesto(ruta_datos) if ruta_datos else None,
+            }
+            metadatos.update(extra or {})
+            with open(os.path.join(temporal, ARCHIVO_METADATOS), 'w') as f:
+                json.dump(metadatos, f, indent=2, ensure_ascii=False)
+
+            destino = self.ruta_version(version)
+            if os.path.exists(destino):
+                # Mismo contenido ya registrado
+                shutil.rmtree(temporal)
+            else:
+                os.rename(temporal, destino)
+            return version
+        except BaseException:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+    def promover(self, version, reversion=False):
+        """Hacer que una versión sea la vigente"""
+        if not os.path.isdir(self.ruta_version(version)):
+            raise ValueError(f"La versión {version} no existe")
+        _escribir_atomico(self.ruta_actual, version + "\n")
+        marca = " revertida" if reversion else ""
+        with open(self.ruta_historial, 'a') as f:
+            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {version}{marca}\n")
+
+    def _pila_promociones(self):
+        """Versiones promovidas que siguen en la pila: cada reversión descarta las de encima"""
+        pila = []
+        if not os.path.exists(self.ruta_historial):
+            return pila
+        with open(self.ruta_historial) as f:
+            for linea in f:
+                partes = linea.split()
+                if len(partes) < 3:
+                    continue
+                if partes[-1] == 'revertida':
+                    while pila and pila[-1] != partes[-2]:
+                        pila.pop()
+                else:
+                    pila.append(partes[-1])
+        return pila
+
+    def revertir(self):
+        """Volver a la versión promovida antes de la actual; seguidas, cada una retrocede un paso más"""
+        actual = self.version_actual()
+        pila = self._pila_promociones()
+        while pila and pila[-1] == actual:
+            pila.pop()
+        if not pila:
+            return None
+        self.promover(pila[-1], reversion=True)
+        return pila[-1]
+
+    def version_actual(self):
+        try:
+            with open(self.ruta_actual) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def marca_actual(self):
+        """Fecha de modificación del puntero, para detectar promociones sin leerlo"""
+        try:
+            return os.stat(self.ruta_actual).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def ruta_version(self, version):
+        return os.path.join(self.carpeta_versiones, version)
+
+    def metadatos(self, version):
+        with open(os.path.join(self.ruta_version(version), ARCHIVO_METADATOS)) as f:
+            return json.load(f)
+
+    def listar(self):
+        """Metadatos de todas las versiones, de la más nueva a la más antigua"""
+        versiones = [self.metadatos(v) for v in os.listdir(self.carpeta_versiones)
+                     if os.path.isdir(self.ruta_version(v))]
+        return sorted(versiones, key=lambda m: m['fecha_entrenamiento'], reverse=True)
+
+    def rutas(self, version):
+        """(ruta del modelo, ruta de clases) de una versión"""
+        carpeta = self.ruta_version(version)
+        return os.path.join(carpeta, ARCHIVO_MODELO), os.path.join(carpeta, ARCHIVO_CLASES)
@@ -0,0 +1,63 @@
+# asignacion_hangares.py - Ocupación de hangares y sugerencia de ubicación
+import threading
+
+from bus_eventos import bus, AERONAVE_ACTUALIZADA, MANTENIMIENTO_ACTUALIZADO, OCUPACION_CAMBIADA
+
+
+class IndiceOcupacion:
+    """Ocupación de hangares en memoria; se reconstruye solo cuando alguien la consulta tras un cambio"""
+    def __init__(self, db):
+        self.db = db
+        self._hangares = None
+        self._lock = threading.Lock()
+        self.suscripciones = [
+            bus.suscribir(AERONAVE_ACTUALIZADA, self._al_cambiar),
+            bus.suscribir(MANTENIMIENTO_ACTUALIZADO, self._al_cambiar),
+        ]
+
+    def detener(self):
+        for suscripcion in self.suscripciones:
+            bus.desuscribir(suscripcion)
+
+    def _al_cambiar(self, **datos):
+        self.invalidar()
+
+    def invalidar(self):
+        """Marcar el índice como desactualizado y avisar a las ventanas"""
+        with self._lock:
+            self._hangares = None
+        bus.publicar(OCUPACION_CAMBIADA)
+
+    def _indice(self):
+        with self._lock:
+            if self._hangares is None:
+                # La ocupación ya la mantienen los triggers: no hace falta contar aeronaves
+                self._hangares = {h[0]: tuple(h[:5]) for h in self.db.obtener_hangares()}
+            return self._hangares
+
+    def utilizacion(self):
+        """Lista de (id, nombre, ubicacion, capacidad, ocupacion, libres, porcentaje)"""
+        resultado = []
+        for id_hangar, nombre, ubicacion, capacidad, ocupacion in self._indice().values():
+            porcentaje = ocupacion / capacidad * 100 if capacidad else 100.0
+            resultado.append((id_hangar, nombre, ubicacion, capacidad, ocupacion,
+                              max(capacidad - ocupacion, 0), porcentaje))
+        return resultado
+
+    def libres(self, hangar_id):
+        hangar = self._indice().get(hangar_id)
+        if hangar is None:
+            return 0
+        return max(hangar[3] - hangar[4], 0)
+
+    def hay_espacio(self, hangar_id):
+        return self.libres(hangar_id) > 0
+
+    def sugerir_hangar(self, ubicacion=None, excluir=()):
+        """Mejor hangar con espacio: primero los de la ubicación pedida, luego el de más lugares libres"""
+        candidatos = [h for h in self._indice().values()
+                      if h[0] not in excluir and h[3] - h[4] > 0]
+        if not candidatos:
+            return None
+        return max(candidatos, key=lambda h: (ubicacion is not None and h[2] == ubicacion,
+                                              h[3] - h[4], -h[0]))
@@ -0,0 +1,114 @@
+# aumentacion.py - Aumento de datos por lote dentro del pipeline tf.data (determinista con semilla)
+import tensorflow as tf
+
+
+# Intensidad de cada transformación; las imágenes llegan en escala 0-255 (el modelo reescala)
+CONFIGURACION_POR_DEFECTO = {
+    'volteo': True,
+    'recorte_minimo': 0.8,     # fracción mínima del lado que conserva el recorte
+    'brillo': 0.15,            # desplazamiento máximo, en fracción de 255
+    'contraste': 0.2,          # factor en [1 - c, 1 + c]
+    'mezcla': None,            # None, 'mixup' o 'cutmix'
+    'alfa_mezcla': 0.2,        # parámetro de la Beta de la proporción de mezcla
+}
+
+
+def _uniforme(forma, semilla, minimo=0.0, maximo=1.0):
+    return tf.random.stateless_uniform(forma, seed=semilla, minval=minimo, maxval=maximo)
+
+
+def _beta(n, alfa, semilla):
+    """Muestras Beta(alfa, alfa) a partir de dos Gamma"""
+    semillas = tf.random.experimental.stateless_split(semilla, 2)
+    x = tf.random.stateless_gamma([n], seed=semillas[0], alpha=alfa)
+    y = tf.random.stateless_gamma([n], seed=semillas[1], alpha=alfa)
+    return x / (x + y)
+
+
+def voltear(imagenes, semilla):
+    n = tf.shape(imagenes)[0]
+    volteadas = _uniforme([n], semilla) < 0.5
+    return tf.where(volteadas[:, None, None, None], tf.reverse(imagenes, axis=[2]), imagenes)
+
+
+def recortar(imagenes, semilla, minimo):
+    """Recorte aleatorio por imagen, reescalado al tamaño original en una sola operación"""
+    forma = tf.shape(imagenes)
+    n = forma[0]
+    semillas = tf.random.experimental.stateless_split(semilla, 3)
+    lado = _uniforme([n], semillas[0], minimo, 1.0)
+    y0 = _uniforme([n], semillas[1]) * (1.0 - lado)
+    x0 = _uniforme([n], semillas[2]) * (1.0 - lado)
+    cajas = tf.stack([y0, x0, y0 + lado, x0 + lado], axis=1)
+    return tf.image.crop_and_resize(imagenes, cajas, tf.range(n), forma[1:3])
+
+
+def ajustar_color(imagenes, semilla, brillo, contraste):
+    n = tf.shape(imagenes)[0]
+    semillas = tf.random.experimental.stateless_split(semilla, 2)
+    delta = _uniforme([n], semillas[0], -brillo, brillo) * 255.0
+    factor = _uniforme([n], semillas[1], 1.0 - contraste, 1.0 + contraste)
+    media = tf.reduce_mean(imagenes, axis=[1, 2, 3], keepdims=True)
+    imagenes = (imagenes - media) * factor[:, None, None, None] + media + delta[:, None, None, None]
+    return tf.clip_by_value(imagenes, 0.0, 255.0)
+
+
+def mezclar(imagenes, etiquetas, semilla, modo, alfa):
+    """MixUp o CutMix con una permutación del mismo lote; las etiquetas deben ser one-hot"""
+    n = tf.shape(imagenes)[0]
+    semillas = tf.random.experimental.stateless_split(semilla, 4)
+    pareja = tf.argsort(_uniforme([n], semillas[0]))
+    proporcion = _beta(n, alfa, semillas[1])
+    otras = tf.gather(imagenes, pareja)
+    if modo == 'mixup':
+        imagenes = imagenes * proporcion[:, None, None, None] + otras * (1.0 - proporcion[:, None, None, None])
+    else:
+        # Rectángulo de área (1 - proporcion) copiado de la pareja
+        alto = tf.cast(tf.shape(imagenes)[1], tf.float32)
+        ancho = tf.cast(tf.shape(imagenes)[2], tf.float32)
+        lado = tf.sqrt(1.0 - proporcion)
+        cy = _uniforme([n], semillas[2])
+        cx = _uniforme([n], semillas[3])
+        y0 = tf.clip_by_value(cy - lado / 2, 0.0, 1.0)
+        y1 = tf.clip_by_value(cy + lado / 2, 0.0, 1.0)
+        x0 = tf.clip_by_value(cx - lado / 2, 0.0, 1.0)
+        x1 = tf.clip_by_value(cx + lado / 2, 0.0, 1.0)
+        filas = (tf.range(alto) + 0.5) / alto
+        columnas = (tf.range(ancho) + 0.5) / ancho
+        dentro_y = (filas[None, :] >= y0[:, None]) & (filas[None, :] < y1[:, None])
+        dentro_x = (columnas[None, :] >= x0[:, None]) & (columnas[None, :] < x1[:, None])
+        mascara = tf.cast(dentro_y[:, :, None] & dentro_x[:, None, :], imagenes.dtype)[..., None]
+        imagenes = imagenes * (1.0 - mascara) + otras * mascara
+        # Proporción real (el rectángulo pudo quedar recortado en el borde)
+        proporcion = 1.0 - tf.reduce_mean(mascara, axis=[1, 2, 3])
+    etiquetas = (etiquetas * proporcion[:, None]
+                 + tf.gather(etiquetas, pareja) * (1.0 - proporcion[:, None]))
+    return imagenes, etiquetas
+
+
+def aumentar_lote(imagenes, etiquetas, semilla, config):
+    """Aplicar todas las transformaciones configuradas a un lote completo"""
+    semillas = tf.random.experimental.stateless_split(semilla, 4)
+    imagenes = tf.cast(imagenes, tf.float32)
+    if config['volteo']:
+        imagenes = voltear(imagenes, semillas[0])
+    if config['recorte_minimo'] < 1.0:
+        imagenes = recortar(imagenes, semillas[1], config['recorte_minimo'])
+    if config['brillo'] or config['contraste']:
+        imagenes = ajustar_color(imagenes, semillas[2], config['brillo'], config['contraste'])
+    if config['mezcla']:
+        imagenes, etiquetas = mezclar(imagenes, etiquetas, semillas[3], config['mezcla'], config['alfa_mezcla'])
+    return imagenes, etiquetas
+
+
+def agregar_aumentacion(dataset, semilla=123, **opciones):
+    """Agregar el aumento a un dataset de lotes (imágenes, etiquetas).
+
+    Cada lote recibe su propia semilla de una secuencia fija: mismas transformaciones en cada
+    corrida, distintas en cada época. Con mezcla, las etiquetas tienen que venir en one-hot.
+    """
+    config = dict(CONFIGURACION_POR_DEFECTO, **opciones)
+    semillas = tf.data.Dataset.random(seed=semilla, rerandomize_each_iteration=True).batch(2)
+    return tf.data.Dataset.zip((dataset, semillas)).map(
+        lambda lote, s: aumentar_lote(lote[0], lote[1], s, config),
+        num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
@@ -0,0 +1,793 @@
+# benchmark.py - Mediciones de rendimiento del sistema
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+def listar_imagenes(ruta_datos):
+    """Listar (ruta, clase) de un dataset organizado en carpetas por tipo"""
+    from preprocesamiento import EXTENSIONES_IMAGEN
+
+    imagenes = []
+    for clase in sorted(os.listdir(ruta_datos)):
+        carpeta = os.path.join(ruta_datos, clase)
+        if not os.path.isdir(carpeta):
+            continue
+        for nombre in sorted(os.listdir(carpeta)):
+            if nombre.lower().endswith(EXTENSIONES_IMAGEN):
+                imagenes.append((os.path.join(carpeta, nombre), clase))
+    return imagenes
+
+
+def resumir_latencias(tiempos):
+    """Media y percentil 95 en milisegundos"""
+    tiempos_ms = np.array(tiempos) * 1000
+    return float(np.mean(tiempos_ms)), float(np.percentile(tiempos_ms, 95))
+
+
+def benchmark_tta(ruta_datos, niveles, limite=None):
+    """Comparar precisión y latencia del clasificador según las vistas de TTA"""
+    from ai_classifier import ClasificadorAeronaves
+
+    # Sin caché: se mide la inferencia real
+    clasificador = ClasificadorAeronaves(usar_cache=False)
+    if not clasificador.cargar_modelo():
+        print("❌ Entrena el modelo antes de ejecutar el benchmark")
+        return None
+
+    imagenes = listar_imagenes(ruta_datos)
+    if limite:
+        # Muestra estable repartida entre todas las clases
+        imagenes = imagenes[::max(1, len(imagenes) // limite)][:limite]
+    print(f"📂 {len(imagenes)} imágenes de {ruta_datos}")
+
+    resultados = []
+    for vistas in niveles:
+        # Calentamiento: la primera llamada compila el grafo para este tamaño de lote
+        clasificador.predecir_imagen(imagenes[0][0], vistas_tta=vistas)
+
+        aciertos = 0
+        tiempos = []
+        for ruta, clase in imagenes:
+            inicio = time.perf_counter()
+            clase_predicha, _ = clasificador.predecir_imagen(ruta, vistas_tta=vistas)
+            tiempos.append(time.perf_counter() - inicio)
+            aciertos += clase_predicha == clase
+
+        media, p95 = resumir_latencias(tiempos)
+        resultados.append((vistas, aciertos / len(imagenes), media, p95))
+
+    base_precision, base_latencia = resultados[0][1], resultados[0][2]
+    print(f"\n{'Vistas':>6} {'Precisión':>10} {'Δ Prec.':>8} {'Media ms':>9} {'p95 ms':>8} {'Δ ms':>7}")
+    for vistas, precision, media, p95 in resultados:
+        print(f"{vistas:>6} {precision:>10.1%} {precision - base_precision:>+8.1%} "
+              f"{media:>9.1f} {p95:>8.1f} {media - base_latencia:>+7.1f}")
+    return resultados
+
+
+def benchmark_carga(url, ruta_datos, concurrencia, duracion, consulta=None):
+    """Prueba de carga contra el servicio HTTP: peticiones/s y latencia de cola"""
+    destino = urlparse(url)
+    imagenes = [os.path.abspath(ruta) for ruta, _ in listar_imagenes(ruta_datos)]
+    tiempos = []
+    errores = [0]
+    lock = threading.Lock()
+    fin = time.monotonic() + duracion
+
+    def cliente(indice):
+        # Conexión persistente por cliente, como haría otra herramienta del taller
+        conexion = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=60)
+        n = indice
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            try:
+                if consulta:
+                    conexion.request('GET', consulta)
+                else:
+                    cuerpo = json.dumps({'rutas': [imagenes[n % len(imagenes)]]})
+                    conexion.request('POST', '/clasificar', body=cuerpo,
+                                     headers={'Content-Type': 'application/json'})
+                respuesta = conexion.getresponse()
+                respuesta.read()
+                ok = respuesta.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conexion.close()
+                conexion = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=60)
+            transcurrido = time.perf_counter() - inicio
+            with lock:
+                if ok:
+                    tiempos.append(transcurrido)
+                else:
+                    errores[0] += 1
+            n += concurrencia
+        conexion.close()
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(concurrencia)]
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.monotonic() - inicio
+
+    if not tiempos:
+        print(f"❌ Ninguna petición exitosa ({errores[0]} errores)")
+        return None
+    tiempos_ms = np.array(tiempos) * 1000
+    p50, p95, p99 = np.percentile(tiempos_ms, [50, 95, 99])
+    print(f"🎯 {consulta or 'POST /clasificar'} con {concurrencia} clientes durante {total:.1f} s")
+    print(f"   Peticiones: {len(tiempos)} ok, {errores[0]} errores")
+    print(f"   Rendimiento: {len(tiempos) / total:.1f} peticiones/s")
+    print(f"   Latencia ms: p50 {p50:.1f} | p95 {p95:.1f} | p99 {p99:.1f} | máx {tiempos_ms.max():.1f}")
+    return len(tiempos) / total, p50, p95, p99
+
+
+def benchmark_pipeline(ruta_datos, tamano_lote, tamano_imagen, pasos, mezcla=None):
+    """¿El pipeline con aumento alimenta al entrenamiento sin esperas?
+
+    Compara el ritmo de entrenamiento con datos reales aumentados contra el de un lote fijo
+    ya en memoria (el máximo que da el modelo); la diferencia es el tiempo esperando datos.
+    """
+    import tensorflow as tf
+    import preprocesamiento
+    from ai_classifier import ClasificadorAeronaves
+    from aumentacion import agregar_aumentacion
+
+    AUTOTUNE = tf.data.AUTOTUNE
+    rutas, etiquetas, clases = preprocesamiento.crear_manifiesto(ruta_datos)
+    base = preprocesamiento.dataset(rutas, etiquetas, (tamano_imagen, tamano_imagen), tamano_lote,
+                                    barajar=True)
+    num_clases = len(clases)
+    if mezcla:
+        base = base.map(lambda x, y: (x, tf.one_hot(y, num_clases)))
+    base = base.cache()
+    for _ in base:
+        pass  # La caché queda llena: se mide el aumento, no la decodificación de los JPEG
+
+    variantes = {
+        'sin aumento': base.repeat().prefetch(AUTOTUNE),
+        'con aumento': agregar_aumentacion(base.repeat(), semilla=123, mezcla=mezcla).prefetch(AUTOTUNE),
+    }
+
+    print(f"📂 {ruta_datos}: lotes de {tamano_lote} a {tamano_imagen}px, {pasos} pasos")
+    print(f"\n{'Pipeline solo':<28} {'img/s':>10}")
+    for nombre, ds in variantes.items():
+        iterador = iter(ds)
+        next(iterador)
+        inicio = time.perf_counter()
+        for _ in range(pasos):
+            next(iterador)
+        print(f"{nombre:<28} {pasos * tamano_lote / (time.perf_counter() - inicio):>10.1f}")
+
+    clasificador = ClasificadorAeronaves(usar_cache=False)
+    clasificador.class_names = clases
+    clasificador.img_height = clasificador.img_width = tamano_imagen
+    model = clasificador.crear_modelo(perdida='categorical_crossentropy' if mezcla else
+                                      'sparse_categorical_crossentropy')
+
+    def ritmo(ds):
+        model.fit(ds, steps_per_epoch=3, epochs=1, verbose=0)  # Calentamiento: compilar el grafo
+        inicio = time.perf_counter()
+        model.fit(ds, steps_per_epoch=pasos, epochs=1, verbose=0)
+        return pasos * tamano_lote / (time.perf_counter() - inicio)
+
+    techo = ritmo(base.take(1).cache().repeat())
+    print(f"\n{'Entrenamiento':<28} {'img/s':>10} {'Espera datos':>13}")
+    print(f"{'lote fijo en memoria':<28} {techo:>10.1f} {'-':>13}")
+    resultados = {'techo': techo}
+    for nombre, ds in variantes.items():
+        resultados[nombre] = ritmo(ds)
+        espera = max(0.0, 1 - resultados[nombre] / techo)
+        marca = " ✅" if espera < 0.05 else " ⚠️"
+        print(f"{nombre:<28} {resultados[nombre]:>10.1f} {espera:>12.1%}{marca}")
+    return resultados
+
+
+def benchmark_perfiles(ruta_datos, nombres, entrenar=False, limite=None, tamano_lote=32):
+    """Precisión vs. latencia de cada perfil de rendimiento (última versión entrenada con él)"""
+    import perfiles
+    from ai_classifier import ClasificadorAeronaves
+    from almacen_modelos import AlmacenModelos
+
+    almacen = AlmacenModelos()
+    versiones = {}
+    for metadatos in almacen.listar():
+        versiones.setdefault(metadatos.get('perfil'), metadatos)
+
+    imagenes = listar_imagenes(ruta_datos)
+    if limite:
+        imagenes = imagenes[::max(1, len(imagenes) // limite)][:limite]
+    rutas = [ruta for ruta, _ in imagenes]
+    print(f"📂 {len(imagenes)} imágenes de {ruta_datos}")
+
+    resultados = []
+    for nombre in nombres:
+        clasificador = ClasificadorAeronaves(usar_cache=False, almacen=almacen)
+        if nombre not in versiones:
+            if not entrenar:
+                print(f"⚠️ No hay versión entrenada con el perfil '{nombre}' (usa --entrenar)")
+                continue
+            # Se registra sin promover: el benchmark no cambia el modelo en uso
+            if not clasificador.entrenar_modelo(ruta_datos, perfil=nombre, guardar=False):
+                continue
+            version = almacen.registrar(clasificador.model, clasificador.class_names,
+                                        metricas=clasificador.ultimas_metricas, ruta_datos=ruta_datos,
+                                        extra={**perfiles.metadatos(nombre), 'ood': clasificador.calibracion_ood})
+            versiones[nombre] = almacen.metadatos(version)
+        metadatos = versiones[nombre]
+        if not clasificador.cargar_modelo(metadatos['version']):
+            continue
+
+        # Calentamiento de los dos tamaños de lote que se miden
+        clasificador.predecir_imagen(rutas[0], vistas_tta=1)
+        clasificador.predecir_lote(rutas[:tamano_lote], vistas_tta=1)
+
+        tiempos = []
+        for ruta in rutas:
+            inicio = time.perf_counter()
+            clasificador.predecir_imagen(ruta, vistas_tta=1)
+            tiempos.append(time.perf_counter() - inicio)
+        inicio = time.perf_counter()
+        predicciones = []
+        for i in range(0, len(rutas), tamano_lote):
+            predicciones.extend(clasificador.predecir_lote(rutas[i:i + tamano_lote], vistas_tta=1))
+        por_lote = len(rutas) / (time.perf_counter() - inicio)
+        aciertos = sum(clase_predicha == clase for (clase_predicha, _), (_, clase) in zip(predicciones, imagenes))
+        media, p95 = resumir_latencias(tiempos)
+        resultados.append((nombre, clasificador.model.input_shape[1], metadatos.get('precision', 'float32'),
+                           metadatos.get('metricas', {}).get('val_accuracy'), aciertos / len(imagenes),
+                           media, p95, por_lote))
+
+    print(f"\n{'Perfil':<12} {'px':>4} {'Precisión':<15} {'val_acc':>8} {'Acierto':>8} "
+          f"{'Media ms':>9} {'p95 ms':>8} {'img/s lote':>11}")
+    for nombre, px, precision, val_acc, acierto, media, p95, por_lote in resultados:
+        val_texto = f"{val_acc:.1%}" if val_acc is not None else "-"
+        print(f"{nombre:<12} {px:>4} {precision:<15} {val_texto:>8} {acierto:>8.1%} "
+              f"{media:>9.1f} {p95:>8.1f} {por_lote:>11.1f}")
+    return resultados
+
+
+def consultas_escala(db):
+    """(nombre, llamada) de cada consulta de DatabaseManager con argumentos representativos"""
+    aeronave_id = db.obtener_ids_por_matricula(['CP-10000']).get('CP-10000', 1)
+    hoy = time.strftime("%Y-%m-%d")
+    return [
+        ('obtener_aeronaves', db.obtener_aeronaves),
+        ('obtener_aeronave_por_id', lambda: db.obtener_aeronave_por_id(aeronave_id)),
+        ('obtener_ids_por_matricula', lambda: db.obtener_ids_por_matricula([f"CP-{10000 + i}" for i in range(500)])),
+        ('obtener_hangares', db.obtener_hangares),
+        ('obtener_hangar_por_nombre', lambda: db.obtener_hangar_por_nombre("Hangar A")),
+        ('obtener_tecnicos', db.obtener_tecnicos),
+        ('obtener_tecnico_por_nombre', lambda: db.obtener_tecnico_por_nombre("Mendoza")),
+        ('obtener_mantenimientos', db.obtener_mantenimientos),
+        ('obtener_mantenimientos_por_aeronave', lambda: db.obtener_mantenimientos_por_aeronave(aeronave_id)),
+        ('contar_mantenimientos', lambda: db.contar_mantenimientos('En Proceso')),
+        ('contar_historial_mantenimientos', db.contar_historial_mantenimientos),
+        ('iterar_historial_mantenimientos', lambda: sum(1 for _ in db.iterar_historial_mantenimientos())),
+        ('obtener_piezas', db.obtener_piezas),
+        ('obtener_clasificaciones', db.obtener_clasificaciones),
+        ('obtener_aeronaves_con_alertas', db.obtener_aeronaves_con_alertas),
+        ('obtener_mantenimientos_pendientes', lambda: db.obtener_mantenimientos_pendientes(hoy)),
+        ('obtener_alertas_abiertas', db.obtener_alertas_abiertas),
+        ('obtener_registro_vuelos', lambda: db.obtener_registro_vuelos(aeronave_id)),
+        ('obtener_estadisticas_generales', db.obtener_estadisticas_generales),
+    ]
+
+
+def consultas_flota(flota):
+    """(nombre, llamada) de los análisis sobre la flota en memoria, comparables con los de la base"""
+    return [
+        ('actualizar', flota.actualizar),
+        ('aeronaves', flota.aeronaves),
+        ('mantenimientos', flota.mantenimientos),
+        ('estadisticas_generales', flota.estadisticas_generales),
+        ('costos_por_tipo', flota.costos_por_tipo),
+        ('aeronaves_con_alertas', flota.aeronaves_con_alertas),
+    ]
+
+
+# Ventanas que se llenan desde la base al abrirse
+VENTANAS_ESCALA = ['abrir_lista_aeronaves', 'abrir_historial_tecnico', 'abrir_alertas',
+                   'abrir_gestion_hangares', 'abrir_gestion_tecnicos', 'abrir_inventario_piezas',
+                   'abrir_estadisticas', 'abrir_reporte_costos', 'abrir_programar_mantenimiento']
+
+
+def medir_llamada(llamada, repeticiones):
+    """Mediana en ms de varias ejecuciones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        llamada()
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos) * 1000)
+
+
+def medir_ventanas(db_name, repeticiones):
+    """Tiempo de abrir y dibujar cada ventana; requiere pantalla"""
+    import tkinter as tk
+
+    try:
+        from main import SGMA
+        app = SGMA(db_name)
+    except (ImportError, tk.TclError) as e:
+        print(f"⚠️ No se pueden abrir las ventanas, se omiten: {str(e)}")
+        return {}
+    app.withdraw()
+    resultados = {}
+
+    def abrir(nombre):
+        antes = set(app.winfo_children())
+        getattr(app, nombre)()
+        app.update_idletasks()
+        for ventana in set(app.winfo_children()) - antes:
+            ventana.destroy()
+
+    try:
+        resultados['crear_interfaz_principal'] = medir_llamada(
+            lambda: [w.destroy() for w in app.winfo_children() if not isinstance(w, tk.Menu)]
+            or app.crear_interfaz_principal() or app.update_idletasks(), repeticiones)
+        for nombre in VENTANAS_ESCALA:
+            try:
+                resultados[nombre] = medir_llamada(lambda: abrir(nombre), repeticiones)
+            except Exception as e:
+                print(f"❌ {nombre}: {str(e)}")
+    finally:
+        app.destroy()
+    return resultados
+
+
+def benchmark_escala(escalas, directorio, repeticiones, ruta_baseline, guardar, tolerancia, piso_ms,
+                     ventanas=True):
+    """Tiempo de cada consulta y ventana a cada escala, comparado con la línea base guardada"""
+    from database import DatabaseManager
+    from generador_datos import ESCALAS, generar
+    from modelo_flota import ModeloFlota
+
+    os.makedirs(directorio, exist_ok=True)
+    resultados = {}
+    for escala in escalas:
+        ruta = os.path.join(directorio, f"escala_{escala}.db")
+        if not os.path.exists(ruta):
+            generar(ruta, **ESCALAS[escala])
+        db = DatabaseManager(ruta)
+        print(f"\n📊 Escala '{escala}' ({ruta})")
+        for nombre, llamada in consultas_escala(db):
+            # Primera llamada fuera de la medición: caché de páginas caliente
+            llamada()
+            resultados[f"{escala}/db.{nombre}"] = medir_llamada(llamada, repeticiones)
+        resultados[f"{escala}/flota.cargar"] = medir_llamada(lambda: ModeloFlota(db), 1)
+        flota = ModeloFlota(db)
+        for nombre, llamada in consultas_flota(flota):
+            resultados[f"{escala}/flota.{nombre}"] = medir_llamada(llamada, repeticiones)
+        if ventanas:
+            for nombre, ms in medir_ventanas(ruta, repeticiones).items():
+                resultados[f"{escala}/ventana.{nombre}"] = ms
+
+    base = {}
+    if os.path.exists(ruta_baseline):
+        with open(ruta_baseline, encoding='utf-8') as f:
+            base = json.load(f)['resultados']
+
+    regresiones = []
+    print(f"\n{'Medición':<55} {'ms':>10} {'Base ms':>10} {'Δ':>8}")
+    for clave, ms in resultados.items():
+        anterior = base.get(clave)
+        if anterior is None:
+            print(f"{clave:<55} {ms:>10.2f} {'-':>10} {'':>8}")
+            continue
+        marca = ""
+        if ms > anterior * (1 + tolerancia) and ms - anterior > piso_ms:
+            regresiones.append(clave)
+            marca = " ❌"
+        print(f"{clave:<55} {ms:>10.2f} {anterior:>10.2f} {(ms - anterior) / anterior:>+8.0%}{marca}")
+
+    if guardar:
+        base.update(resultados)
+        with open(ruta_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'fecha': time.strftime("%Y-%m-%d %H:%M:%S"), 'resultados': base}, f, indent=2)
+        print(f"💾 Línea base guardada en {ruta_baseline}")
+
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones (tolerancia {tolerancia:.0%}, mínimo {piso_ms} ms)")
+    else:
+        print("\n✅ Sin regresiones")
+    return resultados, regresiones
+
+
+def _escritor_concurrente(ruta, concurrente, duracion, semilla, aeronaves_calientes, resultados):
+    """Proceso de la prueba de concurrencia: mezcla de escrituras cortas, optimistas y lecturas"""
+    import instrumentacion
+    from database import DatabaseManager, ConflictoVersion
+
+    instrumentacion.activar(True)
+    db = DatabaseManager(ruta, concurrente=concurrente)
+    rnd = random.Random(semilla)
+    # Pocas aeronaves para que las ediciones simultáneas choquen de verdad
+    aeronaves = [a[0] for a in db.obtener_aeronaves()][:aeronaves_calientes]
+    tecnicos = [t[0] for t in db.obtener_tecnicos()]
+    conteo = {'escrituras': 0, 'lecturas': 0, 'optimistas': 0, 'conflictos': 0, 'bloqueos': 0}
+    tiempos = []
+
+    fin = time.monotonic() + duracion
+    while time.monotonic() < fin:
+        aeronave_id = rnd.choice(aeronaves)
+        operacion = rnd.random()
+        inicio = time.perf_counter()
+        try:
+            if operacion < 0.4:
+                conteo['optimistas'] += 1
+                version = db.obtener_version('aeronaves', aeronave_id)
+                horas = db.obtener_aeronave_por_id(aeronave_id)[6]
+                time.sleep(rnd.uniform(0, 0.005))  # el usuario edita el valor leído
+                db.actualizar_horas_vuelo(aeronave_id, horas + 0.5, version=version)
+            elif operacion < 0.6:
+                db.insertar_mantenimiento(aeronave_id, "Preventivo", "2030-01-01", rnd.choice(tecnicos),
+                                          "Prueba de concurrencia")
+            elif operacion < 0.8:
+                db.registrar_vuelo(aeronave_id, "2030-01-01", 1.5)
+            else:
+                db.obtener_mantenimientos_por_aeronave(aeronave_id)
+                conteo['lecturas'] += 1
+                continue
+        except ConflictoVersion:
+            conteo['conflictos'] += 1
+            continue
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            conteo['bloqueos'] += 1
+            continue
+        tiempos.append(time.perf_counter() - inicio)
+        conteo['escrituras'] += 1
+
+    conteo['reintentos'] = instrumentacion.resumen().get('db.reintento_bloqueo', {}).get('llamadas', 0)
+    resultados.put((conteo, tiempos))
+
+
+def benchmark_concurrencia(procesos, duracion, modos, directorio, aeronaves_calientes):
+    """Varios procesos escribiendo a la vez sobre la misma base: rendimiento y conflictos"""
+    from database import DatabaseManager
+    from generador_datos import ESCALAS, generar
+
+    os.makedirs(directorio, exist_ok=True)
+    resumen = {}
+    for modo in modos:
+        # Base nueva por modo: el modo WAL queda grabado en el archivo
+        ruta = os.path.join(directorio, f"concurrencia_{modo}.db")
+        generar(ruta, reiniciar=True, **ESCALAS['pequena'])
+        DatabaseManager(ruta, concurrente=modo == 'wal')
+
+        resultados = multiprocessing.Queue()
+        hijos = [multiprocessing.Process(target=_escritor_concurrente,
+                                         args=(ruta, modo == 'wal', duracion, i, aeronaves_calientes, resultados))
+                 for i in range(procesos)]
+        for hijo in hijos:
+            hijo.start()
+        parciales = [resultados.get() for _ in hijos]
+        for hijo in hijos:
+            hijo.join()
+
+        total = {clave: sum(c[clave] for c, _ in parciales) for clave in parciales[0][0]}
+        tiempos_ms = np.array([t for _, tiempos in parciales for t in tiempos]) * 1000
+        p50, p95, p99 = np.percentile(tiempos_ms, [50, 95, 99]) if len(tiempos_ms) else (0, 0, 0)
+        intentos = total['escrituras'] + total['conflictos'] + total['bloqueos']
+        resumen[modo] = total
+        print(f"\n🔀 Modo '{modo}': {procesos} procesos durante {duracion:.0f} s")
+        print(f"   Escrituras: {total['escrituras']} ({total['escrituras'] / duracion:.1f}/s), "
+              f"lecturas: {total['lecturas']}")
+        print(f"   Conflictos de versión: {total['conflictos']} "
+              f"({total['conflictos'] / max(total['optimistas'], 1):.1%} de las ediciones)")
+        print(f"   'database is locked' tras reintentos: {total['bloqueos']} "
+              f"({total['bloqueos'] / max(intentos, 1):.2%}), reintentos: {total['reintentos']}")
+        print(f"   Latencia de escritura ms: p50 {p50:.1f} | p95 {p95:.1f} | p99 {p99:.1f}")
+    return resumen
+
+
+def benchmark_desconocidas(ruta_datos, ruta_desconocidas, limite=None, tamano_lote=32):
+    """Separación entre tipos conocidos y fotos de otros tipos, y costo del rechazo por lote"""
+    import deteccion_ood
+    from ai_classifier import ClasificadorAeronaves
+    from preprocesamiento import EXTENSIONES_IMAGEN
+
+    clasificador = ClasificadorAeronaves(usar_cache=False)
+    if not clasificador.cargar_modelo():
+        print("❌ Entrena el modelo antes de ejecutar el benchmark")
+        return None
+    calibracion = clasificador._activo.ood
+
+    conocidas = [ruta for ruta, _ in listar_imagenes(ruta_datos)]
+    # Las desconocidas pueden venir sueltas o en subcarpetas (helicópteros, Dash 8, ...)
+    desconocidas = sorted(os.path.join(raiz, nombre) for raiz, _, nombres in os.walk(ruta_desconocidas)
+                          for nombre in nombres if nombre.lower().endswith(EXTENSIONES_IMAGEN))
+    if limite:
+        conocidas = conocidas[::max(1, len(conocidas) // limite)][:limite]
+        desconocidas = desconocidas[:limite]
+    if not conocidas or not desconocidas:
+        print("❌ Hacen falta imágenes conocidas y desconocidas")
+        return None
+    print(f"📂 {len(conocidas)} conocidas de {ruta_datos}, {len(desconocidas)} desconocidas de {ruta_desconocidas}")
+
+    puntajes_conocidas = clasificador.puntajes_ood(conocidas, tamano_lote)
+    puntajes_desconocidas = clasificador.puntajes_ood(desconocidas, tamano_lote)
+    tasa = calibracion['tasa_aceptacion'] if calibracion else deteccion_ood.TASA_ACEPTACION
+
+    resultados = {}
+    print(f"\n{'Puntaje':<10} {'AUROC':>7} {f'Desc. aceptadas @{tasa:.0%}':>24} "
+          f"{'Con umbral guardado: conocidas':>31} {'desconocidas':>13}")
+    for nombre, valores in puntajes_conocidas.items():
+        evaluacion = deteccion_ood.evaluar(valores, puntajes_desconocidas[nombre], tasa)
+        resultados[nombre] = evaluacion
+        guardado = f"{'-':>31} {'-':>13}"
+        if calibracion:
+            umbral = calibracion['umbrales'][nombre]
+            guardado = (f"{np.mean(valores >= umbral):>31.1%} "
+                        f"{np.mean(puntajes_desconocidas[nombre] >= umbral):>13.1%}")
+        elegido = " ⬅" if calibracion and calibracion['puntaje'] == nombre else ""
+        print(f"{nombre:<10} {evaluacion['auroc']:>7.3f} {evaluacion['falsos_aceptados']:>24.1%} {guardado}{elegido}")
+    if not calibracion:
+        print("\n⚠️ El modelo vigente no tiene calibración: no rechaza desconocidas (reentrénalo)")
+        return resultados
+
+    # Costo del rechazo: puntajes sobre la salida de una pasada ya hecha, frente a la pasada misma
+    activo = clasificador._activo
+    lote, legibles = clasificador._cargar_lote(conocidas[:tamano_lote], 1, activo.tamano)
+    cantidad = len(legibles)
+    clasificador._inferir(activo, lote, cantidad, 1)
+    tiempos_red, tiempos_rechazo = [], []
+    for _ in range(20):
+        inicio = time.perf_counter()
+        probabilidades, embeddings = clasificador._inferir(activo, lote, cantidad, 1)
+        tiempos_red.append(time.perf_counter() - inicio)
+        inicio = time.perf_counter()
+        deteccion_ood.desconocidas(embeddings, probabilidades, activo.ood)
+        tiempos_rechazo.append(time.perf_counter() - inicio)
+    red, _ = resumir_latencias(tiempos_red)
+    rechazo, _ = resumir_latencias(tiempos_rechazo)
+    print(f"\n⏱️ Lote de {cantidad}: red {red:.1f} ms, rechazo {rechazo:.3f} ms ({rechazo / red:.2%} extra)")
+    return resultados
+
+
+def benchmark_similitud(cantidad, dimension, consultas, k, ruta_db, semilla=0):
+    """Búsqueda de imágenes parecidas: exacta vs. IVF-PQ sobre embeddings sintéticos"""
+    from database import DatabaseManager
+    from indice_embeddings import IndiceEmbeddings
+
+    # Embeddings agrupados por tipo, con variación de pocas dimensiones dentro de cada grupo
+    # (ángulo, luz, librea) como los de una red entrenada, más algo de ruido
+    rng = np.random.default_rng(semilla)
+    grupos = rng.integers(50, size=cantidad + consultas)
+    datos = np.empty((len(grupos), dimension), dtype='f4')
+    for grupo in range(50):
+        filas = np.flatnonzero(grupos == grupo)
+        centro = rng.normal(size=dimension)
+        variacion = 0.5 * rng.normal(size=(8, dimension))
+        datos[filas] = (centro + rng.normal(size=(len(filas), 8)) @ variacion
+                        + 0.1 * rng.normal(size=(len(filas), dimension)))
+    datos = np.maximum(datos, 0)
+    guardados, preguntas = datos[:cantidad], datos[cantidad:]
+
+    if os.path.exists(ruta_db):
+        os.remove(ruta_db)
+    db = DatabaseManager(ruta_db)
+    inicio = time.perf_counter()
+    for i in range(0, cantidad, 10000):
+        db.guardar_imagenes([(None, f"sintetica/{j}.jpg", 'Sintetica', 100.0, guardados[j].tobytes())
+                             for j in range(i, min(i + 10000, cantidad))], 'benchmark')
+    print(f"💾 {cantidad} embeddings de {dimension} dimensiones guardados en "
+          f"{time.perf_counter() - inicio:.1f} s")
+
+    exactos = None
+    print(f"\n{'Modo':<11} {'Carga s':>8} {'Media ms':>9} {'p95 ms':>8} {f'Recall@{k}':>9}")
+    for modo in ('exacto', 'aproximado'):
+        inicio = time.perf_counter()
+        indice = IndiceEmbeddings(db, 'benchmark', aproximado=modo == 'aproximado')
+        carga = time.perf_counter() - inicio
+        indice.buscar(preguntas[0], k)
+
+        tiempos = []
+        encontrados = []
+        for consulta in preguntas:
+            inicio = time.perf_counter()
+            resultado = indice.buscar(consulta, k)
+            tiempos.append(time.perf_counter() - inicio)
+            encontrados.append({imagen_id for imagen_id, _ in resultado})
+        if exactos is None:
+            exactos = encontrados
+        recall = np.mean([len(a & e) / k for a, e in zip(encontrados, exactos)])
+        media, p95 = resumir_latencias(tiempos)
+        print(f"{modo:<11} {carga:>8.2f} {media:>9.2f} {p95:>8.2f} {recall:>9.1%}")
+
+    # Alta incremental: lo que cuesta incorporar un lote recién clasificado
+    db.guardar_imagenes([(None, f"sintetica/nueva_{j}.jpg", 'Sintetica', 100.0, preguntas[j].tobytes())
+                         for j in range(min(100, consultas))], 'benchmark')
+    inicio = time.perf_counter()
+    agregadas = indice.actualizar()
+    print(f"\n➕ {agregadas} imágenes nuevas incorporadas en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+
+def benchmark_decodificacion(ruta_datos, cantidad, tamano, tamano_lote=32):
+    """Decodificación completa (load_img) vs. reducida en el dominio DCT sobre las imágenes más pesadas"""
+    from PIL import Image
+
+    import preprocesamiento
+
+    rutas = sorted((ruta for ruta, _ in listar_imagenes(ruta_datos)), key=os.path.getsize,
+                   reverse=True)[:cantidad]
+    if not rutas:
+        print(f"❌ No hay imágenes en {ruta_datos}")
+        return None
+    objetivo = (tamano, tamano)
+    originales = []
+    for ruta in rutas:
+        with Image.open(ruta) as img:
+            originales.append((img.size[::-1], img.format == 'JPEG'))
+    megapixeles = np.mean([alto * ancho for (alto, ancho), _ in originales]) / 1e6
+    print(f"🖼️ {len(rutas)} imágenes, {np.mean([os.path.getsize(r) for r in rutas]) / 1e6:.1f} MB y "
+          f"{megapixeles:.1f} MP de media")
+
+    def pil_completa(ruta):
+        # Lo que hacía tf.keras.utils.load_img: decodificar todo y después reducir
+        with Image.open(ruta) as img:
+            return np.asarray(img.convert('RGB').resize(objetivo, Image.NEAREST))
+
+    def pil_draft(ruta):
+        return preprocesamiento._decodificar_pil(ruta, objetivo)
+
+    # Memoria del buffer decodificado antes de redimensionar (RGB uint8)
+    mb_completa = np.mean([alto * ancho * 3 for (alto, ancho), _ in originales]) / 2 ** 20
+    factores = [preprocesamiento.factor_reduccion(original, objetivo) if es_jpeg else 1
+                for original, es_jpeg in originales]
+    mb_reducida = np.mean([(alto // f) * (ancho // f) * 3
+                           for ((alto, ancho), _), f in zip(originales, factores)]) / 2 ** 20
+    metodos = [('PIL completa', pil_completa, mb_completa), ('PIL draft', pil_draft, mb_reducida)]
+    if preprocesamiento.cv2 is not None:
+        cv2 = preprocesamiento.cv2
+
+        def cv2_completa(ruta):
+            imagen = cv2.imdecode(np.fromfile(ruta, dtype=np.uint8), cv2.IMREAD_COLOR)
+            return cv2.resize(imagen, (tamano, tamano), interpolation=cv2.INTER_AREA)
+
+        metodos += [('cv2 completa', cv2_completa, mb_completa),
+                    ('cv2 reducida', lambda ruta: preprocesamiento._decodificar_cv2(ruta, objetivo), mb_reducida)]
+    else:
+        print("⚠️ OpenCV no está instalado: solo se comparan los caminos de PIL")
+
+    resultados = {}
+    print(f"\n{'Método':<13} {'Media ms':>9} {'p95 ms':>8} {'Buffer MB':>10}")
+    for nombre, metodo, memoria in metodos:
+        tiempos = []
+        for ruta in rutas:
+            inicio = time.perf_counter()
+            metodo(ruta)
+            tiempos.append(time.perf_counter() - inicio)
+        media, p95 = resumir_latencias(tiempos)
+        resultados[nombre] = {'media_ms': media, 'p95_ms': p95, 'buffer_mb': memoria}
+        print(f"{nombre:<13} {media:>9.1f} {p95:>8.1f} {memoria:>10.1f}")
+
+    # Lote completo como lo arma la inferencia: hilos + buffer float32 preasignado
+    inicio = time.perf_counter()
+    for i in range(0, len(rutas), tamano_lote):
+        preprocesamiento.cargar_lote(rutas[i:i + tamano_lote], objetivo)
+    total = time.perf_counter() - inicio
+    print(f"\n📦 cargar_lote ({preprocesamiento.HILOS_DECODIFICACION} hilos): "
+          f"{len(rutas) / total:.1f} imágenes/s")
+    base = resultados['PIL completa']['media_ms']
+    mejor = min(resultados, key=lambda nombre: resultados[nombre]['media_ms'])
+    print(f"⏱️ {mejor}: {base / resultados[mejor]['media_ms']:.1f}x más rápido que la decodificación completa, "
+          f"{mb_completa / max(mb_reducida, 1e-9):.0f}x menos memoria por imagen")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del SGMA")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p_tta = subparsers.add_parser('tta', help="Latencia vs. precisión de test-time augmentation")
+    p_tta.add_argument('--datos', default='aeronaves')
+    p_tta.add_argument('--vistas', type=int, nargs='+', default=[1, 2, 3, 5, 8])
+    p_tta.add_argument('--limite', type=int, default=None,
+                       help="Número máximo de imágenes a evaluar")
+
+    p_carga = subparsers.add_parser('carga', help="Prueba de carga del servicio HTTP (servicio.py)")
+    p_carga.add_argument('--url', default='http://127.0.0.1:8750')
+    p_carga.add_argument('--datos', default='aeronaves')
+    p_carga.add_argument('--clientes', type=int, default=16)
+    p_carga.add_argument('--duracion', type=float, default=30)
+    p_carga.add_argument('--consulta', default=None,
+                         help="Ruta GET a medir (p. ej. /aeronaves); por defecto POST /clasificar")
+
+    p_escala = subparsers.add_parser('escala', help="Consultas y ventanas sobre flotas sintéticas")
+    p_escala.add_argument('--escalas', nargs='+', default=['pequena', 'mediana', 'grande'])
+    p_escala.add_argument('--directorio', default='bases_benchmark',
+                          help="Dónde se generan (una sola vez) las bases de cada escala")
+    p_escala.add_argument('--repeticiones', type=int, default=5)
+    p_escala.add_argument('--baseline', default='baseline_escala.json')
+    p_escala.add_argument('--guardar', action='store_true', help="Guardar los resultados como nueva línea base")
+    p_escala.add_argument('--tolerancia', type=float, default=0.25,
+                          help="Aumento relativo permitido antes de considerar regresión")
+    p_escala.add_argument('--piso-ms', type=float, default=2.0,
+                          help="Diferencia absoluta mínima para considerar regresión")
+    p_escala.add_argument('--sin-ventanas', action='store_true')
+
+    p_pipeline = subparsers.add_parser('pipeline', help="Ritmo del pipeline de entrenamiento con aumento")
+    p_pipeline.add_argument('--datos', default='aeronaves')
+    p_pipeline.add_argument('--lote', type=int, default=32)
+    p_pipeline.add_argument('--tamano', type=int, default=224)
+    p_pipeline.add_argument('--pasos', type=int, default=50)
+    p_pipeline.add_argument('--mezcla', choices=['mixup', 'cutmix'], default=None)
+
+    p_perfiles = subparsers.add_parser('perfiles', help="Precisión vs. latencia de cada perfil de rendimiento")
+    p_perfiles.add_argument('--datos', default='aeronaves')
+    p_perfiles.add_argument('--perfiles', nargs='+', default=['rapido', 'equilibrado', 'preciso'])
+    p_perfiles.add_argument('--entrenar', action='store_true',
+                            help="Entrenar (sin promover) los perfiles que no tengan versión")
+    p_perfiles.add_argument('--limite', type=int, default=None)
+
+    p_desconocidas = subparsers.add_parser('desconocidas', help="Rechazo de tipos no entrenados (OOD)")
+    p_desconocidas.add_argument('desconocidas', help="Carpeta con fotos de tipos que el modelo no conoce")
+    p_desconocidas.add_argument('--datos', default='aeronaves')
+    p_desconocidas.add_argument('--limite', type=int, default=None)
+    p_desconocidas.add_argument('--lote', type=int, default=32)
+
+    p_similitud = subparsers.add_parser('similitud', help="Búsqueda de imágenes parecidas: exacta vs. IVF-PQ")
+    p_similitud.add_argument('--cantidad', type=int, default=100000)
+    p_similitud.add_argument('--dimension', type=int, default=128)
+    p_similitud.add_argument('--consultas', type=int, default=200)
+    p_similitud.add_argument('-k', type=int, default=5)
+    p_similitud.add_argument('--db', default=os.path.join('bases_benchmark', 'similitud.db'))
+
+    p_decodificacion = subparsers.add_parser('decodificacion',
+                                             help="Decodificación completa vs. reducida de las fotos más pesadas")
+    p_decodificacion.add_argument('--datos', default='aeronaves')
+    p_decodificacion.add_argument('--cantidad', type=int, default=50)
+    p_decodificacion.add_argument('--tamano', type=int, default=224)
+
+    p_concurrencia = subparsers.add_parser('concurrencia', help="Escritores simultáneos en varios procesos")
+    p_concurrencia.add_argument('--procesos', type=int, default=8)
+    p_concurrencia.add_argument('--duracion', type=float, default=20)
+    p_concurrencia.add_argument('--modos', nargs='+', choices=['clasico', 'wal'], default=['clasico', 'wal'])
+    p_concurrencia.add_argument('--directorio', default='bases_benchmark')
+    p_concurrencia.add_argument('--aeronaves-calientes', type=int, default=20,
+                                help="Aeronaves que se editan a la vez (más pocas, más conflictos)")
+
+    args = parser.parse_args()
+
+    if args.comando == 'tta':
+        benchmark_tta(args.datos, args.vistas, args.limite)
+    elif args.comando == 'carga':
+        benchmark_carga(args.url, args.datos, args.clientes, args.duracion, args.consulta)
+    elif args.comando == 'escala':
+        _, regresiones = benchmark_escala(args.escalas, args.directorio, args.repeticiones, args.baseline,
+                                          args.guardar, args.tolerancia, args.piso_ms,
+                                          not args.sin_ventanas)
+        if regresiones:
+            sys.exit(1)
+    elif args.comando == 'pipeline':
+        benchmark_pipeline(args.datos, args.lote, args.tamano, args.pasos, args.mezcla)
+    elif args.comando == 'perfiles':
+        benchmark_perfiles(args.datos, args.perfiles, args.entrenar, args.limite)
+    elif args.comando == 'desconocidas':
+        benchmark_desconocidas(args.datos, args.desconocidas, args.limite, args.lote)
+    elif args.comando == 'similitud':
+        os.makedirs(os.path.dirname(args.db) or '.', exist_ok=True)
+        benchmark_similitud(args.cantidad, args.dimension, args.consultas, args.k, args.db)
+    elif args.comando == 'decodificacion':
+        benchmark_decodificacion(args.datos, args.cantidad, args.tamano)
+    elif args.comando == 'concurrencia':
+        benchmark_concurrencia(args.procesos, args.duracion, args.modos, args.directorio,
+                               args.aeronaves_calientes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# bus_eventos.py - Bus de eventos en proceso (publicación/suscripción)
+import itertools
+import threading
+
+
+# Eventos publicados por la aplicación
+AERONAVE_ACTUALIZADA = 'aeronave_actualizada'
+MANTENIMIENTO_INSERTADO = 'mantenimiento_insertado'
+MANTENIMIENTO_ACTUALIZADO = 'mantenimiento_actualizado'
+ALERTAS_CAMBIADAS = 'alertas_cambiadas'
+OCUPACION_CAMBIADA = 'ocupacion_cambiada'
+REGLAS_CAMBIADAS = 'reglas_cambiadas'
+
+
+class BusEventos:
+    def __init__(self):
+        self._suscriptores = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def suscribir(self, evento, callback):
+        """Registrar callback(**datos) para un evento; devuelve un id para desuscribirse"""
+        id_suscripcion = next(self._ids)
+        with self._lock:
+            self._suscriptores.setdefault(evento, {})[id_suscripcion] = callback
+        return id_suscripcion
+
+    def desuscribir(self, id_suscripcion):
+        with self._lock:
+            for callbacks in self._suscriptores.values():
+                callbacks.pop(id_suscripcion, None)
+
+    def publicar(self, evento, **datos):
+        """Llamar a los suscriptores en el hilo que publica; un error no corta a los demás"""
+        with self._lock:
+            callbacks = list(self._suscriptores.get(evento, {}).values())
+        for callback in callbacks:
+            try:
+                callback(**datos)
+            except Exception as e:
+                print(f"❌ Error en suscriptor de '{evento}': {str(e)}")
+
+
+# Bus compartido por toda la aplicación
+bus = BusEventos()
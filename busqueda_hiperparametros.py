@@ -0,0 +1,322 @@
+# busqueda_hiperparametros.py - Búsqueda de hiperparámetros en paralelo con detención temprana y poda
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+
+# Valores a probar de cada hiperparámetro (nombres de HIPERPARAMETROS_POR_DEFECTO en ai_classifier)
+ESPACIO_POR_DEFECTO = {
+    'tasa_aprendizaje': [1e-4, 3e-4, 1e-3, 3e-3],
+    'tamano_lote': [16, 32, 64],
+    'dropout': [0.3, 0.5],
+    'tamano_imagen': [128, 160, 224],
+    'aumentacion': [False, True],
+}
+
+# Una prueba se poda si después de estas épocas queda por debajo de la mediana de las demás
+EPOCAS_ANTES_DE_PODAR = 3
+PRUEBAS_ANTES_DE_PODAR = 3
+
+
+class AlmacenResultados:
+    """Pruebas y métricas por época en SQLite; lo comparten los procesos de la búsqueda"""
+    def __init__(self, ruta_db):
+        self.ruta_db = ruta_db
+        conn = self._conectar()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS busquedas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha TEXT NOT NULL,
+                ruta_datos TEXT NOT NULL,
+                espacio TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pruebas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                busqueda_id INTEGER NOT NULL REFERENCES busquedas (id),
+                hiperparametros TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'Pendiente',
+                val_accuracy REAL,
+                val_loss REAL,
+                epocas INTEGER,
+                duracion REAL,
+                ruta_modelo TEXT,
+                error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS epocas_pruebas (
+                prueba_id INTEGER NOT NULL REFERENCES pruebas (id),
+                epoca INTEGER NOT NULL,
+                val_accuracy REAL,
+                val_loss REAL,
+                PRIMARY KEY (prueba_id, epoca)
+            );
+            CREATE INDEX IF NOT EXISTS idx_pruebas_busqueda ON pruebas (busqueda_id, val_accuracy);
+        ''')
+        conn.close()
+
+    def _conectar(self):
+        # WAL: los procesos escriben sus épocas sin bloquear a los que leen la mediana
+        conn = sqlite3.connect(self.ruta_db, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def crear_busqueda(self, ruta_datos, espacio, combinaciones):
+        conn = self._conectar()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO busquedas (fecha, ruta_datos, espacio) VALUES (?, ?, ?)",
+                       (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ruta_datos, json.dumps(espacio)))
+        busqueda_id = cursor.lastrowid
+        cursor.executemany("INSERT INTO pruebas (busqueda_id, hiperparametros) VALUES (?, ?)",
+                           [(busqueda_id, json.dumps(hp, sort_keys=True)) for hp in combinaciones])
+        conn.commit()
+        cursor.execute("SELECT id, hiperparametros FROM pruebas WHERE busqueda_id = ? ORDER BY id",
+                       (busqueda_id,))
+        pruebas = [(prueba_id, json.loads(hp)) for prueba_id, hp in cursor.fetchall()]
+        conn.close()
+        return busqueda_id, pruebas
+
+    def registrar_epoca(self, prueba_id, epoca, val_accuracy, val_loss):
+        conn = self._conectar()
+        conn.execute("INSERT OR REPLACE INTO epocas_pruebas VALUES (?, ?, ?, ?)",
+                     (prueba_id, epoca, val_accuracy, val_loss))
+        conn.commit()
+        conn.close()
+
+    def mediana_en_epoca(self, busqueda_id, prueba_id, epoca):
+        """Mediana de la mejor precisión hasta esa época de las otras pruebas (None si hay pocas)"""
+        conn = self._conectar()
+        filas = conn.execute("""SELECT MAX(e.val_accuracy) FROM epocas_pruebas e
+                                JOIN pruebas p ON p.id = e.prueba_id
+                                WHERE p.busqueda_id = ? AND p.id != ? AND e.epoca <= ?
+                                GROUP BY p.id HAVING MAX(e.epoca) >= ?""",
+                             (busqueda_id, prueba_id, epoca, epoca)).fetchall()
+        conn.close()
+        if len(filas) < PRUEBAS_ANTES_DE_PODAR:
+            return None
+        return statistics.median(f[0] for f in filas)
+
+    def terminar_prueba(self, prueba_id, estado, metricas=None, duracion=None, ruta_modelo=None, error=None):
+        metricas = metricas or {}
+        conn = self._conectar()
+        conn.execute("""UPDATE pruebas SET estado = ?, val_accuracy = ?, val_loss = ?, epocas = ?,
+                        duracion = ?, ruta_modelo = ?, error = ? WHERE id = ?""",
+                     (estado, metricas.get('val_accuracy'), metricas.get('val_loss'), metricas.get('epocas'),
+                      duracion, ruta_modelo, error, prueba_id))
+        conn.commit()
+        conn.close()
+
+    def pruebas(self, busqueda_id):
+        """(id, hiperparametros, estado, val_accuracy, val_loss, epocas, duracion, ruta_modelo), mejor primero"""
+        conn = self._conectar()
+        filas = conn.execute("""SELECT id, hiperparametros, estado, val_accuracy, val_loss, epocas, duracion,
+                                       ruta_modelo
+                                FROM pruebas WHERE busqueda_id = ?
+                                ORDER BY val_accuracy IS NULL, val_accuracy DESC, val_loss""",
+                             (busqueda_id,)).fetchall()
+        conn.close()
+        return [(f[0], json.loads(f[1]), *f[2:]) for f in filas]
+
+
+def generar_combinaciones(espacio, cantidad=None, semilla=0):
+    """Grilla completa, o una muestra aleatoria reproducible si se pide una cantidad"""
+    nombres = sorted(espacio)
+    grilla = [dict(zip(nombres, valores)) for valores in itertools.product(*(espacio[n] for n in nombres))]
+    if cantidad is None or cantidad >= len(grilla):
+        return grilla
+    return random.Random(semilla).sample(grilla, cantidad)
+
+
+def limitar_hilos(hilos):
+    """Limitar los hilos de TensorFlow del proceso antes de crear cualquier operación"""
+    os.environ['OMP_NUM_THREADS'] = str(hilos)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(hilos)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(hilos)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def ruta_calibracion(ruta_modelo):
+    return os.path.splitext(ruta_modelo)[0] + '_ood.json'
+
+
+def _ejecutar_prueba(ruta_store, busqueda_id, prueba_id, hiperparametros, ruta_datos, carpeta, epocas, paciencia):
+    """Entrenar una combinación en el proceso hijo; devuelve (prueba_id, estado)"""
+    from tensorflow import keras
+    from ai_classifier import ClasificadorAeronaves
+
+    store = AlmacenResultados(ruta_store)
+    podada = []
+
+    class PodaMediana(keras.callbacks.Callback):
+        mejor = 0.0
+
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            epoca = epoch + 1
+            store.registrar_epoca(prueba_id, epoca, logs.get('val_accuracy'), logs.get('val_loss'))
+            self.mejor = max(self.mejor, logs.get('val_accuracy') or 0.0)
+            if epoca < EPOCAS_ANTES_DE_PODAR:
+                return
+            mediana = store.mediana_en_epoca(busqueda_id, prueba_id, epoca)
+            if mediana is not None and self.mejor < mediana:
+                print(f"✂️ Prueba {prueba_id} podada en la época {epoca}: {self.mejor:.3f} < mediana {mediana:.3f}")
+                podada.append(epoca)
+                self.model.stop_training = True
+
+    ruta_modelo = os.path.join(carpeta, f"prueba_{prueba_id}.h5")
+    inicio = time.perf_counter()
+    try:
+        clasificador = ClasificadorAeronaves(usar_cache=False)
+        hp = dict(hiperparametros, epocas=epocas, paciencia=paciencia)
+        exito = clasificador.entrenar_modelo(ruta_datos, hiperparametros=hp, callbacks=[PodaMediana()],
+                                             ruta_checkpoint=ruta_modelo, guardar=False)
+        if not exito:
+            raise RuntimeError("el entrenamiento falló")
+        # La calibración de desconocidas no viaja en el .h5: se guarda al lado para promover_mejor
+        if clasificador.calibracion_ood:
+            with open(ruta_calibracion(ruta_modelo), 'w', encoding='utf-8') as f:
+                json.dump(clasificador.calibracion_ood, f)
+        estado = 'Podada' if podada else 'Completada'
+        store.terminar_prueba(prueba_id, estado, clasificador.ultimas_metricas,
+                              time.perf_counter() - inicio, ruta_modelo)
+    except Exception as e:
+        estado = 'Error'
+        store.terminar_prueba(prueba_id, estado, duracion=time.perf_counter() - inicio, error=str(e))
+    return prueba_id, estado
+
+
+def buscar(ruta_datos, espacio=None, cantidad=None, procesos=None, hilos_por_proceso=None, epocas=30,
+           paciencia=5, carpeta='busquedas', semilla=0, promover=False):
+    """Probar combinaciones en un pool de procesos; devuelve (busqueda_id, pruebas ordenadas)"""
+    espacio = espacio or ESPACIO_POR_DEFECTO
+    os.makedirs(carpeta, exist_ok=True)
+    store = AlmacenResultados(os.path.join(carpeta, 'resultados.db'))
+    busqueda_id, pruebas = store.crear_busqueda(ruta_datos, espacio,
+                                                generar_combinaciones(espacio, cantidad, semilla))
+    carpeta_busqueda = os.path.join(carpeta, f"busqueda_{busqueda_id}")
+    os.makedirs(carpeta_busqueda, exist_ok=True)
+
+    # Cada proceso recibe una parte de los núcleos: sin competir por los mismos hilos
+    nucleos = os.cpu_count() or 1
+    procesos = procesos or max(1, min(len(pruebas), nucleos // 4))
+    hilos = hilos_por_proceso or max(1, nucleos // procesos)
+    print(f"🔎 Búsqueda {busqueda_id}: {len(pruebas)} pruebas en {procesos} procesos × {hilos} hilos")
+
+    inicio = time.perf_counter()
+    # 'spawn': TensorFlow no tolera fork después de inicializarse
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=limitar_hilos, initargs=(hilos,)) as pool:
+        futuros = [pool.submit(_ejecutar_prueba, store.ruta_db, busqueda_id, prueba_id, hp, ruta_datos,
+                               carpeta_busqueda, epocas, paciencia)
+                   for prueba_id, hp in pruebas]
+        for terminadas, futuro in enumerate(as_completed(futuros), 1):
+            prueba_id, estado = futuro.result()
+            print(f"   [{terminadas}/{len(futuros)}] prueba {prueba_id}: {estado}")
+    print(f"⏱️ Búsqueda terminada en {time.perf_counter() - inicio:.1f} s")
+
+    resultados = store.pruebas(busqueda_id)
+    mostrar_resultados(resultados)
+    if promover:
+        promover_mejor(resultados, ruta_datos, busqueda_id)
+    return busqueda_id, resultados
+
+
+def mostrar_resultados(resultados, limite=10):
+    print(f"\n{'Prueba':>6} {'Estado':<11} {'val_acc':>8} {'val_loss':>9} {'Épocas':>7} {'s':>7}  Hiperparámetros")
+    for prueba_id, hp, estado, val_accuracy, val_loss, epocas, duracion, _ in resultados[:limite]:
+        print(f"{prueba_id:>6} {estado:<11} {val_accuracy or 0:>8.3f} {val_loss or 0:>9.3f} "
+              f"{epocas or 0:>7} {duracion or 0:>7.1f}  {hp}")
+
+
+def precision_en_validacion(model, ruta_datos, tamano_lote=32):
+    """Precisión del modelo sobre la partición de validación fija de entrenar_modelo (semilla 123)"""
+    import numpy as np
+    import preprocesamiento
+
+    _, validacion, clases = preprocesamiento.datasets_desde_carpetas(
+        ruta_datos, tuple(model.input_shape[1:3]), tamano_lote, fraccion_validacion=0.2, semilla=123)
+    aciertos = total = 0
+    for x, y in validacion:
+        predichas = np.argmax(model.predict_on_batch(x), axis=1)
+        aciertos += int(np.sum(predichas == np.asarray(y)))
+        total += len(predichas)
+    return (aciertos / total if total else 0.0), clases
+
+
+def promover_mejor(resultados, ruta_datos, busqueda_id=None):
+    """Registrar en el almacén el mejor modelo y promoverlo si supera al vigente.
+
+    Ambos se miden sobre la misma partición de validación: la precisión guardada de la versión
+    vigente puede venir de otra partición u otros datos.
+    """
+    import tensorflow as tf
+    from almacen_modelos import AlmacenModelos
+
+    candidatas = [r for r in resultados if r[2] in ('Completada', 'Podada') and r[7] and os.path.exists(r[7])]
+    if not candidatas:
+        print("❌ Ninguna prueba dejó un modelo")
+        return None
+    prueba_id, hp, _, val_accuracy, val_loss, epocas, _, ruta_modelo = candidatas[0]
+
+    model = tf.keras.models.load_model(ruta_modelo)
+    precision, clases = precision_en_validacion(model, ruta_datos)
+
+    almacen = AlmacenModelos()
+    actual = almacen.version_actual()
+    if actual:
+        ruta_vigente, ruta_clases = almacen.rutas(actual)
+        with open(ruta_clases) as f:
+            clases_vigentes = [linea.strip() for linea in f if linea.strip()]
+        if clases_vigentes != clases:
+            print(f"⚠️ La versión vigente {actual} se entrenó con otras clases; no se puede comparar "
+                  f"y no se promueve")
+            return None
+        vigente, _ = precision_en_validacion(tf.keras.models.load_model(ruta_vigente), ruta_datos)
+        if vigente >= precision:
+            print(f"⚠️ La versión vigente {actual} ({vigente:.3f}) no es peor que la mejor prueba "
+                  f"({precision:.3f}); no se promueve")
+            return None
+
+    extra = {'hiperparametros': hp, 'busqueda_id': busqueda_id, 'prueba_id': prueba_id}
+    if os.path.exists(ruta_calibracion(ruta_modelo)):
+        with open(ruta_calibracion(ruta_modelo), encoding='utf-8') as f:
+            extra['ood'] = json.load(f)
+    version = almacen.registrar(model, clases,
+                                metricas={'val_accuracy': val_accuracy, 'val_loss': val_loss, 'epocas': epocas},
+                                ruta_datos=ruta_datos, extra=extra)
+    almacen.promover(version)
+    print(f"🏆 Prueba {prueba_id} promovida como versión {version} ({precision:.3f} en validación)")
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros del clasificador")
+    parser.add_argument('datos', nargs='?', default='aeronaves')
+    parser.add_argument('--pruebas', type=int, default=None,
+                        help="Cantidad de combinaciones al azar (por defecto la grilla completa)")
+    parser.add_argument('--procesos', type=int, default=None)
+    parser.add_argument('--hilos', type=int, default=None, help="Hilos de TensorFlow por proceso")
+    parser.add_argument('--epocas', type=int, default=30)
+    parser.add_argument('--paciencia', type=int, default=5)
+    parser.add_argument('--espacio', default=None, help="JSON con {hiperparámetro: [valores]}")
+    parser.add_argument('--carpeta', default='busquedas')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--promover', action='store_true', help="Promover el mejor modelo si supera al vigente")
+    args = parser.parse_args()
+
+    espacio = json.loads(args.espacio) if args.espacio else None
+    buscar(args.datos, espacio, args.pruebas, args.procesos, args.hilos, args.epocas, args.paciencia,
+           args.carpeta, args.semilla, args.promover)
+
+
+if __name__ == "__main__":
+    main()
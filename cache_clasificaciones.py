@@ -0,0 +1,100 @@
+# cache_clasificaciones.py - Caché persistente de resultados del clasificador
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+def hash_archivo(ruta, tamano_bloque=1024 * 1024):
+    """Hash del contenido del archivo (sin decodificar la imagen)"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class CacheClasificaciones:
+    """Resultados indexados por hash de imagen + versión del modelo, con expulsión LRU"""
+    def __init__(self, ruta_db="cache_clasificaciones.db", max_entradas=50000):
+        self.max_entradas = max_entradas
+        self.lock = threading.Lock()
+        # Una sola conexión compartida entre la GUI y los hilos de ingesta
+        self.conn = sqlite3.connect(ruta_db, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache (
+                hash TEXT NOT NULL,
+                version_modelo TEXT NOT NULL,
+                vistas INTEGER NOT NULL,
+                tipo_predicho TEXT NOT NULL,
+                confianza REAL NOT NULL,
+                ultimo_acceso REAL NOT NULL,
+                PRIMARY KEY (hash, version_modelo, vistas)
+            )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_acceso ON cache (ultimo_acceso)")
+        # Embedding de la imagen (float32), para quien además lo indexa; cachés anteriores no lo tienen
+        if 'embedding' not in [c[1] for c in self.conn.execute("PRAGMA table_info(cache)")]:
+            self.conn.execute("ALTER TABLE cache ADD COLUMN embedding BLOB")
+        self.conn.commit()
+        self.entradas = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def obtener(self, hash_imagen, version_modelo, vistas=1, con_embedding=False):
+        """Devolver (tipo, confianza) o None si no está en caché.
+
+        Con con_embedding devuelve (tipo, confianza, bytes del embedding); sin embedding guardado es un fallo.
+        """
+        with self.lock:
+            fila = self.conn.execute(
+                f"""SELECT tipo_predicho, confianza{', embedding' if con_embedding else ''} FROM cache
+                    WHERE hash = ? AND version_modelo = ? AND vistas = ?""",
+                (hash_imagen, version_modelo, vistas)).fetchone()
+            if fila and con_embedding and fila[2] is None:
+                return None
+            if fila:
+                self.conn.execute(
+                    """UPDATE cache SET ultimo_acceso = ?
+                       WHERE hash = ? AND version_modelo = ? AND vistas = ?""",
+                    (time.time(), hash_imagen, version_modelo, vistas))
+                self.conn.commit()
+            return fila
+
+    def guardar(self, hash_imagen, version_modelo, vistas, tipo_predicho, confianza, embedding=None):
+        """Guardar un resultado (y su embedding, si se tiene) y expulsar los menos usados si se supera el límite"""
+        with self.lock:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO cache
+                   (hash, version_modelo, vistas, tipo_predicho, confianza, ultimo_acceso, embedding)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (hash_imagen, version_modelo, vistas, tipo_predicho, float(confianza), time.time(),
+                 None if embedding is None else embedding.astype('float32').tobytes()))
+            # Conteo aproximado (un reemplazo también suma); se corrige al expulsar
+            self.entradas += 1
+            if self.entradas > self.max_entradas:
+                self._expulsar()
+            self.conn.commit()
+
+    def _expulsar(self):
+        """Borrar el 10% menos usado recientemente de una sola vez"""
+        self.entradas = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if self.entradas <= self.max_entradas:
+            return
+        sobrantes = self.entradas - self.max_entradas + max(1, self.max_entradas // 10)
+        self.conn.execute(
+            """DELETE FROM cache WHERE rowid IN
+               (SELECT rowid FROM cache ORDER BY ultimo_acceso LIMIT ?)""", (sobrantes,))
+        self.entradas -= sobrantes
+
+    def invalidar(self, version_vigente=None):
+        """Borrar resultados de otros modelos (o todos si no se indica versión)"""
+        with self.lock:
+            if version_vigente is None:
+                self.conn.execute("DELETE FROM cache")
+            else:
+                self.conn.execute("DELETE FROM cache WHERE version_modelo != ?", (version_vigente,))
+            self.entradas = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            self.conn.commit()
+
+    def cerrar(self):
+        with self.lock:
+            self.conn.close()
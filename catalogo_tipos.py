@@ -0,0 +1,155 @@
+# catalogo_tipos.py - Catálogo de tipos de aeronave: fabricante, MTOW, categoría e intervalo de mantenimiento
+import argparse
+import csv
+import re
+import threading
+from collections import namedtuple
+
+
+# Valores de fábrica de las reglas (se configuran en motor_reglas):
+# categoría por peso MTOW (kg), primer límite que no se supera...
+CATEGORIAS_POR_PESO = ((5700, 'Liviana'), (27000, 'Mediana'), (float('inf'), 'Pesada'))
+
+# ...e intervalo de mantenimiento en horas de vuelo por categoría (si el tipo no define uno propio)
+INTERVALO_POR_CATEGORIA = {'Liviana': 100, 'Mediana': 150, 'Pesada': 200}
+
+# Catálogo con el que nace una base nueva: (tipo, modelo, fabricante, peso_mtow, categoría, intervalo).
+# Categoría e intervalo en None: se heredan de las reglas (peso y categoría) y siguen sus cambios.
+# Los tipos con guion son las clases del clasificador (nombres de carpeta de aeronaves/)
+TIPOS_INICIALES = [
+    ('Boeing-737', 'Boeing 737-800', 'Boeing', 79000, None, None),
+    ('Airbus-A320', 'Airbus A320', 'Airbus', 73500, None, None),
+    ('Cessna-172', 'Cessna 172', 'Cessna', 1157, None, None),
+    ('Embraer-190', 'Embraer 190', 'Embraer', 51800, None, None),
+    ('ATR-72', 'ATR 72', 'ATR', 22500, None, None),
+    ('Piper-PA-28', 'Piper PA-28', 'Piper', 1157, None, None),
+    ('Cessna-208', 'Cessna 208 Caravan', 'Cessna', 3995, None, None),
+    ('Beechcraft-King-Air-350', 'Beechcraft King Air 350', 'Beechcraft', 6818, None, None),
+    ('Embraer-ERJ-145', 'Embraer ERJ-145', 'Embraer', 22000, None, None),
+    ('ATR-72-600', 'ATR 72-600', 'ATR', 23000, None, None),
+    ('Bombardier-CRJ200', 'Bombardier CRJ200', 'Bombardier', 24041, None, None),
+    ('Boeing-767', 'Boeing 767-300ER', 'Boeing', 186880, None, None),
+]
+
+# Columnas de un catálogo CSV para importar (categoría e intervalo son opcionales)
+COLUMNAS_CSV = ('tipo', 'modelo', 'fabricante', 'peso_mtow', 'categoria', 'intervalo_horas')
+
+TipoAeronave = namedtuple('TipoAeronave', 'tipo modelo fabricante peso_mtow categoria intervalo_horas')
+
+
+def clave_tipo(nombre):
+    """Clave de búsqueda: sin mayúsculas, espacios ni signos ("Boeing-737" = "boeing 737" = "BOEING_737")"""
+    return re.sub(r'[^0-9a-z]', '', (nombre or '').lower())
+
+
+def completar_tipo(reglas, tipo, modelo, fabricante, peso_mtow, categoria=None, intervalo_horas=None):
+    """Fila lista para la tabla; categoría e intervalo vacíos quedan en None (se heredan de las reglas)"""
+    peso_mtow = float(peso_mtow)
+    categoria = categoria or None
+    if categoria and categoria not in [nombre for nombre, _ in reglas.categorias]:
+        raise ValueError(f"Categoría desconocida para {tipo}: {categoria}")
+    intervalo_horas = float(intervalo_horas) if intervalo_horas not in (None, '') else None
+    return TipoAeronave(tipo.strip(), (modelo or tipo).strip(), fabricante.strip(), peso_mtow, categoria,
+                        intervalo_horas)
+
+
+class CatalogoTipos:
+    """Tabla tipos_aeronave en memoria: búsquedas O(1) por tipo o por modelo sin tocar la base"""
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.por_clave = {}
+        self.recargar()
+
+    def recargar(self):
+        """Leer la tabla completa (una consulta); se llama sola después de importar"""
+        por_clave = {}
+        filas = [TipoAeronave(*fila) for fila in self.db.obtener_tipos_aeronave()]
+        # Primero los modelos y después los tipos: si coinciden, gana el tipo
+        for fila in filas:
+            por_clave.setdefault(clave_tipo(fila.modelo), fila)
+        for fila in filas:
+            por_clave[clave_tipo(fila.tipo)] = fila
+        with self.lock:
+            self.por_clave = por_clave
+            self.filas = filas
+        return len(filas)
+
+    def buscar(self, nombre):
+        """TipoAeronave por tipo del clasificador o por modelo, o None si no está en el catálogo"""
+        return self.por_clave.get(clave_tipo(nombre))
+
+    def tipos(self):
+        return list(self.filas)
+
+    def modelos(self):
+        return sorted({fila.modelo for fila in self.filas})
+
+    def importar(self, filas):
+        """Alta o actualización masiva de tipos (tuplas o dicts con COLUMNAS_CSV); devuelve cuántos"""
+        # Los intervalos por tipo son parte de las reglas de mantenimiento: se recompilan al terminar
+        import motor_reglas
+
+        reglas = motor_reglas.reglas(self.db)
+        completas = [completar_tipo(reglas, **fila) if isinstance(fila, dict) else completar_tipo(reglas, *fila)
+                     for fila in filas]
+        self.db.guardar_tipos_aeronave(completas)
+        self.recargar()
+        motor_reglas.recargar_reglas(self.db)
+        return len(completas)
+
+    def importar_csv(self, ruta):
+        """Importar un catálogo CSV con encabezado (ver COLUMNAS_CSV)"""
+        with open(ruta, newline='', encoding='utf-8') as f:
+            lector = csv.DictReader(f)
+            faltantes = {'tipo', 'fabricante', 'peso_mtow'} - set(lector.fieldnames or ())
+            if faltantes:
+                raise ValueError(f"Faltan columnas en {ruta}: {', '.join(sorted(faltantes))}")
+            return self.importar([{columna: fila.get(columna) for columna in COLUMNAS_CSV} for fila in lector])
+
+
+_catalogos = {}
+_lock_catalogos = threading.Lock()
+
+
+def catalogo(db):
+    """Catálogo compartido de la base (se lee una sola vez por proceso)"""
+    with _lock_catalogos:
+        if db.db_name not in _catalogos:
+            _catalogos[db.db_name] = CatalogoTipos(db)
+        return _catalogos[db.db_name]
+
+
+def main():
+    from database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Catálogo de tipos de aeronave")
+    parser.add_argument('--db', default='sgma_aeronaves.db')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_importar = subparsers.add_parser('importar', help="Importar tipos desde un CSV")
+    p_importar.add_argument('archivo', help=f"CSV con columnas {', '.join(COLUMNAS_CSV)}")
+    subparsers.add_parser('listar', help="Mostrar el catálogo")
+    args = parser.parse_args()
+
+    import motor_reglas
+
+    db = DatabaseManager(args.db)
+    tipos = catalogo(db)
+    if args.comando == 'importar':
+        cantidad = tipos.importar_csv(args.archivo)
+        print(f"✅ {cantidad} tipos importados")
+    else:
+        reglas = motor_reglas.reglas(db)
+        print(f"{'Tipo':<26} {'Modelo':<26} {'Fabricante':<12} {'MTOW kg':>9} {'Categoría':<10} {'Intervalo':>10}")
+        for fila in tipos.tipos():
+            # Los valores heredados de las reglas se muestran sin asterisco
+            categoria = reglas.categoria(fila.peso_mtow, fila.tipo)
+            intervalo = reglas.intervalo(categoria, fila.tipo)
+            print(f"{fila.tipo:<26} {fila.modelo:<26} {fila.fabricante:<12} {fila.peso_mtow:>9,.0f} "
+                  f"{categoria + ('*' if fila.categoria else ''):<10} "
+                  f"{'-' if intervalo is None else f'{intervalo:.0f}h':>9}{'*' if fila.intervalo_horas is not None else ' '}")
+        print("* fijado en el catálogo (el resto sigue las reglas de mantenimiento)")
+
+
+if __name__ == "__main__":
+    main()
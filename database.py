@@ -1,18 +1,167 @@
 # database.py - Gestor de Base de Datos SQLite
+import functools
+import random
 import sqlite3
+import threading
+import time
 from datetime import datetime
 import os
 
+import instrumentacion
+from instrumentacion import instrumentar_clase
+from sincronizacion import crear_captura_cambios
+from historial import crear_historial
+from bus_eventos import bus, AERONAVE_ACTUALIZADA, MANTENIMIENTO_INSERTADO, MANTENIMIENTO_ACTUALIZADO
+from catalogo_tipos import CATEGORIAS_POR_PESO, INTERVALO_POR_CATEGORIA, TIPOS_INICIALES, clave_tipo
+import motor_reglas
+
+
+# Máximo de parámetros por consulta IN (...) para no superar el límite de SQLite
+TAMANO_BLOQUE_IN = 500
+
+
+def en_bloques(valores, tamano=TAMANO_BLOQUE_IN):
+    valores = list(valores)
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+# Columnas originales, explícitas para que las columnas agregadas después
+# no desplacen las posiciones que usan las ventanas
+COLUMNAS_AERONAVE = ("a.id, a.matricula, a.modelo, a.fabricante, a.peso_mtow, a.categoria, "
+                     "a.horas_vuelo, a.hangar_id, a.fecha_registro")
+COLUMNAS_MANTENIMIENTO = ("m.id, m.aeronave_id, m.tipo, m.fecha_programada, m.tecnico_id, "
+                          "m.descripcion, m.estado, m.fecha_creacion, m.costo")
+
+
+# Campos que se pueden modificar con control de versión
+CAMPOS_EDITABLES_AERONAVE = ('modelo', 'fabricante', 'peso_mtow', 'categoria', 'horas_vuelo', 'hangar_id')
+CAMPOS_EDITABLES_MANTENIMIENTO = ('tipo', 'fecha_programada', 'tecnico_id', 'descripcion', 'costo')
+
+# Columnas del historial de mantenimientos para auditoría: (expresión SQL, nombre)
+COLUMNAS_HISTORIAL = [
+    ("m.id", "mantenimiento_id"),
+    ("m.fecha_programada", "fecha_programada"),
+    ("m.tipo", "tipo"),
+    ("m.estado", "estado"),
+    ("m.descripcion", "descripcion"),
+    ("m.costo", "costo"),
+    ("m.fecha_creacion", "fecha_creacion"),
+    ("a.matricula", "matricula"),
+    ("a.modelo", "modelo"),
+    ("a.fabricante", "fabricante"),
+    ("a.categoria", "categoria"),
+    ("t.nombre", "tecnico"),
+    ("t.licencia", "licencia_tecnico"),
+    ("t.especialidad", "especialidad_tecnico"),
+]
+
+# Mismo origen para contar y recorrer: un técnico o aeronave borrados no sacan mantenimientos del historial
+FROM_HISTORIAL = """FROM mantenimientos m 
+                     LEFT JOIN aeronaves a ON m.aeronave_id = a.id 
+                     LEFT JOIN tecnicos t ON m.tecnico_id = t.id"""
+
+
+# SGMA_CONCURRENTE=1: varios planificadores sobre el mismo archivo (modo WAL)
+MODO_CONCURRENTE = os.environ.get('SGMA_CONCURRENTE') == '1'
+
+# Reintentos ante "database is locked": espera exponencial con variación aleatoria
+INTENTOS_BLOQUEO = 6
+ESPERA_INICIAL_BLOQUEO = 0.05
+ESPERA_MAXIMA_BLOQUEO = 2.0
+
+
+class ConflictoVersion(Exception):
+    """Otro usuario modificó la fila después de leerla (concurrencia optimista)"""
+
+
+def _es_bloqueo(error):
+    mensaje = str(error).lower()
+    return 'locked' in mensaje or 'busy' in mensaje
+
+
+def reintentar_si_bloqueada(func):
+    """Repetir la operación completa si otro escritor tiene bloqueada la base"""
+    @functools.wraps(func)
+    def envoltura(self, *args, **kwargs):
+        db = getattr(self, 'db', self)
+        espera = ESPERA_INICIAL_BLOQUEO
+        for intento in range(INTENTOS_BLOQUEO):
+            try:
+                return func(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _es_bloqueo(e) or intento == INTENTOS_BLOQUEO - 1:
+                    raise
+                db.descartar_transaccion()
+                pausa = espera * (1 + random.random())
+                if instrumentacion.ACTIVO:
+                    instrumentacion.registrar('db.reintento_bloqueo', pausa)
+                time.sleep(pausa)
+                espera = min(espera * 2, ESPERA_MAXIMA_BLOQUEO)
+    return envoltura
+
+
+class ConexionReutilizable:
+    """Conexión que sigue abierta tras close() para reutilizarse en el mismo hilo"""
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def close(self):
+        # Igual que un cierre real, lo no confirmado se descarta
+        if self._conn.in_transaction:
+            self._conn.rollback()
+    
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+
 class DatabaseManager:
-    def __init__(self, db_name="sgma_aeronaves.db"):
+    def __init__(self, db_name="sgma_aeronaves.db", reutilizar_conexiones=False, concurrente=None,
+                 espera_ocupada=5.0):
         self.db_name = db_name
+        # En procesos de larga duración (servicio) cada hilo mantiene su conexión abierta
+        self.reutilizar_conexiones = reutilizar_conexiones
+        # Varios usuarios sobre el mismo archivo: WAL, lectores sin bloquear al escritor
+        self.concurrente = MODO_CONCURRENTE if concurrente is None else concurrente
+        self.espera_ocupada = espera_ocupada
+        self._local = threading.local()
+        if self.concurrente:
+            self._activar_wal()
         self.crear_tablas()
         self.insertar_datos_iniciales()
     
+    def _conectar(self):
+        conn = sqlite3.connect(self.db_name, timeout=self.espera_ocupada)
+        # Misma normalización de tipos que el catálogo, para las reglas por tipo en SQL
+        conn.create_function('clave_tipo', 1, clave_tipo, deterministic=True)
+        if self.concurrente:
+            # En WAL basta con sincronizar en cada checkpoint
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+    
+    @reintentar_si_bloqueada
+    def _activar_wal(self):
+        conn = sqlite3.connect(self.db_name, timeout=self.espera_ocupada)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+    
     def crear_conexion(self):
         """Crear conexión a la base de datos"""
-        return sqlite3.connect(self.db_name)
+        if not self.reutilizar_conexiones:
+            return self._conectar()
+        conn = getattr(self._local, 'conexion', None)
+        if conn is None:
+            conn = ConexionReutilizable(self._conectar())
+            self._local.conexion = conn
+        return conn
     
+    def descartar_transaccion(self):
+        """Deshacer lo pendiente en la conexión reutilizada del hilo (tras un error)"""
+        conn = getattr(self._local, 'conexion', None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+    
+    @reintentar_si_bloqueada
     def crear_tablas(self):
         """Crear todas las tablas necesarias"""
         conn = self.crear_conexion()
@@ -98,9 +247,229 @@ class DatabaseManager:
             )
         ''')
         
+        # Tabla de clasificaciones automáticas de imágenes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS clasificaciones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                aeronave_id INTEGER,
+                ruta_imagen TEXT NOT NULL,
+                tipo_predicho TEXT,
+                confianza REAL,
+                fecha TEXT NOT NULL,
+                FOREIGN KEY (aeronave_id) REFERENCES aeronaves (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_clasificaciones_aeronave ON clasificaciones (aeronave_id)")
+
+        # Almacén de imágenes: cada foto clasificada, opcionalmente vinculada a una aeronave
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS imagenes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                aeronave_id INTEGER,
+                ruta TEXT UNIQUE NOT NULL,
+                tipo_predicho TEXT,
+                confianza REAL,
+                fecha TEXT NOT NULL,
+                FOREIGN KEY (aeronave_id) REFERENCES aeronaves (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_imagenes_aeronave ON imagenes (aeronave_id)")
+
+        # Embedding de cada imagen por versión de modelo (float32 crudo); el rowid crece con cada alta
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings_imagenes (
+                imagen_id INTEGER NOT NULL,
+                version_modelo TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (imagen_id, version_modelo),
+                FOREIGN KEY (imagen_id) REFERENCES imagenes (id)
+            )
+        ''')
+        # El índice incluye el rowid: lectura incremental por versión sin recorrer la tabla
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_version ON embeddings_imagenes (version_modelo)")
+
+        # Último cumplimiento de cada componente con intervalo propio (ver motor_reglas)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS componentes_aeronave (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                aeronave_id INTEGER NOT NULL,
+                componente TEXT NOT NULL,
+                horas REAL,
+                fecha TEXT,
+                UNIQUE (aeronave_id, componente),
+                FOREIGN KEY (aeronave_id) REFERENCES aeronaves (id)
+            )
+        ''')
+        
+        # Catálogo de tipos de aeronave (clave = nombre normalizado, ver catalogo_tipos.clave_tipo)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tipos_aeronave (
+                clave TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                modelo TEXT NOT NULL,
+                fabricante TEXT NOT NULL,
+                peso_mtow REAL NOT NULL,
+                categoria TEXT,
+                intervalo_horas REAL,
+                fecha_actualizacion TEXT NOT NULL
+            )
+        ''')
+        self._migrar_tipos_heredables(cursor)
+
+        # Tabla de alertas de mantenimiento (una abierta por aeronave, tipo y mantenimiento)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alertas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                aeronave_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                mantenimiento_id INTEGER NOT NULL DEFAULT 0,
+                estado TEXT NOT NULL DEFAULT 'Activa',
+                mensaje TEXT,
+                fecha_creacion TEXT NOT NULL,
+                fecha_actualizacion TEXT NOT NULL,
+                FOREIGN KEY (aeronave_id) REFERENCES aeronaves (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_alertas_aeronave ON alertas (aeronave_id, estado)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_alertas_estado ON alertas (estado)")
+        
+        # Parámetros persistentes de la aplicación (clave/valor)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS configuracion (
+                clave TEXT PRIMARY KEY,
+                valor TEXT
+            )
+        ''')
+        
+        # Ciclo de vida de las órdenes de trabajo y horas base de cada aeronave
+        self._agregar_columna(cursor, 'mantenimientos', 'fecha_inicio', 'TEXT')
+        self._agregar_columna(cursor, 'mantenimientos', 'fecha_cierre', 'TEXT')
+        self._agregar_columna(cursor, 'mantenimientos', 'hangar_id', 'INTEGER REFERENCES hangares (id)')
+        self._agregar_columna(cursor, 'aeronaves', 'horas_ultimo_mantenimiento', 'REAL NOT NULL DEFAULT 0')
+        self._agregar_columna(cursor, 'aeronaves', 'fecha_ultimo_mantenimiento', 'TEXT')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mantenimientos_estado ON mantenimientos (estado)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mantenimiento_piezas_mantenimiento ON mantenimiento_piezas (mantenimiento_id)")
+        
+        # Índices para recorrer el historial por fecha o aeronave sin ordenar en memoria
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mantenimientos_fecha ON mantenimientos (fecha_programada)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mantenimientos_aeronave ON mantenimientos (aeronave_id)")
+        
+        # Registro de horas de vuelo por vuelo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS registro_vuelos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                aeronave_id INTEGER NOT NULL,
+                fecha TEXT NOT NULL,
+                horas REAL NOT NULL,
+                FOREIGN KEY (aeronave_id) REFERENCES aeronaves (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_registro_vuelos_aeronave ON registro_vuelos (aeronave_id, fecha)")
+        
+        self.crear_triggers_ocupacion(cursor)
+        
+        # Concurrencia optimista: cada modificación incrementa la versión de la fila
+        self._agregar_columna(cursor, 'aeronaves', 'version', 'INTEGER NOT NULL DEFAULT 0')
+        self._agregar_columna(cursor, 'mantenimientos', 'version', 'INTEGER NOT NULL DEFAULT 0')
+        for tabla in ('aeronaves', 'mantenimientos'):
+            # Las actualizaciones que no fijan la versión también la incrementan
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_version_{tabla} AFTER UPDATE ON {tabla}
+                WHEN NEW.version = OLD.version
+                BEGIN
+                    UPDATE {tabla} SET version = version + 1 WHERE id = NEW.id;
+                END""")
+        
+        # Historial temporal para auditoría y registro de cambios para sincronizar bases
+        # (al final, con todas las columnas ya creadas)
+        crear_historial(cursor)
+        crear_captura_cambios(cursor)
+        
         conn.commit()
         conn.close()
     
+    def crear_triggers_ocupacion(self, cursor):
+        """Mantener hangares.ocupacion igual al número de aeronaves asignadas y respetar la capacidad"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_ocupacion_insert'")
+        recontar = cursor.fetchone() is None
+        
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS trg_capacidad_insert BEFORE INSERT ON aeronaves
+            WHEN NEW.hangar_id IS NOT NULL
+                 AND (SELECT ocupacion >= capacidad FROM hangares WHERE id = NEW.hangar_id)
+            BEGIN
+                SELECT RAISE(ABORT, 'Hangar sin capacidad disponible');
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_capacidad_update BEFORE UPDATE OF hangar_id ON aeronaves
+            WHEN NEW.hangar_id IS NOT OLD.hangar_id AND NEW.hangar_id IS NOT NULL
+                 AND (SELECT ocupacion >= capacidad FROM hangares WHERE id = NEW.hangar_id)
+            BEGIN
+                SELECT RAISE(ABORT, 'Hangar sin capacidad disponible');
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_ocupacion_insert AFTER INSERT ON aeronaves
+            WHEN NEW.hangar_id IS NOT NULL
+            BEGIN
+                UPDATE hangares SET ocupacion = ocupacion + 1 WHERE id = NEW.hangar_id;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_ocupacion_update AFTER UPDATE OF hangar_id ON aeronaves
+            WHEN NEW.hangar_id IS NOT OLD.hangar_id
+            BEGIN
+                UPDATE hangares SET ocupacion = ocupacion - 1 WHERE id = OLD.hangar_id;
+                UPDATE hangares SET ocupacion = ocupacion + 1 WHERE id = NEW.hangar_id;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_ocupacion_delete AFTER DELETE ON aeronaves
+            WHEN OLD.hangar_id IS NOT NULL
+            BEGIN
+                UPDATE hangares SET ocupacion = ocupacion - 1 WHERE id = OLD.hangar_id;
+            END;
+        ''')
+        
+        # Bases anteriores a los triggers: recontar una sola vez
+        if recontar:
+            cursor.execute("""UPDATE hangares SET ocupacion =
+                              (SELECT COUNT(*) FROM aeronaves WHERE hangar_id = hangares.id)""")
+    
+    def _migrar_tipos_heredables(self, cursor):
+        """Catálogos creados con categoría e intervalo obligatorios: los valores iguales a los de
+        fábrica pasan a NULL para que el tipo siga a las reglas de su categoría"""
+        cursor.execute("PRAGMA table_info(tipos_aeronave)")
+        if not any(c[1] == 'intervalo_horas' and c[3] for c in cursor.fetchall()):
+            return
+        cursor.execute("SELECT clave, peso_mtow, categoria, intervalo_horas FROM tipos_aeronave")
+        filas = cursor.fetchall()
+        cursor.execute("ALTER TABLE tipos_aeronave RENAME TO tipos_aeronave_anterior")
+        cursor.execute('''
+            CREATE TABLE tipos_aeronave (
+                clave TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                modelo TEXT NOT NULL,
+                fabricante TEXT NOT NULL,
+                peso_mtow REAL NOT NULL,
+                categoria TEXT,
+                intervalo_horas REAL,
+                fecha_actualizacion TEXT NOT NULL
+            )
+        ''')
+        cursor.execute("INSERT INTO tipos_aeronave SELECT * FROM tipos_aeronave_anterior")
+        cursor.execute("DROP TABLE tipos_aeronave_anterior")
+        for clave, peso_mtow, categoria, intervalo_horas in filas:
+            por_peso = next(nombre for limite, nombre in CATEGORIAS_POR_PESO if peso_mtow <= limite)
+            if intervalo_horas == INTERVALO_POR_CATEGORIA.get(categoria):
+                cursor.execute("UPDATE tipos_aeronave SET intervalo_horas = NULL WHERE clave = ?", (clave,))
+            if categoria == por_peso:
+                cursor.execute("UPDATE tipos_aeronave SET categoria = NULL WHERE clave = ?", (clave,))
+    
+    def _agregar_columna(self, cursor, tabla, columna, definicion):
+        """Agregar una columna a una tabla existente si todavía no la tiene"""
+        cursor.execute(f"PRAGMA table_info({tabla})")
+        if columna not in [c[1] for c in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+    
+    @reintentar_si_bloqueada
     def insertar_datos_iniciales(self):
         """Insertar datos iniciales si la base está vacía"""
         conn = self.crear_conexion()
@@ -154,12 +523,31 @@ class DatabaseManager:
                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", 
                                (*aeronave, fecha_actual))
         
+        # Catálogo de tipos (también en bases creadas antes de que existiera)
+        cursor.execute("SELECT COUNT(*) FROM tipos_aeronave")
+        if cursor.fetchone()[0] == 0:
+            self._insertar_tipos(cursor, TIPOS_INICIALES)
+        
         conn.commit()
         conn.close()
     
+    def _insertar_tipos(self, cursor, tipos):
+        fecha_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.executemany("""INSERT INTO tipos_aeronave
+                           (clave, tipo, modelo, fabricante, peso_mtow, categoria, intervalo_horas,
+                            fecha_actualizacion)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT (clave) DO UPDATE SET
+                               tipo = excluded.tipo, modelo = excluded.modelo,
+                               fabricante = excluded.fabricante, peso_mtow = excluded.peso_mtow,
+                               categoria = excluded.categoria, intervalo_horas = excluded.intervalo_horas,
+                               fecha_actualizacion = excluded.fecha_actualizacion""",
+                           [(clave_tipo(t[0]), *t, fecha_actual) for t in tipos])
+    
     # Métodos para aeronaves
+    @reintentar_si_bloqueada
     def insertar_aeronave(self, matricula, modelo, fabricante, peso_mtow, categoria, horas_vuelo, hangar_id):
-        """Insertar nueva aeronave"""
+        """Insertar nueva aeronave (False si la matrícula existe o el hangar está lleno)"""
         conn = self.crear_conexion()
         cursor = conn.cursor()
         fecha_actual = datetime.now().strftime("%Y-%m-%d")
@@ -170,19 +558,93 @@ class DatabaseManager:
                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", 
                            (matricula, modelo, fabricante, peso_mtow, categoria, horas_vuelo, hangar_id, fecha_actual))
             conn.commit()
-            return True
         except sqlite3.IntegrityError:
             return False
         finally:
             conn.close()
+        bus.publicar(AERONAVE_ACTUALIZADA, aeronave_id=cursor.lastrowid)
+        return True
+    
+    def actualizar_horas_vuelo(self, aeronave_id, horas_vuelo, version=None):
+        """Actualizar las horas de vuelo acumuladas de una aeronave"""
+        if version is not None:
+            return self.actualizar_aeronave(aeronave_id, version, horas_vuelo=horas_vuelo)
+        self._escribir("UPDATE aeronaves SET horas_vuelo = ? WHERE id = ?", (horas_vuelo, aeronave_id))
+        bus.publicar(AERONAVE_ACTUALIZADA, aeronave_id=aeronave_id)
+        return True
+    
+    def actualizar_aeronave(self, aeronave_id, version, **campos):
+        """Actualizar campos solo si la fila sigue en la versión leída; devuelve la nueva versión"""
+        nueva_version = self._actualizar_con_version('aeronaves', CAMPOS_EDITABLES_AERONAVE,
+                                                     aeronave_id, version, campos)
+        bus.publicar(AERONAVE_ACTUALIZADA, aeronave_id=aeronave_id)
+        return nueva_version
+    
+    @reintentar_si_bloqueada
+    def _escribir(self, sql, parametros):
+        """Transacción corta de una sola sentencia"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute(sql, parametros)
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+    
+    @reintentar_si_bloqueada
+    def _actualizar_con_version(self, tabla, editables, fila_id, version, campos):
+        invalidos = set(campos) - set(editables)
+        if invalidos or not campos:
+            raise ValueError(f"Campos no editables en {tabla}: {', '.join(sorted(invalidos)) or 'ninguno'}")
+        asignaciones = ", ".join(f"{campo} = ?" for campo in campos)
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        # Escritura corta: una sola sentencia compara y actualiza
+        cursor.execute(f"UPDATE {tabla} SET {asignaciones}, version = version + 1 WHERE id = ? AND version = ?",
+                      (*campos.values(), fila_id, version))
+        actualizada = cursor.rowcount
+        conn.commit()
+        conn.close()
+        if not actualizada:
+            raise ConflictoVersion(f"{tabla} {fila_id} fue modificada por otro usuario (versión {version})")
+        return version + 1
+    
+    @reintentar_si_bloqueada
+    def registrar_vuelo(self, aeronave_id, fecha, horas):
+        """Registrar un vuelo y sumar sus horas a la aeronave"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO registro_vuelos (aeronave_id, fecha, horas) VALUES (?, ?, ?)",
+                      (aeronave_id, fecha, horas))
+        cursor.execute("UPDATE aeronaves SET horas_vuelo = horas_vuelo + ? WHERE id = ?", (horas, aeronave_id))
+        conn.commit()
+        conn.close()
+        bus.publicar(AERONAVE_ACTUALIZADA, aeronave_id=aeronave_id)
+        return True
+    
+    def obtener_registro_vuelos(self, aeronave_id, desde=None, hasta=None):
+        """Vuelos de una aeronave (fecha, horas), del más reciente al más antiguo"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        consulta = "SELECT fecha, horas FROM registro_vuelos WHERE aeronave_id = ?"
+        parametros = [aeronave_id]
+        if desde:
+            consulta += " AND fecha >= ?"
+            parametros.append(desde)
+        if hasta:
+            consulta += " AND fecha <= ?"
+            parametros.append(hasta)
+        cursor.execute(consulta + " ORDER BY fecha DESC", parametros)
+        resultado = cursor.fetchall()
+        conn.close()
+        return resultado
     
     def obtener_aeronaves(self):
         """Obtener todas las aeronaves"""
         conn = self.crear_conexion()
         cursor = conn.cursor()
-        cursor.execute("""SELECT a.*, h.nombre as hangar_nombre 
-                         FROM aeronaves a 
-                         LEFT JOIN hangares h ON a.hangar_id = h.id""")
+        cursor.execute(f"""SELECT {COLUMNAS_AERONAVE}, h.nombre as hangar_nombre, a.version 
+                          FROM aeronaves a 
+                          LEFT JOIN hangares h ON a.hangar_id = h.id""")
         resultado = cursor.fetchall()
         conn.close()
         return resultado
@@ -196,6 +658,30 @@ class DatabaseManager:
         conn.close()
         return resultado
     
+    def obtener_version(self, tabla, fila_id):
+        """Versión actual de una fila de aeronaves o mantenimientos (None si no existe)"""
+        if tabla not in ('aeronaves', 'mantenimientos'):
+            raise ValueError(f"La tabla {tabla} no tiene control de versión")
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT version FROM {tabla} WHERE id = ?", (fila_id,))
+        resultado = cursor.fetchone()
+        conn.close()
+        return resultado[0] if resultado else None
+    
+    def obtener_ids_por_matricula(self, matriculas):
+        """Obtener {matricula: id} para varias matrículas en una sola consulta"""
+        matriculas = list(set(matriculas))
+        if not matriculas:
+            return {}
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        marcadores = ", ".join("?" * len(matriculas))
+        cursor.execute(f"SELECT matricula, id FROM aeronaves WHERE matricula IN ({marcadores})", matriculas)
+        resultado = dict(cursor.fetchall())
+        conn.close()
+        return resultado
+    
     # Métodos para hangares
     def obtener_hangares(self):
         """Obtener todos los hangares"""
@@ -235,6 +721,7 @@ class DatabaseManager:
         return resultado
     
     # Métodos para mantenimientos
+    @reintentar_si_bloqueada
     def insertar_mantenimiento(self, aeronave_id, tipo, fecha_programada, tecnico_id, descripcion, costo=0):
         """Insertar nuevo mantenimiento"""
         conn = self.crear_conexion()
@@ -247,17 +734,30 @@ class DatabaseManager:
                        (aeronave_id, tipo, fecha_programada, tecnico_id, descripcion, fecha_actual, costo))
         conn.commit()
         conn.close()
+        bus.publicar(MANTENIMIENTO_INSERTADO, aeronave_id=aeronave_id, mantenimiento_id=cursor.lastrowid)
         return True
     
+    def actualizar_mantenimiento(self, mantenimiento_id, version, **campos):
+        """Actualizar campos solo si la fila sigue en la versión leída; devuelve la nueva versión"""
+        nueva_version = self._actualizar_con_version('mantenimientos', CAMPOS_EDITABLES_MANTENIMIENTO,
+                                                     mantenimiento_id, version, campos)
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT aeronave_id FROM mantenimientos WHERE id = ?", (mantenimiento_id,))
+        aeronave_id = cursor.fetchone()[0]
+        conn.close()
+        bus.publicar(MANTENIMIENTO_ACTUALIZADO, aeronave_id=aeronave_id, mantenimiento_id=mantenimiento_id)
+        return nueva_version
+    
     def obtener_mantenimientos(self):
         """Obtener todos los mantenimientos con información relacionada"""
         conn = self.crear_conexion()
         cursor = conn.cursor()
-        cursor.execute("""SELECT m.*, a.matricula, a.modelo, t.nombre as tecnico_nombre 
-                         FROM mantenimientos m 
-                         JOIN aeronaves a ON m.aeronave_id = a.id 
-                         JOIN tecnicos t ON m.tecnico_id = t.id 
-                         ORDER BY m.fecha_programada DESC""")
+        cursor.execute(f"""SELECT {COLUMNAS_MANTENIMIENTO}, a.matricula, a.modelo, t.nombre as tecnico_nombre 
+                          FROM mantenimientos m 
+                          JOIN aeronaves a ON m.aeronave_id = a.id 
+                          JOIN tecnicos t ON m.tecnico_id = t.id 
+                          ORDER BY m.fecha_programada DESC""")
         resultado = cursor.fetchall()
         conn.close()
         return resultado
@@ -266,15 +766,80 @@ class DatabaseManager:
         """Obtener mantenimientos de una aeronave específica"""
         conn = self.crear_conexion()
         cursor = conn.cursor()
-        cursor.execute("""SELECT m.*, t.nombre as tecnico_nombre 
-                         FROM mantenimientos m 
-                         JOIN tecnicos t ON m.tecnico_id = t.id 
-                         WHERE m.aeronave_id = ? 
-                         ORDER BY m.fecha_programada DESC""", (aeronave_id,))
+        cursor.execute(f"""SELECT {COLUMNAS_MANTENIMIENTO}, t.nombre as tecnico_nombre 
+                          FROM mantenimientos m 
+                          JOIN tecnicos t ON m.tecnico_id = t.id 
+                          WHERE m.aeronave_id = ? 
+                          ORDER BY m.fecha_programada DESC""", (aeronave_id,))
         resultado = cursor.fetchall()
         conn.close()
         return resultado
     
+    def contar_mantenimientos(self, estado):
+        """Contar mantenimientos en un estado (usa el índice por estado)"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM mantenimientos WHERE estado = ?", (estado,))
+        resultado = cursor.fetchone()[0]
+        conn.close()
+        return resultado
+    
+    @reintentar_si_bloqueada
+    def asignar_piezas_mantenimiento(self, mantenimiento_id, piezas):
+        """Registrar piezas a usar en un mantenimiento: [(pieza_id, cantidad), ...]"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO mantenimiento_piezas (mantenimiento_id, pieza_id, cantidad) VALUES (?, ?, ?)",
+                           [(mantenimiento_id, pieza_id, cantidad) for pieza_id, cantidad in piezas])
+        conn.commit()
+        conn.close()
+        return True
+    
+    def _filtros_historial(self, desde, hasta, matricula):
+        """Construir la cláusula WHERE del historial según los filtros dados"""
+        condiciones = []
+        parametros = []
+        if desde:
+            condiciones.append("m.fecha_programada >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("m.fecha_programada <= ?")
+            parametros.append(hasta)
+        if matricula:
+            condiciones.append("a.matricula = ?")
+            parametros.append(matricula)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return where, parametros
+    
+    def contar_historial_mantenimientos(self, desde=None, hasta=None, matricula=None):
+        """Contar filas del historial que cumplen los filtros"""
+        where, parametros = self._filtros_historial(desde, hasta, matricula)
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) {FROM_HISTORIAL} {where}", parametros)
+        resultado = cursor.fetchone()[0]
+        conn.close()
+        return resultado
+    
+    def iterar_historial_mantenimientos(self, desde=None, hasta=None, matricula=None, tamano_bloque=5000):
+        """Recorrer el historial en bloques de fetchmany sin cargarlo entero en memoria"""
+        where, parametros = self._filtros_historial(desde, hasta, matricula)
+        expresiones = ", ".join(expresion for expresion, _ in COLUMNAS_HISTORIAL)
+        conn = self.crear_conexion()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""SELECT {expresiones} 
+                              {FROM_HISTORIAL} 
+                              {where} 
+                              ORDER BY m.fecha_programada, m.id""", parametros)
+            while True:
+                bloque = cursor.fetchmany(tamano_bloque)
+                if not bloque:
+                    break
+                yield bloque
+        finally:
+            conn.close()
+    
     # Métodos para piezas
     def obtener_piezas(self):
         """Obtener todas las piezas"""
@@ -285,6 +850,7 @@ class DatabaseManager:
         conn.close()
         return resultado
     
+    @reintentar_si_bloqueada
     def actualizar_stock_pieza(self, pieza_id, nueva_cantidad):
         """Actualizar stock de una pieza"""
         conn = self.crear_conexion()
@@ -296,19 +862,288 @@ class DatabaseManager:
         conn.close()
         return True
     
+    # Métodos para el catálogo de tipos
+    def obtener_tipos_aeronave(self):
+        """(tipo, modelo, fabricante, peso_mtow, categoria, intervalo_horas) de todo el catálogo"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("""SELECT tipo, modelo, fabricante, peso_mtow, categoria, intervalo_horas
+                          FROM tipos_aeronave ORDER BY tipo""")
+        resultado = cursor.fetchall()
+        conn.close()
+        return resultado
+    
+    @reintentar_si_bloqueada
+    def guardar_tipos_aeronave(self, tipos):
+        """Alta o actualización (por tipo) de un lote de tipos en una sola transacción"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        self._insertar_tipos(cursor, tipos)
+        conn.commit()
+        conn.close()
+        return len(tipos)
+    
+    @reintentar_si_bloqueada
+    def recategorizar_aeronaves(self, expresion, parametros):
+        """Recalcular aeronaves.categoria con una expresión SQL sobre 'a' (p. ej. MotorReglas.categoria_sql)"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute(f"""UPDATE aeronaves AS a SET categoria = {expresion}
+                           WHERE a.categoria IS NOT {expresion}""", parametros + parametros)
+        cambiadas = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return cambiadas
+    
+    # Métodos para clasificaciones
+    @reintentar_si_bloqueada
+    def insertar_clasificaciones(self, clasificaciones):
+        """Insertar un lote de clasificaciones (aeronave_id, ruta_imagen, tipo_predicho, confianza)"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        fecha_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.executemany("""INSERT INTO clasificaciones 
+                           (aeronave_id, ruta_imagen, tipo_predicho, confianza, fecha) 
+                           VALUES (?, ?, ?, ?, ?)""", 
+                           [(*c, fecha_actual) for c in clasificaciones])
+        conn.commit()
+        conn.close()
+        return True
+    
+    # Métodos para el almacén de imágenes
+    @reintentar_si_bloqueada
+    def guardar_imagenes(self, imagenes, version_modelo=None):
+        """Registrar imágenes (aeronave_id, ruta, tipo_predicho, confianza, embedding) y devolver sus ids.
+
+        Una ruta ya registrada se actualiza; el embedding (bytes float32 o None) se guarda por versión.
+        """
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        fecha_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ids = []
+        for aeronave_id, ruta, tipo, confianza, embedding in imagenes:
+            cursor.execute("""INSERT INTO imagenes (aeronave_id, ruta, tipo_predicho, confianza, fecha)
+                           VALUES (?, ?, ?, ?, ?)
+                           ON CONFLICT (ruta) DO UPDATE SET
+                               aeronave_id = COALESCE(excluded.aeronave_id, imagenes.aeronave_id),
+                               tipo_predicho = excluded.tipo_predicho,
+                               confianza = excluded.confianza
+                           RETURNING id""", (aeronave_id, ruta, tipo, confianza, fecha_actual))
+            imagen_id = cursor.fetchone()[0]
+            ids.append(imagen_id)
+            if embedding is not None and version_modelo is not None:
+                # La misma imagen con el mismo modelo da el mismo embedding: no se duplica
+                cursor.execute("""INSERT OR IGNORE INTO embeddings_imagenes (imagen_id, version_modelo, vector)
+                               VALUES (?, ?, ?)""", (imagen_id, version_modelo, embedding))
+        conn.commit()
+        conn.close()
+        return ids
+
+    def vincular_imagen(self, imagen_id, aeronave_id):
+        """Asociar una imagen guardada a la aeronave que muestra"""
+        self._escribir("UPDATE imagenes SET aeronave_id = ? WHERE id = ?", (aeronave_id, imagen_id))
+
+    def obtener_embeddings(self, version_modelo, desde=0):
+        """(rowid, imagen_id, vector) de una versión de modelo con rowid mayor que desde"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("""SELECT rowid, imagen_id, vector FROM embeddings_imagenes
+                       WHERE version_modelo = ? AND rowid > ? ORDER BY rowid""", (version_modelo, desde))
+        resultado = cursor.fetchall()
+        conn.close()
+        return resultado
+
+    def obtener_imagenes_sin_embedding(self, version_modelo):
+        """(id, ruta) de las imágenes que todavía no tienen embedding de esta versión"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("""SELECT i.id, i.ruta FROM imagenes i
+                       WHERE NOT EXISTS (SELECT 1 FROM embeddings_imagenes e
+                                         WHERE e.imagen_id = i.id AND e.version_modelo = ?)
+                       ORDER BY i.id""", (version_modelo,))
+        resultado = cursor.fetchall()
+        conn.close()
+        return resultado
+
+    def obtener_imagenes(self, imagen_ids):
+        """{id: (id, ruta, tipo_predicho, confianza, fecha, aeronave_id, matricula, modelo)}"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        resultado = {}
+        for bloque in en_bloques(imagen_ids):
+            cursor.execute(f"""SELECT i.id, i.ruta, i.tipo_predicho, i.confianza, i.fecha, i.aeronave_id,
+                                      a.matricula, a.modelo
+                               FROM imagenes i LEFT JOIN aeronaves a ON i.aeronave_id = a.id
+                               WHERE i.id IN ({', '.join('?' * len(bloque))})""", bloque)
+            resultado.update((fila[0], fila) for fila in cursor.fetchall())
+        conn.close()
+        return resultado
+
+    def obtener_clasificaciones(self, aeronave_id=None):
+        """Obtener clasificaciones, opcionalmente de una aeronave"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        if aeronave_id is None:
+            cursor.execute("SELECT * FROM clasificaciones ORDER BY fecha DESC")
+        else:
+            cursor.execute("SELECT * FROM clasificaciones WHERE aeronave_id = ? ORDER BY fecha DESC", 
+                          (aeronave_id,))
+        resultado = cursor.fetchall()
+        conn.close()
+        return resultado
+    
     # Métodos para alertas
-    def obtener_aeronaves_con_alertas(self):
-        """Obtener aeronaves que requieren mantenimiento (más de cierta cantidad de horas)"""
+    def obtener_aeronaves_con_alertas(self, aeronave_ids=None, reglas=None, hoy=None):
+        """Aeronaves que superaron algún intervalo de mantenimiento (horas o calendario).
+
+        Columnas de aeronave + horas y fecha del último mantenimiento; reglas: motor_reglas.MotorReglas
+        """
+        reglas = reglas or motor_reglas.reglas(self)
+        predicado, parametros = reglas.predicado_sql('a', hoy)
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        consulta = f"""SELECT {COLUMNAS_AERONAVE}, a.horas_ultimo_mantenimiento,
+                             COALESCE(a.fecha_ultimo_mantenimiento, a.fecha_registro)
+                      FROM aeronaves a WHERE {predicado}"""
+        if aeronave_ids is None:
+            cursor.execute(consulta, parametros)
+            resultado = cursor.fetchall()
+        else:
+            resultado = []
+            for bloque in en_bloques(aeronave_ids):
+                cursor.execute(f"{consulta} AND a.id IN ({', '.join('?' * len(bloque))})", parametros + bloque)
+                resultado.extend(cursor.fetchall())
+        conn.close()
+        return resultado
+    
+    def registrar_cumplimiento(self, aeronave_id, componente, horas, fecha):
+        """Registrar el mantenimiento de un componente (horas de la aeronave y fecha en que se hizo)"""
+        self._escribir("""INSERT INTO componentes_aeronave (aeronave_id, componente, horas, fecha)
+                          VALUES (?, ?, ?, ?)
+                          ON CONFLICT (aeronave_id, componente) DO UPDATE SET
+                              horas = excluded.horas, fecha = excluded.fecha""",
+                       (aeronave_id, componente, horas, fecha))
+        bus.publicar(AERONAVE_ACTUALIZADA, aeronave_id=aeronave_id)
+    
+    def obtener_cumplimientos(self, aeronave_ids=None):
+        """(aeronave_id, componente, horas, fecha) de los componentes con cumplimiento registrado"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        consulta = "SELECT aeronave_id, componente, horas, fecha FROM componentes_aeronave"
+        if aeronave_ids is None:
+            cursor.execute(consulta)
+            resultado = cursor.fetchall()
+        else:
+            resultado = []
+            for bloque in en_bloques(aeronave_ids):
+                cursor.execute(f"{consulta} WHERE aeronave_id IN ({', '.join('?' * len(bloque))})", bloque)
+                resultado.extend(cursor.fetchall())
+        conn.close()
+        return resultado
+    
+    def obtener_mantenimientos_pendientes(self, hasta, desde_exclusivo=None, aeronave_ids=None):
+        """Mantenimientos programados con fecha hasta 'hasta' (id, aeronave_id, tipo, fecha_programada)"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        consulta = """SELECT id, aeronave_id, tipo, fecha_programada FROM mantenimientos 
+                     WHERE estado = 'Programado' AND fecha_programada <= ?"""
+        parametros = [hasta]
+        if desde_exclusivo is not None:
+            consulta += " AND fecha_programada > ?"
+            parametros.append(desde_exclusivo)
+        if aeronave_ids is None:
+            cursor.execute(consulta, parametros)
+            resultado = cursor.fetchall()
+        else:
+            resultado = []
+            for bloque in en_bloques(aeronave_ids):
+                cursor.execute(f"{consulta} AND aeronave_id IN ({', '.join('?' * len(bloque))})",
+                              parametros + bloque)
+                resultado.extend(cursor.fetchall())
+        conn.close()
+        return resultado
+    
+    @reintentar_si_bloqueada
+    def sincronizar_alertas(self, aeronave_ids, vigentes):
+        """Dejar abiertas solo las alertas vigentes de esas aeronaves.
+        
+        vigentes: {(aeronave_id, tipo, mantenimiento_id): mensaje}. Las que siguen abiertas con otro
+        mensaje (más horas de atraso, fecha ya vencida) se actualizan. Devuelve la cantidad de cambios.
+        """
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        fecha_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        abiertas = {}
+        for bloque in en_bloques(aeronave_ids):
+            cursor.execute(f"""SELECT id, aeronave_id, tipo, mantenimiento_id, mensaje FROM alertas 
+                              WHERE estado != 'Resuelta' 
+                              AND aeronave_id IN ({', '.join('?' * len(bloque))})""", bloque)
+            for alerta_id, aeronave_id, tipo, mantenimiento_id, mensaje in cursor.fetchall():
+                abiertas[(aeronave_id, tipo, mantenimiento_id)] = (alerta_id, mensaje)
+        
+        nuevas = [(clave, mensaje) for clave, mensaje in vigentes.items() if clave not in abiertas]
+        resueltas = [alerta_id for clave, (alerta_id, _) in abiertas.items() if clave not in vigentes]
+        modificadas = [(vigentes[clave], alerta_id) for clave, (alerta_id, mensaje) in abiertas.items()
+                       if clave in vigentes and vigentes[clave] != mensaje]
+        
+        cursor.executemany("""INSERT INTO alertas 
+                           (aeronave_id, tipo, mantenimiento_id, estado, mensaje, fecha_creacion, fecha_actualizacion) 
+                           VALUES (?, ?, ?, 'Activa', ?, ?, ?)""",
+                           [(*clave, mensaje, fecha_actual, fecha_actual) for clave, mensaje in nuevas])
+        cursor.executemany("UPDATE alertas SET estado = 'Resuelta', fecha_actualizacion = ? WHERE id = ?",
+                           [(fecha_actual, alerta_id) for alerta_id in resueltas])
+        cursor.executemany("UPDATE alertas SET mensaje = ?, fecha_actualizacion = ? WHERE id = ?",
+                           [(mensaje, fecha_actual, alerta_id) for mensaje, alerta_id in modificadas])
+        conn.commit()
+        conn.close()
+        return len(nuevas) + len(resueltas) + len(modificadas)
+    
+    @reintentar_si_bloqueada
+    def reconocer_alerta(self, alerta_id):
+        """Marcar una alerta activa como reconocida por un operador"""
         conn = self.crear_conexion()
         cursor = conn.cursor()
-        cursor.execute("""SELECT * FROM aeronaves 
-                         WHERE (categoria = 'Liviana' AND horas_vuelo > 100) 
-                         OR (categoria = 'Mediana' AND horas_vuelo > 150) 
-                         OR (categoria = 'Pesada' AND horas_vuelo > 200)""")
+        cursor.execute("""UPDATE alertas SET estado = 'Reconocida', fecha_actualizacion = ? 
+                         WHERE id = ? AND estado = 'Activa'""",
+                      (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), alerta_id))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount > 0
+    
+    def obtener_alertas_abiertas(self):
+        """Alertas no resueltas con datos de la aeronave"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("""SELECT al.id, a.matricula, a.modelo, a.horas_vuelo, a.categoria, 
+                                al.tipo, al.mensaje, al.estado, al.fecha_creacion, 
+                                a.horas_ultimo_mantenimiento 
+                         FROM alertas al 
+                         JOIN aeronaves a ON al.aeronave_id = a.id 
+                         WHERE al.estado != 'Resuelta' 
+                         ORDER BY al.fecha_creacion DESC""")
         resultado = cursor.fetchall()
         conn.close()
         return resultado
     
+    # Métodos para configuración
+    def obtener_configuracion(self, clave, defecto=None):
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT valor FROM configuracion WHERE clave = ?", (clave,))
+        resultado = cursor.fetchone()
+        conn.close()
+        return resultado[0] if resultado else defecto
+    
+    @reintentar_si_bloqueada
+    def guardar_configuracion(self, clave, valor):
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, ?)", (clave, valor))
+        conn.commit()
+        conn.close()
+        return True
+    
     # Métodos para estadísticas
     def obtener_estadisticas_generales(self):
         """Obtener estadísticas generales del sistema"""
@@ -333,6 +1168,24 @@ class DatabaseManager:
         conn.close()
         return estadisticas
     
+    def obtener_costos_por_tipo(self):
+        """Costo total de mantenimientos por tipo [(tipo, costo)], de mayor a menor"""
+        conn = self.crear_conexion()
+        cursor = conn.cursor()
+        cursor.execute("""SELECT tipo, SUM(costo) AS total FROM mantenimientos 
+                         GROUP BY tipo HAVING total > 0 ORDER BY total DESC""")
+        resultado = cursor.fetchall()
+        conn.close()
+        return resultado
+    
     def cerrar_conexion(self):
-        """Cerrar conexión (no es necesario con context managers, pero útil para cleanup)"""
-        pass
\ No newline at end of file
+        """Cerrar la conexión reutilizada del hilo actual, si la hay"""
+        conn = getattr(self._local, 'conexion', None)
+        if conn is not None:
+            conn._conn.close()
+            self._local.conexion = None
+
+
+# Métricas de cada consulta (sin costo apreciable mientras la instrumentación esté apagada)
+instrumentar_clase(DatabaseManager, prefijo='db',
+                   incluir=lambda nombre: nombre not in ('crear_conexion', 'cerrar_conexion'))
@@ -0,0 +1,95 @@
+# deteccion_ood.py - Rechazo de imágenes que no son de ningún tipo conocido (fuera de distribución)
+import numpy as np
+
+
+# Resultado para una imagen que no se parece a ninguna clase entrenada
+DESCONOCIDO = 'Desconocido'
+
+# Puntajes calculados con la misma pasada de la red; en todos, más alto = más "conocida"
+#   max_prob:  probabilidad de la clase ganadora
+#   energia:   logsumexp de los logits (energía libre con signo cambiado)
+#   centroide: similitud coseno del embedding con el centroide de la clase ganadora
+PUNTAJES = ('max_prob', 'energia', 'centroide')
+PUNTAJE_POR_DEFECTO = 'energia'
+
+# Fracción de las imágenes de validación (todas conocidas) que debe aceptar el umbral
+TASA_ACEPTACION = 0.95
+
+
+def _normalizar(vectores):
+    return vectores / np.maximum(np.linalg.norm(vectores, axis=-1, keepdims=True), 1e-12)
+
+
+def logits(embeddings, pesos, sesgo):
+    """Logits de la capa de salida a partir del embedding (la capa es lineal antes del softmax)"""
+    return embeddings @ pesos + sesgo
+
+
+def calcular_puntajes(embeddings, probabilidades, pesos, sesgo, centroides=None):
+    """{puntaje: array (n,)} para un lote; centroide solo si hay centroides calibrados"""
+    z = logits(embeddings, pesos, sesgo)
+    maximo = z.max(axis=1)
+    puntajes = {
+        'max_prob': probabilidades.max(axis=1),
+        'energia': maximo + np.log(np.exp(z - maximo[:, None]).sum(axis=1)),
+    }
+    if centroides is not None:
+        ganadoras = probabilidades.argmax(axis=1)
+        puntajes['centroide'] = np.einsum('ij,ij->i', _normalizar(embeddings), centroides[ganadoras])
+    return puntajes
+
+
+def calibrar(embeddings_entrenamiento, etiquetas_entrenamiento, embeddings_validacion,
+             probabilidades_validacion, pesos, sesgo, puntaje=PUNTAJE_POR_DEFECTO,
+             tasa_aceptacion=TASA_ACEPTACION):
+    """Centroides por clase (entrenamiento) y umbral de cada puntaje (validación), listos para JSON"""
+    num_clases = pesos.shape[1]
+    normalizados = _normalizar(embeddings_entrenamiento)
+    centroides = np.stack([normalizados[etiquetas_entrenamiento == c].mean(axis=0)
+                           if np.any(etiquetas_entrenamiento == c) else np.zeros(normalizados.shape[1])
+                           for c in range(num_clases)])
+    centroides = _normalizar(centroides)
+    puntajes = calcular_puntajes(embeddings_validacion, probabilidades_validacion, pesos, sesgo, centroides)
+    return {
+        'puntaje': puntaje,
+        'tasa_aceptacion': tasa_aceptacion,
+        'umbrales': {nombre: float(np.quantile(valores, 1.0 - tasa_aceptacion))
+                     for nombre, valores in puntajes.items()},
+        'centroides': centroides.astype('f4').tolist(),
+    }
+
+
+def preparar(calibracion, pesos, sesgo):
+    """Calibración guardada (metadatos del modelo) con arrays listos para inferencia; None si no hay"""
+    if not calibracion:
+        return None
+    return {
+        'puntaje': calibracion.get('puntaje', PUNTAJE_POR_DEFECTO),
+        'tasa_aceptacion': calibracion.get('tasa_aceptacion', TASA_ACEPTACION),
+        'umbrales': calibracion['umbrales'],
+        'centroides': np.asarray(calibracion['centroides'], dtype='f4'),
+        'pesos': np.asarray(pesos, dtype='f4'),
+        'sesgo': np.asarray(sesgo, dtype='f4'),
+    }
+
+
+def desconocidas(embeddings, probabilidades, ood):
+    """Máscara (n,) de las imágenes que quedan bajo el umbral del puntaje elegido"""
+    puntajes = calcular_puntajes(embeddings, probabilidades, ood['pesos'], ood['sesgo'], ood['centroides'])
+    return puntajes[ood['puntaje']] < ood['umbrales'][ood['puntaje']]
+
+
+def evaluar(puntajes_conocidas, puntajes_desconocidas, tasa_aceptacion=TASA_ACEPTACION):
+    """AUROC y fracción de desconocidas aceptadas con el umbral que acepta tasa_aceptacion de las conocidas"""
+    conocidas = np.asarray(puntajes_conocidas, dtype='f8')
+    ajenas = np.asarray(puntajes_desconocidas, dtype='f8')
+    # AUROC = probabilidad de que una conocida puntúe más que una desconocida (rangos de Mann-Whitney)
+    _, inversa, cuentas = np.unique(np.concatenate([conocidas, ajenas]), return_inverse=True,
+                                    return_counts=True)
+    fin = np.cumsum(cuentas)
+    rangos = (fin - (cuentas - 1) / 2)[inversa]
+    n = len(conocidas)
+    auroc = (rangos[:n].sum() - n * (n + 1) / 2) / (n * len(ajenas))
+    umbral = np.quantile(conocidas, 1.0 - tasa_aceptacion)
+    return {'auroc': float(auroc), 'falsos_aceptados': float(np.mean(ajenas >= umbral)),
+            'umbral': float(umbral)}
@@ -0,0 +1,154 @@
+# exportacion.py - Exportación en streaming del historial de mantenimientos
+import argparse
+import csv
+import json
+import os
+
+from database import DatabaseManager, COLUMNAS_HISTORIAL
+
+
+FORMATOS = ('csv', 'jsonl', 'parquet', 'xlsx')
+
+# Límite de filas de una hoja de Excel (se continúa en hojas nuevas)
+MAX_FILAS_HOJA = 1048575
+
+
+def nombres_columnas():
+    return [nombre for _, nombre in COLUMNAS_HISTORIAL]
+
+
+class EscritorCSV:
+    def __init__(self, ruta):
+        self.archivo = open(ruta, 'w', newline='', encoding='utf-8')
+        self.escritor = csv.writer(self.archivo)
+        self.escritor.writerow(nombres_columnas())
+
+    def escribir(self, filas):
+        self.escritor.writerows(filas)
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+class EscritorJSONL:
+    def __init__(self, ruta):
+        self.archivo = open(ruta, 'w', encoding='utf-8')
+        self.columnas = nombres_columnas()
+
+    def escribir(self, filas):
+        self.archivo.writelines(
+            json.dumps(dict(zip(self.columnas, fila)), ensure_ascii=False) + "\n" for fila in filas)
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+class EscritorParquet:
+    """Cada bloque se escribe como un row group: la memoria no crece con el total"""
+    def __init__(self, ruta):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Instala pyarrow para exportar a Parquet (pip install pyarrow)")
+        self.pa = pa
+        self.columnas = nombres_columnas()
+        tipos = {'mantenimiento_id': pa.int64(), 'costo': pa.float64()}
+        self.esquema = pa.schema([(c, tipos.get(c, pa.string())) for c in self.columnas])
+        self.escritor = pq.ParquetWriter(ruta, self.esquema, compression='snappy')
+
+    def escribir(self, filas):
+        columnas = list(zip(*filas))
+        tabla = self.pa.Table.from_arrays(
+            [self.pa.array(valores, type=campo.type) for valores, campo in zip(columnas, self.esquema)],
+            schema=self.esquema)
+        self.escritor.write_table(tabla)
+
+    def cerrar(self):
+        self.escritor.close()
+
+
+class EscritorExcel:
+    """Libro en modo write_only de openpyxl: las filas se vuelcan a disco al agregarse"""
+    def __init__(self, ruta):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Instala openpyxl para exportar a Excel (pip install openpyxl)")
+        self.ruta = ruta
+        self.libro = Workbook(write_only=True)
+        self.hoja = None
+        self.filas_hoja = MAX_FILAS_HOJA
+
+    def escribir(self, filas):
+        for fila in filas:
+            if self.filas_hoja >= MAX_FILAS_HOJA:
+                self.hoja = self.libro.create_sheet(f"Historial {len(self.libro.worksheets) + 1}")
+                self.hoja.append(nombres_columnas())
+                self.filas_hoja = 0
+            self.hoja.append(fila)
+            self.filas_hoja += 1
+
+    def cerrar(self):
+        if self.hoja is None:
+            self.libro.create_sheet("Historial 1").append(nombres_columnas())
+        self.libro.save(self.ruta)
+
+
+ESCRITORES = {
+    'csv': EscritorCSV,
+    'jsonl': EscritorJSONL,
+    'parquet': EscritorParquet,
+    'xlsx': EscritorExcel,
+}
+
+
+def formato_por_extension(ruta):
+    extension = os.path.splitext(ruta)[1].lower().lstrip('.')
+    return {'json': 'jsonl', 'xls': 'xlsx'}.get(extension, extension)
+
+
+def exportar_historial(db, ruta, formato=None, desde=None, hasta=None, matricula=None,
+                       tamano_bloque=5000, progreso=None):
+    """Exportar el historial filtrado; progreso(filas_escritas, total) se llama por bloque"""
+    formato = formato or formato_por_extension(ruta)
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato no soportado: {formato} (use {', '.join(FORMATOS)})")
+
+    total = db.contar_historial_mantenimientos(desde, hasta, matricula) if progreso else None
+    escritor = ESCRITORES[formato](ruta)
+    escritas = 0
+    try:
+        for bloque in db.iterar_historial_mantenimientos(desde, hasta, matricula, tamano_bloque):
+            escritor.escribir(bloque)
+            escritas += len(bloque)
+            if progreso:
+                progreso(escritas, total)
+    finally:
+        escritor.cerrar()
+    return escritas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar historial de mantenimientos")
+    parser.add_argument('salida', help="Archivo destino (.csv, .jsonl, .parquet, .xlsx)")
+    parser.add_argument('--formato', choices=FORMATOS, default=None)
+    parser.add_argument('--desde', help="Fecha programada mínima (YYYY-MM-DD)")
+    parser.add_argument('--hasta', help="Fecha programada máxima (YYYY-MM-DD)")
+    parser.add_argument('--matricula', help="Solo la aeronave con esta matrícula")
+    parser.add_argument('--db', default='sgma_aeronaves.db')
+    parser.add_argument('--bloque', type=int, default=5000, help="Filas por fetchmany")
+    args = parser.parse_args()
+
+    def mostrar_progreso(escritas, total):
+        porcentaje = 100 * escritas / total if total else 100
+        print(f"\r📤 {escritas:,}/{total:,} filas ({porcentaje:.0f}%)", end='', flush=True)
+
+    db = DatabaseManager(args.db)
+    escritas = exportar_historial(db, args.salida, args.formato, args.desde, args.hasta,
+                                  args.matricula, args.bloque, mostrar_progreso)
+    print(f"\n✅ {escritas:,} filas exportadas a {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
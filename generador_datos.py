@@ -0,0 +1,239 @@
+# generador_datos.py - Datos sintéticos de flota a gran escala (deterministas)
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from database import DatabaseManager
+from sincronizacion import pausar_captura
+from historial import TABLAS_HISTORIAL, completar_historial
+
+
+# Las bases sintéticas viven junto a las del benchmark; la de la aplicación nunca se toca
+BASE_SINTETICA = os.path.join('bases_benchmark', 'flota_sintetica.db')
+BASE_APLICACION = 'sgma_aeronaves.db'
+
+# Escalas predefinidas para pruebas de rendimiento
+ESCALAS = {
+    'pequena': {'aeronaves': 100, 'mantenimientos': 10_000, 'vuelos_por_aeronave': 20},
+    'mediana': {'aeronaves': 1_000, 'mantenimientos': 100_000, 'vuelos_por_aeronave': 50},
+    'grande': {'aeronaves': 10_000, 'mantenimientos': 1_000_000, 'vuelos_por_aeronave': 100},
+}
+
+# (modelo, fabricante, peso MTOW, categoría)
+MODELOS = [
+    ("Cessna 172", "Cessna", 1157, "Liviana"),
+    ("Piper PA-28", "Piper", 1157, "Liviana"),
+    ("Cessna 208 Caravan", "Cessna", 3995, "Liviana"),
+    ("Beechcraft King Air 350", "Beechcraft", 6818, "Mediana"),
+    ("Embraer ERJ-145", "Embraer", 22000, "Mediana"),
+    ("ATR 72-600", "ATR", 23000, "Mediana"),
+    ("Bombardier CRJ200", "Bombardier", 24041, "Mediana"),
+    ("Airbus A320", "Airbus", 73500, "Pesada"),
+    ("Boeing 737-800", "Boeing", 79000, "Pesada"),
+    ("Boeing 767-300ER", "Boeing", 186880, "Pesada"),
+]
+
+UBICACIONES = ["El Alto", "Santa Cruz", "Cochabamba", "Tarija", "Sucre",
+               "Trinidad", "Cobija", "Potosí", "Oruro", "Riberalta"]
+ESPECIALIDADES = ["Motores", "Aviónica", "Estructural", "Sistemas Hidráulicos", "Instrumentos"]
+TIPOS_MANTENIMIENTO = ["Preventivo", "Correctivo", "Modificación"]
+
+# Índices secundarios que se reconstruyen al final en lugar de mantenerse fila por fila
+INDICES_CARGA = ["idx_mantenimientos_estado", "idx_mantenimientos_fecha", "idx_mantenimientos_aeronave",
+                 "idx_mantenimiento_piezas_mantenimiento", "idx_registro_vuelos_aeronave"]
+
+
+def _fecha(base, dias):
+    return (base + timedelta(days=dias)).strftime("%Y-%m-%d")
+
+
+def _siguiente_id(cursor, tabla):
+    """Próximo id AUTOINCREMENT de la tabla"""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,))
+    fila = cursor.fetchone()
+    return (fila[0] if fila else 0) + 1
+
+
+def _insertar_por_lotes(cursor, sql, filas, tamano_lote):
+    """executemany sobre un generador, en lotes para acotar la memoria"""
+    lote = []
+    total = 0
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano_lote:
+            cursor.executemany(sql, lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        cursor.executemany(sql, lote)
+        total += len(lote)
+    return total
+
+
+def generar(db_name=BASE_SINTETICA, aeronaves=10_000, mantenimientos=1_000_000,
+            vuelos_por_aeronave=100, piezas=500, tecnicos=200, semilla=42,
+            fecha_base=date(2024, 1, 1), dias=3 * 365, tamano_lote=50_000, reiniciar=False):
+    """Llenar la base con una flota sintética; la misma semilla produce siempre los mismos datos"""
+    if os.path.basename(db_name) == BASE_APLICACION:
+        raise ValueError(f"{db_name} es la base de la aplicación: los datos sintéticos van en otra base")
+    if os.path.dirname(db_name):
+        os.makedirs(os.path.dirname(db_name), exist_ok=True)
+    if reiniciar and os.path.exists(db_name):
+        os.remove(db_name)
+
+    # Esquema, triggers y datos iniciales los crea el gestor habitual
+    DatabaseManager(db_name)
+
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM mantenimientos")
+    if cursor.fetchone()[0]:
+        conn.close()
+        raise ValueError(f"{db_name} ya tiene mantenimientos; usa reiniciar=True para regenerarla")
+
+    rnd = random.Random(semilla)
+    inicio = time.perf_counter()
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA journal_mode = MEMORY")
+    for indice in INDICES_CARGA:
+        cursor.execute(f"DROP INDEX IF EXISTS {indice}")
+    # El historial se completa de una vez al final; DatabaseManager vuelve a crear los triggers
+    for tabla in TABLAS_HISTORIAL:
+        for operacion in ('insert', 'update', 'delete'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_historial_{tabla}_{operacion}")
+    cursor.execute("BEGIN")
+    # La carga sintética es local: no se registra para sincronizar
+    pausar_captura(cursor)
+
+    # Hangares con capacidad total holgada para toda la flota
+    cursor.execute("SELECT COALESCE(SUM(capacidad - ocupacion), 0) FROM hangares")
+    faltantes = max(aeronaves - cursor.fetchone()[0], 0)
+    nuevos_hangares = []
+    while faltantes > 0:
+        capacidad = rnd.randint(20, 40)
+        ubicacion = UBICACIONES[len(nuevos_hangares) % len(UBICACIONES)]
+        nuevos_hangares.append((f"Hangar S{len(nuevos_hangares) + 1:04d}", ubicacion, capacidad))
+        faltantes -= capacidad
+    cursor.executemany("INSERT INTO hangares (nombre, ubicacion, capacidad) VALUES (?, ?, ?)", nuevos_hangares)
+    cursor.execute("SELECT id, capacidad - ocupacion FROM hangares ORDER BY id")
+    lugares = [hangar_id for hangar_id, libres in cursor.fetchall() for _ in range(libres)]
+    rnd.shuffle(lugares)
+
+    cursor.executemany("INSERT INTO tecnicos (nombre, especialidad, licencia) VALUES (?, ?, ?)",
+                       [(f"Técnico {i:04d}", rnd.choice(ESPECIALIDADES), f"AMT-S{i:05d}")
+                        for i in range(1, tecnicos + 1)])
+    cursor.executemany("""INSERT INTO piezas (nombre, descripcion, stock, precio, proveedor, fecha_actualizacion)
+                          VALUES (?, ?, ?, ?, ?, ?)""",
+                       [(f"Pieza {i:04d}", "Pieza sintética", rnd.randint(0, 500),
+                         round(rnd.uniform(20, 5000), 2), f"Proveedor {i % 25}", _fecha(fecha_base, 0))
+                        for i in range(1, piezas + 1)])
+    cursor.execute("SELECT id FROM tecnicos")
+    ids_tecnicos = [fila[0] for fila in cursor.fetchall()]
+    cursor.execute("SELECT id FROM piezas")
+    ids_piezas = [fila[0] for fila in cursor.fetchall()]
+
+    # Aeronaves: los triggers de ocupación se mantienen activos (son pocas filas)
+    def filas_aeronaves():
+        for i in range(aeronaves):
+            modelo, fabricante, peso, categoria = rnd.choice(MODELOS)
+            horas = round(rnd.uniform(50, 30000), 1)
+            yield (f"CP-{10000 + i}", modelo, fabricante, peso, categoria, horas,
+                   lugares[i], _fecha(fecha_base, rnd.randint(0, dias)),
+                   round(max(horas - rnd.uniform(0, 250), 0), 1))
+    primer_id = _siguiente_id(cursor, 'aeronaves')
+    _insertar_por_lotes(cursor, """INSERT INTO aeronaves
+                                   (matricula, modelo, fabricante, peso_mtow, categoria, horas_vuelo,
+                                    hangar_id, fecha_registro, horas_ultimo_mantenimiento)
+                                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", filas_aeronaves(), tamano_lote)
+    ids_aeronaves = range(primer_id, primer_id + aeronaves)
+
+    # Mantenimientos: los anteriores a la fecha de corte ya están cerrados
+    corte = int(dias * 0.9)
+    cerrados = []
+    primer_mantenimiento = _siguiente_id(cursor, 'mantenimientos')
+
+    def filas_mantenimientos():
+        for mantenimiento_id in range(primer_mantenimiento, primer_mantenimiento + mantenimientos):
+            dia = rnd.randint(0, dias)
+            if dia < corte:
+                estado = "Completado" if rnd.random() < 0.92 else "Cancelado"
+                cierre = _fecha(fecha_base, dia + rnd.randint(0, 5))
+            else:
+                estado = "En Proceso" if rnd.random() < 0.05 else "Programado"
+                cierre = None
+            if estado == "Completado":
+                cerrados.append(mantenimiento_id)
+            yield (rnd.choice(ids_aeronaves), rnd.choice(TIPOS_MANTENIMIENTO), _fecha(fecha_base, dia),
+                   rnd.choice(ids_tecnicos), f"Mantenimiento sintético {mantenimiento_id}", estado,
+                   _fecha(fecha_base, max(dia - rnd.randint(1, 60), 0)),
+                   round(rnd.uniform(100, 50000), 2), cierre)
+    total_mantenimientos = _insertar_por_lotes(
+        cursor, """INSERT INTO mantenimientos
+                   (aeronave_id, tipo, fecha_programada, tecnico_id, descripcion, estado,
+                    fecha_creacion, costo, fecha_cierre)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", filas_mantenimientos(), tamano_lote)
+
+    def filas_piezas():
+        for mantenimiento_id in cerrados:
+            for _ in range(rnd.choice((0, 1, 1, 2, 3))):
+                yield (mantenimiento_id, rnd.choice(ids_piezas), rnd.randint(1, 4))
+    total_piezas = _insertar_por_lotes(
+        cursor, "INSERT INTO mantenimiento_piezas (mantenimiento_id, pieza_id, cantidad) VALUES (?, ?, ?)",
+        filas_piezas(), tamano_lote)
+
+    def filas_vuelos():
+        for aeronave_id in ids_aeronaves:
+            dia = 0
+            for _ in range(vuelos_por_aeronave):
+                dia += rnd.randint(0, max(2 * dias // max(vuelos_por_aeronave, 1), 1))
+                yield (aeronave_id, _fecha(fecha_base, min(dia, dias)), round(rnd.uniform(0.5, 12), 1))
+    total_vuelos = _insertar_por_lotes(
+        cursor, "INSERT INTO registro_vuelos (aeronave_id, fecha, horas) VALUES (?, ?, ?)",
+        filas_vuelos(), tamano_lote)
+
+    pausar_captura(cursor, False)
+    conn.commit()
+    conn.close()
+
+    # Reconstruir los índices en una sola pasada y actualizar estadísticas del planificador
+    DatabaseManager(db_name)
+    conn = sqlite3.connect(db_name)
+    completar_historial(conn.cursor())
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    print(f"✅ {db_name}: {aeronaves} aeronaves, {total_mantenimientos} mantenimientos, "
+          f"{total_piezas} piezas usadas, {total_vuelos} vuelos en {time.perf_counter() - inicio:.1f} s")
+    return {'aeronaves': aeronaves, 'mantenimientos': total_mantenimientos,
+            'mantenimiento_piezas': total_piezas, 'registro_vuelos': total_vuelos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar una flota sintética para pruebas de rendimiento")
+    parser.add_argument('--db', default=BASE_SINTETICA)
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default=None,
+                        help="Escala predefinida (reemplaza los conteos individuales)")
+    parser.add_argument('--aeronaves', type=int, default=10_000)
+    parser.add_argument('--mantenimientos', type=int, default=1_000_000)
+    parser.add_argument('--vuelos-por-aeronave', type=int, default=100)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--reiniciar', action='store_true', help="Borrar la base antes de generar")
+    args = parser.parse_args()
+
+    conteos = ESCALAS[args.escala] if args.escala else {
+        'aeronaves': args.aeronaves,
+        'mantenimientos': args.mantenimientos,
+        'vuelos_por_aeronave': args.vuelos_por_aeronave,
+    }
+    try:
+        generar(args.db, semilla=args.semilla, reiniciar=args.reiniciar, **conteos)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
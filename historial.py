@@ -0,0 +1,199 @@
+# historial.py - Historial temporal (versiones con vigencia) de aeronaves, mantenimientos y piezas
+from datetime import datetime, timedelta, timezone
+
+
+TABLAS_HISTORIAL = ('aeronaves', 'mantenimientos', 'piezas')
+
+# Versión vigente: abierta hasta esta fecha
+VIGENTE = '9999-12-31'
+
+# Fecha de alta de cada fila, usada al cargar el historial de filas anteriores a los triggers
+COLUMNA_ALTA = {
+    'aeronaves': 'fecha_registro',
+    'mantenimientos': 'fecha_creacion',
+    'piezas': 'fecha_actualizacion',
+}
+
+COLUMNAS_META = ('hist_id', 'fila_id', 'valido_desde', 'valido_hasta')
+# Vigencias en UTC, el mismo reloj que la 'fecha' de registro_cambios (sincronizacion.py)
+_FORMATO = '%Y-%m-%d %H:%M:%f'
+_AHORA = f"strftime('{_FORMATO}', 'now')"
+
+
+def _columnas(cursor, tabla):
+    return [(c[1], c[2]) for c in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()]
+
+
+def crear_historial(cursor):
+    """Crear/actualizar tablas de historial, índices y triggers (se llama desde crear_tablas)"""
+    for tabla in TABLAS_HISTORIAL:
+        historial = f"historial_{tabla}"
+        columnas = [(nombre, tipo) for nombre, tipo in _columnas(cursor, tabla) if nombre != 'id']
+        nueva = not _columnas(cursor, historial)
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {historial} (
+                hist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fila_id INTEGER NOT NULL,
+                valido_desde TEXT NOT NULL,
+                valido_hasta TEXT NOT NULL DEFAULT '{VIGENTE}'
+            )
+        ''')
+        # Columnas nuevas de la tabla original se agregan también al historial
+        existentes = {nombre for nombre, _ in _columnas(cursor, historial)}
+        for nombre, tipo in columnas:
+            if nombre not in existentes:
+                cursor.execute(f"ALTER TABLE {historial} ADD COLUMN {nombre} {tipo}")
+
+        # Lectura a una fecha y línea de tiempo: rango sobre (fila_id, valido_hasta)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{historial}_fila ON {historial} (fila_id, valido_hasta)")
+        # Toda la tabla a una fecha: rango sobre valido_hasta
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{historial}_vigencia ON {historial} (valido_hasta, valido_desde)")
+
+        nombres = [nombre for nombre, _ in columnas]
+        versionada = 'version' in nombres
+        _migrar_a_utc(cursor, tabla, historial)
+        for operacion, sql in _sql_triggers(tabla, historial, nombres, versionada).items():
+            nombre_trigger = f"trg_historial_{tabla}_{operacion}"
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (nombre_trigger,))
+            actual = cursor.fetchone()
+            if actual is None or actual[0] != sql:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {nombre_trigger}")
+                cursor.execute(sql)
+
+        # Filas anteriores al historial: una versión desde su fecha de alta
+        if nueva:
+            completar_historial(cursor, [tabla])
+
+
+def _migrar_a_utc(cursor, tabla, historial):
+    """Historiales escritos con hora local (triggers anteriores): pasar sus vigencias a UTC una vez"""
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                   (f"trg_historial_{tabla}_insert",))
+    actual = cursor.fetchone()
+    if actual is None or "'localtime'" not in actual[0]:
+        return
+    cursor.execute(f"""UPDATE {historial} SET
+                           valido_desde = strftime('{_FORMATO}', valido_desde, 'utc'),
+                           valido_hasta = CASE WHEN valido_hasta = '{VIGENTE}' THEN valido_hasta
+                                               ELSE strftime('{_FORMATO}', valido_hasta, 'utc') END""")
+
+
+def _sql_triggers(tabla, historial, columnas, versionada):
+    lista = ", ".join(columnas)
+    nuevos = ", ".join(f"NEW.{c}" for c in columnas)
+    insertar = (f"    INSERT INTO {historial} (fila_id, valido_desde, {lista})\n"
+                f"    VALUES (NEW.id, {_AHORA}, {nuevos});\n")
+    cerrar = (f"    UPDATE {historial} SET valido_hasta = {_AHORA}\n"
+              f"    WHERE fila_id = {{fila}}.id AND valido_hasta = '{VIGENTE}';\n")
+    # En tablas versionadas toda modificación termina cambiando 'version': una sola versión por cambio
+    condicion_update = "WHEN NEW.version <> OLD.version\n" if versionada else ""
+    return {
+        'insert': (f"CREATE TRIGGER trg_historial_{tabla}_insert AFTER INSERT ON {tabla}\n"
+                   f"BEGIN\n{insertar}END"),
+        'update': (f"CREATE TRIGGER trg_historial_{tabla}_update AFTER UPDATE ON {tabla}\n"
+                   f"{condicion_update}BEGIN\n{cerrar.format(fila='NEW')}{insertar}END"),
+        'delete': (f"CREATE TRIGGER trg_historial_{tabla}_delete AFTER DELETE ON {tabla}\n"
+                   f"BEGIN\n{cerrar.format(fila='OLD')}END"),
+    }
+
+
+def completar_historial(cursor, tablas=TABLAS_HISTORIAL):
+    """Abrir una versión para las filas que no tienen ninguna vigente (bases previas o cargas masivas)"""
+    for tabla in tablas:
+        historial = f"historial_{tabla}"
+        columnas = [nombre for nombre, _ in _columnas(cursor, tabla) if nombre != 'id']
+        lista = ", ".join(columnas)
+        alta = COLUMNA_ALTA.get(tabla)
+        # Las fechas de alta están en hora local
+        desde = f"COALESCE(strftime('{_FORMATO}', t.{alta}, 'utc'), {_AHORA})" if alta else _AHORA
+        cursor.execute(f"""INSERT INTO {historial} (fila_id, valido_desde, {lista})
+                           SELECT t.id, {desde}, {', '.join(f't.{c}' for c in columnas)}
+                           FROM {tabla} t
+                           WHERE NOT EXISTS (SELECT 1 FROM {historial} h
+                                             WHERE h.fila_id = t.id AND h.valido_hasta = '{VIGENTE}')""")
+
+
+def _instante(fecha):
+    """Fecha local (o datetime con zona) a instante UTC; 'YYYY-MM-DD' se toma como el final de ese día"""
+    if not isinstance(fecha, datetime):
+        if len(fecha) == 10:
+            fecha = datetime.strptime(fecha, '%Y-%m-%d') + timedelta(days=1, milliseconds=-1)
+        else:
+            fecha = datetime.fromisoformat(fecha)
+    return fecha.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+
+
+def _validar(tabla):
+    if tabla not in TABLAS_HISTORIAL:
+        raise ValueError(f"La tabla {tabla} no tiene historial")
+    return f"historial_{tabla}"
+
+
+def _como_dicts(cursor):
+    nombres = [d[0] for d in cursor.description]
+    return [dict(zip(nombres, fila)) for fila in cursor.fetchall()]
+
+
+def leer_a_fecha(db, tabla, fila_id, fecha):
+    """Cómo era la fila en esa fecha (dict) o None si no existía"""
+    historial = _validar(tabla)
+    instante = _instante(fecha)
+    conn = db.crear_conexion()
+    cursor = conn.cursor()
+    # Primera versión que seguía vigente después del instante: una búsqueda en el índice
+    cursor.execute(f"""SELECT * FROM {historial}
+                       WHERE fila_id = ? AND valido_hasta > ?
+                       ORDER BY valido_hasta LIMIT 1""", (fila_id, instante))
+    filas = _como_dicts(cursor)
+    conn.close()
+    if not filas or filas[0]['valido_desde'] > instante:
+        return None
+    return filas[0]
+
+
+def tabla_a_fecha(db, tabla, fecha, fila_ids=None):
+    """Todas las filas (o las indicadas) tal como estaban en esa fecha"""
+    historial = _validar(tabla)
+    instante = _instante(fecha)
+    conn = db.crear_conexion()
+    cursor = conn.cursor()
+    consulta = f"SELECT * FROM {historial} WHERE valido_hasta > ? AND valido_desde <= ?"
+    if fila_ids is None:
+        cursor.execute(consulta + " ORDER BY fila_id", (instante, instante))
+        resultado = _como_dicts(cursor)
+    else:
+        from database import en_bloques
+        resultado = []
+        for bloque in en_bloques(fila_ids):
+            cursor.execute(f"{consulta} AND fila_id IN ({', '.join('?' * len(bloque))})",
+                           (instante, instante, *bloque))
+            resultado.extend(_como_dicts(cursor))
+    conn.close()
+    return resultado
+
+
+def linea_tiempo(db, tabla, fila_id, desde=None, hasta=None):
+    """Versiones de una fila en orden, cada una con los campos que cambiaron respecto de la anterior"""
+    historial = _validar(tabla)
+    conn = db.crear_conexion()
+    cursor = conn.cursor()
+    consulta = f"SELECT * FROM {historial} WHERE fila_id = ?"
+    parametros = [fila_id]
+    if desde:
+        consulta += " AND valido_hasta > ?"
+        parametros.append(_instante(desde))
+    if hasta:
+        consulta += " AND valido_desde <= ?"
+        parametros.append(_instante(hasta))
+    cursor.execute(consulta + " ORDER BY valido_hasta, hist_id", parametros)
+    versiones = _como_dicts(cursor)
+    conn.close()
+
+    anterior = None
+    for version in versiones:
+        datos = {c: v for c, v in version.items() if c not in COLUMNAS_META}
+        version['cambios'] = {} if anterior is None else {
+            c: (anterior.get(c), v) for c, v in datos.items() if anterior.get(c) != v
+        }
+        anterior = datos
+    return versiones
@@ -0,0 +1,274 @@
+# indice_embeddings.py - Búsqueda de imágenes parecidas con los embeddings del clasificador
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+
+# Debajo de esta cantidad el modo aproximado no compensa: se busca exacto
+MINIMO_APROXIMADO = 4096
+
+# Parámetros del índice aproximado (listas invertidas + cuantización de producto)
+OPCIONES_IVF = {
+    'listas': 256,         # centroides gruesos (IVF)
+    'subespacios': 16,     # bloques del vector cuantizados por separado (PQ); dividen la dimensión
+    'sondeos': 16,         # listas recorridas por consulta
+    'reordenar': 10,       # candidatos por resultado que se reordenan con el vector exacto
+}
+
+
+def normalizar(vectores):
+    """Vectores float32 de norma 1: el producto interno pasa a ser la similitud coseno"""
+    vectores = np.asarray(vectores, dtype='f4')
+    normas = np.linalg.norm(vectores, axis=-1, keepdims=True)
+    return vectores / np.maximum(normas, 1e-12)
+
+
+def _mas_cercanos(datos, centroides, bloque=8192):
+    """Índice del centroide más cercano a cada fila (distancia euclídea, por bloques de filas)"""
+    normas = np.einsum('ij,ij->i', centroides, centroides)
+    resultado = np.empty(len(datos), dtype='i4')
+    for i in range(0, len(datos), bloque):
+        # |x - c|² = |x|² - 2 x·c + |c|²; |x|² no cambia el mínimo
+        distancias = normas - 2 * datos[i:i + bloque] @ centroides.T
+        resultado[i:i + bloque] = np.argmin(distancias, axis=1)
+    return resultado
+
+
+def kmeans(datos, k, iteraciones=10, semilla=0):
+    """Centroides de k-means (Lloyd) en float32"""
+    rng = np.random.default_rng(semilla)
+    k = min(k, len(datos))
+    centroides = datos[rng.choice(len(datos), k, replace=False)].copy()
+    for _ in range(iteraciones):
+        asignacion = _mas_cercanos(datos, centroides)
+        cantidades = np.bincount(asignacion, minlength=k)
+        sumas = np.stack([np.bincount(asignacion, weights=datos[:, d], minlength=k)
+                          for d in range(datos.shape[1])], axis=1)
+        vacios = cantidades == 0
+        centroides = (sumas / np.maximum(cantidades, 1)[:, None]).astype('f4')
+        # Un centroide sin puntos se vuelve a sembrar en un punto al azar
+        if vacios.any():
+            centroides[vacios] = datos[rng.choice(len(datos), int(vacios.sum()), replace=False)]
+    return centroides
+
+
+class CuantizadorIVFPQ:
+    """Índice aproximado: cada vector va a la lista de su centroide grueso y se guarda
+    comprimido en 'subespacios' bytes (cuantización de producto del residuo)"""
+    def __init__(self, listas=256, subespacios=16, sondeos=16, reordenar=10):
+        self.listas = listas
+        self.subespacios = subespacios
+        self.sondeos = sondeos
+        self.reordenar = reordenar
+        self.centroides = None
+        self.libros = None  # (subespacios, 256, dimensión / subespacios)
+        self.posiciones = []
+        self.codigos = []
+
+    def entrenar(self, vectores, muestra=20000, semilla=0):
+        dimension = vectores.shape[1]
+        if dimension % self.subespacios:
+            raise ValueError(f"La dimensión {dimension} no es múltiplo de {self.subespacios} subespacios")
+        rng = np.random.default_rng(semilla)
+        if len(vectores) > muestra:
+            vectores = vectores[rng.choice(len(vectores), muestra, replace=False)]
+        self.centroides = kmeans(vectores, self.listas, semilla=semilla)
+        residuos = vectores - self.centroides[_mas_cercanos(vectores, self.centroides)]
+        partes = residuos.reshape(len(residuos), self.subespacios, -1)
+        self.libros = np.stack([kmeans(np.ascontiguousarray(partes[:, m]), 256, semilla=semilla + m)
+                                for m in range(self.subespacios)])
+        self.posiciones = [np.empty(0, dtype='i8') for _ in range(len(self.centroides))]
+        self.codigos = [np.empty((0, self.subespacios), dtype='u1') for _ in range(len(self.centroides))]
+
+    def agregar(self, posiciones, vectores):
+        """Codificar vectores nuevos con los centroides ya entrenados"""
+        listas = _mas_cercanos(vectores, self.centroides)
+        partes = (vectores - self.centroides[listas]).reshape(len(vectores), self.subespacios, -1)
+        codigos = np.stack([_mas_cercanos(np.ascontiguousarray(partes[:, m]), self.libros[m])
+                            for m in range(self.subespacios)], axis=1).astype('u1')
+        for lista in np.unique(listas):
+            filas = listas == lista
+            self.posiciones[lista] = np.concatenate([self.posiciones[lista], posiciones[filas]])
+            self.codigos[lista] = np.concatenate([self.codigos[lista], codigos[filas]])
+
+    def candidatos(self, consulta, cantidad):
+        """Posiciones de los vectores con mayor producto interno estimado"""
+        listas = np.argsort(self.centroides @ consulta)[::-1][:self.sondeos]
+        # q·x = q·centroide + q·residuo; el segundo término sale de una tabla por subespacio
+        tabla = np.einsum('mkd,md->mk', self.libros, consulta.reshape(self.subespacios, -1))
+        columnas = np.arange(self.subespacios)
+        posiciones, puntajes = [], []
+        for lista in listas:
+            if len(self.posiciones[lista]):
+                posiciones.append(self.posiciones[lista])
+                puntajes.append(self.centroides[lista] @ consulta
+                                + tabla[columnas, self.codigos[lista]].sum(axis=1))
+        if not posiciones:
+            return np.empty(0, dtype='i8')
+        posiciones = np.concatenate(posiciones)
+        puntajes = np.concatenate(puntajes)
+        if len(posiciones) > cantidad:
+            posiciones = posiciones[np.argpartition(-puntajes, cantidad)[:cantidad]]
+        return posiciones
+
+
+class IndiceEmbeddings:
+    """Embeddings de las imágenes guardadas para una versión de modelo, con búsqueda top-k.
+
+    Exacto por defecto (un producto matriz-vector); aproximado=True usa IVF-PQ cuando hay
+    suficientes imágenes. actualizar() incorpora solo las imágenes guardadas desde la última vez.
+    """
+    def __init__(self, db, version_modelo, aproximado=False, **opciones_ivf):
+        self.db = db
+        self.version = version_modelo
+        self.aproximado = aproximado
+        self.opciones_ivf = dict(OPCIONES_IVF, **opciones_ivf)
+        self.lock = threading.Lock()
+        self.vectores = None
+        self.ids = np.empty(0, dtype='i8')
+        self.n = 0
+        self.ultimo_rowid = 0
+        self.ivf = None
+        self.entrenado_con = 0
+        self.actualizar()
+
+    def __len__(self):
+        return self.n
+
+    def actualizar(self):
+        """Leer los embeddings nuevos de la base; devuelve cuántos se agregaron"""
+        filas = self.db.obtener_embeddings(self.version, self.ultimo_rowid)
+        if not filas:
+            return 0
+        vectores = np.frombuffer(b''.join(f[2] for f in filas), dtype='f4').reshape(len(filas), -1)
+        self.agregar([f[1] for f in filas], vectores)
+        self.ultimo_rowid = filas[-1][0]
+        return len(filas)
+
+    def agregar(self, imagen_ids, vectores):
+        """Agregar vectores al final (capacidad duplicada si hace falta)"""
+        vectores = normalizar(vectores)
+        with self.lock:
+            if self.vectores is None:
+                self.vectores = np.empty((0, vectores.shape[1]), dtype='f4')
+            necesario = self.n + len(vectores)
+            if necesario > len(self.vectores):
+                capacidad = max(necesario, 2 * len(self.vectores), 1024)
+                nuevos = np.empty((capacidad, vectores.shape[1]), dtype='f4')
+                nuevos[:self.n] = self.vectores[:self.n]
+                ids = np.empty(capacidad, dtype='i8')
+                ids[:self.n] = self.ids[:self.n]
+                self.vectores, self.ids = nuevos, ids
+            posiciones = np.arange(self.n, necesario)
+            self.vectores[self.n:necesario] = vectores
+            self.ids[self.n:necesario] = imagen_ids
+            self.n = necesario
+
+            if not self.aproximado or self.n < MINIMO_APROXIMADO:
+                return
+            # Se reentrena cuando la colección se duplicó desde el último entrenamiento
+            if self.ivf is None or self.n >= 2 * self.entrenado_con:
+                self._entrenar_ivf()
+            else:
+                self.ivf.agregar(posiciones, vectores)
+
+    def _entrenar_ivf(self):
+        inicio = time.perf_counter()
+        opciones = self.opciones_ivf
+        ivf = CuantizadorIVFPQ(opciones['listas'], opciones['subespacios'], opciones['sondeos'],
+                               opciones['reordenar'])
+        datos = self.vectores[:self.n]
+        ivf.entrenar(datos)
+        ivf.agregar(np.arange(self.n), datos)
+        self.ivf = ivf
+        self.entrenado_con = self.n
+        print(f"🧭 Índice aproximado entrenado con {self.n} imágenes en {time.perf_counter() - inicio:.1f} s")
+
+    def buscar(self, vector, k=5, excluir=()):
+        """[(imagen_id, similitud coseno)] de las k imágenes más parecidas, de mayor a menor"""
+        consulta = normalizar(vector).reshape(-1)
+        with self.lock:
+            n, vectores, ids, ivf = self.n, self.vectores, self.ids, self.ivf
+        if n == 0:
+            return []
+        pedidos = k + len(excluir)
+        if ivf is not None:
+            # Los candidatos aproximados se reordenan con el producto interno exacto
+            posiciones = ivf.candidatos(consulta, pedidos * ivf.reordenar)
+            similitudes = vectores[posiciones] @ consulta
+        else:
+            posiciones = np.arange(n)
+            similitudes = vectores[:n] @ consulta
+        if len(posiciones) > pedidos:
+            mejores = np.argpartition(-similitudes, pedidos)[:pedidos]
+            posiciones, similitudes = posiciones[mejores], similitudes[mejores]
+        orden = np.argsort(-similitudes)
+        excluir = set(excluir)
+        resultado = [(int(ids[p]), float(s)) for p, s in zip(posiciones[orden], similitudes[orden])
+                     if int(ids[p]) not in excluir]
+        return resultado[:k]
+
+    def similares(self, vector, k=5, excluir=()):
+        """Filas de imagenes (con matrícula y modelo) de las k más parecidas, más su similitud"""
+        encontrados = self.buscar(vector, k, excluir)
+        filas = self.db.obtener_imagenes([i for i, _ in encontrados])
+        return [(filas[i], similitud) for i, similitud in encontrados if i in filas]
+
+
+def indexar_pendientes(db, clasificador, tamano_lote=32):
+    """Calcular con el modelo vigente los embeddings que falten (p. ej. tras cambiar de versión)"""
+    if clasificador.model is None and not clasificador.cargar_modelo():
+        return 0
+    version = clasificador.version_modelo
+    pendientes = [(i, ruta) for i, ruta in db.obtener_imagenes_sin_embedding(version) if os.path.exists(ruta)]
+    print(f"🧮 {len(pendientes)} imágenes sin embedding de la versión {version}")
+    total = 0
+    for i in range(0, len(pendientes), tamano_lote):
+        lote = pendientes[i:i + tamano_lote]
+        version, resultados = clasificador.predecir_con_embeddings([ruta for _, ruta in lote])
+        db.guardar_imagenes([(None, ruta, tipo, confianza, embedding)
+                             for (_, ruta), (tipo, confianza, embedding) in zip(lote, resultados)
+                             if embedding is not None], version)
+        total += sum(embedding is not None for _, _, embedding in resultados)
+    print(f"✅ {total} embeddings calculados")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de imágenes parecidas")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('indexar', help="Calcular los embeddings que falten con el modelo vigente")
+    p_buscar = subparsers.add_parser('buscar', help="Imágenes más parecidas a una foto")
+    p_buscar.add_argument('imagen')
+    p_buscar.add_argument('-k', type=int, default=5)
+    p_buscar.add_argument('--aproximado', action='store_true')
+    args = parser.parse_args()
+
+    from ai_classifier import ClasificadorAeronaves
+    from database import DatabaseManager
+
+    db = DatabaseManager()
+    clasificador = ClasificadorAeronaves(usar_cache=False)
+    if args.comando == 'indexar':
+        indexar_pendientes(db, clasificador)
+        return
+
+    if not clasificador.cargar_modelo():
+        return
+    version, [(tipo, confianza, embedding)] = clasificador.predecir_con_embeddings([args.imagen])
+    if embedding is None:
+        return
+    indice = IndiceEmbeddings(db, version, aproximado=args.aproximado)
+    inicio = time.perf_counter()
+    similares = indice.similares(embedding, args.k)
+    print(f"🎯 {tipo} ({confianza:.1f}%); {len(indice)} imágenes indexadas, "
+          f"búsqueda en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    for fila, similitud in similares:
+        print(f"   {similitud:.3f}  {fila[6] or '-':<10} {fila[2] or '':<14} {fila[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+# ingesta_carpeta.py - Clasificación automática de imágenes dejadas en una carpeta
+import argparse
+import collections
+import ctypes
+import ctypes.util
+import os
+import queue
+import re
+import select
+import shutil
+import struct
+import threading
+import time
+
+from database import DatabaseManager
+from preprocesamiento import es_imagen
+
+# Matrícula en el nombre del archivo, p. ej. "CP-2501_rampa.jpg"
+PATRON_MATRICULA = re.compile(r'([A-Z]{1,2}-[A-Z0-9]{3,5})', re.IGNORECASE)
+
+# Constantes de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+
+class VigilanteInotify:
+    """Detecta archivos terminados de escribir usando inotify (solo Linux)"""
+    def __init__(self, carpeta):
+        nombre_libc = ctypes.util.find_library('c')
+        if not nombre_libc:
+            raise OSError("libc no disponible")
+        self.libc = ctypes.CDLL(nombre_libc, use_errno=True)
+        self.carpeta = carpeta
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(carpeta), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch falló")
+
+    def esperar_nuevos(self, timeout):
+        """Devolver rutas de imágenes nuevas, esperando como máximo timeout segundos"""
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return []
+        try:
+            datos = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        rutas = []
+        desplazamiento = 0
+        while desplazamiento < len(datos):
+            _, _, _, longitud = struct.unpack_from('iIII', datos, desplazamiento)
+            inicio = desplazamiento + 16
+            nombre = datos[inicio:inicio + longitud].rstrip(b'\0').decode(errors='replace')
+            desplazamiento = inicio + longitud
+            if es_imagen(nombre):
+                rutas.append(os.path.join(self.carpeta, nombre))
+        return rutas
+
+    def cerrar(self):
+        os.close(self.fd)
+
+
+class VigilanteSondeo:
+    """Alternativa portable: sondea la carpeta y entrega archivos de tamaño estable"""
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        self.vistos = set()
+        # Tamaño observado en el sondeo anterior, para no tomar archivos a medio copiar
+        self.tamanos = {}
+
+    def esperar_nuevos(self, timeout):
+        time.sleep(timeout)
+        rutas = []
+        presentes = set()
+        with os.scandir(self.carpeta) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file() or not es_imagen(entrada.name):
+                    continue
+                presentes.add(entrada.path)
+                if entrada.path in self.vistos:
+                    continue
+                try:
+                    tamano = entrada.stat().st_size
+                except FileNotFoundError:
+                    continue
+                if self.tamanos.get(entrada.path) == tamano:
+                    self.vistos.add(entrada.path)
+                    rutas.append(entrada.path)
+                self.tamanos[entrada.path] = tamano
+        # Olvidar archivos que ya fueron movidos
+        self.vistos &= presentes
+        self.tamanos = {r: t for r, t in self.tamanos.items() if r in presentes}
+        return rutas
+
+    def cerrar(self):
+        pass
+
+
+class MedidorRendimiento:
+    """Imágenes por segundo en una ventana deslizante"""
+    def __init__(self, ventana_segundos=60):
+        self.ventana = ventana_segundos
+        self.eventos = collections.deque()
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def registrar(self, cantidad):
+        ahora = time.monotonic()
+        with self.lock:
+            self.eventos.append((ahora, cantidad))
+            self.total += cantidad
+            self._purgar(ahora)
+
+    def por_segundo(self):
+        ahora = time.monotonic()
+        with self.lock:
+            self._purgar(ahora)
+            if not self.eventos:
+                return 0.0
+            transcurrido = max(ahora - self.eventos[0][0], 1.0)
+            return sum(c for _, c in self.eventos) / transcurrido
+
+    def _purgar(self, ahora):
+        while self.eventos and ahora - self.eventos[0][0] > self.ventana:
+            self.eventos.popleft()
+
+
+class ServicioIngesta:
+    """Vigila una carpeta, clasifica por lotes y archiva las imágenes procesadas"""
+    def __init__(self, carpeta, db=None, clasificador=None, tamano_lote=16,
+                 capacidad_cola=256, espera_lote=0.5, intervalo_sondeo=1.0):
+        self.carpeta = os.path.abspath(carpeta)
+        self.carpeta_procesadas = os.path.join(self.carpeta, 'procesadas')
+        self.carpeta_errores = os.path.join(self.carpeta, 'errores')
+        for ruta in (self.carpeta, self.carpeta_procesadas, self.carpeta_errores):
+            os.makedirs(ruta, exist_ok=True)
+
+        self.db = db or DatabaseManager()
+        if clasificador is None:
+            from ai_classifier import ClasificadorAeronaves
+            clasificador = ClasificadorAeronaves()
+        self.clasificador = clasificador
+
+        self.tamano_lote = tamano_lote
+        self.espera_lote = espera_lote
+        self.intervalo_sondeo = intervalo_sondeo
+        # Cola acotada: si el clasificador se atrasa, el detector se bloquea (back-pressure)
+        self.cola = queue.Queue(maxsize=capacidad_cola)
+        self.encolados = set()
+        self.rendimiento = MedidorRendimiento()
+        self.errores = 0
+        self.detenido = threading.Event()
+        self.hilos = []
+
+    def crear_vigilante(self):
+        """Usar inotify si está disponible, si no sondeo periódico"""
+        try:
+            vigilante = VigilanteInotify(self.carpeta)
+            print("👁️ Vigilando carpeta con inotify")
+        except (OSError, AttributeError):
+            vigilante = VigilanteSondeo(self.carpeta)
+            print("👁️ Vigilando carpeta por sondeo")
+        return vigilante
+
+    def iniciar(self):
+        """Arrancar los hilos de detección y clasificación"""
+        if self.clasificador.model is None and not self.clasificador.cargar_modelo():
+            raise RuntimeError("No hay modelo entrenado para clasificar")
+        # Los modelos promovidos durante el turno se toman sin detener la ingesta
+        self.clasificador.iniciar_recarga_automatica()
+
+        self.detenido.clear()
+        self.hilos = [
+            threading.Thread(target=self._detectar, daemon=True),
+            threading.Thread(target=self._clasificar, daemon=True),
+        ]
+        for hilo in self.hilos:
+            hilo.start()
+
+    def detener(self):
+        self.detenido.set()
+        self.clasificador.detener_recarga_automatica()
+        for hilo in self.hilos:
+            hilo.join()
+
+    def estadisticas(self):
+        return {
+            'en_cola': self.cola.qsize(),
+            'procesadas': self.rendimiento.total,
+            'errores': self.errores,
+            'imagenes_por_segundo': self.rendimiento.por_segundo(),
+        }
+
+    def _encolar(self, ruta):
+        """Encolar una ruta bloqueando mientras la cola esté llena"""
+        if ruta in self.encolados:
+            return
+        while not self.detenido.is_set():
+            try:
+                self.cola.put(ruta, timeout=0.5)
+                self.encolados.add(ruta)
+                return
+            except queue.Full:
+                continue
+
+    def _detectar(self):
+        vigilante = self.crear_vigilante()
+        try:
+            # Las imágenes que ya estaban en la carpeta también se procesan
+            with os.scandir(self.carpeta) as entradas:
+                existentes = sorted(e.path for e in entradas if e.is_file() and es_imagen(e.name))
+            for ruta in existentes:
+                self._encolar(ruta)
+
+            while not self.detenido.is_set():
+                for ruta in vigilante.esperar_nuevos(self.intervalo_sondeo):
+                    self._encolar(ruta)
+        finally:
+            vigilante.cerrar()
+
+    def _tomar_lote(self):
+        """Esperar la primera imagen y juntar las que lleguen durante espera_lote"""
+        try:
+            lote = [self.cola.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.espera_lote
+        while len(lote) < self.tamano_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _clasificar(self):
+        while not self.detenido.is_set() or not self.cola.empty():
+            lote = self._tomar_lote()
+            if not lote:
+                continue
+            try:
+                self.procesar_lote(lote)
+            except Exception as e:
+                print(f"❌ Error procesando lote: {str(e)}")
+                self.errores += len(lote)
+                for ruta in lote:
+                    self._archivar(ruta, self.carpeta_errores)
+            finally:
+                self.encolados.difference_update(lote)
+
+    def procesar_lote(self, rutas):
+        """Clasificar un lote, registrar los resultados y mover los archivos"""
+        # Una sola pasada: clase y embedding para el índice de imágenes parecidas
+        version, resultados = self.clasificador.predecir_con_embeddings(rutas)
+
+        matriculas = {}
+        for ruta in rutas:
+            coincidencia = PATRON_MATRICULA.search(os.path.basename(ruta))
+            if coincidencia:
+                matriculas[ruta] = coincidencia.group(1).upper()
+        ids_aeronaves = self.db.obtener_ids_por_matricula(matriculas.values())
+
+        registros = []
+        imagenes = []
+        for ruta, (tipo, confianza, embedding) in zip(rutas, resultados):
+            if tipo is None:
+                self.errores += 1
+                self._archivar(ruta, self.carpeta_errores)
+                continue
+            destino = self._archivar(ruta, self.carpeta_procesadas)
+            aeronave_id = ids_aeronaves.get(matriculas.get(ruta))
+            registros.append((aeronave_id, destino, tipo, float(confianza)))
+            imagenes.append((aeronave_id, destino, tipo, float(confianza), embedding.tobytes()))
+
+        if registros:
+            self.db.insertar_clasificaciones(registros)
+            self.db.guardar_imagenes(imagenes, version)
+        self.rendimiento.registrar(len(registros))
+
+    def _archivar(self, ruta, carpeta_destino):
+        """Mover el archivo a la carpeta destino sin pisar otro con el mismo nombre"""
+        nombre = os.path.basename(ruta)
+        destino = os.path.join(carpeta_destino, nombre)
+        if os.path.exists(destino):
+            base, extension = os.path.splitext(nombre)
+            destino = os.path.join(carpeta_destino, f"{base}_{time.time_ns()}{extension}")
+        try:
+            shutil.move(ruta, destino)
+        except OSError as e:
+            print(f"⚠️ No se pudo mover {ruta}: {str(e)}")
+            return ruta
+        return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clasificación automática de una carpeta de entrada")
+    parser.add_argument('carpeta', help="Carpeta donde se dejan las imágenes nuevas")
+    parser.add_argument('--lote', type=int, default=16, help="Imágenes por llamada al modelo")
+    parser.add_argument('--cola', type=int, default=256, help="Capacidad máxima de la cola")
+    args = parser.parse_args()
+
+    servicio = ServicioIngesta(args.carpeta, tamano_lote=args.lote, capacidad_cola=args.cola)
+    servicio.iniciar()
+    print(f"📥 Esperando imágenes en {servicio.carpeta} (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(10)
+            e = servicio.estadisticas()
+            print(f"📊 Procesadas: {e['procesadas']} | En cola: {e['en_cola']} | "
+                  f"Errores: {e['errores']} | {e['imagenes_por_segundo']:.2f} img/s")
+    except KeyboardInterrupt:
+        print("⏹️ Deteniendo servicio...")
+        servicio.detener()
+
+
+if __name__ == "__main__":
+    main()
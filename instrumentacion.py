@@ -0,0 +1,202 @@
+# instrumentacion.py - Métricas de rendimiento de base de datos, ventanas e IA
+import bisect
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Desactivado por defecto: cada llamada instrumentada solo comprueba esta bandera
+ACTIVO = os.environ.get('SGMA_INSTRUMENTACION') == '1'
+
+# Límites superiores (ms) de los cubos del histograma de latencias
+LIMITES_MS = [0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf')]
+
+_metricas = {}
+_lock = threading.Lock()
+_perfil_armado = False
+_perfilando = threading.local()
+
+
+class Metrica:
+    __slots__ = ('llamadas', 'errores', 'total', 'maximo', 'histograma', 'filas')
+
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.histograma = [0] * len(LIMITES_MS)
+        self.filas = 0
+
+    def percentil(self, p):
+        """Percentil aproximado: límite superior del cubo que lo contiene"""
+        objetivo = p / 100 * self.llamadas
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES_MS, self.histograma):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+
+def activar(estado=True):
+    global ACTIVO
+    ACTIVO = estado
+
+
+def reiniciar():
+    with _lock:
+        _metricas.clear()
+
+
+def registrar(nombre, segundos, filas=None, error=False):
+    ms = segundos * 1000
+    with _lock:
+        metrica = _metricas.get(nombre)
+        if metrica is None:
+            metrica = _metricas[nombre] = Metrica()
+        metrica.llamadas += 1
+        metrica.errores += error
+        metrica.total += ms
+        metrica.maximo = max(metrica.maximo, ms)
+        metrica.histograma[bisect.bisect_left(LIMITES_MS, ms)] += 1
+        if filas is not None:
+            metrica.filas += filas
+
+
+def medir(nombre=None):
+    """Decorador: cuenta llamadas, latencia y filas devueltas (si el resultado es una lista)"""
+    def decorador(func):
+        etiqueta = nombre or func.__qualname__
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            if not ACTIVO:
+                return func(*args, **kwargs)
+            if _perfil_armado and not getattr(_perfilando, 'activo', False):
+                with capturar_perfil(etiqueta):
+                    return _ejecutar_medido(etiqueta, func, args, kwargs)
+            return _ejecutar_medido(etiqueta, func, args, kwargs)
+        return envoltura
+    return decorador
+
+
+def _ejecutar_medido(etiqueta, func, args, kwargs):
+    inicio = time.perf_counter()
+    try:
+        resultado = func(*args, **kwargs)
+    except BaseException:
+        registrar(etiqueta, time.perf_counter() - inicio, error=True)
+        raise
+    filas = len(resultado) if isinstance(resultado, list) else None
+    registrar(etiqueta, time.perf_counter() - inicio, filas)
+    return resultado
+
+
+@contextmanager
+def medicion(nombre):
+    """Medir un bloque; se pueden informar filas con: with medicion('x') as m: m['filas'] = n"""
+    if not ACTIVO:
+        yield {}
+        return
+    datos = {}
+    inicio = time.perf_counter()
+    error = False
+    try:
+        yield datos
+    except BaseException:
+        error = True
+        raise
+    finally:
+        registrar(nombre, time.perf_counter() - inicio, datos.get('filas'), error)
+
+
+def instrumentar_clase(cls, prefijo=None, incluir=None):
+    """Aplicar medir() a los métodos públicos de una clase (los generadores se omiten)"""
+    prefijo = prefijo or cls.__name__
+    for nombre, atributo in list(vars(cls).items()):
+        if nombre.startswith('_') or not inspect.isfunction(atributo):
+            continue
+        if inspect.isgeneratorfunction(atributo):
+            continue
+        if incluir and not incluir(nombre):
+            continue
+        setattr(cls, nombre, medir(f"{prefijo}.{nombre}")(atributo))
+    return cls
+
+
+def resumen():
+    """Métricas actuales como diccionario serializable"""
+    with _lock:
+        return {
+            nombre: {
+                'llamadas': m.llamadas,
+                'errores': m.errores,
+                'total_ms': round(m.total, 3),
+                'media_ms': round(m.total / m.llamadas, 3) if m.llamadas else 0,
+                'p50_ms': m.percentil(50),
+                'p95_ms': m.percentil(95),
+                'max_ms': round(m.maximo, 3),
+                'filas': m.filas,
+                'histograma': dict(zip([str(l) for l in LIMITES_MS], m.histograma)),
+            }
+            for nombre, m in sorted(_metricas.items())
+        }
+
+
+def volcar_json(ruta):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'fecha': datetime.now().isoformat(timespec='seconds'), 'metricas': resumen()},
+                  f, indent=2, ensure_ascii=False)
+
+
+def armar_perfil():
+    """Perfilar (cProfile + tracemalloc) la próxima acción instrumentada"""
+    global _perfil_armado
+    _perfil_armado = True
+    activar(True)
+
+
+@contextmanager
+def capturar_perfil(nombre, carpeta="perfiles", top=30):
+    """Perfilar un bloque y guardar .prof más un resumen de tiempo y memoria en texto"""
+    global _perfil_armado
+    _perfil_armado = False
+    _perfilando.activo = True
+    os.makedirs(carpeta, exist_ok=True)
+    base = os.path.join(carpeta, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{nombre}")
+
+    memoria_previa = tracemalloc.is_tracing()
+    if not memoria_previa:
+        tracemalloc.start()
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield base
+    finally:
+        perfil.disable()
+        instantanea = tracemalloc.take_snapshot()
+        _, pico = tracemalloc.get_traced_memory()
+        if not memoria_previa:
+            tracemalloc.stop()
+        _perfilando.activo = False
+
+        perfil.dump_stats(base + '.prof')
+        texto = io.StringIO()
+        pstats.Stats(perfil, stream=texto).sort_stats('cumulative').print_stats(top)
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(f"Perfil de {nombre}\nPico de memoria: {pico / 1024 / 1024:.2f} MB\n\n")
+            f.write(texto.getvalue())
+            f.write("\nAsignaciones principales:\n")
+            for estadistica in instantanea.statistics('lineno')[:top]:
+                f.write(f"{estadistica}\n")
+        print(f"📈 Perfil guardado en {base}.txt")
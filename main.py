@@ -1,22 +1,49 @@
 # main.py - Sistema de Gestión de Mantenimiento de Aeronaves
+import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import DatabaseManager
+from database import DatabaseManager, ConflictoVersion
 from ventana_aeronaves import VentanaRegistroAeronave, VentanaListaAeronaves
 from ventana_mantenimiento import VentanaProgramarMantenimiento, VentanaHistorialTecnico, VentanaAlertas
 from ventana_gestion import VentanaGestionHangares, VentanaGestionTecnicos, VentanaInventarioPiezas
-from ventana_reportes import VentanaEstadisticas, VentanaReporteCostos
+from ventana_reportes import VentanaEstadisticas, VentanaReporteCostos, VentanaExportarHistorial
 from ai_classifier import VentanaIAAeronaves
+from ventana_diagnostico import VentanaDiagnostico
+from instrumentacion import instrumentar_clase
+from motor_alertas import MotorAlertas
+from asignacion_hangares import IndiceOcupacion
+from modelo_flota import ModeloFlota
+from catalogo_tipos import catalogo
+import motor_reglas
+
+# Diferencia de MTOW con el catálogo a partir de la cual se pide confirmación (fracción)
+TOLERANCIA_PESO_CATALOGO = 0.01
 
 class SGMA(tk.Tk):
-    def __init__(self):
+    def __init__(self, db_name="sgma_aeronaves.db"):
         super().__init__()
         self.title("Sistema de Gestión de Mantenimiento de Aeronaves - Bolivia")
         self.geometry('1000x700')
         self.configure(bg='#2c3e50')
         
         # Inicializar base de datos
-        self.db = DatabaseManager()
+        self.db = DatabaseManager(db_name)
+        
+        # Categorías e intervalos de mantenimiento: una sola definición para SQL, NumPy y ventanas
+        self.reglas = motor_reglas.reglas(self.db)
+        
+        # Alertas: se reevalúan con cada cambio y al acercarse las fechas programadas
+        self.motor_alertas = MotorAlertas(self.db, reglas=self.reglas)
+        self.revisar_fechas_alertas()
+        
+        # Ocupación de hangares en memoria para sugerir ubicación y mostrar utilización
+        self.indice_hangares = IndiceOcupacion(self.db)
+        
+        # Flota en memoria para listas y estadísticas (se pone al día solo con lo que cambió)
+        self.flota = ModeloFlota(self.db, self.reglas)
+        
+        # Tipos de aeronave conocidos: datos sugeridos al registrar y categoría por tipo
+        self.catalogo = catalogo(self.db)
         
         # Crear interfaz
         self.crear_menu()
@@ -55,11 +82,16 @@ class SGMA(tk.Tk):
         self.barra_menu.add_cascade(label='Reportes', menu=menu_reportes)
         menu_reportes.add_command(label='Estadísticas Generales', command=self.abrir_estadisticas)
         menu_reportes.add_command(label='Reporte de Costos', command=self.abrir_reporte_costos)
+        menu_reportes.add_command(label='Exportar Historial', command=self.abrir_exportar_historial)
         
         menu_ia = tk.Menu(self.barra_menu, tearoff=0)
         self.barra_menu.add_cascade(label='🤖 IA', menu=menu_ia)
         menu_ia.add_command(label='Clasificador de Aeronaves', command=self.abrir_ia_aeronaves)
         
+        menu_herramientas = tk.Menu(self.barra_menu, tearoff=0)
+        self.barra_menu.add_cascade(label='Herramientas', menu=menu_herramientas)
+        menu_herramientas.add_command(label='Diagnóstico de Rendimiento', command=self.abrir_diagnostico)
+        
         self.config(menu=self.barra_menu)
 
     def crear_interfaz_principal(self):
@@ -90,8 +122,8 @@ class SGMA(tk.Tk):
         stats_frame.pack(pady=10)
         
         # Obtener estadísticas de la base de datos
-        total_aeronaves = len(self.db.obtener_aeronaves())
-        mantenimientos_activos = len([m for m in self.db.obtener_mantenimientos() if m[6] == 'En Proceso'])
+        total_aeronaves = self.flota.cantidad_aeronaves()
+        mantenimientos_activos = self.flota.contar_mantenimientos('En Proceso')
         total_tecnicos = len(self.db.obtener_tecnicos())
         total_hangares = len(self.db.obtener_hangares())
         
@@ -119,6 +151,20 @@ class SGMA(tk.Tk):
         tk.Button(botones_frame, text="Clasificar Aeronave", command=self.abrir_ia_aeronaves,
                  bg='#9b59b6', fg='white', font=('Arial', 12), width=18, height=2).grid(row=0, column=3, padx=10, pady=5)    
 
+    def report_callback_exception(self, tipo, valor, traza):
+        """Mostrar los conflictos entre usuarios como aviso en lugar de una traza"""
+        if isinstance(valor, ConflictoVersion):
+            messagebox.showwarning("Conflicto", f"{str(valor)}.\nVuelve a cargar los datos e intenta de nuevo.")
+        elif isinstance(valor, sqlite3.OperationalError) and 'locked' in str(valor):
+            messagebox.showwarning("Base ocupada", "Otro usuario está guardando cambios. Intenta de nuevo.")
+        else:
+            super().report_callback_exception(tipo, valor, traza)
+    
+    def revisar_fechas_alertas(self):
+        """Revisar cada hora los mantenimientos que entran en la ventana de aviso"""
+        self.motor_alertas.revisar_fechas()
+        self.after(60 * 60 * 1000, self.revisar_fechas_alertas)
+    
     def crear_stat_box(self, parent, titulo, valor, color, row, col):
         """Crear una caja de estadística"""
         frame = tk.Frame(parent, bg=color, width=150, height=80)
@@ -130,32 +176,33 @@ class SGMA(tk.Tk):
         tk.Label(frame, text=titulo, font=('Arial', 10), 
                 fg='white', bg=color).pack()
     
-    def categorizar_aeronave(self, peso_mtow):
-        """Categorizar aeronave según su peso MTOW"""
-        if peso_mtow <= 5700:
-            return "Liviana"
-        elif peso_mtow <= 27000:
-            return "Mediana"
-        else:
-            return "Pesada"
+    def categorizar_aeronave(self, peso_mtow, modelo=None):
+        """Categorizar aeronave por el peso MTOW ingresado (salvo categoría fijada para el tipo en el catálogo)"""
+        return self.reglas.categoria(peso_mtow, modelo)
+    
+    def discrepancia_catalogo(self, peso_mtow, modelo):
+        """Aviso si el peso ingresado contradice al catálogo del modelo (None si coincide o no está)"""
+        tipo = self.catalogo.buscar(modelo)
+        if not tipo:
+            return None
+        avisos = []
+        if abs(peso_mtow - tipo.peso_mtow) > TOLERANCIA_PESO_CATALOGO * tipo.peso_mtow:
+            avisos.append(f"El catálogo indica {tipo.peso_mtow:,.0f} kg de MTOW para {tipo.modelo}; "
+                          f"se ingresó {peso_mtow:,.0f} kg.")
+        propia = self.reglas.categoria_propia(modelo)
+        por_peso = self.reglas.categoria_por_peso(peso_mtow)
+        if propia and propia != por_peso:
+            avisos.append(f"Se usará la categoría fijada para el tipo ({propia}), "
+                          f"no la que corresponde al peso ({por_peso}).")
+        elif avisos:
+            avisos.append(f"Se usará la categoría que corresponde al peso ingresado ({por_peso}).")
+        return "\n".join(avisos) or None
     
     def mostrar_categorias(self):
         """Mostrar información sobre categorías de aeronaves"""
-        info = """
-        CATEGORÍAS DE AERONAVES POR PESO (MTOW - Maximum Take-Off Weight):
-        
-        • LIVIANA: Hasta 5,700 kg
-          - Aviones pequeños, vuelos cortos
-          - Mantenimiento cada 100 horas de vuelo
-          
-        • MEDIANA: 5,701 kg - 27,000 kg  
-          - Aviones comerciales regionales
-          - Mantenimiento cada 150 horas de vuelo
-          
-        • PESADA: Más de 27,000 kg
-          - Aviones comerciales grandes
-          - Mantenimiento cada 200 horas de vuelo
-        """
+        info = ("CATEGORÍAS DE AERONAVES POR PESO (MTOW - Maximum Take-Off Weight):\n\n"
+                + self.reglas.descripcion()
+                + "\n\nLos tipos del catálogo pueden tener un intervalo propio.")
         messagebox.showinfo("Categorías de Aeronaves", info)
     
     # Métodos para abrir ventanas
@@ -188,9 +235,19 @@ class SGMA(tk.Tk):
     
     def abrir_reporte_costos(self):
         VentanaReporteCostos(self)
+    
+    def abrir_exportar_historial(self):
+        VentanaExportarHistorial(self)
         
     def abrir_ia_aeronaves(self):
         VentanaIAAeronaves(self)
+    
+    def abrir_diagnostico(self):
+        VentanaDiagnostico(self)
+
+# Tiempo de construcción de cada ventana y del dashboard
+instrumentar_clase(SGMA, prefijo='ventana',
+                   incluir=lambda nombre: nombre.startswith('abrir_') or nombre == 'crear_interfaz_principal')
 
 if __name__ == "__main__":
     app = SGMA()
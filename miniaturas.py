@@ -0,0 +1,344 @@
+# miniaturas.py - Caché en disco de miniaturas y vista previa asincrónica para la GUI
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import tkinter as tk
+
+from PIL import Image, ImageOps
+
+from preprocesamiento import es_imagen
+
+
+DIRECTORIO_MINIATURAS = 'miniaturas'
+TAMANO_MINIATURA = (160, 120)
+TAMANO_VISTA_PREVIA = (320, 240)
+# Tope del directorio de miniaturas; al superarlo se borran las menos usadas
+MAX_MB_MINIATURAS = 200
+
+
+class CacheMiniaturas:
+    """Miniaturas PNG en disco, indexadas por ruta + fecha de modificación + tamaño del archivo.
+
+    Si la foto cambia, cambia la clave y la miniatura vieja queda huérfana hasta el próximo recorte.
+    PNG porque Tk lo abre directamente, sin pasar por ImageTk.
+    """
+    def __init__(self, directorio=DIRECTORIO_MINIATURAS, max_mb=MAX_MB_MINIATURAS):
+        self.directorio = directorio
+        self.max_mb = max_mb
+        os.makedirs(directorio, exist_ok=True)
+
+    def ruta_miniatura(self, ruta, tamano):
+        """Ruta en caché de la miniatura (no verifica que exista); lanza OSError si la foto no existe"""
+        estado = os.stat(ruta)
+        clave = f"{os.path.abspath(ruta)}|{estado.st_mtime_ns}|{estado.st_size}|{tamano[0]}x{tamano[1]}"
+        nombre = hashlib.blake2b(clave.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directorio, nombre[:2], nombre + '.png')
+
+    def en_cache(self, ruta, tamano=TAMANO_MINIATURA):
+        """Ruta de la miniatura si ya está generada, o None (no decodifica nada)"""
+        try:
+            destino = self.ruta_miniatura(ruta, tamano)
+        except OSError:
+            return None
+        return destino if os.path.exists(destino) else None
+
+    def obtener(self, ruta, tamano=TAMANO_MINIATURA):
+        """Ruta de la miniatura, generándola si hace falta (llamar fuera del hilo de Tk)"""
+        destino = self.ruta_miniatura(ruta, tamano)
+        if os.path.exists(destino):
+            os.utime(destino)  # La fecha de acceso manda en el recorte
+            return destino
+        with Image.open(ruta) as img:
+            # draft decodifica el JPEG a 1/2, 1/4 u 1/8 de escala: nunca la foto completa
+            img.draft('RGB', (tamano[0] * 2, tamano[1] * 2))
+            img = ImageOps.exif_transpose(img).convert('RGB')
+            img.thumbnail(tamano, Image.BILINEAR)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            # Escribir aparte y renombrar: otro proceso nunca ve una miniatura a medias
+            temporal = f"{destino}.{threading.get_ident()}.tmp"
+            img.save(temporal, 'PNG', compress_level=1)
+        os.replace(temporal, destino)
+        return destino
+
+    def recortar(self):
+        """Borrar las miniaturas menos usadas hasta quedar en el 80% de max_mb; devuelve cuántas"""
+        archivos = []
+        for carpeta, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                ruta = os.path.join(carpeta, nombre)
+                try:
+                    estado = os.stat(ruta)
+                except OSError:
+                    continue
+                archivos.append((estado.st_mtime, estado.st_size, ruta))
+        total = sum(tamano for _, tamano, _ in archivos)
+        limite = self.max_mb * 1024 * 1024
+        if total <= limite:
+            return 0
+        borradas = 0
+        for _, tamano, ruta in sorted(archivos):
+            if total <= limite * 0.8:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            total -= tamano
+            borradas += 1
+        return borradas
+
+
+class GeneradorMiniaturas:
+    """Hilo que genera miniaturas en orden LIFO: lo último pedido (lo que se ve ahora) va primero.
+
+    El callback se llama desde el hilo de trabajo con (ruta, ruta_miniatura o None);
+    quien toque widgets debe pasarlo al hilo de Tk con after(). Cada ventana pide con su
+    propio consumidor (nuevo_consumidor) y solo cancela lo suyo.
+    """
+    def __init__(self, cache=None):
+        self.cache = cache or CacheMiniaturas()
+        self.pedidos = queue.LifoQueue()
+        self._consumidores = itertools.count(1)
+        # Generación vigente de cada consumidor: los pedidos de generaciones anteriores se descartan
+        self.generaciones = {}
+        self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self.hilo.start()
+
+    def nuevo_consumidor(self):
+        consumidor = next(self._consumidores)
+        self.generaciones[consumidor] = 0
+        return consumidor
+
+    def pedir(self, consumidor, ruta, tamano, callback):
+        self.pedidos.put((consumidor, self.generaciones.get(consumidor), ruta, tamano, callback))
+
+    def cancelar_pendientes(self, consumidor):
+        """Descartar lo pedido hasta ahora por un consumidor (p. ej. al cambiar de carpeta)"""
+        self.generaciones[consumidor] = self.generaciones.get(consumidor, 0) + 1
+
+    def liberar(self, consumidor):
+        """El consumidor se cerró: sus pedidos pendientes se descartan"""
+        self.generaciones.pop(consumidor, None)
+
+    def detener(self):
+        self.pedidos.put(None)
+
+    def _trabajar(self):
+        try:
+            self.cache.recortar()
+        except OSError as e:
+            print(f"⚠️ No se pudo recortar la caché de miniaturas: {str(e)}")
+        while True:
+            pedido = self.pedidos.get()
+            if pedido is None:
+                return
+            consumidor, generacion, ruta, tamano, callback = pedido
+            if generacion is None or generacion != self.generaciones.get(consumidor):
+                continue
+            try:
+                miniatura = self.cache.obtener(ruta, tamano)
+            except Exception as e:
+                print(f"❌ No se pudo generar la miniatura de {ruta}: {str(e)}")
+                miniatura = None
+            callback(ruta, miniatura)
+
+
+_generador = None
+_lock_generador = threading.Lock()
+
+
+def generador():
+    """Generador compartido por todas las ventanas (un solo hilo decodificando)"""
+    global _generador
+    with _lock_generador:
+        if _generador is None:
+            _generador = GeneradorMiniaturas()
+        return _generador
+
+
+class VistaPrevia(tk.Label):
+    """Vista previa de una foto; se muestra en cuanto la miniatura está lista"""
+    def __init__(self, parent, tamano=TAMANO_VISTA_PREVIA, **kwargs):
+        kwargs.setdefault('bg', '#ecf0f1')
+        super().__init__(parent, text="Sin vista previa", width=tamano[0], height=tamano[1],
+                         compound='center', **kwargs)
+        self.tamano = tamano
+        self.ruta = None
+        self.foto = None
+        self.consumidor = generador().nuevo_consumidor()
+        # Label con imagen se mide en píxeles; sin imagen, en caracteres
+        self.config(image=self._vacia())
+
+    def _vacia(self):
+        self.foto = tk.PhotoImage(width=self.tamano[0], height=self.tamano[1])
+        return self.foto
+
+    def mostrar(self, ruta):
+        self.ruta = ruta
+        miniatura = generador().cache.en_cache(ruta, self.tamano)
+        if miniatura:
+            self._poner(ruta, miniatura)
+            return
+        self.config(image=self._vacia(), text="⏳ Cargando vista previa...")
+        # Solo interesa la última foto elegida
+        generador().cancelar_pendientes(self.consumidor)
+        generador().pedir(self.consumidor, ruta, self.tamano, self._lista)
+
+    def destroy(self):
+        generador().liberar(self.consumidor)
+        super().destroy()
+
+    def _lista(self, ruta, miniatura):
+        try:
+            self.after(0, self._poner, ruta, miniatura)
+        except (RuntimeError, tk.TclError):
+            pass  # La ventana se cerró mientras se generaba
+
+    def _poner(self, ruta, miniatura):
+        if ruta != self.ruta or not self.winfo_exists():
+            return  # Llegó tarde: ya se eligió otra foto
+        if miniatura is None:
+            self.config(image=self._vacia(), text="❌ No se pudo leer la imagen")
+            return
+        self.foto = tk.PhotoImage(file=miniatura)
+        self.config(image=self.foto, text='')
+
+
+class GrillaMiniaturas(tk.Frame):
+    """Grilla con desplazamiento de las fotos de una carpeta; solo carga las filas visibles"""
+    MARGEN = 6
+
+    def __init__(self, parent, al_seleccionar=None, tamano=TAMANO_MINIATURA, columnas=4, **kwargs):
+        kwargs.setdefault('bg', '#ecf0f1')
+        super().__init__(parent, **kwargs)
+        self.al_seleccionar = al_seleccionar
+        self.tamano = tamano
+        self.columnas = columnas
+        self.rutas = []
+        self.fotos = {}
+        self.pedidas = set()
+        self.celdas = {}
+        self.seleccionada = None
+        self.consumidor = generador().nuevo_consumidor()
+
+        self.canvas = tk.Canvas(self, bg='white', highlightthickness=0,
+                                width=columnas * (tamano[0] + self.MARGEN) + self.MARGEN)
+        barra = tk.Scrollbar(self, orient='vertical', command=self._desplazar)
+        self.canvas.configure(yscrollcommand=barra.set)
+        barra.pack(side='right', fill='y')
+        self.canvas.pack(side='left', fill='both', expand=True)
+
+        self.canvas.bind('<Configure>', lambda e: self._cargar_visibles())
+        self.canvas.bind('<MouseWheel>', lambda e: self._desplazar('scroll', -e.delta // 120, 'units'))
+        self.canvas.bind('<Button-4>', lambda e: self._desplazar('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self._desplazar('scroll', 1, 'units'))
+        self.canvas.bind('<Button-1>', self._clic)
+
+    @property
+    def alto_fila(self):
+        return self.tamano[1] + 2 * self.MARGEN + 14
+
+    def mostrar_carpeta(self, carpeta):
+        """Listar las fotos de la carpeta (sin decodificarlas); devuelve cuántas hay"""
+        rutas = sorted(os.path.join(carpeta, nombre) for nombre in os.listdir(carpeta) if es_imagen(nombre))
+        self.mostrar(rutas)
+        return len(rutas)
+
+    def mostrar(self, rutas):
+        # Los pedidos de la carpeta anterior se cancelan: sus celdas dejan de estar pedidas
+        generador().cancelar_pendientes(self.consumidor)
+        self.pedidas.clear()
+        self.canvas.delete('all')
+        self.rutas = list(rutas)
+        self.fotos.clear()
+        self.celdas.clear()
+        self.seleccionada = None
+        filas = -(-len(self.rutas) // self.columnas)
+        ancho_celda = self.tamano[0] + self.MARGEN
+        self.canvas.configure(scrollregion=(0, 0, self.columnas * ancho_celda + self.MARGEN,
+                                            filas * self.alto_fila))
+        self.canvas.yview_moveto(0)
+        # Los recuadros y nombres son baratos: se dibujan todos; las imágenes, a medida que se ven
+        for i, ruta in enumerate(self.rutas):
+            x, y = self._posicion(i)
+            marco = self.canvas.create_rectangle(x - 2, y - 2, x + self.tamano[0] + 2, y + self.tamano[1] + 2,
+                                                 outline='#bdc3c7')
+            self.canvas.create_text(x + self.tamano[0] // 2, y + self.tamano[1] + 9, font=('Arial', 7),
+                                    text=self._acortar(os.path.basename(ruta)))
+            self.celdas[i] = marco
+        self._cargar_visibles()
+
+    def destroy(self):
+        generador().liberar(self.consumidor)
+        super().destroy()
+
+    def _acortar(self, nombre, largo=26):
+        return nombre if len(nombre) <= largo else nombre[:largo - 1] + '…'
+
+    def _posicion(self, i):
+        fila, columna = divmod(i, self.columnas)
+        return (self.MARGEN + columna * (self.tamano[0] + self.MARGEN),
+                self.MARGEN + fila * self.alto_fila)
+
+    def _desplazar(self, *args):
+        self.canvas.yview(*args)
+        self._cargar_visibles()
+
+    def _cargar_visibles(self):
+        """Pedir las miniaturas de las filas visibles (más una de margen) y soltar las lejanas"""
+        if not self.rutas:
+            return
+        arriba = self.canvas.canvasy(0)
+        abajo = self.canvas.canvasy(self.canvas.winfo_height())
+        primera = max(0, int(arriba // self.alto_fila) - 1)
+        ultima = int(abajo // self.alto_fila) + 1
+        visibles = range(primera * self.columnas, min(len(self.rutas), (ultima + 1) * self.columnas))
+        # Pedidas en orden inverso: la cola es LIFO y así la primera visible sale primero
+        for i in reversed(visibles):
+            if i in self.fotos or i in self.pedidas:
+                continue
+            ruta = self.rutas[i]
+            miniatura = generador().cache.en_cache(ruta, self.tamano)
+            if miniatura:
+                self._poner(i, ruta, miniatura)
+            else:
+                self.pedidas.add(i)
+                generador().pedir(self.consumidor, ruta, self.tamano, lambda r, m, i=i: self._lista(i, r, m))
+        # Tk guarda cada PhotoImage entera en memoria: se liberan las que quedaron muy lejos
+        lejos = [i for i in self.fotos if i < visibles.start - 4 * self.columnas
+                 or i >= visibles.stop + 4 * self.columnas]
+        for i in lejos:
+            self.canvas.delete(f"miniatura_{i}")
+            del self.fotos[i]
+
+    def _lista(self, i, ruta, miniatura):
+        try:
+            self.after(0, self._poner, i, ruta, miniatura)
+        except (RuntimeError, tk.TclError):
+            pass
+
+    def _poner(self, i, ruta, miniatura):
+        self.pedidas.discard(i)
+        if not self.winfo_exists() or i >= len(self.rutas) or self.rutas[i] != ruta or miniatura is None:
+            return
+        x, y = self._posicion(i)
+        foto = tk.PhotoImage(file=miniatura)
+        self.fotos[i] = foto
+        # Centrada en la celda: las miniaturas conservan la proporción de la foto
+        self.canvas.create_image(x + self.tamano[0] // 2, y + self.tamano[1] // 2, image=foto,
+                                 tags=(f"miniatura_{i}",))
+
+    def _clic(self, evento):
+        x, y = self.canvas.canvasx(evento.x), self.canvas.canvasy(evento.y)
+        columna = int((x - self.MARGEN) // (self.tamano[0] + self.MARGEN))
+        i = int(y // self.alto_fila) * self.columnas + columna
+        if not 0 <= columna < self.columnas or not 0 <= i < len(self.rutas):
+            return
+        if self.seleccionada is not None:
+            self.canvas.itemconfig(self.celdas[self.seleccionada], outline='#bdc3c7', width=1)
+        self.seleccionada = i
+        self.canvas.itemconfig(self.celdas[i], outline='#e74c3c', width=3)
+        if self.al_seleccionar:
+            self.al_seleccionar(self.rutas[i])
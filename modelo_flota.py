@@ -0,0 +1,359 @@
+# modelo_flota.py - Flota en memoria: registros compactos por fila y columnas NumPy para análisis
+import threading
+
+import numpy as np
+
+import motor_reglas
+from database import COLUMNAS_AERONAVE, COLUMNAS_MANTENIMIENTO, en_bloques
+
+# Más cambios que esta fracción de la flota: conviene recargar todo en una sola pasada
+FRACCION_RECARGA = 0.25
+
+
+class Aeronave:
+    """Fila de aeronaves con acceso por nombre"""
+    __slots__ = ('id', 'matricula', 'modelo', 'fabricante', 'peso_mtow', 'categoria', 'horas_vuelo',
+                 'hangar_id', 'fecha_registro', 'horas_ultimo_mantenimiento', 'fecha_ultimo_mantenimiento',
+                 'version', 'hangar_nombre')
+
+    def __init__(self, *valores):
+        for nombre, valor in zip(self.__slots__, valores):
+            setattr(self, nombre, valor)
+
+    @property
+    def horas_desde_mantenimiento(self):
+        return self.horas_vuelo - (self.horas_ultimo_mantenimiento or 0)
+
+    def __repr__(self):
+        return f"Aeronave({self.id}, {self.matricula!r}, {self.modelo!r})"
+
+
+class Mantenimiento:
+    """Fila de mantenimientos con los datos de su aeronave y técnico"""
+    __slots__ = ('id', 'aeronave_id', 'tipo', 'fecha_programada', 'tecnico_id', 'descripcion', 'estado',
+                 'fecha_creacion', 'costo', 'version', 'matricula', 'modelo', 'tecnico_nombre')
+
+    def __init__(self, *valores):
+        for nombre, valor in zip(self.__slots__, valores):
+            setattr(self, nombre, valor)
+
+    def __repr__(self):
+        return f"Mantenimiento({self.id}, {self.tipo!r}, {self.fecha_programada!r})"
+
+
+# Columnas NumPy de cada tabla: (atributo del registro, tipo). 'cat' = código entero + vocabulario
+COLUMNAS_NUMPY = {
+    'aeronaves': (('peso_mtow', 'f8'), ('horas_vuelo', 'f8'), ('horas_ultimo_mantenimiento', 'f8'),
+                  ('hangar_id', 'i8'), ('fecha_registro', 'M8[s]'), ('categoria', 'cat'), ('modelo', 'cat'),
+                  ('fecha_ultimo_mantenimiento', 'M8[s]')),
+    'mantenimientos': (('aeronave_id', 'i8'), ('costo', 'f8'), ('fecha_programada', 'M8[D]'),
+                       ('fecha_creacion', 'M8[s]'), ('estado', 'cat'), ('tipo', 'cat')),
+}
+
+NULOS = {'f8': np.nan, 'i8': -1, 'M8[s]': np.datetime64('NaT'), 'M8[D]': np.datetime64('NaT')}
+
+
+def _fechas(valores, tipo):
+    """Textos de fecha a datetime64; los vacíos o inválidos quedan como NaT"""
+    try:
+        return np.array([v if v else 'NaT' for v in valores], dtype=tipo)
+    except ValueError:
+        resultado = np.empty(len(valores), dtype=tipo)
+        for i, v in enumerate(valores):
+            try:
+                resultado[i] = np.datetime64(v) if v else NULOS[tipo]
+            except ValueError:
+                resultado[i] = NULOS[tipo]
+        return resultado
+
+
+class _Tabla:
+    """Registros de una tabla y sus columnas NumPy, alineados por posición"""
+    def __init__(self, columnas):
+        self.columnas = columnas
+        self.vocabularios = {nombre: {} for nombre, tipo in columnas if tipo == 'cat'}
+        self.cargar([])
+
+    def cargar(self, registros):
+        self.registros = list(registros)
+        self.posiciones = {r.id: i for i, r in enumerate(self.registros)}
+        self.n = len(self.registros)
+        capacidad = max(self.n, 16)
+        self.arrays = {'id': np.zeros(capacidad, dtype='i8')}
+        self.arrays['id'][:self.n] = [r.id for r in self.registros]
+        for nombre, tipo in self.columnas:
+            valores = [getattr(r, nombre) for r in self.registros]
+            if tipo == 'cat':
+                datos = np.array([self._codigo(nombre, v) for v in valores], dtype='i4')
+                tipo = 'i4'
+            elif tipo.startswith('M8'):
+                datos = _fechas(valores, tipo)
+            else:
+                datos = np.array([NULOS[tipo] if v is None else v for v in valores], dtype=tipo)
+            columna = np.zeros(capacidad, dtype=tipo)
+            columna[:self.n] = datos
+            self.arrays[nombre] = columna
+
+    def _codigo(self, nombre, valor):
+        vocabulario = self.vocabularios[nombre]
+        codigo = vocabulario.get(valor)
+        if codigo is None:
+            codigo = vocabulario[valor] = len(vocabulario)
+        return codigo
+
+    def _escribir(self, pos, registro):
+        self.registros[pos] = registro
+        self.arrays['id'][pos] = registro.id
+        for nombre, tipo in self.columnas:
+            valor = getattr(registro, nombre)
+            if tipo == 'cat':
+                valor = self._codigo(nombre, valor)
+            elif tipo.startswith('M8'):
+                valor = _fechas([valor], tipo)[0]
+            elif valor is None:
+                valor = NULOS[tipo]
+            self.arrays[nombre][pos] = valor
+
+    def poner(self, registro):
+        """Reemplazar la fila con ese id o agregarla al final (capacidad duplicada si hace falta)"""
+        pos = self.posiciones.get(registro.id)
+        if pos is None:
+            if self.n == len(self.arrays['id']):
+                for nombre, columna in self.arrays.items():
+                    self.arrays[nombre] = np.concatenate([columna, np.zeros_like(columna)])
+            pos = self.posiciones[registro.id] = self.n
+            self.registros.append(None)
+            self.n += 1
+        self._escribir(pos, registro)
+
+    def quitar(self, fila_id):
+        """Borrar la fila moviendo la última a su lugar"""
+        pos = self.posiciones.pop(fila_id, None)
+        if pos is None:
+            return
+        ultima = self.n - 1
+        if pos != ultima:
+            movida = self.registros[ultima]
+            self.registros[pos] = movida
+            self.posiciones[movida.id] = pos
+            for columna in self.arrays.values():
+                columna[pos] = columna[ultima]
+        self.registros.pop()
+        self.n -= 1
+
+    def columna(self, nombre):
+        return self.arrays[nombre][:self.n]
+
+    def codigos(self, nombre, valores):
+        """Códigos de los valores de una columna categórica (-1 si nunca aparecieron)"""
+        vocabulario = self.vocabularios[nombre]
+        return np.array([vocabulario.get(v, -1) for v in valores], dtype='i4')
+
+    def etiquetas(self, nombre):
+        """Valor de cada código de una columna categórica"""
+        vocabulario = self.vocabularios[nombre]
+        etiquetas = [None] * len(vocabulario)
+        for valor, codigo in vocabulario.items():
+            etiquetas[codigo] = valor
+        return etiquetas
+
+
+class ModeloFlota:
+    """Aeronaves y mantenimientos en memoria; se pone al día leyendo solo las filas que cambiaron"""
+    def __init__(self, db, reglas=None):
+        self.db = db
+        # Mismo motor que las alertas: editar las reglas cambia el resultado acá también
+        self.reglas = reglas or motor_reglas.reglas(db)
+        self._lock = threading.RLock()
+        self.aeronaves_tabla = _Tabla(COLUMNAS_NUMPY['aeronaves'])
+        self.mantenimientos_tabla = _Tabla(COLUMNAS_NUMPY['mantenimientos'])
+        self.recargar()
+
+    # --- Carga y actualización incremental ---
+
+    def _consultar_aeronaves(self, cursor, ids=None):
+        consulta = (f"SELECT {COLUMNAS_AERONAVE}, a.horas_ultimo_mantenimiento, a.fecha_ultimo_mantenimiento, "
+                    f"a.version FROM aeronaves a")
+        return self._consultar(cursor, consulta, "a.id", ids)
+
+    def _consultar_mantenimientos(self, cursor, ids=None):
+        consulta = f"SELECT {COLUMNAS_MANTENIMIENTO}, m.version FROM mantenimientos m"
+        return self._consultar(cursor, consulta, "m.id", ids)
+
+    def _consultar(self, cursor, consulta, columna_id, ids):
+        if ids is None:
+            return cursor.execute(consulta).fetchall()
+        filas = []
+        for bloque in en_bloques(ids):
+            cursor.execute(f"{consulta} WHERE {columna_id} IN ({', '.join('?' * len(bloque))})", bloque)
+            filas.extend(cursor.fetchall())
+        return filas
+
+    def _leer_nombres(self, cursor):
+        self.hangares = dict(cursor.execute("SELECT id, nombre FROM hangares").fetchall())
+        self.tecnicos = dict(cursor.execute("SELECT id, nombre FROM tecnicos").fetchall())
+
+    def _ultimo_cambio(self, cursor):
+        return cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM registro_cambios").fetchone()[0]
+
+    def _aeronave(self, fila):
+        return Aeronave(*fila, self.hangares.get(fila[7]))
+
+    def _mantenimiento(self, fila):
+        aeronave = self.aeronave(fila[1])
+        return Mantenimiento(*fila, aeronave.matricula if aeronave else None,
+                             aeronave.modelo if aeronave else None, self.tecnicos.get(fila[4]))
+
+    def recargar(self):
+        """Leer toda la flota en una sola pasada"""
+        with self._lock:
+            conn = self.db.crear_conexion()
+            cursor = conn.cursor()
+            self.ultimo_cambio = self._ultimo_cambio(cursor)
+            self._leer_nombres(cursor)
+            self.aeronaves_tabla.cargar(self._aeronave(f) for f in self._consultar_aeronaves(cursor))
+            self.mantenimientos_tabla.cargar(
+                self._mantenimiento(f) for f in self._consultar_mantenimientos(cursor))
+            conn.close()
+
+    def actualizar(self):
+        """Releer por id las filas modificadas desde la última lectura (según el registro de cambios)"""
+        with self._lock:
+            conn = self.db.crear_conexion()
+            cursor = conn.cursor()
+            cursor.execute("""SELECT tabla, fila_id, MAX(seq) FROM registro_cambios
+                              WHERE seq > ? AND tabla IN ('aeronaves', 'mantenimientos', 'hangares', 'tecnicos')
+                              GROUP BY tabla, fila_id""", (self.ultimo_cambio,))
+            cambios = {}
+            for tabla, fila_id, seq in cursor.fetchall():
+                cambios.setdefault(tabla, set()).add(fila_id)
+                self.ultimo_cambio = max(self.ultimo_cambio, seq)
+            if not cambios:
+                conn.close()
+                return 0
+
+            total = sum(len(ids) for ids in cambios.values())
+            if total > FRACCION_RECARGA * (self.aeronaves_tabla.n + self.mantenimientos_tabla.n):
+                conn.close()
+                self.recargar()
+                return total
+
+            if 'hangares' in cambios or 'tecnicos' in cambios:
+                self._leer_nombres(cursor)
+                for a in self.aeronaves_tabla.registros:
+                    a.hangar_nombre = self.hangares.get(a.hangar_id)
+                for m in self.mantenimientos_tabla.registros:
+                    m.tecnico_nombre = self.tecnicos.get(m.tecnico_id)
+
+            aeronave_ids = cambios.get('aeronaves', set())
+            self._aplicar(self.aeronaves_tabla, aeronave_ids,
+                          [self._aeronave(f) for f in self._consultar_aeronaves(cursor, aeronave_ids)])
+            self._aplicar(self.mantenimientos_tabla, cambios.get('mantenimientos', set()),
+                          [self._mantenimiento(f) for f in
+                           self._consultar_mantenimientos(cursor, cambios.get('mantenimientos', set()))])
+            conn.close()
+
+            # Matrícula y modelo copiados en los mantenimientos de las aeronaves modificadas
+            if aeronave_ids:
+                tabla = self.mantenimientos_tabla
+                for pos in np.flatnonzero(np.isin(tabla.columna('aeronave_id'), list(aeronave_ids))):
+                    m = tabla.registros[pos]
+                    aeronave = self.aeronave(m.aeronave_id)
+                    m.matricula = aeronave.matricula if aeronave else None
+                    m.modelo = aeronave.modelo if aeronave else None
+            return total
+
+    def _aplicar(self, tabla, ids, registros):
+        for registro in registros:
+            tabla.poner(registro)
+        # Los ids que ya no están en la base fueron borrados
+        for fila_id in ids - {r.id for r in registros}:
+            tabla.quitar(fila_id)
+
+    # --- Acceso por fila ---
+
+    def aeronave(self, aeronave_id):
+        pos = self.aeronaves_tabla.posiciones.get(aeronave_id)
+        return None if pos is None else self.aeronaves_tabla.registros[pos]
+
+    def aeronaves(self):
+        """Aeronaves en orden de id"""
+        self.actualizar()
+        tabla = self.aeronaves_tabla
+        return [tabla.registros[i] for i in np.argsort(tabla.columna('id'), kind='stable')]
+
+    def mantenimientos(self, aeronave_id=None):
+        """Mantenimientos (de una aeronave o todos) del más reciente al más antiguo"""
+        self.actualizar()
+        tabla = self.mantenimientos_tabla
+        fechas = tabla.columna('fecha_programada')
+        if aeronave_id is None:
+            posiciones = np.arange(tabla.n)
+        else:
+            posiciones = np.flatnonzero(tabla.columna('aeronave_id') == aeronave_id)
+        # NaT al final, igual que los NULL en ORDER BY ... DESC
+        orden = np.argsort(-fechas[posiciones].astype('i8'), kind='stable')
+        orden = np.concatenate([orden[~np.isnat(fechas[posiciones][orden])],
+                                orden[np.isnat(fechas[posiciones][orden])]])
+        return [tabla.registros[i] for i in posiciones[orden]]
+
+    def cantidad_aeronaves(self):
+        self.actualizar()
+        return self.aeronaves_tabla.n
+
+    # --- Análisis vectorizado ---
+
+    def contar_mantenimientos(self, estado):
+        self.actualizar()
+        tabla = self.mantenimientos_tabla
+        codigo = tabla.codigos('estado', [estado])[0]
+        return int(np.count_nonzero(tabla.columna('estado') == codigo)) if codigo >= 0 else 0
+
+    def _contar_por(self, tabla, nombre):
+        conteos = np.bincount(tabla.columna(nombre), minlength=len(tabla.vocabularios[nombre]))
+        return {etiqueta: int(c) for etiqueta, c in zip(tabla.etiquetas(nombre), conteos) if c}
+
+    def estadisticas_generales(self):
+        """Mismo resultado que DatabaseManager.obtener_estadisticas_generales, sin consultar la base"""
+        self.actualizar()
+        mantenimientos = self.mantenimientos_tabla
+        return {
+            'aeronaves_por_categoria': self._contar_por(self.aeronaves_tabla, 'categoria'),
+            'mantenimientos_por_estado': self._contar_por(mantenimientos, 'estado'),
+            'costo_total_mantenimientos': float(np.nansum(mantenimientos.columna('costo'))),
+        }
+
+    def costos_por_tipo(self):
+        """[(tipo, costo total)] de mayor a menor"""
+        self.actualizar()
+        tabla = self.mantenimientos_tabla
+        costos = np.nan_to_num(tabla.columna('costo'))
+        totales = np.bincount(tabla.columna('tipo'), weights=costos, minlength=len(tabla.vocabularios['tipo']))
+        return sorted(((tipo, float(total)) for tipo, total in zip(tabla.etiquetas('tipo'), totales) if total),
+                      key=lambda c: -c[1])
+
+    def evaluar_reglas(self, hoy=None):
+        """Horas y días restantes de cada aeronave y componente según las reglas (motor_reglas.Evaluacion)"""
+        self.actualizar()
+        tabla = self.aeronaves_tabla
+        # Sin fecha de último mantenimiento se cuenta desde el alta
+        fechas = tabla.columna('fecha_ultimo_mantenimiento')
+        fechas = np.where(np.isnat(fechas), tabla.columna('fecha_registro'), fechas)
+        return self.reglas.evaluar(tabla.columna('id').copy(),
+                                   (tabla.columna('modelo'), tabla.etiquetas('modelo')),
+                                   (tabla.columna('categoria'), tabla.etiquetas('categoria')),
+                                   tabla.columna('horas_vuelo'), tabla.columna('horas_ultimo_mantenimiento'),
+                                   fechas, self.db.obtener_cumplimientos(), hoy)
+
+    def horas_restantes(self):
+        """(ids, horas que faltan para el próximo mantenimiento general) de toda la flota"""
+        evaluacion = self.evaluar_reglas()
+        if motor_reglas.COMPONENTE_GENERAL not in evaluacion.componentes:
+            return evaluacion.ids, np.full(len(evaluacion.ids), np.nan)
+        return evaluacion.ids, evaluacion.horas_restantes[:, evaluacion.componentes.index(
+            motor_reglas.COMPONENTE_GENERAL)]
+
+    def aeronaves_con_alertas(self):
+        """Aeronaves que superaron algún intervalo (mismo resultado que la consulta SQL de alertas)"""
+        evaluacion = self.evaluar_reglas()
+        return [self.aeronave(i) for i in evaluacion.ids[motor_reglas.vencidas(evaluacion)]]
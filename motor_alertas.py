@@ -0,0 +1,86 @@
+# motor_alertas.py - Evaluación incremental de alertas de mantenimiento
+from datetime import date, timedelta
+
+import motor_reglas
+from bus_eventos import (bus, AERONAVE_ACTUALIZADA, MANTENIMIENTO_INSERTADO,
+                         MANTENIMIENTO_ACTUALIZADO, ALERTAS_CAMBIADAS, REGLAS_CAMBIADAS)
+
+
+class MotorAlertas:
+    """Reevalúa solo las aeronaves afectadas por cada cambio y persiste el estado en 'alertas'"""
+    def __init__(self, db, dias_anticipacion=7, reglas=None):
+        self.db = db
+        self.dias_anticipacion = dias_anticipacion
+        self.reglas = reglas or motor_reglas.reglas(db)
+        self.suscripciones = [
+            bus.suscribir(AERONAVE_ACTUALIZADA, self._al_cambiar_aeronave),
+            bus.suscribir(MANTENIMIENTO_INSERTADO, self._al_cambiar_aeronave),
+            bus.suscribir(MANTENIMIENTO_ACTUALIZADO, self._al_cambiar_aeronave),
+            # Reglas editadas: cualquier aeronave puede entrar o salir de alerta
+            bus.suscribir(REGLAS_CAMBIADAS, lambda **datos: self.evaluar_flota()),
+        ]
+
+        # La primera vez se evalúa toda la flota; después solo los cambios
+        if self.db.obtener_configuracion('alertas_ultimo_limite') is None:
+            self.evaluar_flota()
+        else:
+            self.revisar_fechas()
+
+    def detener(self):
+        for suscripcion in self.suscripciones:
+            bus.desuscribir(suscripcion)
+
+    def _al_cambiar_aeronave(self, aeronave_id, **datos):
+        self.evaluar_aeronaves([aeronave_id])
+
+    def limite_fechas(self):
+        return (date.today() + timedelta(days=self.dias_anticipacion)).strftime("%Y-%m-%d")
+
+    def evaluar_aeronaves(self, aeronave_ids):
+        """Recalcular las alertas de las aeronaves indicadas"""
+        aeronave_ids = list(set(aeronave_ids))
+        if not aeronave_ids:
+            return 0
+
+        vigentes = {}
+        # SQL filtra las vencidas; NumPy (mismas reglas) dice qué componente y por cuánto
+        filas = self.db.obtener_aeronaves_con_alertas(aeronave_ids, self.reglas)
+        if filas:
+            cumplimientos = self.db.obtener_cumplimientos([a[0] for a in filas])
+            evaluacion = motor_reglas.evaluar_filas(self.reglas, filas, cumplimientos)
+            for aeronave_id, alertas in motor_reglas.mensajes(evaluacion, range(len(filas))).items():
+                for tipo, mensaje in alertas:
+                    vigentes[(aeronave_id, tipo, 0)] = mensaje
+
+        hoy = date.today().strftime("%Y-%m-%d")
+        for mantenimiento_id, aeronave_id, tipo, fecha in self.db.obtener_mantenimientos_pendientes(
+                self.limite_fechas(), aeronave_ids=aeronave_ids):
+            estado = "vencido" if fecha < hoy else "próximo"
+            vigentes[(aeronave_id, 'Fecha', mantenimiento_id)] = f"{tipo} {estado}: programado para {fecha}"
+
+        cambios = self.db.sincronizar_alertas(aeronave_ids, vigentes)
+        if cambios:
+            bus.publicar(ALERTAS_CAMBIADAS, aeronave_ids=aeronave_ids)
+        return cambios
+
+    def evaluar_flota(self):
+        """Evaluación completa (solo al inicializar la tabla de alertas)"""
+        limite = self.limite_fechas()
+        cambios = self.evaluar_aeronaves([a[0] for a in self.db.obtener_aeronaves()])
+        self.db.guardar_configuracion('alertas_ultimo_limite', limite)
+        return cambios
+
+    def revisar_fechas(self):
+        """Al cambiar el día: tomar los mantenimientos que entraron en la ventana de anticipación y
+        pasar a vencidos los que ya quedaron atrás (main.py la llama cada hora)"""
+        anterior = self.db.obtener_configuracion('alertas_ultimo_limite')
+        limite = self.limite_fechas()
+        if anterior == limite:
+            return 0
+        entrantes = [m[1] for m in self.db.obtener_mantenimientos_pendientes(limite)]
+        if self.reglas.tiene_calendario():
+            # Con reglas por calendario el paso de los días también vence intervalos
+            entrantes += [a[0] for a in self.db.obtener_aeronaves_con_alertas(reglas=self.reglas)]
+        cambios = self.evaluar_aeronaves(entrantes)
+        self.db.guardar_configuracion('alertas_ultimo_limite', limite)
+        return cambios
@@ -0,0 +1,422 @@
+# motor_reglas.py - Reglas de categoría e intervalos de mantenimiento: una definición, SQL y NumPy
+import argparse
+import json
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+from bus_eventos import bus, REGLAS_CAMBIADAS
+from catalogo_tipos import CATEGORIAS_POR_PESO, INTERVALO_POR_CATEGORIA, catalogo, clave_tipo
+
+
+# Componente al que aplican las horas y la fecha del último mantenimiento de la aeronave
+COMPONENTE_GENERAL = 'General'
+
+# Clave de la definición en la tabla configuracion
+CLAVE_CONFIGURACION = 'reglas_mantenimiento'
+
+# Definición de fábrica. Categorías: [nombre, MTOW máximo en kg (null = sin límite)], de menor a mayor.
+# Intervalos: componente y, opcionalmente, categoría o tipo; horas de vuelo y/o días de calendario.
+# Los intervalos por tipo del catálogo (tipos_aeronave) se agregan solos
+REGLAS_POR_DEFECTO = {
+    'categorias': [[categoria, None if math.isinf(limite) else limite] for limite, categoria in CATEGORIAS_POR_PESO],
+    'intervalos': [{'componente': COMPONENTE_GENERAL, 'categoria': categoria, 'horas': horas}
+                   for categoria, horas in INTERVALO_POR_CATEGORIA.items()],
+}
+
+# Medidas de un intervalo: horas de vuelo desde el último cumplimiento y días de calendario
+MEDIDAS = ('horas', 'dias')
+
+Regla = namedtuple('Regla', 'componente categoria tipo horas dias', defaults=(COMPONENTE_GENERAL, None, None,
+                                                                             None, None))
+
+# Resultado de evaluar la flota: (n aeronaves, k componentes); nan = el componente no tiene esa medida
+Evaluacion = namedtuple('Evaluacion', 'ids componentes horas_restantes dias_restantes')
+
+
+def _sin_nan(valor):
+    return None if valor is None or (isinstance(valor, float) and math.isnan(valor)) else valor
+
+
+class MotorReglas:
+    """Reglas compiladas: predicado SQL y evaluador NumPy salen de las mismas tablas de intervalos.
+
+    Para cada componente y medida manda la regla más específica que la defina:
+    tipo de aeronave > categoría > toda la flota.
+    """
+    def __init__(self, definicion=None, tipos=()):
+        self.cargar(definicion, tipos)
+
+    @classmethod
+    def desde_db(cls, db):
+        """Definición guardada en configuracion (o la de fábrica) más los intervalos del catálogo"""
+        return cls(*_leer_definicion(db))
+
+    def cargar(self, definicion=None, tipos=()):
+        """Compilar una definición (en el lugar: quien comparte el motor ve las reglas nuevas)"""
+        definicion = definicion or REGLAS_POR_DEFECTO
+        categorias = [(nombre, float('inf') if limite is None else float(limite))
+                      for nombre, limite in definicion['categorias']]
+        # Claves normalizadas de cada tipo del catálogo: el clasificador usa el tipo, las aeronaves el modelo
+        tipos_por_clave = {}
+        claves_tipo = {}
+        reglas = []
+        for tipo in tipos:
+            claves = {clave_tipo(tipo.tipo), clave_tipo(tipo.modelo)}
+            for clave in claves:
+                tipos_por_clave[clave] = tipo
+                claves_tipo[clave] = claves
+            # Sin intervalo propio el tipo hereda el de su categoría
+            if tipo.intervalo_horas is not None:
+                reglas.append(Regla(COMPONENTE_GENERAL, tipo=tipo.tipo, horas=tipo.intervalo_horas))
+        # Las reglas explícitas van después: pisan a las del catálogo
+        reglas.extend(Regla(**intervalo) for intervalo in definicion['intervalos'])
+
+        # {(componente, medida): (valor por clave de tipo, valor por categoría, valor general)}
+        tablas = {}
+        for regla in reglas:
+            for medida in MEDIDAS:
+                valor = _sin_nan(getattr(regla, medida))
+                if valor is None:
+                    continue
+                por_clave, por_categoria, general = tablas.setdefault((regla.componente, medida), ({}, {}, {}))
+                if regla.tipo:
+                    for clave in claves_tipo.get(clave_tipo(regla.tipo), {clave_tipo(regla.tipo)}):
+                        por_clave[clave] = float(valor)
+                elif regla.categoria:
+                    por_categoria[regla.categoria] = float(valor)
+                else:
+                    general['valor'] = float(valor)
+
+        self.definicion = definicion
+        self.categorias = categorias
+        self.tipos_por_clave = tipos_por_clave
+        self.reglas = reglas
+        self.tablas = {llave: (por_clave, por_categoria, general.get('valor'))
+                       for llave, (por_clave, por_categoria, general) in tablas.items()}
+        self.componentes = sorted({componente for componente, _ in self.tablas},
+                                  key=lambda c: (c != COMPONENTE_GENERAL, c))
+
+    # --- Consultas puntuales (formularios y textos) ---
+
+    def categoria_por_peso(self, peso_mtow):
+        for nombre, limite in self.categorias:
+            if peso_mtow <= limite:
+                return nombre
+        return self.categorias[-1][0]
+
+    def categoria_propia(self, modelo):
+        """Categoría fijada en el catálogo para el modelo (None si se deduce del peso)"""
+        tipo = self.tipos_por_clave.get(clave_tipo(modelo)) if modelo else None
+        return tipo.categoria if tipo else None
+
+    def categoria(self, peso_mtow, modelo=None):
+        """Categoría fijada para el tipo en el catálogo o, si no tiene, la que corresponde al peso"""
+        return self.categoria_propia(modelo) or self.categoria_por_peso(peso_mtow)
+
+    def intervalo(self, categoria, modelo=None, componente=COMPONENTE_GENERAL, medida='horas'):
+        """Intervalo que corresponde a una aeronave (None si ninguna regla lo define)"""
+        tabla = self.tablas.get((componente, medida))
+        if tabla is None:
+            return None
+        por_clave, por_categoria, general = tabla
+        valor = por_clave.get(clave_tipo(modelo)) if modelo else None
+        if valor is None:
+            valor = por_categoria.get(categoria, general)
+        return valor
+
+    def tiene_calendario(self):
+        return any(medida == 'dias' for _, medida in self.tablas)
+
+    def descripcion(self):
+        """Texto con las categorías y sus intervalos generales (para las ventanas de ayuda)"""
+        lineas = []
+        anterior = 0
+        for nombre, limite in self.categorias:
+            rango = f"hasta {limite:,.0f} kg" if anterior == 0 else \
+                f"{anterior + 1:,.0f} - {limite:,.0f} kg" if not math.isinf(limite) else f"más de {anterior:,.0f} kg"
+            medidas = [f"cada {valor:g} {'horas de vuelo' if medida == 'horas' else 'días'}"
+                       for medida in MEDIDAS for valor in [self.intervalo(nombre, medida=medida)] if valor]
+            lineas.append(f"• {nombre.upper()}: {rango}" + (f" (mantenimiento {' o '.join(medidas)})"
+                                                              if medidas else ""))
+            anterior = limite
+        otros = sorted({r.componente for r in self.reglas} - {COMPONENTE_GENERAL})
+        if otros:
+            lineas.append(f"• Componentes con intervalo propio: {', '.join(otros)}")
+        return "\n".join(lineas)
+
+    # --- SQL ---
+
+    def categoria_sql(self, alias='a'):
+        """(expresión, parámetros) con la misma categoría que categoria() para cada fila de aeronaves"""
+        ramas = []
+        parametros = []
+        por_categoria = {}
+        for clave, tipo in self.tipos_por_clave.items():
+            if tipo.categoria:
+                por_categoria.setdefault(tipo.categoria, []).append(clave)
+        for nombre, claves in sorted(por_categoria.items()):
+            ramas.append(f"WHEN clave_tipo({alias}.modelo) IN ({', '.join('?' * len(claves))}) THEN ?")
+            parametros.extend(sorted(claves) + [nombre])
+        for nombre, limite in self.categorias[:-1]:
+            ramas.append(f"WHEN {alias}.peso_mtow <= ? THEN ?")
+            parametros.extend([limite, nombre])
+        parametros.append(self.categorias[-1][0])
+        return f"CASE {' '.join(ramas)} ELSE ? END", parametros
+
+    def _caso_sql(self, componente, medida, alias, parametros):
+        """CASE con el intervalo de cada fila, o None si el componente no tiene esa medida"""
+        tabla = self.tablas.get((componente, medida))
+        if tabla is None:
+            return None
+        por_clave, por_categoria, general = tabla
+        ramas = []
+        # Agrupadas por valor: una rama IN (...) por intervalo distinto
+        for valores, expresion in ((por_clave, f"clave_tipo({alias}.modelo)"),
+                                   (por_categoria, f"{alias}.categoria")):
+            por_valor = {}
+            for clave, valor in valores.items():
+                por_valor.setdefault(valor, []).append(clave)
+            for valor, claves in sorted(por_valor.items()):
+                ramas.append(f"WHEN {expresion} IN ({', '.join('?' * len(claves))}) THEN {valor!r}")
+                parametros.extend(sorted(claves))
+        otro = 'NULL' if general is None else repr(general)
+        return f"CASE {' '.join(ramas)} ELSE {otro} END" if ramas else otro
+
+    def _referencias_sql(self, componente, alias, parametros):
+        """(horas, fecha) del último cumplimiento: del componente si se registró, si no de la aeronave"""
+        horas = f"COALESCE({alias}.horas_ultimo_mantenimiento, 0)"
+        fecha = f"COALESCE({alias}.fecha_ultimo_mantenimiento, {alias}.fecha_registro)"
+        if componente == COMPONENTE_GENERAL:
+            return horas, fecha
+        parametros.extend([componente, componente])
+        return (f"COALESCE((SELECT c.horas FROM componentes_aeronave c WHERE c.aeronave_id = {alias}.id "
+                f"AND c.componente = ?), {horas})",
+                f"COALESCE((SELECT c.fecha FROM componentes_aeronave c WHERE c.aeronave_id = {alias}.id "
+                f"AND c.componente = ?), {fecha})")
+
+    def predicado_sql(self, alias='a', hoy=None):
+        """(condición, parámetros): la aeronave superó algún intervalo a la fecha 'hoy' (YYYY-MM-DD).
+
+        Requiere la función clave_tipo registrada en la conexión (DatabaseManager lo hace).
+        """
+        hoy = hoy or date.today().strftime("%Y-%m-%d")
+        condiciones = []
+        parametros = []
+        for componente in self.componentes:
+            # Los parámetros se agregan en el orden en que aparecen en el texto
+            params_ref = []
+            horas_ref, fecha_ref = self._referencias_sql(componente, alias, params_ref)
+            params_horas = []
+            caso = self._caso_sql(componente, 'horas', alias, params_horas)
+            if caso is not None:
+                condiciones.append(f"({alias}.horas_vuelo - {horas_ref} > {caso})")
+                parametros.extend(params_ref[:1] + params_horas)
+            params_dias = []
+            caso = self._caso_sql(componente, 'dias', alias, params_dias)
+            if caso is not None:
+                condiciones.append(f"(julianday(?) - julianday(date({fecha_ref})) > {caso})")
+                parametros.extend([hoy] + params_ref[1:] + params_dias)
+        if not condiciones:
+            return "0", []
+        return "(" + " OR ".join(condiciones) + ")", parametros
+
+    # --- NumPy ---
+
+    def _valores(self, componente, medida, modelos, categorias):
+        """Intervalo de cada fila (nan si no hay regla); modelos y categorías como (códigos, vocabulario)"""
+        tabla = self.tablas.get((componente, medida))
+        n = len(modelos[0])
+        if tabla is None:
+            return np.full(n, np.nan)
+        por_clave, por_categoria, general = tabla
+        general = np.nan if general is None else general
+        # Una búsqueda por valor distinto del vocabulario; después solo indexación (código -1 = nulo)
+        por_codigo = np.array([por_categoria.get(c, general) for c in categorias[1]] + [general], dtype='f8')
+        valores = por_codigo[categorias[0]]
+        if por_clave:
+            del_tipo = np.array([por_clave.get(clave_tipo(m), np.nan) for m in modelos[1]] + [np.nan], dtype='f8')
+            propios = del_tipo[modelos[0]]
+            valores = np.where(np.isnan(propios), valores, propios)
+        return valores
+
+    def evaluar(self, ids, modelos, categorias, horas_vuelo, horas_ultimo, fecha_ultimo, cumplimientos=(),
+                hoy=None):
+        """Horas y días restantes de cada aeronave y componente (negativo = vencido).
+
+        modelos/categorias: (códigos int, vocabulario) como en ModeloFlota; fecha_ultimo: datetime64.
+        cumplimientos: (aeronave_id, componente, horas, fecha) registrados por componente.
+        """
+        ids = np.asarray(ids)
+        hoy = np.datetime64(hoy or date.today().strftime("%Y-%m-%d"), 'D')
+        horas_vuelo = np.asarray(horas_vuelo, dtype='f8')
+        horas_base = np.nan_to_num(np.asarray(horas_ultimo, dtype='f8'))
+        fecha_base = np.asarray(fecha_ultimo).astype('M8[D]')
+
+        # Cumplimientos por componente, ubicados por id (ids ordenados para buscar en bloque)
+        orden = np.argsort(ids, kind='stable')
+        por_componente = {}
+        for aeronave_id, componente, horas, fecha in cumplimientos:
+            por_componente.setdefault(componente, []).append((aeronave_id, horas, fecha))
+
+        k = len(self.componentes)
+        horas_restantes = np.full((len(ids), k), np.nan)
+        dias_restantes = np.full((len(ids), k), np.nan)
+        for j, componente in enumerate(self.componentes):
+            horas_ref, fecha_ref = horas_base, fecha_base
+            filas = por_componente.get(componente)
+            if filas and len(ids):
+                filas_ids = np.array([f[0] for f in filas])
+                pos = np.searchsorted(ids[orden], filas_ids).clip(max=len(ids) - 1)
+                presentes = ids[orden][pos] == filas_ids
+                destino = orden[pos[presentes]]
+                horas_ref, fecha_ref = horas_base.copy(), fecha_base.copy()
+                horas = np.array([np.nan if f[1] is None else f[1] for f in filas], dtype='f8')[presentes]
+                fechas = np.array([f[2] or 'NaT' for f in filas], dtype='M8[D]')[presentes]
+                horas_ref[destino] = np.where(np.isnan(horas), horas_ref[destino], horas)
+                fecha_ref[destino] = np.where(np.isnat(fechas), fecha_ref[destino], fechas)
+            horas_restantes[:, j] = self._valores(componente, 'horas', modelos, categorias) - (horas_vuelo - horas_ref)
+            transcurridos = (hoy - fecha_ref).astype('f8')  # NaT -> nan
+            dias_restantes[:, j] = self._valores(componente, 'dias', modelos, categorias) - transcurridos
+        return Evaluacion(ids, list(self.componentes), horas_restantes, dias_restantes)
+
+
+def _categorica(valores):
+    """(códigos, vocabulario) de una lista de textos"""
+    vocabulario, codigos = np.unique(np.array([v or '' for v in valores], dtype=object), return_inverse=True)
+    return codigos, list(vocabulario)
+
+
+def evaluar_filas(motor, filas, cumplimientos=(), hoy=None):
+    """Evaluar filas de DatabaseManager.obtener_aeronaves_con_alertas (columnas de aeronave + referencias)"""
+    filas = list(filas)
+    return motor.evaluar([f[0] for f in filas], _categorica([f[2] for f in filas]),
+                         _categorica([f[5] for f in filas]), [f[6] for f in filas], [f[9] for f in filas],
+                         np.array([(f[10] or 'NaT')[:10] for f in filas], dtype='M8[D]'), cumplimientos, hoy)
+
+
+def vencidas(evaluacion):
+    """Máscara de aeronaves con algún componente vencido (misma condición que predicado_sql)"""
+    with np.errstate(invalid='ignore'):
+        return ((evaluacion.horas_restantes < 0) | (evaluacion.dias_restantes < 0)).any(axis=1)
+
+
+def mensajes(evaluacion, posiciones):
+    """{aeronave_id: (tipo de alerta, texto)} de las filas indicadas, por cada medida vencida"""
+    resultado = {}
+    for pos in posiciones:
+        for tipo, restantes, unidad in (('Horas', evaluacion.horas_restantes, 'h'),
+                                        ('Calendario', evaluacion.dias_restantes, 'días')):
+            vencidos = [f"{componente} ({-restantes[pos, j]:.1f} {unidad} de atraso)"
+                        for j, componente in enumerate(evaluacion.componentes) if restantes[pos, j] < 0]
+            if vencidos:
+                resultado.setdefault(int(evaluacion.ids[pos]), []).append(
+                    (tipo, f"Supera el intervalo: {', '.join(vencidos)}"))
+    return resultado
+
+
+def validar(definicion):
+    """Errores de una definición antes de guardarla (lista vacía = válida)"""
+    errores = []
+    categorias = definicion.get('categorias') or []
+    if not categorias:
+        errores.append("Falta la lista de categorías")
+    limites = [float('inf') if limite is None else limite for _, limite in categorias]
+    if any(limite is None for _, limite in categorias[:-1]) or \
+            any(a >= b for a, b in zip(limites, limites[1:])):
+        errores.append("Los límites de MTOW deben ir de menor a mayor (solo el último puede ser null)")
+    nombres = {nombre for nombre, _ in categorias}
+    for i, intervalo in enumerate(definicion.get('intervalos', [])):
+        desconocidos = set(intervalo) - set(Regla._fields)
+        if desconocidos:
+            errores.append(f"Intervalo {i}: campos desconocidos {', '.join(sorted(desconocidos))}")
+        if intervalo.get('categoria') and intervalo['categoria'] not in nombres:
+            errores.append(f"Intervalo {i}: categoría desconocida {intervalo['categoria']}")
+        if intervalo.get('categoria') and intervalo.get('tipo'):
+            errores.append(f"Intervalo {i}: indicar categoría o tipo, no ambos")
+        if not any(_sin_nan(intervalo.get(medida)) for medida in MEDIDAS):
+            errores.append(f"Intervalo {i}: falta 'horas' o 'dias'")
+    return errores
+
+
+def _leer_definicion(db):
+    guardada = db.obtener_configuracion(CLAVE_CONFIGURACION)
+    return json.loads(guardada) if guardada else None, catalogo(db).tipos()
+
+
+_motores = {}
+_lock_motores = threading.Lock()
+
+
+def reglas(db):
+    """Motor compartido de la base: la GUI, la flota en memoria y las alertas usan el mismo"""
+    with _lock_motores:
+        if db.db_name not in _motores:
+            _motores[db.db_name] = MotorReglas.desde_db(db)
+        return _motores[db.db_name]
+
+
+def recargar_reglas(db):
+    """Recompilar el motor compartido (p. ej. tras importar tipos) y avisar para reevaluar la flota"""
+    motor = reglas(db)
+    motor.cargar(*_leer_definicion(db))
+    # Límites de peso o categorías del catálogo nuevos: las aeronaves guardadas se recategorizan
+    db.recategorizar_aeronaves(*motor.categoria_sql())
+    bus.publicar(REGLAS_CAMBIADAS)
+    return motor
+
+
+def guardar_reglas(db, definicion):
+    """Validar y guardar la definición; el motor compartido se recompila y la flota se reevalúa"""
+    errores = validar(definicion)
+    if errores:
+        raise ValueError("; ".join(errores))
+    db.guardar_configuracion(CLAVE_CONFIGURACION, json.dumps(definicion, ensure_ascii=False))
+    return recargar_reglas(db)
+
+
+def main():
+    from database import DatabaseManager
+    from modelo_flota import ModeloFlota
+
+    parser = argparse.ArgumentParser(description="Reglas de categorías e intervalos de mantenimiento")
+    parser.add_argument('--db', default='sgma_aeronaves.db')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('mostrar', help="Imprimir la definición vigente (JSON)")
+    p_cargar = subparsers.add_parser('cargar', help="Validar y guardar una definición desde un JSON")
+    p_cargar.add_argument('archivo')
+    subparsers.add_parser('evaluar', help="Comparar el predicado SQL con el evaluador NumPy sobre la flota")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    if args.comando == 'mostrar':
+        print(json.dumps(reglas(db).definicion, ensure_ascii=False, indent=2))
+        return
+    if args.comando == 'cargar':
+        with open(args.archivo, encoding='utf-8') as f:
+            motor = guardar_reglas(db, json.load(f))
+        print(f"✅ Reglas guardadas: {len(motor.reglas)} intervalos, componentes {', '.join(motor.componentes)}")
+        print(motor.descripcion())
+        return
+
+    motor = reglas(db)
+    flota = ModeloFlota(db, motor)
+    inicio = time.perf_counter()
+    por_sql = {fila[0] for fila in db.obtener_aeronaves_con_alertas(reglas=motor)}
+    tiempo_sql = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    evaluacion = flota.evaluar_reglas()
+    por_numpy = set(evaluacion.ids[vencidas(evaluacion)].tolist())
+    tiempo_numpy = time.perf_counter() - inicio
+    print(f"🔎 {len(evaluacion.ids)} aeronaves, componentes {', '.join(motor.componentes)}")
+    print(f"   SQL:   {len(por_sql)} vencidas en {tiempo_sql * 1000:.1f} ms")
+    print(f"   NumPy: {len(por_numpy)} vencidas en {tiempo_numpy * 1000:.1f} ms")
+    print("✅ Coinciden" if por_sql == por_numpy else f"❌ Difieren en {len(por_sql ^ por_numpy)} aeronaves")
+
+
+if __name__ == "__main__":
+    main()
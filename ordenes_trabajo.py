@@ -0,0 +1,170 @@
+# ordenes_trabajo.py - Ciclo de vida de las órdenes de trabajo de mantenimiento
+from datetime import datetime
+
+from bus_eventos import bus, MANTENIMIENTO_ACTUALIZADO
+from database import en_bloques, reintentar_si_bloqueada
+
+
+PROGRAMADO = 'Programado'
+EN_PROCESO = 'En Proceso'
+COMPLETADO = 'Completado'
+CANCELADO = 'Cancelado'
+
+# Estados a los que se puede pasar desde cada estado
+TRANSICIONES = {
+    PROGRAMADO: (EN_PROCESO, CANCELADO),
+    EN_PROCESO: (COMPLETADO, CANCELADO),
+    COMPLETADO: (),
+    CANCELADO: (),
+}
+
+
+class ErrorOrdenTrabajo(Exception):
+    """Transición rechazada; la base de datos queda sin cambios"""
+
+
+def _ahora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M")
+
+
+class GestorOrdenesTrabajo:
+    """Cada transición es una sola transacción: estado, stock, hangar y horas base"""
+    def __init__(self, db):
+        self.db = db
+
+    def _transaccion(self):
+        conn = self.db.crear_conexion()
+        # IMMEDIATE toma el bloqueo de escritura antes de leer el estado actual
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def _leer_orden(self, cursor, mantenimiento_id, destino):
+        cursor.execute("SELECT estado, aeronave_id FROM mantenimientos WHERE id = ?", (mantenimiento_id,))
+        fila = cursor.fetchone()
+        if fila is None:
+            raise ErrorOrdenTrabajo(f"No existe el mantenimiento {mantenimiento_id}")
+        estado, aeronave_id = fila
+        if destino not in TRANSICIONES.get(estado, ()):
+            raise ErrorOrdenTrabajo(f"No se puede pasar de '{estado}' a '{destino}'")
+        return estado, aeronave_id
+
+    def _ejecutar(self, mantenimiento_id, destino, pasos):
+        """Validar la transición, aplicar pasos(cursor, estado, aeronave_id) y confirmar todo junto"""
+        conn = self._transaccion()
+        try:
+            cursor = conn.cursor()
+            estado, aeronave_id = self._leer_orden(cursor, mantenimiento_id, destino)
+            pasos(cursor, estado, aeronave_id)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        bus.publicar(MANTENIMIENTO_ACTUALIZADO, aeronave_id=aeronave_id,
+                     mantenimiento_id=mantenimiento_id, estado=destino)
+        return True
+
+    @reintentar_si_bloqueada
+    def iniciar(self, mantenimiento_id, hangar_id=None):
+        """Programado -> En Proceso; si se indica hangar, la aeronave se traslada a él"""
+        def pasos(cursor, estado, aeronave_id):
+            cursor.execute("SELECT hangar_id FROM aeronaves WHERE id = ?", (aeronave_id,))
+            hangar_actual = cursor.fetchone()[0]
+            destino = hangar_id or hangar_actual
+            if destino != hangar_actual:
+                self._trasladar(cursor, aeronave_id, destino)
+            cursor.execute("""UPDATE mantenimientos SET estado = ?, fecha_inicio = ?, hangar_id = ?
+                              WHERE id = ?""", (EN_PROCESO, _ahora(), destino, mantenimiento_id))
+        return self._ejecutar(mantenimiento_id, EN_PROCESO, pasos)
+
+    @reintentar_si_bloqueada
+    def completar(self, mantenimiento_id, piezas=None):
+        """En Proceso -> Completado: descuenta piezas y reinicia las horas base de la aeronave"""
+        def pasos(cursor, estado, aeronave_id):
+            if piezas:
+                cursor.executemany("""INSERT INTO mantenimiento_piezas (mantenimiento_id, pieza_id, cantidad)
+                                      VALUES (?, ?, ?)""",
+                                   [(mantenimiento_id, pieza_id, cantidad) for pieza_id, cantidad in piezas])
+            self._consumir_stock(cursor, [mantenimiento_id])
+            cursor.execute("""UPDATE aeronaves SET horas_ultimo_mantenimiento = horas_vuelo,
+                              fecha_ultimo_mantenimiento = ? WHERE id = ?""", (_ahora()[:10], aeronave_id))
+            cursor.execute("UPDATE mantenimientos SET estado = ?, fecha_cierre = ? WHERE id = ?",
+                          (COMPLETADO, _ahora(), mantenimiento_id))
+        return self._ejecutar(mantenimiento_id, COMPLETADO, pasos)
+
+    @reintentar_si_bloqueada
+    def cancelar(self, mantenimiento_id):
+        """Programado/En Proceso -> Cancelado (no consume piezas)"""
+        def pasos(cursor, estado, aeronave_id):
+            cursor.execute("UPDATE mantenimientos SET estado = ?, fecha_cierre = ? WHERE id = ?",
+                          (CANCELADO, _ahora(), mantenimiento_id))
+        return self._ejecutar(mantenimiento_id, CANCELADO, pasos)
+
+    @reintentar_si_bloqueada
+    def completar_del_dia(self, fecha=None, incluir_atrasadas=False):
+        """Cerrar de una vez las órdenes en proceso programadas para la fecha (hoy por defecto).
+
+        Las atrasadas de días anteriores solo se cierran con incluir_atrasadas=True.
+        """
+        fecha = fecha or datetime.now().strftime("%Y-%m-%d")
+        condicion = "fecha_programada <= ?" if incluir_atrasadas else "fecha_programada = ?"
+        conn = self._transaccion()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""SELECT id, aeronave_id FROM mantenimientos
+                               WHERE estado = ? AND {condicion}""", (EN_PROCESO, fecha))
+            ordenes = cursor.fetchall()
+            if not ordenes:
+                conn.rollback()
+                return 0
+
+            self._consumir_stock(cursor, [orden[0] for orden in ordenes])
+            aeronaves = sorted({orden[1] for orden in ordenes})
+            for bloque in en_bloques(aeronaves):
+                cursor.execute(f"""UPDATE aeronaves SET horas_ultimo_mantenimiento = horas_vuelo,
+                                   fecha_ultimo_mantenimiento = ?
+                                   WHERE id IN ({', '.join('?' * len(bloque))})""", [_ahora()[:10], *bloque])
+            cursor.execute(f"""UPDATE mantenimientos SET estado = ?, fecha_cierre = ?
+                               WHERE estado = ? AND {condicion}""",
+                          (COMPLETADO, _ahora(), EN_PROCESO, fecha))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        for mantenimiento_id, aeronave_id in ordenes:
+            bus.publicar(MANTENIMIENTO_ACTUALIZADO, aeronave_id=aeronave_id,
+                         mantenimiento_id=mantenimiento_id, estado=COMPLETADO)
+        return len(ordenes)
+
+    def _consumir_stock(self, cursor, mantenimiento_ids):
+        """Descontar las piezas asignadas; falla si alguna no alcanza"""
+        consumo = {}
+        for bloque in en_bloques(mantenimiento_ids):
+            cursor.execute(f"""SELECT pieza_id, SUM(cantidad) FROM mantenimiento_piezas
+                               WHERE mantenimiento_id IN ({', '.join('?' * len(bloque))})
+                               GROUP BY pieza_id""", bloque)
+            for pieza_id, cantidad in cursor.fetchall():
+                consumo[pieza_id] = consumo.get(pieza_id, 0) + cantidad
+
+        fecha_actual = datetime.now().strftime("%Y-%m-%d")
+        for pieza_id, cantidad in consumo.items():
+            cursor.execute("""UPDATE piezas SET stock = stock - ?, fecha_actualizacion = ?
+                              WHERE id = ? AND stock >= ?""", (cantidad, fecha_actual, pieza_id, cantidad))
+            if cursor.rowcount == 0:
+                raise ErrorOrdenTrabajo(f"Stock insuficiente de la pieza {pieza_id} (se necesitan {cantidad})")
+
+    def _trasladar(self, cursor, aeronave_id, destino):
+        """Mover la aeronave de hangar respetando la capacidad del destino"""
+        cursor.execute("SELECT capacidad, ocupacion FROM hangares WHERE id = ?", (destino,))
+        fila = cursor.fetchone()
+        if fila is None:
+            raise ErrorOrdenTrabajo(f"No existe el hangar {destino}")
+        capacidad, ocupacion = fila
+        if ocupacion >= capacidad:
+            raise ErrorOrdenTrabajo(f"El hangar {destino} está lleno ({ocupacion}/{capacidad})")
+        # La ocupación de origen y destino la ajustan los triggers de aeronaves
+        cursor.execute("UPDATE aeronaves SET hangar_id = ? WHERE id = ?", (destino, aeronave_id))
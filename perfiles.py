@@ -0,0 +1,93 @@
+# perfiles.py - Perfiles de rendimiento: resolución de entrada, precisión numérica e hilos
+import contextlib
+
+
+# Cada perfil cambia hiperparámetros de entrenamiento y la configuración de TensorFlow.
+# hilos_intra / hilos_inter = None: lo que elija TensorFlow según los núcleos
+PERFILES = {
+    'rapido': {
+        'descripcion': "128 px, bfloat16: PCs lentas de hangar",
+        'hiperparametros': {'tamano_imagen': 128},
+        'precision': 'mixed_bfloat16',
+        'hilos_intra': None,
+        'hilos_inter': 1,
+    },
+    'equilibrado': {
+        'descripcion': "160 px, bfloat16",
+        'hiperparametros': {'tamano_imagen': 160},
+        'precision': 'mixed_bfloat16',
+        'hilos_intra': None,
+        'hilos_inter': 2,
+    },
+    'preciso': {
+        'descripcion': "224 px, float32 (el modelo original)",
+        'hiperparametros': {'tamano_imagen': 224},
+        'precision': 'float32',
+        'hilos_intra': None,
+        'hilos_inter': None,
+    },
+}
+
+PERFIL_POR_DEFECTO = 'preciso'
+
+
+def soporta_bfloat16():
+    """La CPU tiene instrucciones bfloat16 (AVX512-BF16 o AMX); sin ellas es más lento que float32"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            banderas = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in banderas or 'amx_bf16' in banderas
+
+
+def precision_efectiva(perfil):
+    """Política de Keras que se usará en esta máquina para el perfil"""
+    precision = PERFILES[perfil]['precision']
+    if precision == 'mixed_bfloat16' and not soporta_bfloat16():
+        return 'float32'
+    return precision
+
+
+@contextlib.contextmanager
+def politica(precision):
+    """Usar una política de precisión mientras se construye el modelo y restaurar la anterior"""
+    from tensorflow import keras
+
+    anterior = keras.mixed_precision.global_policy()
+    keras.mixed_precision.set_global_policy(precision)
+    try:
+        yield
+    finally:
+        keras.mixed_precision.set_global_policy(anterior)
+
+
+def configurar_hilos(perfil):
+    """Aplicar los hilos del perfil; solo es posible antes de la primera operación de TensorFlow"""
+    import tensorflow as tf
+
+    config = PERFILES[perfil]
+    try:
+        if config['hilos_intra']:
+            tf.config.threading.set_intra_op_parallelism_threads(config['hilos_intra'])
+        if config['hilos_inter']:
+            tf.config.threading.set_inter_op_parallelism_threads(config['hilos_inter'])
+        return True
+    except RuntimeError:
+        # TensorFlow ya está inicializado en este proceso: se mantiene la configuración actual
+        return False
+
+
+def hiperparametros(perfil, hiperparametros=None):
+    """Hiperparámetros del perfil con los explícitos por encima"""
+    return dict(PERFILES[perfil]['hiperparametros'], **(hiperparametros or {}))
+
+
+def metadatos(perfil):
+    """Lo que se guarda con el modelo para que la inferencia use el mismo perfil"""
+    return {'perfil': perfil, 'precision': precision_efectiva(perfil)}
+
+
+def perfil_de(metadatos_modelo):
+    perfil = (metadatos_modelo or {}).get('perfil')
+    return perfil if perfil in PERFILES else PERFIL_POR_DEFECTO
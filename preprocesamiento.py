@@ -0,0 +1,226 @@
+# preprocesamiento.py - Decodificación de imágenes a tamaño reducido, común a entrenamiento e inferencia
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:
+    # Sin OpenCV se usa el modo draft de PIL, que también reduce en el dominio DCT
+    cv2 = None
+
+
+# Factores de reducción del decodificador JPEG (escalado en el dominio DCT, sin decodificar todo)
+if cv2 is not None:
+    LECTURA_REDUCIDA = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }
+
+EXTENSIONES_IMAGEN = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+# Versión de la decodificación: cambiarla invalida las cachés de imágenes ya decodificadas
+VERSION_PREPROCESAMIENTO = 2
+
+# Hilos que decodifican un lote (OpenCV y PIL liberan el GIL mientras decodifican)
+HILOS_DECODIFICACION = min(8, os.cpu_count() or 1)
+
+_local = threading.local()
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def es_imagen(nombre):
+    """Extensión de imagen conocida y no oculta (p. ej. los '._foto.jpg' de macOS)"""
+    return nombre.lower().endswith(EXTENSIONES_IMAGEN) and not nombre.startswith('.')
+
+
+def factor_reduccion(original, tamano):
+    """Mayor factor (1, 2, 4 u 8) con el que la imagen (alto, ancho) sigue cubriendo tamano"""
+    for factor in (8, 4, 2):
+        if original[0] // factor >= tamano[0] and original[1] // factor >= tamano[1]:
+            return factor
+    return 1
+
+
+def firma_preprocesamiento():
+    """Versión y decodificador en uso (OpenCV y PIL no dan exactamente los mismos píxeles)"""
+    return f"v{VERSION_PREPROCESAMIENTO}{'cv2' if cv2 is not None else 'pil'}"
+
+
+def _decodificar_cv2(ruta, tamano):
+    """RGB uint8 con OpenCV, o None si OpenCV no sabe leer el formato (p. ej. GIF)"""
+    alto, ancho = tamano
+    # La cabecera alcanza para conocer el tamaño original: PIL no decodifica al abrir
+    with Image.open(ruta) as img:
+        original = img.size[::-1]
+        es_jpeg = img.format == 'JPEG'
+    bandera = LECTURA_REDUCIDA[factor_reduccion(original, tamano) if es_jpeg else 1]
+    # imdecode sobre los bytes: imread no abre rutas con acentos en Windows.
+    # La orientación EXIF se ignora, igual que en el camino de PIL
+    imagen = cv2.imdecode(np.fromfile(ruta, dtype=np.uint8), bandera | cv2.IMREAD_IGNORE_ORIENTATION)
+    if imagen is None:
+        return None
+    if imagen.shape[:2] != (alto, ancho):
+        # Lo que queda por reducir es menos de 2x salvo en formatos sin escalado DCT
+        interpolacion = cv2.INTER_AREA if imagen.shape[0] > 2 * alto or imagen.shape[1] > 2 * ancho \
+            else cv2.INTER_LINEAR
+        imagen = cv2.resize(imagen, (ancho, alto), interpolation=interpolacion)
+    return cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)
+
+
+def _decodificar_pil(ruta, tamano):
+    alto, ancho = tamano
+    with Image.open(ruta) as img:
+        # JPEG: elige la escala 1/2, 1/4 u 1/8 más chica que siga cubriendo tamano (otros formatos: nada)
+        img.draft('RGB', (ancho, alto))
+        return np.asarray(img.convert('RGB').resize((ancho, alto), Image.BILINEAR))
+
+
+def decodificar(ruta, tamano, destino=None):
+    """Imagen RGB de tamano (alto, ancho), decodificada a la menor escala JPEG que alcance.
+
+    Sin destino devuelve uint8; con destino (p. ej. una fila float32 de un lote) escribe ahí.
+    """
+    imagen = _decodificar_cv2(ruta, tamano) if cv2 is not None else None
+    if imagen is None:
+        imagen = _decodificar_pil(ruta, tamano)
+    if destino is None:
+        return imagen
+    destino[...] = imagen
+    return destino
+
+
+def redimensionar(imagen, tamano):
+    alto, ancho = tamano
+    if cv2 is not None:
+        return cv2.resize(imagen, (ancho, alto), interpolation=cv2.INTER_LINEAR)
+    return np.asarray(Image.fromarray(imagen).resize((ancho, alto), Image.BILINEAR))
+
+
+def vistas_tta(imagen, vistas, tamano, destino):
+    """Escribir en destino las vistas de TTA de una imagen decodificada más grande que tamano"""
+    alto, ancho = tamano
+    dy, dx = imagen.shape[0] - alto, imagen.shape[1] - ancho
+    completa = redimensionar(imagen, tamano)
+
+    def recorte(y, x):
+        return imagen[y:y + alto, x:x + ancho]
+
+    # Ordenadas de mayor a menor aporte: la vista completa siempre va primero
+    generadores = [
+        lambda: completa,
+        lambda: completa[:, ::-1],
+        lambda: recorte(dy // 2, dx // 2),
+        lambda: recorte(0, 0),
+        lambda: recorte(0, dx),
+        lambda: recorte(dy, 0),
+        lambda: recorte(dy, dx),
+        lambda: recorte(dy // 2, dx // 2)[:, ::-1],
+    ]
+    for i in range(vistas):
+        destino[i] = generadores[i]()
+    return destino
+
+
+def _buffer(forma):
+    """Buffer float32 del hilo, reutilizado entre lotes (crece cuando hace falta)"""
+    necesario = int(np.prod(forma))
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None or buffer.size < necesario:
+        buffer = _local.buffer = np.empty(necesario, dtype='f4')
+    return buffer[:necesario].reshape(forma)
+
+
+def _ejecutor():
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HILOS_DECODIFICACION, thread_name_prefix='decodificacion')
+        return _pool
+
+
+def cargar_lote(rutas, tamano, vistas=1, fraccion_recorte=0.8):
+    """(lote float32 (n·vistas, alto, ancho, 3) en escala 0-255, índices de las rutas legibles).
+
+    El modelo reescala internamente (capa Rescaling). El lote vive en un buffer del hilo que se
+    reutiliza: hay que consumirlo (predict) antes de volver a llamar desde el mismo hilo.
+    """
+    alto, ancho = tamano
+    # Con TTA se decodifica más grande para que los recortes no pierdan detalle
+    tamano_decodificado = (int(round(alto / fraccion_recorte)), int(round(ancho / fraccion_recorte))) \
+        if vistas > 1 else tamano
+    lote = _buffer((len(rutas) * vistas, alto, ancho, 3))
+
+    def cargar(i):
+        destino = lote[i * vistas:(i + 1) * vistas]
+        try:
+            if vistas == 1:
+                decodificar(rutas[i], tamano, destino[0])
+            else:
+                vistas_tta(decodificar(rutas[i], tamano_decodificado), vistas, tamano, destino)
+            return True
+        except Exception as e:
+            print(f"❌ No se pudo leer {rutas[i]}: {str(e)}")
+            return False
+
+    legibles = list(_ejecutor().map(cargar, range(len(rutas)))) if len(rutas) > 1 else \
+        [cargar(i) for i in range(len(rutas))]
+    indices = [i for i, legible in enumerate(legibles) if legible]
+    # Las ilegibles no llegan al modelo: se corren las siguientes hacia adelante
+    for posicion, i in enumerate(indices):
+        if posicion != i:
+            lote[posicion * vistas:(posicion + 1) * vistas] = lote[i * vistas:(i + 1) * vistas]
+    return lote[:len(indices) * vistas], indices
+
+
+def crear_manifiesto(ruta_datos):
+    """(rutas, etiquetas, clases) de un dataset organizado en carpetas por tipo"""
+    clases = sorted(d for d in os.listdir(ruta_datos) if os.path.isdir(os.path.join(ruta_datos, d)))
+    rutas, etiquetas = [], []
+    for etiqueta, clase in enumerate(clases):
+        carpeta = os.path.join(ruta_datos, clase)
+        for nombre in sorted(os.listdir(carpeta)):
+            if nombre.lower().endswith(EXTENSIONES_IMAGEN):
+                rutas.append(os.path.join(carpeta, nombre))
+                etiquetas.append(etiqueta)
+    return rutas, np.array(etiquetas, dtype='i4'), clases
+
+
+def dataset(rutas, etiquetas, tamano, tamano_lote, barajar=False, semilla=123):
+    """tf.data de lotes (float32 0-255, etiqueta) decodificados igual que en la inferencia.
+
+    Cada imagen se decodifica una sola vez (caché de uint8); el orden se baraja en cada época.
+    """
+    import tensorflow as tf
+
+    alto, ancho = tamano
+
+    def leer(ruta):
+        return decodificar(ruta.decode(), tamano)
+
+    ds = tf.data.Dataset.from_tensor_slices((list(rutas), np.asarray(etiquetas, dtype='i4')))
+    ds = ds.map(lambda ruta, y: (tf.ensure_shape(tf.numpy_function(leer, [ruta], tf.uint8), (alto, ancho, 3)), y),
+                num_parallel_calls=tf.data.AUTOTUNE, deterministic=True).cache()
+    if barajar:
+        ds = ds.shuffle(len(rutas), seed=semilla, reshuffle_each_iteration=True)
+    return ds.batch(tamano_lote).map(lambda x, y: (tf.cast(x, tf.float32), y))
+
+
+def datasets_desde_carpetas(ruta_datos, tamano, tamano_lote, fraccion_validacion=0.2, semilla=123):
+    """(entrenamiento, validación, clases) con la misma partición al azar en cada corrida"""
+    rutas, etiquetas, clases = crear_manifiesto(ruta_datos)
+    orden = np.random.default_rng(semilla).permutation(len(rutas))
+    corte = len(rutas) - int(len(rutas) * fraccion_validacion)
+    rutas = np.array(rutas)
+    entrenamiento, validacion = orden[:corte], orden[corte:]
+    print(f"📂 {len(rutas)} imágenes: {len(entrenamiento)} de entrenamiento, {len(validacion)} de validación")
+    return (dataset(rutas[entrenamiento], etiquetas[entrenamiento], tamano, tamano_lote, barajar=True,
+                    semilla=semilla),
+            dataset(rutas[validacion], etiquetas[validacion], tamano, tamano_lote),
+            clases)
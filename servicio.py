@@ -0,0 +1,214 @@
+# servicio.py - Servicio HTTP sin interfaz gráfica para consultas y clasificación
+import argparse
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from database import DatabaseManager
+
+
+# Carpetas del servidor desde las que POST /clasificar acepta rutas (las demás se rechazan con 403)
+RAICES_IMAGENES = ('aeronaves',)
+
+
+class AgrupadorInferencia:
+    """Junta peticiones concurrentes en micro-lotes para una sola llamada al modelo"""
+    def __init__(self, clasificador, tamano_lote=32, espera_ms=10):
+        self.clasificador = clasificador
+        self.tamano_lote = tamano_lote
+        self.espera = espera_ms / 1000
+        self.cola = queue.Queue()
+        self.hilo = threading.Thread(target=self._procesar, daemon=True)
+        self.hilo.start()
+
+    def clasificar(self, rutas, timeout=60):
+        """Clasificar rutas y esperar los resultados (llamado desde los hilos HTTP)"""
+        futuros = []
+        for ruta in rutas:
+            futuro = Future()
+            self.cola.put((ruta, futuro))
+            futuros.append(futuro)
+        return [futuro.result(timeout=timeout) for futuro in futuros]
+
+    def _procesar(self):
+        while True:
+            pendientes = [self.cola.get()]
+            limite = time.monotonic() + self.espera
+            while len(pendientes) < self.tamano_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    pendientes.append(self.cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            rutas = [ruta for ruta, _ in pendientes]
+            try:
+                resultados = self.clasificador.predecir_lote(rutas)
+            except Exception as e:
+                for _, futuro in pendientes:
+                    futuro.set_exception(e)
+                continue
+            for (_, futuro), resultado in zip(pendientes, resultados):
+                futuro.set_result(resultado)
+
+
+class ServicioSGMA:
+    """Mantiene base de datos y modelo cargados entre peticiones"""
+    def __init__(self, db_name="sgma_aeronaves.db", clasificador=None, tamano_lote=32, espera_ms=10,
+                 raices_imagenes=RAICES_IMAGENES):
+        self.db = DatabaseManager(db_name, reutilizar_conexiones=True)
+        self.raices_imagenes = [os.path.realpath(raiz) for raiz in raices_imagenes]
+        if clasificador is None:
+            from ai_classifier import ClasificadorAeronaves
+            clasificador = ClasificadorAeronaves()
+            if clasificador.cargar_modelo():
+                clasificador.iniciar_recarga_automatica()
+        self.clasificador = clasificador
+        self.agrupador = AgrupadorInferencia(clasificador, tamano_lote, espera_ms)
+
+        # Consultas de solo lectura expuestas por GET
+        self.consultas = {
+            '/aeronaves': lambda p: self.db.obtener_aeronaves(),
+            '/hangares': lambda p: self.db.obtener_hangares(),
+            '/tecnicos': lambda p: self.db.obtener_tecnicos(),
+            '/piezas': lambda p: self.db.obtener_piezas(),
+            '/alertas': lambda p: self.db.obtener_aeronaves_con_alertas(),
+            '/estadisticas': lambda p: self.db.obtener_estadisticas_generales(),
+            '/mantenimientos': self._mantenimientos,
+            '/clasificaciones': lambda p: self.db.obtener_clasificaciones(
+                int(p['aeronave_id']) if 'aeronave_id' in p else None),
+        }
+
+    def _mantenimientos(self, parametros):
+        if 'aeronave_id' in parametros:
+            return self.db.obtener_mantenimientos_por_aeronave(int(parametros['aeronave_id']))
+        return self.db.obtener_mantenimientos()
+
+    def consultar(self, ruta, parametros):
+        if ruta.startswith('/aeronaves/'):
+            return self.db.obtener_aeronave_por_id(int(ruta.rsplit('/', 1)[1]))
+        if ruta not in self.consultas:
+            raise KeyError(ruta)
+        return self.consultas[ruta](parametros)
+
+    def validar_ruta(self, ruta):
+        """Ruta real de la imagen si está dentro de alguna raíz permitida; si no, PermissionError"""
+        real = os.path.realpath(ruta)
+        for raiz in self.raices_imagenes:
+            if os.path.commonpath([real, raiz]) == raiz:
+                return real
+        raise PermissionError(f"Ruta fuera de las carpetas de imágenes permitidas: {ruta}")
+
+    def clasificar(self, rutas):
+        if not isinstance(rutas, list) or not all(isinstance(ruta, str) for ruta in rutas):
+            raise ValueError("'rutas' debe ser una lista de textos")
+        resultados = self.agrupador.clasificar([self.validar_ruta(ruta) for ruta in rutas])
+        return [{'ruta': ruta, 'tipo': tipo, 'confianza': float(confianza)}
+                for ruta, (tipo, confianza) in zip(rutas, resultados)]
+
+    def clasificar_bytes(self, contenido, extension='.jpg'):
+        """Clasificar una imagen recibida en el cuerpo de la petición"""
+        fd, temporal = tempfile.mkstemp(suffix=extension)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(contenido)
+            tipo, confianza = self.agrupador.clasificar([temporal])[0]
+            return {'tipo': tipo, 'confianza': float(confianza)}
+        finally:
+            os.remove(temporal)
+
+
+def crear_manejador(servicio):
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Cabeceras y cuerpo van en escrituras separadas; sin esto Nagle agrega ~40 ms
+        disable_nagle_algorithm = True
+
+        def log_message(self, formato, *args):
+            # Sin registro por petición: en pruebas de carga domina el costo
+            pass
+
+        def _responder(self, estado, datos):
+            cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode()
+            self.send_response(estado)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == '/salud':
+                self._responder(200, {'estado': 'ok',
+                                      'version_modelo': servicio.clasificador.version_modelo})
+                return
+            try:
+                self._responder(200, servicio.consultar(url.path, parametros))
+            except KeyError:
+                self._responder(404, {'error': f"Ruta desconocida: {url.path}"})
+            except ValueError as e:
+                self._responder(400, {'error': str(e)})
+            except Exception as e:
+                self._responder(500, {'error': str(e)})
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/clasificar':
+                self._responder(404, {'error': "Ruta desconocida"})
+                return
+            longitud = int(self.headers.get('Content-Length', 0))
+            contenido = self.rfile.read(longitud)
+            tipo_contenido = self.headers.get('Content-Type', '')
+            try:
+                if tipo_contenido.startswith('image/'):
+                    extension = '.' + tipo_contenido.split('/', 1)[1].replace('jpeg', 'jpg')
+                    self._responder(200, servicio.clasificar_bytes(contenido, extension))
+                else:
+                    rutas = json.loads(contenido)['rutas']
+                    self._responder(200, servicio.clasificar(rutas))
+            except (ValueError, KeyError) as e:
+                self._responder(400, {'error': f"Petición inválida: {str(e)}"})
+            except PermissionError as e:
+                self._responder(403, {'error': str(e)})
+            except Exception as e:
+                self._responder(500, {'error': str(e)})
+
+    return Manejador
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP del SGMA")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8750)
+    parser.add_argument('--db', default='sgma_aeronaves.db')
+    parser.add_argument('--lote', type=int, default=32, help="Tamaño máximo de micro-lote")
+    parser.add_argument('--espera-ms', type=float, default=10,
+                        help="Tiempo máximo que una petición espera a otras para formar lote")
+    parser.add_argument('--raiz-imagenes', action='append', default=None,
+                        help=f"Carpeta desde la que se aceptan rutas en POST /clasificar (repetible; "
+                             f"por defecto {', '.join(RAICES_IMAGENES)}). Las imágenes subidas se aceptan siempre")
+    args = parser.parse_args()
+
+    servicio = ServicioSGMA(args.db, tamano_lote=args.lote, espera_ms=args.espera_ms,
+                            raices_imagenes=args.raiz_imagenes or RAICES_IMAGENES)
+    servidor = ThreadingHTTPServer((args.host, args.puerto), crear_manejador(servicio))
+    servidor.daemon_threads = True
+    print(f"🌐 Servicio SGMA escuchando en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("⏹️ Servicio detenido")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
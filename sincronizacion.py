@@ -0,0 +1,499 @@
+# sincronizacion.py - Registro de cambios (CDC) y sincronización incremental entre bases
+import argparse
+import glob
+import gzip
+import json
+import os
+import sqlite3
+import uuid
+
+
+# Tablas que no se replican: estado local, derivado o de la propia sincronización
+TABLAS_LOCALES = {'registro_cambios', 'sincronizacion_estado', 'sincronizacion_ids',
+                  'sincronizacion_pendientes', 'configuracion', 'alertas', 'sqlite_sequence', 'sqlite_stat1'}
+
+# Columnas que cada base recalcula por su cuenta
+COLUMNAS_LOCALES = {'id', 'version', 'ocupacion'}
+
+# Clave natural para reconocer la misma fila creada en dos bases distintas
+CLAVES_NATURALES = {
+    'aeronaves': 'matricula',
+    'tecnicos': 'licencia',
+    'hangares': 'nombre',
+    'piezas': 'nombre',
+}
+
+FORMATO_LOTE = 1
+
+
+class ErrorSincronizacion(Exception):
+    """Lote fuera de orden o de otra versión de formato"""
+
+
+# --- Captura de cambios (se instala desde DatabaseManager.crear_tablas) ---
+
+def crear_captura_cambios(cursor):
+    """Crear el registro de cambios y (re)generar los triggers de cada tabla replicada"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS registro_cambios (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            fila_id INTEGER NOT NULL,
+            operacion TEXT NOT NULL,
+            origen TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            datos TEXT NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_registro_cambios_fila ON registro_cambios (tabla, fila_id)")
+
+    # Una sola fila: identidad de esta base y bandera de aplicación de cambios remotos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sincronizacion_estado (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            base_local TEXT NOT NULL,
+            aplicando_origen TEXT,
+            aplicando_fecha TEXT,
+            capturar INTEGER NOT NULL DEFAULT 1
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO sincronizacion_estado (id, base_local) VALUES (1, ?)",
+                   (uuid.uuid4().hex[:12],))
+
+    # Filas recibidas de otras bases: (tabla, base de origen, id en origen) -> id local
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sincronizacion_ids (
+            tabla TEXT NOT NULL,
+            origen TEXT NOT NULL,
+            id_origen INTEGER NOT NULL,
+            id_local INTEGER NOT NULL,
+            PRIMARY KEY (tabla, origen, id_origen)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sincronizacion_ids_local ON sincronizacion_ids (tabla, id_local)")
+
+    # Cambios recibidos que no se pudieron aplicar (p. ej. falta la fila padre): se reintentan
+    # en cada lote siguiente del mismo origen, así el cursor puede avanzar sin perderlos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sincronizacion_pendientes (
+            origen TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            cambio TEXT NOT NULL,
+            error TEXT NOT NULL,
+            intentos INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (origen, seq)
+        )
+    ''')
+
+    for tabla in tablas_replicadas(cursor):
+        columnas = [c[1] for c in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()]
+        for operacion in ('INSERT', 'UPDATE', 'DELETE'):
+            nombre = f"trg_cdc_{tabla}_{operacion.lower()}"
+            sql = _sql_trigger(nombre, tabla, columnas, operacion)
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (nombre,))
+            actual = cursor.fetchone()
+            # Tras agregar columnas el trigger se regenera con la lista nueva
+            if actual is None or actual[0] != sql:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+                cursor.execute(sql)
+
+
+def tablas_replicadas(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+    tablas = []
+    for (tabla,) in cursor.fetchall():
+        if tabla in TABLAS_LOCALES or tabla.startswith('historial_'):
+            continue
+        columnas = [c[1] for c in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()]
+        if 'id' in columnas:
+            tablas.append(tabla)
+    return tablas
+
+
+def _condicion_update(columnas):
+    """Filtro del trigger de UPDATE: un solo registro por modificación real"""
+    if 'version' in columnas:
+        # El UPDATE anidado de trg_version_* vuelve a disparar el trigger: solo cuenta el que cambia la versión
+        return "NEW.version <> OLD.version"
+    # Cambios solo en columnas locales (p. ej. hangares.ocupacion) no se replican
+    return "(" + " OR ".join(f"NEW.{c} IS NOT OLD.{c}" for c in columnas if c not in COLUMNAS_LOCALES) + ")"
+
+
+def _sql_trigger(nombre, tabla, columnas, operacion):
+    fila = 'OLD' if operacion == 'DELETE' else 'NEW'
+    datos = ", ".join(f"'{columna}', {fila}.{columna}" for columna in columnas)
+    condicion = f" AND {_condicion_update(columnas)}" if operacion == 'UPDATE' else ""
+    return (f"CREATE TRIGGER {nombre} AFTER {operacion} ON {tabla}\n"
+            f"WHEN (SELECT capturar FROM sincronizacion_estado WHERE id = 1){condicion}\n"
+            f"BEGIN\n"
+            f"    INSERT INTO registro_cambios (tabla, fila_id, operacion, origen, fecha, datos)\n"
+            f"    SELECT '{tabla}', {fila}.id, '{operacion[0]}', COALESCE(aplicando_origen, base_local),\n"
+            f"           COALESCE(aplicando_fecha, strftime('%Y-%m-%d %H:%M:%f', 'now')), json_object({datos})\n"
+            f"    FROM sincronizacion_estado WHERE id = 1;\n"
+            f"END")
+
+
+def pausar_captura(cursor, pausar=True):
+    """Cargas masivas locales (p. ej. datos sintéticos) sin llenar el registro de cambios"""
+    cursor.execute("UPDATE sincronizacion_estado SET capturar = ? WHERE id = 1", (0 if pausar else 1,))
+
+
+# --- Traducción de identidades entre bases ---
+
+class _Identidades:
+    """Resolver ids locales <-> claves globales (base de origen, id en origen) con caché por lote"""
+    def __init__(self, cursor, base_local):
+        self.cursor = cursor
+        self.base_local = base_local
+        self._claves = {}
+        self._naturales = {}
+        self._llaves_foraneas = {}
+        self._columnas = {}
+
+    def columnas(self, tabla):
+        if tabla not in self._columnas:
+            self._columnas[tabla] = [c[1] for c in self.cursor.execute(f"PRAGMA table_info({tabla})").fetchall()]
+        return self._columnas[tabla]
+
+    def llaves_foraneas(self, tabla):
+        """{columna: tabla referenciada}, leído del esquema"""
+        if tabla not in self._llaves_foraneas:
+            filas = self.cursor.execute(f"PRAGMA foreign_key_list({tabla})").fetchall()
+            self._llaves_foraneas[tabla] = {f[3]: f[2] for f in filas}
+        return self._llaves_foraneas[tabla]
+
+    def clave(self, tabla, id_local):
+        llave = (tabla, id_local)
+        if llave not in self._claves:
+            self.cursor.execute("SELECT origen, id_origen FROM sincronizacion_ids WHERE tabla = ? AND id_local = ?",
+                                llave)
+            fila = self.cursor.fetchone()
+            self._claves[llave] = list(fila) if fila else [self.base_local, id_local]
+        return self._claves[llave]
+
+    def natural(self, tabla, id_local):
+        columna = CLAVES_NATURALES.get(tabla)
+        if columna is None:
+            return None
+        llave = (tabla, id_local)
+        if llave not in self._naturales:
+            self.cursor.execute(f"SELECT {columna} FROM {tabla} WHERE id = ?", (id_local,))
+            fila = self.cursor.fetchone()
+            self._naturales[llave] = fila[0] if fila else None
+        return self._naturales[llave]
+
+    def local(self, tabla, clave, natural=None):
+        """Id local de una fila remota, o None si todavía no existe aquí"""
+        origen, id_origen = clave
+        if origen == self.base_local:
+            self.cursor.execute(f"SELECT id FROM {tabla} WHERE id = ?", (id_origen,))
+            fila = self.cursor.fetchone()
+            return fila[0] if fila else None
+        self.cursor.execute("SELECT id_local FROM sincronizacion_ids WHERE tabla = ? AND origen = ? AND id_origen = ?",
+                            (tabla, origen, id_origen))
+        fila = self.cursor.fetchone()
+        if fila:
+            return fila[0]
+        columna = CLAVES_NATURALES.get(tabla)
+        if columna and natural is not None:
+            # Misma matrícula/licencia registrada por separado: es la misma fila
+            self.cursor.execute(f"SELECT id FROM {tabla} WHERE {columna} = ?", (natural,))
+            fila = self.cursor.fetchone()
+            if fila:
+                self.vincular(tabla, clave, fila[0])
+                return fila[0]
+        return None
+
+    def vincular(self, tabla, clave, id_local):
+        origen, id_origen = clave
+        if origen == self.base_local:
+            return
+        self.cursor.execute("""INSERT OR REPLACE INTO sincronizacion_ids (tabla, origen, id_origen, id_local)
+                               VALUES (?, ?, ?, ?)""", (tabla, origen, id_origen, id_local))
+        self._claves[(tabla, id_local)] = list(clave)
+
+
+def base_local(cursor):
+    cursor.execute("SELECT base_local FROM sincronizacion_estado WHERE id = 1")
+    return cursor.fetchone()[0]
+
+
+# --- Exportación ---
+
+def exportar_cambios(db, carpeta, destino=None, desde=None, tamano_lote=5000):
+    """Escribir en lotes .jsonl.gz los cambios con seq > desde; devuelve las rutas creadas.
+
+    Con 'destino' se omiten los cambios que vinieron de esa base y el cursor queda guardado
+    para la próxima exportación.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    if desde is None:
+        desde = int(db.obtener_configuracion(f'sync_enviado_{destino}', 0)) if destino else 0
+
+    conn = db.crear_conexion()
+    cursor = conn.cursor()
+    origen = base_local(cursor)
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM registro_cambios")
+    hasta = cursor.fetchone()[0]
+    identidades = _Identidades(conn.cursor(), origen)
+
+    rutas = []
+    siguiente = desde
+    while siguiente < hasta:
+        # Rango por clave primaria: el costo depende de los cambios, no del tamaño de las tablas
+        cursor.execute("""SELECT seq, tabla, fila_id, operacion, origen, fecha, datos FROM registro_cambios
+                          WHERE seq > ? AND seq <= ? ORDER BY seq LIMIT ?""", (siguiente, hasta, tamano_lote))
+        filas = cursor.fetchall()
+        ultimo = filas[-1][0]
+
+        # Compactar: de varias modificaciones de la misma fila basta el último estado
+        compactados = {}
+        for seq, tabla, fila_id, operacion, origen_cambio, fecha, datos in filas:
+            if origen_cambio == destino:
+                continue
+            # Cada fila sale en la posición de su último cambio: el padre insertado después
+            # de que un hijo cambiara de referencia sigue llegando antes que el hijo
+            compactados.pop((tabla, fila_id), None)
+            compactados[(tabla, fila_id)] = (seq, tabla, fila_id, operacion, origen_cambio, fecha, datos)
+
+        ruta = os.path.join(carpeta, f"cambios_{origen}_{siguiente:012d}_{ultimo:012d}.jsonl.gz")
+        with gzip.open(ruta + '.tmp', 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'formato': FORMATO_LOTE, 'origen': origen, 'desde': siguiente,
+                                'hasta': ultimo, 'cambios': len(compactados)}) + '\n')
+            for seq, tabla, fila_id, operacion, origen_cambio, fecha, datos in compactados.values():
+                f.write(json.dumps(_serializar_cambio(identidades, seq, tabla, fila_id, operacion,
+                                                      origen_cambio, fecha, json.loads(datos)),
+                                   ensure_ascii=False) + '\n')
+        os.replace(ruta + '.tmp', ruta)
+        rutas.append(ruta)
+        siguiente = ultimo
+
+    conn.close()
+    if destino:
+        db.guardar_configuracion(f'sync_enviado_{destino}', hasta)
+    return rutas
+
+
+def _serializar_cambio(identidades, seq, tabla, fila_id, operacion, origen, fecha, datos):
+    referencias = {}
+    for columna, tabla_ref in identidades.llaves_foraneas(tabla).items():
+        valor = datos.get(columna)
+        if valor is not None:
+            referencias[columna] = {'clave': identidades.clave(tabla_ref, valor),
+                                    'natural': identidades.natural(tabla_ref, valor)}
+    columna_natural = CLAVES_NATURALES.get(tabla)
+    return {
+        'seq': seq,
+        'tabla': tabla,
+        'operacion': 'D' if operacion == 'D' else 'U',
+        'origen': origen,
+        'fecha': fecha,
+        'clave': identidades.clave(tabla, fila_id),
+        'natural': datos.get(columna_natural) if columna_natural else None,
+        'datos': {c: v for c, v in datos.items() if c not in COLUMNAS_LOCALES},
+        'referencias': referencias,
+    }
+
+
+# --- Aplicación ---
+
+def aplicar_lote(db, ruta):
+    """Aplicar un lote en una sola transacción; devuelve un resumen con conflictos y aeronaves afectadas"""
+    with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+        cabecera = json.loads(f.readline())
+        if cabecera.get('formato') != FORMATO_LOTE:
+            raise ErrorSincronizacion(f"Formato de lote no soportado: {cabecera.get('formato')}")
+        emisor = cabecera['origen']
+        aplicado = int(db.obtener_configuracion(f'sync_aplicado_{emisor}', 0))
+        resumen = {'lote': os.path.basename(ruta), 'aplicados': 0, 'descartados': 0,
+                   'conflictos': [], 'recuperados': 0, 'pendientes': 0, 'aeronaves': set()}
+        if cabecera['hasta'] <= aplicado:
+            return resumen
+        if cabecera['desde'] > aplicado:
+            raise ErrorSincronizacion(f"Faltan cambios de {emisor} entre {aplicado} y {cabecera['desde']}")
+
+        conn = db.crear_conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            if emisor == base_local(cursor):
+                raise ErrorSincronizacion("El lote fue exportado por esta misma base")
+            identidades = _Identidades(cursor, base_local(cursor))
+            fallidos = {}
+            for linea in f:
+                cambio = json.loads(linea)
+                if cambio['seq'] <= aplicado:
+                    continue
+                error = _aplicar_registrando(identidades, cambio, resumen)
+                if error is not None:
+                    cursor.execute("""INSERT INTO sincronizacion_pendientes (origen, seq, cambio, error)
+                                      VALUES (?, ?, ?, ?)
+                                      ON CONFLICT (origen, seq) DO UPDATE SET
+                                          error = excluded.error, intentos = intentos + 1""",
+                                   (emisor, cambio['seq'], json.dumps(cambio, ensure_ascii=False), error))
+                    fallidos[cambio['seq']] = (cambio['tabla'], cambio['clave'], error)
+
+            # Los pendientes (de este lote o de anteriores) pueden resolverse con lo que trajo este
+            cursor.execute("SELECT seq, cambio FROM sincronizacion_pendientes WHERE origen = ? ORDER BY seq",
+                           (emisor,))
+            for seq, texto in cursor.fetchall():
+                error = _aplicar_registrando(identidades, json.loads(texto), resumen)
+                if error is None:
+                    resumen['recuperados'] += 1
+                    fallidos.pop(seq, None)
+                    cursor.execute("DELETE FROM sincronizacion_pendientes WHERE origen = ? AND seq = ?", (emisor, seq))
+                else:
+                    cursor.execute("""UPDATE sincronizacion_pendientes SET error = ?, intentos = intentos + 1
+                                      WHERE origen = ? AND seq = ?""", (error, emisor, seq))
+            resumen['conflictos'] = list(fallidos.values())
+            cursor.execute("SELECT COUNT(*) FROM sincronizacion_pendientes WHERE origen = ?", (emisor,))
+            resumen['pendientes'] = cursor.fetchone()[0]
+
+            cursor.execute("UPDATE sincronizacion_estado SET aplicando_origen = NULL, aplicando_fecha = NULL WHERE id = 1")
+            cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, ?)",
+                           (f'sync_aplicado_{emisor}', str(cabecera['hasta'])))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    resumen['aeronaves'].discard(None)
+    return resumen
+
+
+def _aplicar_registrando(identidades, cambio, resumen):
+    """Aplicar un cambio en su propio savepoint; devuelve el error de integridad o None"""
+    cursor = identidades.cursor
+    # Los cambios aplicados quedan registrados con su origen y fecha originales
+    cursor.execute("UPDATE sincronizacion_estado SET aplicando_origen = ?, aplicando_fecha = ? WHERE id = 1",
+                   (cambio['origen'], cambio['fecha']))
+    cursor.execute("SAVEPOINT cambio")
+    try:
+        if _aplicar_cambio(identidades, cambio):
+            resumen['aplicados'] += 1
+        else:
+            resumen['descartados'] += 1
+        cursor.execute("RELEASE cambio")
+    except sqlite3.IntegrityError as e:
+        cursor.execute("ROLLBACK TO cambio")
+        cursor.execute("RELEASE cambio")
+        return str(e)
+    if cambio['tabla'] == 'aeronaves':
+        resumen['aeronaves'].add(identidades.local('aeronaves', cambio['clave'], cambio['natural']))
+    elif 'aeronave_id' in cambio['referencias']:
+        ref = cambio['referencias']['aeronave_id']
+        resumen['aeronaves'].add(identidades.local('aeronaves', ref['clave'], ref['natural']))
+    return None
+
+
+def _aplicar_cambio(identidades, cambio):
+    """Upsert o borrado de una fila remota; gana la modificación más reciente"""
+    cursor = identidades.cursor
+    tabla = cambio['tabla']
+    columnas_locales = identidades.columnas(tabla)
+    if not columnas_locales:
+        raise sqlite3.IntegrityError(f"La tabla {tabla} no existe en esta base")
+    id_local = identidades.local(tabla, cambio['clave'], cambio['natural'])
+
+    if id_local is not None:
+        cursor.execute("SELECT MAX(fecha) FROM registro_cambios WHERE tabla = ? AND fila_id = ?", (tabla, id_local))
+        ultima = cursor.fetchone()[0]
+        if ultima is not None and ultima > cambio['fecha']:
+            return False
+
+    if cambio['operacion'] == 'D':
+        if id_local is not None:
+            cursor.execute(f"DELETE FROM {tabla} WHERE id = ?", (id_local,))
+            cursor.execute("DELETE FROM sincronizacion_ids WHERE tabla = ? AND id_local = ?", (tabla, id_local))
+        return True
+
+    valores = {c: v for c, v in cambio['datos'].items() if c in columnas_locales}
+    for columna, referencia in cambio['referencias'].items():
+        if columna in valores:
+            tabla_ref = identidades.llaves_foraneas(tabla).get(columna)
+            valores[columna] = identidades.local(tabla_ref, referencia['clave'], referencia['natural'])
+
+    if id_local is None:
+        columnas = ", ".join(valores)
+        cursor.execute(f"INSERT INTO {tabla} ({columnas}) VALUES ({', '.join('?' * len(valores))})",
+                       list(valores.values()))
+        identidades.vincular(tabla, cambio['clave'], cursor.lastrowid)
+    else:
+        asignaciones = ", ".join(f"{c} = ?" for c in valores)
+        cursor.execute(f"UPDATE {tabla} SET {asignaciones} WHERE id = ?", [*valores.values(), id_local])
+    return True
+
+
+def aplicar_carpeta(db, carpeta):
+    """Aplicar en orden todos los lotes de una carpeta (los ya aplicados se saltan)"""
+    resumenes = []
+    for ruta in sorted(glob.glob(os.path.join(carpeta, 'cambios_*.jsonl.gz'))):
+        resumenes.append(aplicar_lote(db, ruta))
+    return resumenes
+
+
+def estado(db):
+    """Identidad de la base, último seq y cursores de envío/recepción"""
+    conn = db.crear_conexion()
+    cursor = conn.cursor()
+    resultado = {'base_local': base_local(cursor)}
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM registro_cambios")
+    resultado['ultimo_seq'] = cursor.fetchone()[0]
+    cursor.execute("SELECT clave, valor FROM configuracion WHERE clave LIKE 'sync_%'")
+    resultado['cursores'] = dict(cursor.fetchall())
+    cursor.execute("SELECT origen, COUNT(*) FROM sincronizacion_pendientes GROUP BY origen")
+    resultado['pendientes'] = dict(cursor.fetchall())
+    conn.close()
+    return resultado
+
+
+def main():
+    from database import DatabaseManager
+    from motor_alertas import MotorAlertas
+
+    parser = argparse.ArgumentParser(description="Sincronización incremental entre bases del SGMA")
+    parser.add_argument('--db', default='sgma_aeronaves.db')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p_exportar = subparsers.add_parser('exportar', help="Exportar cambios pendientes como lotes comprimidos")
+    p_exportar.add_argument('carpeta')
+    p_exportar.add_argument('--destino', help="Base destino (recuerda el cursor y evita devolverle sus cambios)")
+    p_exportar.add_argument('--desde', type=int, default=None, help="Reenviar desde este seq")
+    p_exportar.add_argument('--lote', type=int, default=5000)
+
+    p_aplicar = subparsers.add_parser('aplicar', help="Aplicar los lotes de una carpeta o un archivo")
+    p_aplicar.add_argument('ruta')
+
+    subparsers.add_parser('estado', help="Mostrar identidad y cursores")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    if args.comando == 'exportar':
+        rutas = exportar_cambios(db, args.carpeta, args.destino, args.desde, args.lote)
+        print(f"📦 {len(rutas)} lotes escritos en {args.carpeta}")
+    elif args.comando == 'aplicar':
+        try:
+            if os.path.isdir(args.ruta):
+                resumenes = aplicar_carpeta(db, args.ruta)
+            else:
+                resumenes = [aplicar_lote(db, args.ruta)]
+        except ErrorSincronizacion as e:
+            print(f"❌ {str(e)}")
+            return
+        aeronaves = set()
+        for r in resumenes:
+            aeronaves |= r['aeronaves']
+            print(f"✅ {r['lote']}: {r['aplicados']} aplicados, {r['descartados']} descartados "
+                  f"(más recientes aquí), {len(r['conflictos'])} conflictos, {r['recuperados']} pendientes "
+                  f"recuperados, {r['pendientes']} pendientes de reintento")
+            for tabla, clave, error in r['conflictos']:
+                print(f"   ⚠️ {tabla} {clave[0]}/{clave[1]}: {error}")
+        # Las alertas de las aeronaves recibidas se recalculan aquí
+        MotorAlertas(db).evaluar_aeronaves(aeronaves)
+    else:
+        print(json.dumps(estado(db), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# test_historial.py - Lectura del historial a una fecha, con el mismo reloj que el registro de cambios
+import time
+from datetime import datetime
+
+import pytest
+
+import historial
+from database import DatabaseManager
+
+
+@pytest.fixture
+def hora_bolivia(monkeypatch):
+    # Fuera de UTC: mezclar hora local y UTC movería los instantes cuatro horas
+    monkeypatch.setenv('TZ', 'America/La_Paz')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _instante():
+    time.sleep(0.01)
+    ahora = datetime.now()
+    time.sleep(0.01)
+    return ahora
+
+
+def _horas(fila):
+    return None if fila is None else fila['horas_vuelo']
+
+
+def test_leer_a_fecha_en_cada_instante(tmp_path, hora_bolivia):
+    db = DatabaseManager(str(tmp_path / "historial.db"))
+    antes = _instante()
+    db.insertar_aeronave("CP-HIST", "Cessna 172", "Cessna", 1157, "Liviana", 10, None)
+    conn = db.crear_conexion()
+    aeronave_id = conn.execute("SELECT id FROM aeronaves WHERE matricula = 'CP-HIST'").fetchone()[0]
+    conn.close()
+    alta = _instante()
+    db.actualizar_horas_vuelo(aeronave_id, 20)
+    actualizada = _instante()
+    conn = db.crear_conexion()
+    conn.execute("DELETE FROM aeronaves WHERE id = ?", (aeronave_id,))
+    conn.commit()
+    conn.close()
+    borrada = _instante()
+
+    assert [_horas(historial.leer_a_fecha(db, 'aeronaves', aeronave_id, instante))
+            for instante in (antes, alta, actualizada, borrada)] == [None, 10, 20, None]
+    # También como texto local
+    assert _horas(historial.leer_a_fecha(db, 'aeronaves', aeronave_id, alta.strftime('%Y-%m-%d %H:%M:%S.%f'))) == 10
+
+    def en_tabla(instante):
+        return [_horas(f) for f in historial.tabla_a_fecha(db, 'aeronaves', instante) if f['fila_id'] == aeronave_id]
+
+    assert [en_tabla(instante) for instante in (antes, alta, actualizada, borrada)] == [[], [10], [20], []]
+    assert [_horas(f) for f in historial.tabla_a_fecha(db, 'aeronaves', actualizada, fila_ids=[aeronave_id])] == [20]
+
+
+def test_linea_tiempo_y_registro_de_cambios_usan_el_mismo_reloj(tmp_path, hora_bolivia):
+    db = DatabaseManager(str(tmp_path / "historial.db"))
+    db.insertar_aeronave("CP-HIST", "Cessna 172", "Cessna", 1157, "Liviana", 10, None)
+    conn = db.crear_conexion()
+    aeronave_id = conn.execute("SELECT id FROM aeronaves WHERE matricula = 'CP-HIST'").fetchone()[0]
+    conn.close()
+    db.actualizar_horas_vuelo(aeronave_id, 20)
+
+    versiones = historial.linea_tiempo(db, 'aeronaves', aeronave_id)
+    assert [v['cambios'] for v in versiones] == [{}, {'horas_vuelo': (10, 20), 'version': (0, 1)}]
+    assert versiones[0]['valido_hasta'] == versiones[1]['valido_desde']
+    assert versiones[1]['valido_hasta'] == historial.VIGENTE
+
+    conn = db.crear_conexion()
+    fechas = [f[0] for f in conn.execute("""SELECT fecha FROM registro_cambios
+                                           WHERE tabla = 'aeronaves' AND fila_id = ? ORDER BY seq""",
+                                        (aeronave_id,))]
+    conn.close()
+    assert fechas == [v['valido_desde'] for v in versiones]
@@ -0,0 +1,72 @@
+# test_motor_reglas.py - Editar una regla se refleja igual en SQL y en NumPy para modelos del catálogo
+import copy
+
+import motor_reglas
+from database import DatabaseManager
+from modelo_flota import ModeloFlota
+
+
+def _base(tmp_path):
+    db = DatabaseManager(str(tmp_path / "reglas.db"))
+    db.insertar_aeronave("CP-TEST", "Cessna 172", "Cessna", 1157, "Liviana", 120, None)
+    conn = db.crear_conexion()
+    aeronave_id = conn.execute("SELECT id FROM aeronaves WHERE matricula = 'CP-TEST'").fetchone()[0]
+    conn.close()
+    return db, aeronave_id
+
+
+def _vencida(db, motor, aeronave_id):
+    """(según predicado_sql, según evaluar) para la aeronave"""
+    por_sql = [f[0] for f in db.obtener_aeronaves_con_alertas([aeronave_id], reglas=motor)]
+    evaluacion = ModeloFlota(db, motor).evaluar_reglas()
+    por_numpy = set(evaluacion.ids[motor_reglas.vencidas(evaluacion)].tolist())
+    return aeronave_id in por_sql, aeronave_id in por_numpy
+
+
+def _definicion(motor):
+    return copy.deepcopy(motor.definicion)
+
+
+def test_intervalo_de_categoria_aplica_a_modelo_catalogado(tmp_path):
+    db, aeronave_id = _base(tmp_path)
+    motor = motor_reglas.reglas(db)
+    # 120 h desde el último mantenimiento con 100 h de intervalo para Liviana
+    assert motor.intervalo("Liviana", "Cessna 172") == 100
+    assert _vencida(db, motor, aeronave_id) == (True, True)
+
+    definicion = _definicion(motor)
+    for intervalo in definicion['intervalos']:
+        if intervalo.get('categoria') == 'Liviana':
+            intervalo['horas'] = 150
+    motor_reglas.guardar_reglas(db, definicion)
+
+    assert motor.intervalo("Liviana", "Cessna 172") == 150
+    assert _vencida(db, motor, aeronave_id) == (False, False)
+
+
+def test_intervalo_propio_del_tipo_pisa_a_la_categoria(tmp_path):
+    db, aeronave_id = _base(tmp_path)
+    motor = motor_reglas.reglas(db)
+    definicion = _definicion(motor)
+    definicion['intervalos'].append({'componente': motor_reglas.COMPONENTE_GENERAL, 'tipo': 'Cessna-172',
+                                     'horas': 200})
+    motor_reglas.guardar_reglas(db, definicion)
+
+    assert motor.intervalo("Liviana", "Cessna 172") == 200
+    assert _vencida(db, motor, aeronave_id) == (False, False)
+
+
+def test_limites_de_peso_recategorizan_modelo_catalogado(tmp_path):
+    db, aeronave_id = _base(tmp_path)
+    motor = motor_reglas.reglas(db)
+    definicion = _definicion(motor)
+    definicion['categorias'][0][1] = 1000
+    motor_reglas.guardar_reglas(db, definicion)
+
+    assert motor.categoria(1157, "Cessna 172") == "Mediana"
+    conn = db.crear_conexion()
+    categoria = conn.execute("SELECT categoria FROM aeronaves WHERE id = ?", (aeronave_id,)).fetchone()[0]
+    conn.close()
+    assert categoria == "Mediana"
+    # Mediana: 150 h de intervalo, 120 h de uso
+    assert _vencida(db, motor, aeronave_id) == (False, False)
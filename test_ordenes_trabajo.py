@@ -0,0 +1,109 @@
+# test_ordenes_trabajo.py - Transiciones de las órdenes de trabajo: todo o nada
+import pytest
+
+from database import DatabaseManager
+from ordenes_trabajo import (GestorOrdenesTrabajo, ErrorOrdenTrabajo, PROGRAMADO, EN_PROCESO,
+                             COMPLETADO, CANCELADO)
+
+
+def _consultar(db, sql, parametros=()):
+    conn = db.crear_conexion()
+    filas = conn.execute(sql, parametros).fetchall()
+    conn.close()
+    return filas
+
+
+def _ejecutar(db, sql, parametros=()):
+    conn = db.crear_conexion()
+    cursor = conn.execute(sql, parametros)
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "ordenes.db"))
+    db.insertar_aeronave("CP-OT", "Cessna 172", "Cessna", 1157, "Liviana", 300, None)
+    return db
+
+
+def _aeronave(db):
+    return _consultar(db, "SELECT id FROM aeronaves WHERE matricula = 'CP-OT'")[0][0]
+
+
+def _orden(db, fecha="2026-03-10"):
+    tecnico_id = _consultar(db, "SELECT MIN(id) FROM tecnicos")[0][0]
+    db.insertar_mantenimiento(_aeronave(db), "Revisión", fecha, tecnico_id, "Prueba")
+    return _consultar(db, "SELECT MAX(id) FROM mantenimientos")[0][0]
+
+
+def _estado(db, mantenimiento_id):
+    return _consultar(db, "SELECT estado FROM mantenimientos WHERE id = ?", (mantenimiento_id,))[0][0]
+
+
+def _pieza(db, stock):
+    return _ejecutar(db, """INSERT INTO piezas (nombre, stock, precio, fecha_actualizacion)
+                            VALUES ('Filtro', ?, 10, '2026-01-01')""", (stock,))
+
+
+def test_transiciones_rechazadas(db):
+    gestor = GestorOrdenesTrabajo(db)
+    orden = _orden(db)
+    # No se completa lo que no empezó
+    with pytest.raises(ErrorOrdenTrabajo):
+        gestor.completar(orden)
+    assert _estado(db, orden) == PROGRAMADO
+
+    gestor.iniciar(orden)
+    with pytest.raises(ErrorOrdenTrabajo):
+        gestor.iniciar(orden)
+    gestor.cancelar(orden)
+    assert _estado(db, orden) == CANCELADO
+    # Los estados finales no tienen salida
+    for transicion in (gestor.iniciar, gestor.completar, gestor.cancelar):
+        with pytest.raises(ErrorOrdenTrabajo):
+            transicion(orden)
+    assert _estado(db, orden) == CANCELADO
+
+    with pytest.raises(ErrorOrdenTrabajo):
+        gestor.iniciar(999999)
+
+
+def test_stock_insuficiente_deshace_la_transicion(db):
+    gestor = GestorOrdenesTrabajo(db)
+    alcanza, falta = _pieza(db, 5), _pieza(db, 1)
+    orden = _orden(db)
+    gestor.iniciar(orden)
+    antes = _consultar(db, "SELECT horas_ultimo_mantenimiento FROM aeronaves WHERE id = ?", (_aeronave(db),))
+
+    with pytest.raises(ErrorOrdenTrabajo):
+        gestor.completar(orden, piezas=[(alcanza, 2), (falta, 3)])
+
+    assert _estado(db, orden) == EN_PROCESO
+    assert _consultar(db, "SELECT stock FROM piezas WHERE id IN (?, ?) ORDER BY id", (alcanza, falta)) == [(5,), (1,)]
+    assert _consultar(db, "SELECT COUNT(*) FROM mantenimiento_piezas WHERE mantenimiento_id = ?", (orden,)) == [(0,)]
+    assert _consultar(db, "SELECT horas_ultimo_mantenimiento FROM aeronaves WHERE id = ?", (_aeronave(db),)) == antes
+
+    # Con stock suficiente la misma orden se completa y descuenta
+    gestor.completar(orden, piezas=[(alcanza, 2)])
+    assert _estado(db, orden) == COMPLETADO
+    assert _consultar(db, "SELECT stock FROM piezas WHERE id = ?", (alcanza,)) == [(3,)]
+    assert _consultar(db, "SELECT horas_ultimo_mantenimiento FROM aeronaves WHERE id = ?", (_aeronave(db),)) == \
+        [(300,)]
+
+
+def test_completar_del_dia_solo_cierra_las_en_proceso_de_esa_fecha(db):
+    gestor = GestorOrdenesTrabajo(db)
+    del_dia, atrasada, de_manana, sin_iniciar = (_orden(db, fecha) for fecha in
+                                                 ("2026-03-10", "2026-03-09", "2026-03-11", "2026-03-10"))
+    for orden in (del_dia, atrasada, de_manana):
+        gestor.iniciar(orden)
+
+    assert gestor.completar_del_dia("2026-03-10") == 1
+    assert [_estado(db, o) for o in (del_dia, atrasada, de_manana, sin_iniciar)] == \
+        [COMPLETADO, EN_PROCESO, EN_PROCESO, PROGRAMADO]
+
+    # Las atrasadas solo si se piden
+    assert gestor.completar_del_dia("2026-03-10", incluir_atrasadas=True) == 1
+    assert [_estado(db, o) for o in (atrasada, de_manana)] == [COMPLETADO, EN_PROCESO]
@@ -0,0 +1,142 @@
+# test_sincronizacion.py - Exportar de una base y aplicar en otra con sincronizacion.py
+import sincronizacion
+from database import DatabaseManager
+
+
+def _bases(tmp_path):
+    origen = DatabaseManager(str(tmp_path / "origen.db"))
+    destino = DatabaseManager(str(tmp_path / "destino.db"))
+    # Punto de partida común: los datos iniciales de cada base quedan vinculados
+    _sincronizar(origen, destino, tmp_path / "lotes_inicio")
+    return origen, destino
+
+
+def _sincronizar(origen, destino, carpeta):
+    sincronizacion.exportar_cambios(origen, str(carpeta), destino=_identidad(destino))
+    return sincronizacion.aplicar_carpeta(destino, str(carpeta))
+
+
+def _identidad(db):
+    return sincronizacion.estado(db)['base_local']
+
+
+def _consultar(db, sql, parametros=()):
+    conn = db.crear_conexion()
+    filas = conn.execute(sql, parametros).fetchall()
+    conn.close()
+    return filas
+
+
+def _ejecutar(db, sql, parametros=()):
+    conn = db.crear_conexion()
+    cursor = conn.execute(sql, parametros)
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+
+def _id_aeronave(db, matricula):
+    return _consultar(db, "SELECT id FROM aeronaves WHERE matricula = ?", (matricula,))[0][0]
+
+
+def _id_tecnico(db, licencia):
+    return _consultar(db, "SELECT id FROM tecnicos WHERE licencia = ?", (licencia,))[0][0]
+
+
+def _nuevo_tecnico(db, licencia):
+    return _ejecutar(db, "INSERT INTO tecnicos (nombre, especialidad, licencia) VALUES (?, ?, ?)",
+                     (f"Técnico {licencia}", "Motores", licencia))
+
+
+def test_exportar_y_aplicar(tmp_path):
+    origen, destino = _bases(tmp_path)
+    origen.insertar_aeronave("CP-SYNC", "Cessna 172", "Cessna", 1157, "Liviana", 40, None)
+    origen.actualizar_horas_vuelo(_id_aeronave(origen, "CP-SYNC"), 55)
+
+    resumenes = _sincronizar(origen, destino, tmp_path / "lotes")
+
+    assert [r['conflictos'] for r in resumenes] == [[]]
+    assert _consultar(destino, "SELECT horas_vuelo FROM aeronaves WHERE matricula = 'CP-SYNC'") == [(55,)]
+    # El mismo lote no se vuelve a aplicar
+    assert sincronizacion.aplicar_carpeta(destino, str(tmp_path / "lotes"))[0]['aplicados'] == 0
+
+
+def test_hijo_apunta_a_padre_insertado_despues_en_el_lote(tmp_path):
+    origen, destino = _bases(tmp_path)
+    tecnico_id = _consultar(origen, "SELECT MIN(id) FROM tecnicos")[0][0]
+    otra_id = _consultar(origen, "SELECT MIN(id) FROM aeronaves")[0][0]
+    origen.insertar_mantenimiento(otra_id, "Revisión", "2026-01-01", tecnico_id, "Lote")
+    mantenimiento_id = _consultar(origen, "SELECT MAX(id) FROM mantenimientos")[0][0]
+    origen.insertar_aeronave("CP-PADRE", "Cessna 172", "Cessna", 1157, "Liviana", 10, None)
+    _ejecutar(origen, "UPDATE mantenimientos SET aeronave_id = ? WHERE id = ?",
+              (_id_aeronave(origen, "CP-PADRE"), mantenimiento_id))
+
+    resumenes = _sincronizar(origen, destino, tmp_path / "lotes")
+
+    assert resumenes[0]['conflictos'] == [] and resumenes[0]['pendientes'] == 0
+    assert _consultar(destino, """SELECT COUNT(*) FROM mantenimientos m JOIN aeronaves a ON a.id = m.aeronave_id
+                                  WHERE a.matricula = 'CP-PADRE' AND m.descripcion = 'Lote'""") == [(1,)]
+
+
+def test_matricula_y_licencia_repetidas_se_vinculan_por_clave_natural(tmp_path):
+    origen, destino = _bases(tmp_path)
+    # La misma aeronave y el mismo técnico registrados por separado en cada base
+    destino.insertar_aeronave("CP-NAT", "Cessna 172", "Cessna", 1157, "Liviana", 100, None)
+    _nuevo_tecnico(destino, "LIC-NAT")
+    origen.insertar_aeronave("CP-NAT", "Cessna 172", "Cessna", 1157, "Liviana", 120, None)
+    _nuevo_tecnico(origen, "LIC-NAT")
+    origen.insertar_mantenimiento(_id_aeronave(origen, "CP-NAT"), "Revisión", "2026-01-01",
+                                  _id_tecnico(origen, "LIC-NAT"), "Natural")
+
+    resumenes = _sincronizar(origen, destino, tmp_path / "lotes")
+
+    assert resumenes[0]['conflictos'] == []
+    assert _consultar(destino, "SELECT horas_vuelo FROM aeronaves WHERE matricula = 'CP-NAT'") == [(120,)]
+    assert _consultar(destino, "SELECT COUNT(*) FROM tecnicos WHERE licencia = 'LIC-NAT'") == [(1,)]
+    assert _consultar(destino, "SELECT aeronave_id, tecnico_id FROM mantenimientos WHERE descripcion = 'Natural'") == \
+        [(_id_aeronave(destino, "CP-NAT"), _id_tecnico(destino, "LIC-NAT"))]
+
+    # Los cambios siguientes llegan a la fila ya vinculada
+    origen.actualizar_horas_vuelo(_id_aeronave(origen, "CP-NAT"), 130)
+    _sincronizar(origen, destino, tmp_path / "lotes_2")
+    assert _consultar(destino, "SELECT horas_vuelo FROM aeronaves WHERE matricula = 'CP-NAT'") == [(130,)]
+
+
+def test_cambio_pendiente_se_recupera_en_un_lote_posterior(tmp_path):
+    origen, destino = _bases(tmp_path)
+    origen.insertar_aeronave("CP-PEND", "Cessna 172", "Cessna", 1157, "Liviana", 10, None)
+    _sincronizar(origen, destino, tmp_path / "lotes_1")
+
+    # El destino pierde la aeronave sin registrar el cambio: el mantenimiento no tiene a quién apuntar
+    conn = destino.crear_conexion()
+    sincronizacion.pausar_captura(conn.cursor())
+    conn.execute("DELETE FROM aeronaves WHERE matricula = 'CP-PEND'")
+    conn.execute("DELETE FROM sincronizacion_ids WHERE tabla = 'aeronaves'")
+    sincronizacion.pausar_captura(conn.cursor(), False)
+    conn.commit()
+    conn.close()
+
+    tecnico_id = _consultar(origen, "SELECT MIN(id) FROM tecnicos")[0][0]
+    origen.insertar_mantenimiento(_id_aeronave(origen, "CP-PEND"), "Revisión", "2026-01-01", tecnico_id, "Pendiente")
+    resumen = _sincronizar(origen, destino, tmp_path / "lotes_2")[0]
+    assert len(resumen['conflictos']) == 1 and resumen['pendientes'] == 1
+    assert _consultar(destino, "SELECT COUNT(*) FROM mantenimientos WHERE descripcion = 'Pendiente'") == [(0,)]
+
+    # La aeronave vuelve con su siguiente cambio y el mantenimiento guardado se aplica
+    origen.actualizar_horas_vuelo(_id_aeronave(origen, "CP-PEND"), 20)
+    resumen = _sincronizar(origen, destino, tmp_path / "lotes_3")[0]
+    assert resumen['recuperados'] == 1 and resumen['pendientes'] == 0
+    assert sincronizacion.estado(destino)['pendientes'] == {}
+    assert _consultar(destino, """SELECT COUNT(*) FROM mantenimientos m JOIN aeronaves a ON a.id = m.aeronave_id
+                                  WHERE a.matricula = 'CP-PEND' AND m.descripcion = 'Pendiente'""") == [(1,)]
+
+
+def test_un_registro_por_actualizacion_de_horas(tmp_path):
+    db = DatabaseManager(str(tmp_path / "cdc.db"))
+    aeronave_id = _consultar(db, "SELECT MIN(id) FROM aeronaves")[0][0]
+    antes = _consultar(db, "SELECT COALESCE(MAX(seq), 0) FROM registro_cambios")[0][0]
+
+    db.actualizar_horas_vuelo(aeronave_id, 777)
+
+    assert _consultar(db, "SELECT tabla, fila_id, operacion FROM registro_cambios WHERE seq > ?", (antes,)) == \
+        [('aeronaves', aeronave_id, 'U')]
@@ -0,0 +1,206 @@
+# validacion_cruzada.py - Validación cruzada estratificada k-fold con pliegues en paralelo
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from almacen_modelos import hash_manifiesto
+from busqueda_hiperparametros import limitar_hilos
+from preprocesamiento import crear_manifiesto, decodificar, firma_preprocesamiento
+
+
+def pliegues_estratificados(etiquetas, k, semilla=123):
+    """Número de pliegue de cada imagen: cada clase se reparte por igual entre los k pliegues"""
+    rng = np.random.default_rng(semilla)
+    pliegue = np.empty(len(etiquetas), dtype='i4')
+    desplazamiento = 0
+    for clase in np.unique(etiquetas):
+        indices = np.flatnonzero(etiquetas == clase)
+        rng.shuffle(indices)
+        # El desplazamiento evita que los pliegues bajos reciban siempre el resto de cada clase
+        pliegue[indices] = (np.arange(len(indices)) + desplazamiento) % k
+        desplazamiento += len(indices)
+    return pliegue
+
+
+def cache_decodificada(ruta_datos, rutas, tamano, carpeta='cache_cv', hilos=None):
+    """Decodificar todas las imágenes una sola vez a un .npy uint8 que los procesos abren como memmap"""
+    os.makedirs(carpeta, exist_ok=True)
+    # La firma separa cachés hechas con otra decodificación (no se reutilizan píxeles distintos)
+    ruta = os.path.join(carpeta, f"{hash_manifiesto(ruta_datos)[:16]}_{tamano}_{firma_preprocesamiento()}.npy")
+    if os.path.exists(ruta):
+        return ruta
+
+    temporal = ruta + '.tmp'
+    imagenes = np.lib.format.open_memmap(temporal, mode='w+', dtype='u1', shape=(len(rutas), tamano, tamano, 3))
+
+    def decodificar_en(i):
+        # Mismo preprocesamiento que el entrenamiento normal y la inferencia
+        decodificar(rutas[i], (tamano, tamano), imagenes[i])
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos or os.cpu_count()) as pool:
+        list(pool.map(decodificar_en, range(len(rutas))))
+    imagenes.flush()
+    del imagenes
+    os.replace(temporal, ruta)
+    print(f"🗜️ {len(rutas)} imágenes decodificadas en {time.perf_counter() - inicio:.1f} s → {ruta}")
+    return ruta
+
+
+def _dataset(imagenes, etiquetas, indices, tamano_lote, semilla=None):
+    """Lotes leídos del memmap bajo demanda; con semilla se barajan distinto en cada época"""
+    import tensorflow as tf
+
+    rng = np.random.default_rng(semilla)
+    _, alto, ancho, canales = imagenes.shape
+
+    def lotes():
+        orden = rng.permutation(indices) if semilla is not None else indices
+        for i in range(0, len(orden), tamano_lote):
+            # Índices ordenados: lectura secuencial del archivo
+            bloque = np.sort(orden[i:i + tamano_lote])
+            yield imagenes[bloque], etiquetas[bloque]
+
+    ds = tf.data.Dataset.from_generator(lotes, output_signature=(
+        tf.TensorSpec((None, alto, ancho, canales), tf.uint8),
+        tf.TensorSpec((None,), tf.int32)))
+    return ds.map(lambda x, y: (tf.cast(x, tf.float32), y))
+
+
+def _entrenar_pliegue(ruta_cache, etiquetas, pliegue, indices_entrenamiento, indices_validacion, clases,
+                      hiperparametros, perfil):
+    """Entrenar un pliegue en el proceso hijo y devolver sus métricas y matriz de confusión"""
+    from ai_classifier import ClasificadorAeronaves, resolver_hiperparametros
+
+    inicio = time.perf_counter()
+    _, hp = resolver_hiperparametros(hiperparametros, perfil)
+    imagenes = np.load(ruta_cache, mmap_mode='r')
+    entrenamiento = _dataset(imagenes, etiquetas, indices_entrenamiento, hp['tamano_lote'], semilla=pliegue)
+    validacion = _dataset(imagenes, etiquetas, indices_validacion, hp['tamano_lote'])
+
+    clasificador = ClasificadorAeronaves(usar_cache=False)
+    clasificador.class_names = clases
+    metricas = clasificador.entrenar_con_datasets(entrenamiento, validacion, hiperparametros, perfil)
+
+    # Matriz de confusión (filas = clase real) con el modelo de la mejor época
+    predichas = np.argmax(clasificador.model.predict(validacion, verbose=0), axis=1)
+    matriz = np.zeros((len(clases), len(clases)), dtype='i8')
+    np.add.at(matriz, (etiquetas[indices_validacion], predichas), 1)
+    return {'pliegue': pliegue, 'metricas': metricas, 'matriz': matriz.tolist(),
+            'duracion': time.perf_counter() - inicio}
+
+
+def validar(ruta_datos, k=5, procesos=None, hilos_por_proceso=None, hiperparametros=None, perfil=None,
+            semilla=123, carpeta_cache='cache_cv', ruta_reporte=None):
+    """Entrenar los k pliegues en paralelo y devolver el reporte agregado"""
+    from ai_classifier import resolver_hiperparametros
+
+    perfil, hp = resolver_hiperparametros(hiperparametros, perfil)
+    rutas, etiquetas, clases = crear_manifiesto(ruta_datos)
+    pliegues = pliegues_estratificados(etiquetas, k, semilla)
+    ruta_cache = cache_decodificada(ruta_datos, rutas, int(hp['tamano_imagen']), carpeta_cache)
+
+    nucleos = os.cpu_count() or 1
+    procesos = procesos or max(1, min(k, nucleos // 2))
+    hilos = hilos_por_proceso or max(1, nucleos // procesos)
+    print(f"🧪 {k} pliegues de {len(rutas)} imágenes ({len(clases)} clases) "
+          f"en {procesos} procesos × {hilos} hilos")
+
+    inicio = time.perf_counter()
+    resultados = []
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=limitar_hilos, initargs=(hilos,)) as pool:
+        futuros = [pool.submit(_entrenar_pliegue, ruta_cache, etiquetas, pliegue,
+                               np.flatnonzero(pliegues != pliegue), np.flatnonzero(pliegues == pliegue),
+                               clases, hiperparametros, perfil)
+                   for pliegue in range(k)]
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            resultados.append(resultado)
+            print(f"   Pliegue {resultado['pliegue']}: val_accuracy "
+                  f"{resultado['metricas']['val_accuracy']:.3f} en {resultado['duracion']:.1f} s")
+    duracion = time.perf_counter() - inicio
+
+    reporte = agregar(sorted(resultados, key=lambda r: r['pliegue']), clases)
+    reporte.update({
+        'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'ruta_datos': ruta_datos,
+        'k': k,
+        'perfil': perfil,
+        'hiperparametros': hp,
+        'duracion_total': duracion,
+        # Cuánto más rápido que entrenar los pliegues uno tras otro
+        'aceleracion': sum(r['duracion'] for r in resultados) / duracion,
+    })
+    mostrar_reporte(reporte)
+    if ruta_reporte:
+        with open(ruta_reporte, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"💾 Reporte guardado en {ruta_reporte}")
+    return reporte
+
+
+def agregar(resultados, clases):
+    """Media y desvío de cada métrica entre pliegues y métricas por clase de la matriz sumada"""
+    nombres = sorted(set().union(*(r['metricas'] for r in resultados)))
+    resumen = {}
+    for nombre in nombres:
+        valores = np.array([r['metricas'][nombre] for r in resultados if nombre in r['metricas']])
+        resumen[nombre] = {'media': float(valores.mean()), 'desvio': float(valores.std(ddof=1))
+                           if len(valores) > 1 else 0.0}
+
+    matriz = np.sum([r['matriz'] for r in resultados], axis=0)
+    aciertos = np.diag(matriz)
+    reales = matriz.sum(axis=1)
+    predichas = matriz.sum(axis=0)
+    por_clase = {}
+    for i, clase in enumerate(clases):
+        precision = aciertos[i] / predichas[i] if predichas[i] else 0.0
+        recall = aciertos[i] / reales[i] if reales[i] else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        por_clase[clase] = {'precision': float(precision), 'recall': float(recall), 'f1': float(f1),
+                            'soporte': int(reales[i])}
+
+    return {'metricas': resumen, 'por_clase': por_clase, 'matriz_confusion': matriz.tolist(),
+            'pliegues': [{'pliegue': r['pliegue'], 'duracion': r['duracion'], **r['metricas']}
+                         for r in resultados]}
+
+
+def mostrar_reporte(reporte):
+    print(f"\n{'Métrica':<22} {'Media':>8} {'Desvío':>8}")
+    for nombre, valores in reporte['metricas'].items():
+        print(f"{nombre:<22} {valores['media']:>8.3f} {valores['desvio']:>8.3f}")
+    print(f"\n{'Clase':<22} {'Precisión':>9} {'Recall':>8} {'F1':>7} {'Soporte':>8}")
+    for clase, valores in reporte['por_clase'].items():
+        print(f"{clase:<22} {valores['precision']:>9.1%} {valores['recall']:>8.1%} "
+              f"{valores['f1']:>7.3f} {valores['soporte']:>8}")
+    print(f"\n⏱️ {reporte['duracion_total']:.1f} s en total; "
+          f"{reporte['aceleracion']:.1f}× respecto de pliegues en serie")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validación cruzada estratificada del clasificador")
+    parser.add_argument('datos', nargs='?', default='aeronaves')
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--procesos', type=int, default=None)
+    parser.add_argument('--hilos', type=int, default=None, help="Hilos de TensorFlow por proceso")
+    parser.add_argument('--perfil', default=None)
+    parser.add_argument('--hiperparametros', default=None, help="JSON con los hiperparámetros a usar")
+    parser.add_argument('--semilla', type=int, default=123)
+    parser.add_argument('--cache', default='cache_cv', help="Carpeta de imágenes ya decodificadas")
+    parser.add_argument('--reporte', default='validacion_cruzada.json')
+    args = parser.parse_args()
+
+    hiperparametros = json.loads(args.hiperparametros) if args.hiperparametros else None
+    validar(args.datos, args.k, args.procesos, args.hilos, hiperparametros, args.perfil, args.semilla,
+            args.cache, args.reporte)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 # ventana_aeronaves.py - Ventanas para gestión de aeronaves
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
+
+from database import ConflictoVersion
 
 class VentanaRegistroAeronave(tk.Toplevel):
     def __init__(self, parent):
@@ -41,6 +43,14 @@ class VentanaRegistroAeronave(tk.Toplevel):
         for i, (label_text, var) in enumerate(campos):
             tk.Label(main_frame, text=label_text, font=('Arial', 12), 
                     bg='#ecf0f1', fg='#2c3e50').grid(row=i, column=0, sticky='w', pady=8)
+            if var is self.var_modelo:
+                # Modelos del catálogo: al elegir uno se completan fabricante y peso
+                combo_modelo = ttk.Combobox(main_frame, textvariable=var, values=self.parent.catalogo.modelos(),
+                                            font=('Arial', 12), width=23)
+                combo_modelo.grid(row=i, column=1, padx=20, pady=8)
+                combo_modelo.bind('<<ComboboxSelected>>', self.completar_desde_catalogo)
+                combo_modelo.bind('<FocusOut>', self.completar_desde_catalogo)
+                continue
             tk.Entry(main_frame, textvariable=var, font=('Arial', 12), 
                     width=25).grid(row=i, column=1, padx=20, pady=8)
         
@@ -56,14 +66,16 @@ class VentanaRegistroAeronave(tk.Toplevel):
                                    font=('Arial', 12), width=23)
         hangar_combo.grid(row=len(campos), column=1, padx=20, pady=8)
         
+        # Preseleccionar el hangar con más lugares libres
+        sugerido = self.parent.indice_hangares.sugerir_hangar()
+        if sugerido:
+            self.var_hangar.set(f"{sugerido[1]} - {sugerido[2]}")
+        
         # Información de categorías
         info_frame = tk.Frame(main_frame, bg='#d5dbdb', relief='sunken', bd=2)
         info_frame.grid(row=len(campos)+1, column=0, columnspan=2, pady=20, padx=10, sticky='ew')
         
-        info_text = """💡 CATEGORÍAS AUTOMÁTICAS POR PESO MTOW:
-• Liviana: ≤ 5,700 kg (Mantenimiento cada 100h)
-• Mediana: 5,701-27,000 kg (Mantenimiento cada 150h)  
-• Pesada: > 27,000 kg (Mantenimiento cada 200h)"""
+        info_text = "💡 CATEGORÍAS AUTOMÁTICAS POR PESO MTOW:\n" + self.parent.reglas.descripcion()
         
         tk.Label(info_frame, text=info_text, font=('Arial', 9), 
                 bg='#d5dbdb', fg='#2c3e50', justify='left').pack(padx=10, pady=10)
@@ -77,6 +89,16 @@ class VentanaRegistroAeronave(tk.Toplevel):
         tk.Button(btn_frame, text="Cancelar", command=self.destroy,
                  bg='#e74c3c', fg='white', font=('Arial', 12), width=12).pack(side='right', padx=10)
     
+    def completar_desde_catalogo(self, evento=None):
+        """Completar fabricante y peso del modelo elegido (sin pisar lo que ya se escribió)"""
+        tipo = self.parent.catalogo.buscar(self.var_modelo.get())
+        if not tipo:
+            return
+        if not self.var_fabricante.get():
+            self.var_fabricante.set(tipo.fabricante)
+        if not self.var_peso_mtow.get():
+            self.var_peso_mtow.set(f"{tipo.peso_mtow:g}")
+    
     def guardar_aeronave(self):
         """Validar y guardar la aeronave en la base de datos"""
         # Validaciones
@@ -101,13 +123,23 @@ class VentanaRegistroAeronave(tk.Toplevel):
             messagebox.showerror("Error", "Hangar no válido")
             return
         
+        if not self.parent.indice_hangares.hay_espacio(hangar[0]):
+            sugerido = self.parent.indice_hangares.sugerir_hangar(ubicacion=hangar[2])
+            detalle = f"\nSugerencia: {sugerido[1]} - {sugerido[2]}" if sugerido else ""
+            messagebox.showerror("Error", f"{hangar[1]} no tiene lugares libres{detalle}")
+            return
+        
+        aviso = self.parent.discrepancia_catalogo(peso_mtow, self.var_modelo.get())
+        if aviso and not messagebox.askyesno("Revisar peso MTOW", f"{aviso}\n\n¿Registrar de todos modos?"):
+            return
+        
         # Insertar en la base de datos
         success = self.parent.db.insertar_aeronave(
             matricula=self.var_matricula.get(),
             modelo=self.var_modelo.get(),
             fabricante=self.var_fabricante.get(),
             peso_mtow=peso_mtow,
-            categoria=self.parent.categorizar_aeronave(peso_mtow),
+            categoria=self.parent.categorizar_aeronave(peso_mtow, self.var_modelo.get()),
             horas_vuelo=horas_vuelo,
             hangar_id=hangar[0]
         )
@@ -151,6 +183,29 @@ class VentanaListaAeronaves(tk.Toplevel):
         
         self.tree.pack(fill='both', expand=True, padx=20, pady=10)
         scrollbar.pack(side='right', fill='y')
+        
+        tk.Button(self, text="Actualizar Horas de Vuelo", command=self.actualizar_horas,
+                 bg='#3498db', fg='white', font=('Arial', 11)).pack(pady=10)
+    
+    def actualizar_horas(self):
+        """Registrar las horas de vuelo acumuladas de la aeronave seleccionada"""
+        seleccion = self.tree.selection()
+        if not seleccion:
+            messagebox.showwarning("Advertencia", "Selecciona una aeronave")
+            return
+        valores = self.tree.item(seleccion[0], 'values')
+        horas = simpledialog.askfloat("Horas de Vuelo", f"Horas de vuelo acumuladas de {valores[1]}:",
+                                      parent=self, minvalue=0)
+        if horas is None:
+            return
+        aeronave_id = int(valores[0])
+        try:
+            # Solo se guarda si nadie modificó la aeronave desde que se cargó la lista
+            self.parent.db.actualizar_horas_vuelo(aeronave_id, horas, version=self.versiones[aeronave_id])
+        except ConflictoVersion:
+            messagebox.showwarning("Conflicto", f"{valores[1]} fue modificada por otro usuario; "
+                                                "se recargó la lista con los datos actuales", parent=self)
+        self.actualizar_lista()
     
     def actualizar_lista(self):
         # Limpiar datos antiguos
@@ -158,9 +213,10 @@ class VentanaListaAeronaves(tk.Toplevel):
             self.tree.delete(item)
         
         # Obtener y cargar nuevos datos
-        aeronaves = self.parent.db.obtener_aeronaves()
+        aeronaves = self.parent.flota.aeronaves()
+        self.versiones = {a.id: a.version for a in aeronaves}
         for a in aeronaves:
             self.tree.insert('', 'end', values=(
-                a[0], a[1], a[2], a[3], f"{a[4]:,.2f} kg", 
-                a[5], f"{a[6]:,.1f} h", a[8]
-            ))
\ No newline at end of file
+                a.id, a.matricula, a.modelo, a.fabricante, f"{a.peso_mtow:,.2f} kg", 
+                a.categoria, f"{a.horas_vuelo:,.1f} h", a.hangar_nombre or "-"
+            ))
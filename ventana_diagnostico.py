@@ -0,0 +1,87 @@
+# ventana_diagnostico.py - Ventana de métricas de rendimiento
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+import instrumentacion
+
+
+class VentanaDiagnostico(tk.Toplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.title("Diagnóstico de Rendimiento")
+        self.geometry("1000x550")
+        self.configure(bg='#ecf0f1')
+        self.crear_interfaz()
+        self.actualizar_metricas()
+
+    def crear_interfaz(self):
+        tk.Label(self, text="Diagnóstico de Rendimiento", font=('Arial', 16, 'bold'),
+                bg='#ecf0f1', fg='#2c3e50').pack(pady=15)
+
+        self.label_estado = tk.Label(self, bg='#ecf0f1', font=('Arial', 10))
+        self.label_estado.pack()
+
+        columns = ("Operación", "Llamadas", "Errores", "Media (ms)", "p50 (ms)", "p95 (ms)", "Máx (ms)", "Filas")
+        self.tree = ttk.Treeview(self, columns=columns, show='headings')
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=90, anchor='center')
+        self.tree.column("Operación", width=300, anchor='w')
+
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(fill='both', expand=True, padx=20, pady=10)
+        scrollbar.pack(side='right', fill='y')
+
+        btn_frame = tk.Frame(self, bg='#ecf0f1')
+        btn_frame.pack(pady=10)
+
+        self.btn_activar = tk.Button(btn_frame, command=self.alternar, bg='#3498db', fg='white', width=14)
+        self.btn_activar.pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Actualizar", command=self.actualizar_metricas,
+                 bg='#2ecc71', fg='white', width=12).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Reiniciar", command=self.reiniciar,
+                 bg='#e67e22', fg='white', width=12).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Exportar JSON", command=self.exportar_json,
+                 bg='#9b59b6', fg='white', width=12).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Perfilar próxima acción", command=self.perfilar,
+                 bg='#e74c3c', fg='white', width=20).pack(side='left', padx=5)
+
+    def actualizar_metricas(self):
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        for nombre, m in instrumentacion.resumen().items():
+            self.tree.insert('', 'end', values=(
+                nombre, m['llamadas'], m['errores'], f"{m['media_ms']:.2f}",
+                f"{m['p50_ms']:.2f}", f"{m['p95_ms']:.2f}", f"{m['max_ms']:.2f}", m['filas']
+            ))
+
+        if instrumentacion.ACTIVO:
+            self.label_estado.config(text="🟢 Instrumentación activa", fg='green')
+            self.btn_activar.config(text="Desactivar")
+        else:
+            self.label_estado.config(text="⚪ Instrumentación desactivada", fg='gray')
+            self.btn_activar.config(text="Activar")
+
+    def alternar(self):
+        instrumentacion.activar(not instrumentacion.ACTIVO)
+        self.actualizar_metricas()
+
+    def reiniciar(self):
+        instrumentacion.reiniciar()
+        self.actualizar_metricas()
+
+    def exportar_json(self):
+        ruta = filedialog.asksaveasfilename(title="Guardar métricas", defaultextension='.json',
+                                            filetypes=[('JSON', '*.json')])
+        if ruta:
+            instrumentacion.volcar_json(ruta)
+            messagebox.showinfo("Éxito", f"Métricas guardadas en {ruta}")
+
+    def perfilar(self):
+        instrumentacion.armar_perfil()
+        self.actualizar_metricas()
+        messagebox.showinfo("Perfilado", "La próxima acción (abrir una ventana, clasificar, entrenar...) "
+                                         "se perfilará con cProfile y tracemalloc.\n"
+                                         "El resultado se guarda en la carpeta 'perfiles'.")
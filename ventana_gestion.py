@@ -1,6 +1,7 @@
 # ventana_gestion.py - Ventanas para gestión de recursos
 import tkinter as tk
 from tkinter import ttk, messagebox
+from bus_eventos import bus, OCUPACION_CAMBIADA
 
 # Implementación completa para VentanaGestionHangares
 class VentanaGestionHangares(tk.Toplevel):
@@ -12,26 +13,41 @@ class VentanaGestionHangares(tk.Toplevel):
         self.configure(bg='#ecf0f1')
         self.crear_interfaz()
         self.actualizar_lista()
+        
+        # Refrescar la utilización con cada cambio de ocupación
+        self.suscripcion = bus.suscribir(OCUPACION_CAMBIADA, self._al_cambiar_ocupacion)
+    
+    def destroy(self):
+        bus.desuscribir(self.suscripcion)
+        super().destroy()
     
     def crear_interfaz(self):
-        columns = ("ID", "Nombre", "Ubicación", "Capacidad", "Ocupación")
+        columns = ("ID", "Nombre", "Ubicación", "Capacidad", "Ocupación", "Libres", "Utilización")
         self.tree = ttk.Treeview(self, columns=columns, show='headings')
         
         for col in columns:
             self.tree.heading(col, text=col)
-            self.tree.column(col, width=150, anchor='center')
+            self.tree.column(col, width=130, anchor='center')
+        self.tree.tag_configure('lleno', background='#fadbd8')
         
         scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
         self.tree.configure(yscrollcommand=scrollbar.set)
         self.tree.pack(fill='both', expand=True, padx=20, pady=20)
         scrollbar.pack(side='right', fill='y')
     
+    def _al_cambiar_ocupacion(self, **datos):
+        # El evento puede llegar desde otro hilo: Tk solo se actualiza en el principal
+        self.after(0, self.actualizar_lista)
+    
     def actualizar_lista(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        hangares = self.parent.db.obtener_hangares()
-        for h in hangares:
-            self.tree.insert('', 'end', values=(h[0], h[1], h[2], h[3], f"{h[4]}/{h[3]}"))
+        # Las filas se actualizan en su lugar a partir del índice en memoria
+        for h in self.parent.indice_hangares.utilizacion():
+            valores = (h[0], h[1], h[2], h[3], f"{h[4]}/{h[3]}", h[5], f"{h[6]:.0f}%")
+            etiquetas = ('lleno',) if h[5] == 0 else ()
+            if self.tree.exists(str(h[0])):
+                self.tree.item(str(h[0]), values=valores, tags=etiquetas)
+            else:
+                self.tree.insert('', 'end', iid=str(h[0]), values=valores, tags=etiquetas)
 
 class VentanaGestionTecnicos(tk.Toplevel):
     def __init__(self, parent):
@@ -2,6 +2,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
+from bus_eventos import bus, ALERTAS_CAMBIADAS
+from ordenes_trabajo import GestorOrdenesTrabajo, ErrorOrdenTrabajo
 
 class VentanaProgramarMantenimiento(tk.Toplevel):
     def __init__(self, parent):
@@ -122,40 +124,65 @@ class VentanaAlertas(tk.Toplevel):
         super().__init__(parent)
         self.parent = parent
         self.title("Alertas de Mantenimiento")
-        self.geometry("800x400")
+        self.geometry("1100x450")
         self.configure(bg='#ecf0f1')
         
         self.crear_interfaz()
         self.actualizar_alertas()
+        
+        # Refrescar cuando el motor de alertas publique cambios
+        self.suscripcion = bus.suscribir(ALERTAS_CAMBIADAS, self._al_cambiar_alertas)
+    
+    def destroy(self):
+        bus.desuscribir(self.suscripcion)
+        super().destroy()
     
     def crear_interfaz(self):
         tk.Label(self, text="Aeronaves con Mantenimiento Pendiente", 
                 font=('Arial', 16, 'bold'), bg='#ecf0f1').pack(pady=20)
         
-        columns = ("Matrícula", "Modelo", "Horas Vuelo", "Categoría", "Horas Restantes")
+        columns = ("Matrícula", "Modelo", "Horas Vuelo", "Categoría", "Horas Restantes", "Alerta", "Estado")
         self.tree = ttk.Treeview(self, columns=columns, show='headings')
         
         for col in columns:
             self.tree.heading(col, text=col)
-            self.tree.column(col, width=150, anchor='center')
+            self.tree.column(col, width=120, anchor='center')
+        self.tree.column("Alerta", width=300, anchor='w')
         
         scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
         self.tree.configure(yscrollcommand=scrollbar.set)
         
         self.tree.pack(fill='both', expand=True, padx=20, pady=10)
         scrollbar.pack(side='right', fill='y')
+        
+        tk.Button(self, text="Reconocer Alerta", command=self.reconocer_alerta,
+                 bg='#3498db', fg='white').pack(pady=10)
+    
+    def _al_cambiar_alertas(self, **datos):
+        # El evento puede llegar desde otro hilo: Tk solo se actualiza en el principal
+        self.after(0, self.actualizar_alertas)
     
     def actualizar_alertas(self):
-        aeronaves = self.parent.db.obtener_aeronaves_con_alertas()
-        for a in aeronaves:
-            self.tree.insert('', 'end', values=(
-                a[1], a[2], f"{a[6]:.1f} h", a[5], 
-                self.calcular_horas_restantes(a[5], a[6])
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        
+        for al in self.parent.db.obtener_alertas_abiertas():
+            self.tree.insert('', 'end', iid=str(al[0]), values=(
+                al[1], al[2], f"{al[3]:.1f} h", al[4], 
+                self.calcular_horas_restantes(al[4], al[2], al[3] - al[9]), al[6], al[7]
             ))
     
-    def calcular_horas_restantes(self, categoria, horas_actuales):
-        limites = {'Liviana': 100, 'Mediana': 150, 'Pesada': 200}
-        return f"{limites[categoria] - horas_actuales:.1f} h"
+    def reconocer_alerta(self):
+        seleccion = self.tree.selection()
+        if not seleccion:
+            messagebox.showwarning("Advertencia", "Selecciona una alerta")
+            return
+        self.parent.db.reconocer_alerta(int(seleccion[0]))
+        self.actualizar_alertas()
+    
+    def calcular_horas_restantes(self, categoria, modelo, horas_actuales):
+        intervalo = self.parent.reglas.intervalo(categoria, modelo)
+        return f"{intervalo - horas_actuales:.1f} h" if intervalo is not None else "-"
 def guardar_mantenimiento(self):
     # Validaciones
     if not all([self.var_aeronave.get(), self.var_tipo.get(), 
@@ -189,8 +216,9 @@ class VentanaHistorialTecnico(tk.Toplevel):
         super().__init__(parent)
         self.parent = parent
         self.title("Historial Técnico")
-        self.geometry("1200x600")
+        self.geometry("1200x650")
         self.configure(bg='#ecf0f1')
+        self.ordenes = GestorOrdenesTrabajo(self.parent.db)
         self.crear_interfaz()
         self.actualizar_historial()
 
@@ -200,7 +228,7 @@ class VentanaHistorialTecnico(tk.Toplevel):
         
         columns = ("ID", "Aeronave", "Modelo", "Tipo", "Fecha Programada", 
                  "Técnico", "Estado", "Costo (Bs)")
-        self.tree = ttk.Treeview(self, columns=columns, show='headings')
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', selectmode='browse')
         
         for col in columns:
             self.tree.heading(col, text=col)
@@ -211,11 +239,46 @@ class VentanaHistorialTecnico(tk.Toplevel):
         
         self.tree.pack(fill='both', expand=True, padx=20, pady=10)
         scrollbar.pack(side='right', fill='y')
+        
+        # Transiciones de la orden de trabajo seleccionada
+        btn_frame = tk.Frame(self, bg='#ecf0f1')
+        btn_frame.pack(pady=10)
+        tk.Button(btn_frame, text="Iniciar", command=lambda: self.cambiar_estado(self.ordenes.iniciar),
+                 bg='#3498db', fg='white', width=12).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Completar", command=lambda: self.cambiar_estado(self.ordenes.completar),
+                 bg='#2ecc71', fg='white', width=12).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Cancelar", command=lambda: self.cambiar_estado(self.ordenes.cancelar),
+                 bg='#e74c3c', fg='white', width=12).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Cerrar trabajos del día", command=self.completar_del_dia,
+                 bg='#9b59b6', fg='white', width=20).pack(side='left', padx=5)
+
+    def cambiar_estado(self, transicion):
+        seleccion = self.tree.selection()
+        if not seleccion:
+            messagebox.showwarning("Advertencia", "Selecciona un mantenimiento")
+            return
+        try:
+            transicion(int(seleccion[0]))
+        except ErrorOrdenTrabajo as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.actualizar_historial()
+
+    def completar_del_dia(self):
+        try:
+            cerradas = self.ordenes.completar_del_dia()
+        except ErrorOrdenTrabajo as e:
+            messagebox.showerror("Error", str(e))
+            return
+        messagebox.showinfo("Éxito", f"{cerradas} órdenes de trabajo completadas")
+        self.actualizar_historial()
 
     def actualizar_historial(self):
-        mantenimientos = self.parent.db.obtener_mantenimientos()
-        for m in mantenimientos:
-            self.tree.insert('', 'end', values=(
-                m[0], m[7], m[8], m[2], m[3],
-                m[9], m[6], f"{m[8]:,.2f}"
-            ))
\ No newline at end of file
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        
+        for m in self.parent.flota.mantenimientos():
+            self.tree.insert('', 'end', iid=str(m.id), values=(
+                m.id, m.matricula, m.modelo, m.tipo, m.fecha_programada,
+                m.tecnico_nombre, m.estado, f"{m.costo or 0:,.2f}"
+            ))
@@ -1,6 +1,7 @@
 # ventana_reportes.py - Ventanas para reportes y estadísticas
+import threading
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox, filedialog
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
@@ -13,7 +14,7 @@ class VentanaEstadisticas(tk.Toplevel):
         self.crear_interfaz()
     
     def crear_interfaz(self):
-        stats = self.parent.db.obtener_estadisticas_generales()
+        stats = self.parent.flota.estadisticas_generales()
         
         # Gráfico de categorías
         fig = plt.Figure(figsize=(6,4))
@@ -35,13 +36,11 @@ class VentanaReporteCostos(tk.Toplevel):
         self.crear_interfaz()
     
     def crear_interfaz(self):
-        stats = self.parent.db.obtener_estadisticas_generales()
-        
         fig = plt.Figure(figsize=(8,5))
         ax = fig.add_subplot(111)
         
         # Gráfico de torta de costos por tipo
-        costos = self.parent.db.obtener_costos_por_tipo()
+        costos = self.parent.flota.costos_por_tipo()
         ax.pie(
             [c[1] for c in costos],
             labels=[c[0] for c in costos],
@@ -51,3 +50,80 @@ class VentanaReporteCostos(tk.Toplevel):
         
         canvas = FigureCanvasTkAgg(fig, self)
         canvas.get_tk_widget().pack()
+
+
+class VentanaExportarHistorial(tk.Toplevel):
+    """Exportar el historial de mantenimientos para auditorías"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.title("Exportar Historial de Mantenimientos")
+        self.geometry("500x320")
+        self.configure(bg='#ecf0f1')
+        
+        self.var_desde = tk.StringVar()
+        self.var_hasta = tk.StringVar()
+        self.var_matricula = tk.StringVar()
+        
+        self.crear_interfaz()
+    
+    def crear_interfaz(self):
+        tk.Label(self, text="Exportar Historial", font=('Arial', 16, 'bold'), 
+                bg='#ecf0f1', fg='#2c3e50').pack(pady=15)
+        
+        main_frame = tk.Frame(self, bg='#ecf0f1')
+        main_frame.pack(padx=30, fill='x')
+        
+        campos = [
+            ("Desde (YYYY-MM-DD):", self.var_desde),
+            ("Hasta (YYYY-MM-DD):", self.var_hasta),
+            ("Matrícula (opcional):", self.var_matricula)
+        ]
+        for i, (label_text, var) in enumerate(campos):
+            tk.Label(main_frame, text=label_text, bg='#ecf0f1').grid(row=i, column=0, sticky='w', pady=5)
+            ttk.Entry(main_frame, textvariable=var, width=30).grid(row=i, column=1, pady=5)
+        
+        self.progreso = ttk.Progressbar(self, length=400, mode='determinate')
+        self.progreso.pack(pady=15)
+        self.label_estado = tk.Label(self, text="", bg='#ecf0f1')
+        self.label_estado.pack()
+        
+        self.btn_exportar = tk.Button(self, text="Exportar...", command=self.exportar,
+                                      bg='#2ecc71', fg='white', width=15)
+        self.btn_exportar.pack(pady=10)
+    
+    def exportar(self):
+        from exportacion import exportar_historial
+        
+        tipos = [('CSV', '*.csv'), ('JSON Lines', '*.jsonl'), ('Parquet', '*.parquet'), ('Excel', '*.xlsx')]
+        ruta = filedialog.asksaveasfilename(title="Guardar historial", filetypes=tipos,
+                                            defaultextension='.csv')
+        if not ruta:
+            return
+        
+        self.btn_exportar.config(state='disabled')
+        filtros = (self.var_desde.get() or None, self.var_hasta.get() or None,
+                   self.var_matricula.get() or None)
+        
+        def progreso(escritas, total):
+            # Tk solo se toca desde el hilo principal
+            self.after(0, self.actualizar_progreso, escritas, total)
+        
+        def tarea():
+            try:
+                escritas = exportar_historial(self.parent.db, ruta, None, *filtros, progreso=progreso)
+                self.after(0, self.finalizar, f"✅ {escritas:,} filas exportadas", None)
+            except Exception as e:
+                self.after(0, self.finalizar, "❌ Error en la exportación", str(e))
+        
+        threading.Thread(target=tarea, daemon=True).start()
+    
+    def actualizar_progreso(self, escritas, total):
+        self.progreso['value'] = 100 * escritas / total if total else 100
+        self.label_estado.config(text=f"{escritas:,} de {total:,} filas")
+    
+    def finalizar(self, mensaje, error):
+        self.btn_exportar.config(state='normal')
+        self.label_estado.config(text=mensaje)
+        if error:
+            messagebox.showerror("Error", error)